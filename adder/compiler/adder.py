@@ -4,11 +4,17 @@ Adder CLI - Compile Python-syntax code to x86_64.
 
 Usage:
     adder compile source.py --target=<target> -o output.elf
+    adder prof dump.bin [dump2.bin ...]     hot-function report
+    adder prof table.bin --cpu cpu0.bin ... [--folded out.folded]
+    adder prof dump.bin --json prof.json    profile for --profile-use
+    adder fentry image.elf                  list --fentry call sites
+    adder size old.json [new.json]          --size-json report / diff
 
 Targets:
     x86_64-bare-metal           Standalone kernel image (hamnix-kernel.elf)
     x86_64-linux-kernel-module  Emits .S for kbuild → .ko
     x86_64-adder-user           CPL-3 userspace ELF for the bare-metal kernel
+    x86_64-linux-user           Static ELF64 that runs on the Linux build host
 
 The original ARM Cortex-M target lived in compiler/codegen_arm.py and was
 deleted in the legacy cleanup; only the x86_64 backend ships now.
@@ -22,8 +28,22 @@ from pathlib import Path
 
 from .lexer import tokenize, LexerError
 from .parser import Parser, ParseError, parse
-from .ast_nodes import Program, ImportDecl
-from .codegen_x86 import generate as generate_x86, CodeGenError
+from .ast_nodes import Program, ImportDecl, FunctionDef, VarDecl, ClassDef
+from .codegen_x86 import (
+    generate as generate_x86, CodeGenError, CodeGenOptions,
+    X86_CPU_FEATURES, CACHE_LINE_SIZE, INSTRUMENT_MODES,
+)
+from .prof import (
+    ProfDumpError, read_dump, parse_records, merge_records,
+    format_counts_report, parse_pcpu_table, cycles_profile,
+    format_cycles_report, format_folded, Profile, format_profile,
+    load_profile,
+)
+from .fentry import FentryDecodeError, decode_elf, format_sites
+from .sizes import (
+    SizeReportError, measure_object, format_size_report, format_size_diff,
+    format_sizes, load_sizes, SIZE_REPORT_TOP,
+)
 
 
 # Compilation targets. `codegen` selects the backend; `kbuild` means the
@@ -44,11 +64,18 @@ TARGETS = {
     # elf32-i386 so the kernel's loader can parse it).
     "x86_64-adder-user": {"codegen": "x86", "kbuild": False,
                           "bare_metal": True},
+    # Static ELF64 for the Linux build host, so generated code can be
+    # timed (`perf stat`) and checked without booting QEMU. Same codegen
+    # again; the link adds compiler/runtime_linux.S (_start plus the
+    # user/runtime.S wrappers that have a Linux equivalent, on Linux
+    # syscall numbers) and uses ld's default script.
+    "x86_64-linux-user": {"codegen": "x86", "kbuild": False,
+                          "bare_metal": True},
 }
 DEFAULT_TARGET = "x86_64-bare-metal"
 
 
-def get_generator(target: str):
+def get_generator(target: str, options: CodeGenOptions = None):
     """Return a callable program -> assembly string for the target."""
     spec = TARGETS.get(target)
     if spec is None:
@@ -58,7 +85,8 @@ def get_generator(target: str):
         sys.exit(1)
     if spec["codegen"] == "x86":
         bare = spec.get("bare_metal", False)
-        return lambda program: generate_x86(program, bare_metal=bare)
+        return lambda program: generate_x86(program, bare_metal=bare,
+                                            options=options)
     raise AssertionError(f"unhandled codegen backend: {spec['codegen']}")
 
 
@@ -466,9 +494,10 @@ def merge_programs(files: list[Path]) -> Program:
 
 
 def compile_source(source: str, filename: str = "<stdin>",
-                   target: str = DEFAULT_TARGET) -> str:
+                   target: str = DEFAULT_TARGET,
+                   options: CodeGenOptions = None) -> str:
     """Compile Adder source to assembly (single file, no imports)."""
-    generate = get_generator(target)
+    generate = get_generator(target, options)
     try:
         program = parse(source, filename)
         return generate(program)
@@ -477,9 +506,14 @@ def compile_source(source: str, filename: str = "<stdin>",
         sys.exit(1)
 
 
-def compile_with_imports(main_file: Path, target: str = DEFAULT_TARGET) -> str:
+def compile_with_imports(main_file: Path, target: str = DEFAULT_TARGET,
+                         options: CodeGenOptions = None) -> str:
     """Compile Adder source with import resolution."""
-    generate = get_generator(target)
+    return compile_program(load_with_imports(main_file), target, options)
+
+
+def load_with_imports(main_file: Path) -> Program:
+    """Parse `main_file` and everything it imports into one program."""
     project_root = find_hamnix_root()
 
     # Collect all imported files
@@ -490,16 +524,58 @@ def compile_with_imports(main_file: Path, target: str = DEFAULT_TARGET) -> str:
         print(f"  {f.relative_to(project_root)}", file=sys.stderr)
 
     # Merge into single program
-    merged_program = merge_programs(all_files)
+    return merge_programs(all_files)
 
-    # Generate assembly
+
+def compile_program(program: Program, target: str = DEFAULT_TARGET,
+                    options: CodeGenOptions = None) -> str:
+    """Generate assembly for a merged program."""
+    generate = get_generator(target, options)
     try:
-        return generate(merged_program)
+        return generate(program)
     except CodeGenError as e:
         print(f"Error: {e}", file=sys.stderr)
         sys.exit(1)
 
 
+def symbol_owners(program: Program) -> dict[str, tuple[str, str]]:
+    """Map each symbol a merged program declares to (module, name as
+    written in source), for --size-report."""
+    owners: dict[str, tuple[str, str]] = {}
+    for decl in program.declarations:
+        if isinstance(decl, (FunctionDef, VarDecl)) and decl.module:
+            owners[decl.name] = (decl.module, decl.orig_name or decl.name)
+        elif isinstance(decl, ClassDef) and decl.module:
+            for method in decl.methods:
+                # The codegen's `Class__method` spelling.
+                owners[f"{decl.name}__{method.name}"] = (
+                    decl.module, f"{decl.name}.{method.name}")
+    return owners
+
+
+def measure_sizes(asm: str, owners: dict[str, tuple[str, str]]):
+    """Assemble `asm` on its own and split its sections among the
+    symbols in it (compiler/sizes.py); None if it does not assemble."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        src = Path(tmpdir) / "sizes.S"
+        obj = Path(tmpdir) / "sizes.o"
+        src.write_text(".code64\n" + asm)
+        try:
+            result = subprocess.run(
+                ["as", "--64", "-o", str(obj), str(src)],
+                capture_output=True, text=True,
+            )
+        except FileNotFoundError:
+            print("Error: GNU as not found (install binutils)",
+                  file=sys.stderr)
+            return None
+        if result.returncode != 0:
+            print(f"Error assembling for --size-report:\n{result.stderr}",
+                  file=sys.stderr)
+            return None
+        return measure_object(obj.read_bytes(), owners)
+
+
 def assemble_and_link_x86_bare(asm_file: Path, output: Path,
                                 project_root: Path) -> bool:
     """Assemble + link a Adder bare-metal x86_64 kernel image.
@@ -715,6 +791,64 @@ def assemble_and_link_x86_user(asm_file: Path, output: Path,
     return True
 
 
+def assemble_and_link_x86_linux(asm_file: Path, output: Path) -> bool:
+    """Assemble + link a Adder source into a static host-Linux ELF64.
+
+    The smallest link of the three: the compiler-emitted .S plus
+    compiler/runtime_linux.S, assembled `as --64` and linked
+    `ld -m elf_x86_64 -static` with ld's default script (text at
+    0x400000, separate R/RX/RW segments). The runtime ships with the
+    compiler rather than under user/, so the target needs nothing from
+    the Hamnix tree. No libc: the program reaches the host kernel only
+    through the runtime's wrappers and the `__syscallN` builtins.
+    """
+    as_cmd = "as"
+    ld_cmd = "ld"
+
+    try:
+        subprocess.run([as_cmd, "--version"], capture_output=True, check=True)
+    except (subprocess.CalledProcessError, FileNotFoundError):
+        print("Error: GNU as not found (install binutils)", file=sys.stderr)
+        return False
+
+    runtime_s = Path(__file__).parent / "runtime_linux.S"
+    if not runtime_s.exists():
+        print(f"Error: missing {runtime_s}", file=sys.stderr)
+        return False
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmpdir = Path(tmpdir)
+        runtime_o = tmpdir / "runtime_linux.o"
+        main_o    = tmpdir / "main.o"
+
+        # Same .code64 marker as the other two links; harmless here.
+        hamnix_s = tmpdir / "hamnix_main.S"
+        hamnix_s.write_text(".code64\n" + asm_file.read_text())
+
+        for src, obj in [(runtime_s, runtime_o), (hamnix_s, main_o)]:
+            result = subprocess.run(
+                [as_cmd, "--64", "-o", str(obj), str(src)],
+                capture_output=True, text=True,
+            )
+            if result.returncode != 0:
+                print(f"Error assembling {src}:\n{result.stderr}",
+                      file=sys.stderr)
+                return False
+
+        # runtime.o first so _start opens .text, as in the user link.
+        link_cmd = [
+            ld_cmd, "-m", "elf_x86_64", "-nostdlib", "-static",
+            "-z", "noexecstack", "-o", str(output),
+            str(runtime_o), str(main_o),
+        ]
+        result = subprocess.run(link_cmd, capture_output=True, text=True)
+        if result.returncode != 0:
+            print(f"Error linking:\n{result.stderr}", file=sys.stderr)
+            return False
+
+    return True
+
+
 def cmd_compile(args: argparse.Namespace) -> int:
     """Compile command."""
     source_file = Path(args.source)
@@ -722,7 +856,19 @@ def cmd_compile(args: argparse.Namespace) -> int:
         print(f"Error: {source_file} not found", file=sys.stderr)
         return 1
 
-    asm = compile_with_imports(source_file, target=args.target)
+    program = load_with_imports(source_file)
+    owners = symbol_owners(program)
+    asm = compile_program(program, target=args.target,
+                          options=codegen_options(args))
+
+    if args.size_report or args.size_json:
+        sizes = measure_sizes(asm, owners)
+        if sizes is None:
+            return 1
+        if args.size_report:
+            print(format_size_report(sizes), file=sys.stderr)
+        if args.size_json:
+            Path(args.size_json).write_text(format_sizes(sizes))
 
     # kbuild targets: the Linux kernel build system owns assembly + link, so
     # we stop at emitting a .S file for it to consume.
@@ -762,10 +908,12 @@ def cmd_compile(args: argparse.Namespace) -> int:
                 asm_path, output, find_hamnix_root(),
                 progname=source_file.stem,
             )
+        elif args.target == "x86_64-linux-user":
+            ok = assemble_and_link_x86_linux(asm_path, output)
         else:
             raise AssertionError(
-                f"x86_64-bare-metal / x86_64-adder-user are the only "
-                f"non-kbuild link paths; got '{args.target}'"
+                f"x86_64-bare-metal / x86_64-adder-user / x86_64-linux-user "
+                f"are the only non-kbuild link paths; got '{args.target}'"
             )
         if not ok:
             return 1
@@ -784,7 +932,8 @@ def cmd_asm(args: argparse.Namespace) -> int:
         return 1
 
     source = source_file.read_text()
-    asm = compile_source(source, str(source_file), target=args.target)
+    asm = compile_source(source, str(source_file), target=args.target,
+                         options=codegen_options(args))
 
     if args.output:
         Path(args.output).write_text(asm)
@@ -794,6 +943,208 @@ def cmd_asm(args: argparse.Namespace) -> int:
     return 0
 
 
+def cmd_prof(args: argparse.Namespace) -> int:
+    """Print the hot-function report for `--instrument` dumps: entry
+    counts, or with `--cpu` the cycles profile merged over CPUs."""
+    runs = []
+    tables = []
+    for names, parse_dump, out in ((args.dumps, parse_records, runs),
+                                   (args.cpu, parse_pcpu_table, tables)):
+        for name in names:
+            path = Path(name)
+            if not path.exists():
+                print(f"Error: {path} not found", file=sys.stderr)
+                return 1
+            try:
+                out.append(parse_dump(read_dump(path.read_bytes())))
+            except ProfDumpError as e:
+                print(f"Error: {path}: {e}", file=sys.stderr)
+                return 1
+    records = merge_records(runs)
+    if not tables:
+        if args.folded:
+            print("Error: --folded needs --cpu tables", file=sys.stderr)
+            return 1
+        print(format_counts_report(records, top=args.top))
+        if args.json:
+            Path(args.json).write_text(format_profile(records))
+        return 0
+    rows, folded = cycles_profile(records, tables)
+    print(format_cycles_report(rows, top=args.top))
+    if args.folded:
+        Path(args.folded).write_text(format_folded(folded))
+    if args.json:
+        # A cycles build counts calls in the per-CPU tables, not in
+        # the records.
+        calls = {row.name: row.calls for row in rows}
+        for rec in records:
+            rec.count = calls.get(rec.name, 0)
+        Path(args.json).write_text(format_profile(records))
+    return 0
+
+
+def cmd_fentry(args: argparse.Namespace) -> int:
+    """List the `--fentry` call sites of a linked image and the state
+    of each one's five bytes."""
+    path = Path(args.image)
+    if not path.exists():
+        print(f"Error: {path} not found", file=sys.stderr)
+        return 1
+    try:
+        sites = decode_elf(path.read_bytes())
+    except FentryDecodeError as e:
+        print(f"Error: {path}: {e}", file=sys.stderr)
+        return 1
+    print(format_sites(sites))
+    return 0
+
+
+def parse_cpu_features(spec: str) -> frozenset:
+    """argparse type for `--cpu-features`: a comma-separated list of
+    X86_CPU_FEATURES names. An unknown name is an error rather than a
+    silent fallback to the baseline instructions."""
+    names = frozenset(n.strip() for n in spec.split(",") if n.strip())
+    unknown = sorted(names - X86_CPU_FEATURES)
+    if unknown:
+        raise argparse.ArgumentTypeError(
+            f"unknown feature {', '.join(unknown)} "
+            f"(known: {', '.join(sorted(X86_CPU_FEATURES))})"
+        )
+    return names
+
+
+def parse_percpu_align(spec: str) -> int:
+    """argparse type for `--percpu-align`: a power of two of at least
+    8 bytes, the per-CPU self pointer's size."""
+    try:
+        align = int(spec, 0)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"not an integer: {spec!r}")
+    if align < 8 or align & (align - 1):
+        raise argparse.ArgumentTypeError(
+            f"{align} is not a power of two >= 8"
+        )
+    return align
+
+
+def parse_instrument_filter(spec: str) -> tuple:
+    """argparse type for `--instrument-filter`: comma-separated
+    patterns, each optionally prefixed with `-`."""
+    patterns = tuple(p.strip() for p in spec.split(",") if p.strip())
+    if not patterns or any(p == "-" for p in patterns):
+        raise argparse.ArgumentTypeError(f"no pattern in {spec!r}")
+    return patterns
+
+
+def parse_profile(path: str) -> Profile:
+    """argparse type for `--profile-use`: a profile `adder prof
+    --json` wrote."""
+    try:
+        return load_profile(Path(path).read_text())
+    except OSError as e:
+        raise argparse.ArgumentTypeError(f"{path}: {e.strerror}")
+    except ProfDumpError as e:
+        raise argparse.ArgumentTypeError(f"{path}: {e}")
+
+
+def add_codegen_arguments(parser: argparse.ArgumentParser) -> None:
+    """Optimisation / diagnostic flags shared by `compile` and `asm`."""
+    parser.add_argument("--no-peephole", action="store_true",
+                        help="Skip the x86 peephole pass over the output")
+    parser.add_argument("--peephole-stats", action="store_true",
+                        help="Print per-rule peephole hit counts to stderr")
+    parser.add_argument("--no-inline", action="store_true",
+                        help="Never expand calls in place (ignores @inline)")
+    parser.add_argument("--inline-report", action="store_true",
+                        help="Print every inlining decision to stderr")
+    parser.add_argument("--keep-frame-pointer", action="store_true",
+                        help="Give every function an %%rbp frame, even "
+                             "leaves that need no stack slot")
+    parser.add_argument("--no-tail-calls", action="store_true",
+                        help="Lower `return f(...)` to call + ret, not jmp")
+    parser.add_argument("--no-unroll", action="store_true",
+                        help="Keep constant-trip-count `for` loops rolled")
+    parser.add_argument("--no-jump-tables", action="store_true",
+                        help="Lower `match` / if-elif dispatch to compares "
+                             "only, never an indirect jmp")
+    parser.add_argument("--cpu-features", type=parse_cpu_features,
+                        default=frozenset(), metavar="LIST",
+                        help="Comma-separated optional x86 extensions the "
+                             "bit intrinsics may use: "
+                             + ",".join(sorted(X86_CPU_FEATURES)))
+    parser.add_argument("--percpu-align", type=parse_percpu_align,
+                        default=CACHE_LINE_SIZE, metavar="N",
+                        help="Align the per-CPU template and pad its size "
+                             "to N bytes (default: 64, one cache line)")
+    parser.add_argument("--layout-report", action="store_true",
+                        help="Print each class's size, alignment, padding "
+                             "holes and cache-line straddles to stderr")
+    parser.add_argument("--instrument", choices=sorted(INSTRUMENT_MODES),
+                        help="Give every function a profile record: "
+                             "counts = an atomic entry counter, cycles = "
+                             "per-CPU rdtsc cycles per call path")
+    parser.add_argument("--instrument-filter", type=parse_instrument_filter,
+                        default=(), metavar="PATTERNS",
+                        help="Comma-separated fnmatch patterns over "
+                             "`module.name` or the symbol picking the "
+                             "functions to instrument; -PATTERN excludes")
+    parser.add_argument("--fentry", action="store_true",
+                        help="Start every function with `call __fentry__` "
+                             "and record the call sites for patching")
+    parser.add_argument("--profile-use", type=parse_profile, metavar="FILE",
+                        help="Lay out, inline and unroll by the entry "
+                             "counts in FILE (from `adder prof --json`)")
+    parser.add_argument("-g", dest="debug_info", action="store_true",
+                        help="Emit DWARF line tables and call-frame "
+                             "information")
+
+
+def codegen_options(args: argparse.Namespace) -> CodeGenOptions:
+    """Build the CodeGenOptions for a parsed `compile` / `asm` command."""
+    return CodeGenOptions(
+        peephole=not args.no_peephole,
+        peephole_stats=args.peephole_stats,
+        inline=not args.no_inline,
+        inline_report=args.inline_report,
+        omit_frame_pointer=not args.keep_frame_pointer,
+        tail_calls=not args.no_tail_calls,
+        unroll=not args.no_unroll,
+        jump_tables=not args.no_jump_tables,
+        cpu_features=args.cpu_features,
+        percpu_align=args.percpu_align,
+        layout_report=args.layout_report,
+        instrument=args.instrument,
+        instrument_filter=args.instrument_filter,
+        fentry=args.fentry,
+        profile=args.profile_use,
+        debug_info=args.debug_info,
+    )
+
+
+def cmd_size(args: argparse.Namespace) -> int:
+    """Print a `--size-json` report, or what changed between two."""
+    if len(args.reports) > 2:
+        print("Error: give one report, or two (old, new) to diff",
+              file=sys.stderr)
+        return 1
+    builds = []
+    for name in args.reports:
+        path = Path(name)
+        if not path.exists():
+            print(f"Error: {path} not found", file=sys.stderr)
+            return 1
+        try:
+            builds.append(load_sizes(path.read_text()))
+        except SizeReportError as e:
+            print(f"Error: {path}: {e}", file=sys.stderr)
+            return 1
+    if len(builds) == 1:
+        print(format_size_report(builds[0], top=args.top))
+    else:
+        print(format_size_diff(*builds, top=args.top))
+    return 0
+
+
 def main() -> int:
     parser = argparse.ArgumentParser(
         prog="adder",
@@ -810,6 +1161,14 @@ def main() -> int:
     compile_parser.add_argument("--target", default=DEFAULT_TARGET,
                                choices=list(TARGETS),
                                help=f"Compilation target (default: {DEFAULT_TARGET})")
+    compile_parser.add_argument("--size-report", action="store_true",
+                                help="Print the bytes of .text / .rodata / "
+                                     ".data / .bss each module and symbol "
+                                     "contributes to stderr")
+    compile_parser.add_argument("--size-json", metavar="FILE",
+                                help="Also write the size report as JSON, "
+                                     "for `adder size`")
+    add_codegen_arguments(compile_parser)
     compile_parser.set_defaults(func=cmd_compile)
 
     # Asm command
@@ -819,8 +1178,48 @@ def main() -> int:
     asm_parser.add_argument("--target", default=DEFAULT_TARGET,
                            choices=list(TARGETS),
                            help=f"Compilation target (default: {DEFAULT_TARGET})")
+    add_codegen_arguments(asm_parser)
     asm_parser.set_defaults(func=cmd_asm)
 
+    # Profile report command
+    prof_parser = subparsers.add_parser(
+        "prof", help="Report hot functions from --instrument dumps")
+    prof_parser.add_argument("dumps", nargs="+", metavar="dump",
+                             help="Raw or hex-dumped copy of the "
+                                  "__adder_prof_start.._end table")
+    prof_parser.add_argument("--top", type=int, default=0, metavar="N",
+                             help="Only list the N hottest functions")
+    prof_parser.add_argument("--cpu", action="append", default=[],
+                             metavar="table",
+                             help="A CPU's __adder_prof_pcpu_start.._end "
+                                  "table from an --instrument=cycles "
+                                  "build; repeat for every CPU")
+    prof_parser.add_argument("--folded", metavar="FILE",
+                             help="Also write folded call stacks (self "
+                                  "cycles) for a flame graph")
+    prof_parser.add_argument("--json", metavar="FILE",
+                             help="Also write the merged entry counts as "
+                                  "a profile for --profile-use")
+    prof_parser.set_defaults(func=cmd_prof)
+
+    # Call-site table decoder
+    fentry_parser = subparsers.add_parser(
+        "fentry", help="List the --fentry call sites of a linked image")
+    fentry_parser.add_argument("image", help="Linked ELF built with --fentry")
+    fentry_parser.set_defaults(func=cmd_fentry)
+
+    # Size report viewer / differ
+    size_parser = subparsers.add_parser(
+        "size", help="Show a --size-json report, or diff two builds")
+    size_parser.add_argument("reports", nargs="+", metavar="report",
+                             help="A --size-json file; give two (old, "
+                                  "new) to see what changed")
+    size_parser.add_argument("--top", type=int, default=0, metavar="N",
+                             help=f"Only list the N largest symbols (or "
+                                  f"changes); a compile-time report shows "
+                                  f"{SIZE_REPORT_TOP}")
+    size_parser.set_defaults(func=cmd_size)
+
     args = parser.parse_args()
     return args.func(args)
 
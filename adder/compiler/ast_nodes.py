@@ -428,6 +428,7 @@ class VarDecl:
     span: Optional[Span] = None
     module: Optional[str] = None
     orig_name: Optional[str] = None
+    align: Optional[int] = None  # `@align(N)` on a global
 
 
 @dataclass
@@ -648,13 +649,19 @@ class ClassField:
 
 @dataclass
 class ClassDef:
-    """Class definition."""
+    """Class definition.
+
+    `module` is populated by the module-resolution pass, like
+    FunctionDef's; the methods' own `module` stays unset.
+    """
     name: str
     fields: list[ClassField] = field(default_factory=list)
     methods: list[FunctionDef] = field(default_factory=list)
     bases: list[str] = field(default_factory=list)
     decorators: list[str] = field(default_factory=list)
     span: Optional[Span] = None
+    align: Optional[int] = None  # N of an `@align(N)` decorator
+    module: Optional[str] = None
 
 
 @dataclass
@@ -722,10 +729,12 @@ class ImportDecl:
 # Pattern matching
 @dataclass
 class Pattern:
-    """Match pattern: Some(x) or None or _"""
+    """Match pattern: Some(x) or None or _, or value alternatives
+    `1 | 2 | FOO` (then `name` is empty and `values` holds them)."""
     name: str  # Variant or _ for wildcard
     bindings: list[str] = field(default_factory=list)
     span: Optional[Span] = None
+    values: list["Expr"] = field(default_factory=list)
 
 
 @dataclass
@@ -32,15 +32,20 @@ Calling convention (System V AMD64):
   - Vector-arg count for varargs: %al (we set to 0 before extern calls)
 """
 
+import sys
+from collections import Counter
+from fnmatch import fnmatchcase
+from pathlib import Path
 from dataclasses import dataclass, field
 from typing import Optional
 
 from .ast_nodes import (
-    Program, FunctionDef, ExternDecl, Parameter,
+    Program, FunctionDef, ExternDecl, Parameter, Span,
     ClassDef, ClassField,
     VarDecl, Assignment, ExprStmt, ReturnStmt, IfStmt, WhileStmt,
     DoWhileStmt, ForStmt, ForUnpackStmt, BreakStmt, ContinueStmt, PassStmt,
-    Expr, Stmt,
+    MatchStmt, Pattern,
+    Expr, Stmt, ListLiteral,
     CallExpr, Identifier, StringLiteral, IntLiteral, CharLiteral, BoolLiteral,
     BinaryExpr, UnaryExpr, BinOp, UnaryOp,
     IndexExpr, MemberExpr, CastExpr, ContainerOfExpr,
@@ -48,6 +53,18 @@ from .ast_nodes import (
     Type, PointerType, ArrayType, FunctionPointerType, PercpuType,
     ListType, DictType, TupleType, OptionalType,
 )
+from .inliner import (
+    InlinePlanner, InlineCandidate, MAX_INLINE_DEPTH, instantiate,
+    format_report, iter_nodes, node_size,
+)
+from .optimizer import X86PeepholeOptimizer
+from .prof import (
+    PROF_SECTION, PROF_START, PROF_END, PROF_HEADER_SIZE, prof_record_size,
+    PROF_PCPU_START, PROF_PCPU_END, PROF_ARMED, PROF_PCPU_HEADER_SIZE,
+    PROF_PCPU_SIZE, PROF_NODE_SIZE, PROF_NODES, PROF_PROBES, Profile,
+)
+from .fentry import FENTRY_SECTION, FENTRY_START, FENTRY_END, FENTRY_SYMBOL
+from .debuginfo import annotate_cfi
 
 
 # Emit endbr64 at function entry. Free NOP with IBT off; required once
@@ -57,16 +74,189 @@ EMIT_ENDBR = True
 # System V AMD64 integer/pointer argument registers, in order.
 ARG_REGS = ["%rdi", "%rsi", "%rdx", "%rcx", "%r8", "%r9"]
 
+# Sub-register names by byte width, for sized moves between registers.
+_REG_LOW = {
+    "%rax": {1: "%al", 2: "%ax", 4: "%eax"},
+    "%rcx": {1: "%cl", 2: "%cx", 4: "%ecx"},
+    "%rdx": {1: "%dl", 2: "%dx", 4: "%edx"},
+    "%rdi": {1: "%dil", 2: "%di", 4: "%edi"},
+    "%rsi": {1: "%sil", 2: "%si", 4: "%esi"},
+    "%r8": {1: "%r8b", 2: "%r8w", 4: "%r8d"},
+    "%r9": {1: "%r9b", 2: "%r9w", 4: "%r9d"},
+    "%r10": {1: "%r10b", 2: "%r10w", 4: "%r10d"},
+    "%r11": {1: "%r11b", 2: "%r11w", 4: "%r11d"},
+    "%rbx": {1: "%bl", 2: "%bx", 4: "%ebx"},
+    "%r12": {1: "%r12b", 2: "%r12w", 4: "%r12d"},
+    "%r13": {1: "%r13b", 2: "%r13w", 4: "%r13d"},
+    "%r14": {1: "%r14b", 2: "%r14w", 4: "%r14d"},
+    "%r15": {1: "%r15b", 2: "%r15w", 4: "%r15d"},
+}
+
+# Frame-pointer omission: a leaf function whose params and locals all
+# fit here keeps them in registers and gets no %rbp frame at all. The
+# expression codegen only ever scratches %rax/%rcx/%rdx (and %rdi in
+# the strlen builtin, which therefore disqualifies a function), so
+# these caller-saved registers survive the whole body. Params arriving
+# in %rdx/%rcx are moved to %r10/%r11; the rest stay where they land.
+FRAMELESS_REGS = ["%rdi", "%rsi", "%r8", "%r9", "%r10", "%r11"]
+_FRAMELESS_PARAM_HOME = {"%rdx": "%r10", "%rcx": "%r11"}
+# Calls a frameless leaf may still contain: builtins lowered inline
+# using only the scratch registers above.
+FRAMELESS_BUILTINS = frozenset({"min", "max", "abs", "clamp",
+                                "outb", "inb", "outl", "inl", "outw", "inw",
+                                "atomic_add", "atomic_fetch_add",
+                                "atomic_cas", "atomic_xchg",
+                                "atomic_inc_and_test", "atomic_dec_and_test",
+                                "smp_mb", "smp_rmb", "smp_wmb", "barrier",
+                                "ctz", "clz", "popcount", "rotl", "rotr",
+                                "likely", "unlikely",
+                                "bswap16", "bswap32", "bswap64",
+                                "load_be16", "load_be32", "load_be64",
+                                "store_be16", "store_be32", "store_be64"})
+
+# `for` loops in a framed function keep their counter and hoisted bound
+# in these callee-saved registers while any are free: calls in the body
+# preserve them, and gen_function saves/restores each one it hands out.
+LOOP_REGS = ["%rbx", "%r12", "%r13", "%r14", "%r15"]
+
+# Full unrolling of a `for` loop with a constant trip count: at most
+# this many iterations, and at most this many body AST nodes in total.
+UNROLL_MAX_TRIPS = 8
+UNROLL_BUDGET = 64
+# --profile-use: both limits scale by this in hot functions; cold ones
+# are not unrolled at all.
+PROFILE_HOT_UNROLL_SCALE = 2
+
+# Function placement. `@hot` functions and the ones --profile-use calls
+# hot go to TEXT_HOT_SECTION, hottest first (one `.subsection` per
+# profile rank, unranked `@hot` ones after them); `@cold` functions,
+# the panic paths named by STACK_PROTECTOR_SKIP_PREFIXES and the ones
+# the profile saw never entered go to TEXT_UNLIKELY_SECTION, the rest
+# stay in .text. kernel.lds puts the hot ones ahead of .text and the
+# unlikely ones after it, so the hot paths share as few pages as
+# possible. The out-of-line blocks of `if unlikely(...)` branches go to
+# TEXT_UNLIKELY_SECTION as well, under a local `<function>.cold`
+# symbol.
+TEXT_HOT_SECTION = ".text.hot"
+TEXT_UNLIKELY_SECTION = ".text.unlikely"
+
+# Branch hints: `likely(c)` / `unlikely(c)` are `c != 0` and tell
+# gen_if / gen_while which way the branch goes. Shadowable like the
+# atomic and bit intrinsics.
+X86_HINT_INTRINSICS = frozenset({"likely", "unlikely"})
+
+# Integer dispatch (`match`, and `if x == C1 ... elif x == C2 ...` chains
+# of at least SWITCH_MIN_CASES values). A run of at least
+# JUMP_TABLE_MIN_CASES values spanning no more than JUMP_TABLE_DENSITY
+# slots per value (and JUMP_TABLE_MAX_SPAN in all) becomes a table of
+# .rodata offsets; anything sparser is a binary search whose leaves of
+# at most SWITCH_LINEAR_MAX values compare in turn.
+SWITCH_MIN_CASES = 4
+JUMP_TABLE_MIN_CASES = 4
+JUMP_TABLE_DENSITY = 3
+JUMP_TABLE_MAX_SPAN = 4096
+SWITCH_LINEAR_MAX = 3
+
 # Names recognized by the x86 backend as inline intrinsics rather than
 # normal function calls.
 #   outb/inb: the kernel's are `static __always_inline` with no exported
 #     symbols, so Adder must emit the bare `out`/`in` instructions.
-#   asm_volatile(s): general inline asm — emit the string literal verbatim
-#     as a `.text` instruction. Zero-operand for now (the brief's required
-#     #3 extension); supports cli/sti/pause/mfence/etc.
+#   asm_volatile(s, ...): general inline asm — emit the string literal
+#     into `.text`, with GCC-style operands when any follow it
+#     (ASM_OPERAND_MARKERS below); supports cli/sti/pause/mfence/etc.
 X86_INTRINSICS = {"outb", "inb", "outl", "inl", "outw", "inw",
                   "asm_volatile"}
 
+# Atomic read-modify-write and memory-ordering intrinsics, each lowered
+# to a single `lock`-prefixed instruction (or fence). Unlike the I/O
+# intrinsics these are ordinary names a program may define itself, so
+# they are only lowered when no `def` / `extern def` of the same name
+# exists. The operand width follows the pointer argument's element type.
+X86_ATOMIC_INTRINSICS = frozenset({
+    "atomic_add", "atomic_fetch_add", "atomic_cas", "atomic_xchg",
+    "atomic_inc_and_test", "atomic_dec_and_test",
+    "smp_mb", "smp_rmb", "smp_wmb", "barrier",
+})
+
+# Bit-scan, rotate and byte-order intrinsics, lowered (and shadowable)
+# the same way. The operand width of ctz / clz / popcount / rotl / rotr
+# follows the first argument's type.
+X86_BIT_INTRINSICS = frozenset({
+    "ctz", "clz", "popcount", "rotl", "rotr",
+    "bswap16", "bswap32", "bswap64",
+    "load_be16", "load_be32", "load_be64",
+    "store_be16", "store_be32", "store_be64",
+})
+
+# Optional CPU features `--cpu-features` can enable. Without them the
+# bit intrinsics use baseline x86_64 instructions only:
+#   popcnt  popcount -> popcnt          (else a SWAR sequence)
+#   lzcnt   clz      -> lzcnt           (else bsr + cmov)
+#   bmi1    ctz      -> tzcnt           (else bsf + cmov)
+#   movbe   load_be* / store_be* -> movbe (else mov + bswap)
+X86_CPU_FEATURES = frozenset({"popcnt", "lzcnt", "bmi1", "movbe"})
+
+# asm_volatile(template, ...) operands, GCC extended-asm style:
+#   asm_out("=X" | "+X", lvalue)   written (or read and written)
+#   asm_in("X", expr)              read
+#   asm_clobber("reg", ...)        trashed ("memory" / "cc" accepted)
+# They mean nothing outside an asm_volatile call.
+ASM_OPERAND_MARKERS = frozenset({"asm_in", "asm_out", "asm_clobber"})
+
+# Bulk memory intrinsics. memcpy / memset / memcmp keep the C library
+# contract, so an `extern def` of the same name (the kernel declares
+# them against arch/x86/lib/string_64.S) still lowers inline; only a
+# `def` or a local shadows them. memzero(dst, n) is memset(dst, 0, n).
+X86_MEM_INTRINSICS = frozenset({"memcpy", "memset", "memcmp", "memzero"})
+
+# Constant sizes up to this many bytes are unrolled into mov sequences
+# (struct assignment included); larger or unknown sizes use `rep movsb`
+# / `rep stos` (fast-string microcode on ERMS parts), or a qword loop
+# for memcmp.
+BULK_UNROLL_MAX = 64
+
+# Offset 0 of every per-CPU area holds the area's own linear address,
+# stored there by whoever installs the GS base. `movq %gs:0, %rax` is
+# then the CPU's base, which is how `&percpu` and accesses the
+# `%gs:disp(%rcx)` form can't express get a plain pointer.
+PERCPU_SELF_SIZE = 8
+
+# Register constraint letters, as in GCC's x86 machine constraints.
+# "r" takes any free register from ASM_SCRATCH_REGS; asm_in also takes
+# "i" / "n", a compile-time constant.
+ASM_REG_CONSTRAINTS = {
+    "a": "%rax", "b": "%rbx", "c": "%rcx", "d": "%rdx",
+    "S": "%rsi", "D": "%rdi", "r": None,
+}
+ASM_SCRATCH_REGS = ["%r8", "%r9", "%r10", "%r11", "%rsi", "%rdi",
+                    "%rdx", "%rcx", "%rax"]
+
+# Decorators with codegen meaning on a `def` (free function or method).
+# Anything else is rejected by _validate_program_supported.
+#   inline / noinline: force / forbid AST-level inlining (inliner.py).
+#   hot / cold:        place the function in TEXT_HOT_SECTION (16-byte
+#                      aligned) / TEXT_UNLIKELY_SECTION; a cold one is
+#                      never inlined, and a branch calling it is laid
+#                      out as unlikely (see _branch_heat).
+FUNCTION_DECORATORS = frozenset({"inline", "noinline", "hot", "cold"})
+
+# Decorators with layout meaning on a `class` (layout_struct).
+#   packed:   no padding — every field at alignment 1, size not rounded.
+#   align(N): the struct's alignment (and so its size) is at least N.
+CLASS_DECORATORS = frozenset({"packed", "align"})
+
+# The cache line `--layout-report` checks fields against, and the
+# default per-CPU template alignment.
+CACHE_LINE_SIZE = 64
+
+# `--instrument` modes. Each instrumented function gets a profile record
+# (prof.py) in PROF_SECTION.
+#   counts: a `lock incq` of the record's entry count as the first
+#           instruction.
+#   cycles: rdtsc at entry and at the shared epilogue, accumulated per
+#           call path in a per-CPU table (__adder_prof_enter / _exit).
+INSTRUMENT_MODES = frozenset({"counts", "cycles"})
+
 
 # Stack-protector: minimum Array[N, T] N to flag a function as canary-
 # needing. Mirrors gcc's `-fstack-protector-strong` heuristic which
@@ -102,6 +292,61 @@ class CodeGenError(Exception):
     pass
 
 
+@dataclass
+class CodeGenOptions:
+    """Optimisation / diagnostic switches for X86CodeGen.
+
+    The defaults are what `adder compile` ships; each field maps onto a
+    CLI flag in adder.py (`--no-peephole`, `--peephole-stats`, ...).
+    """
+    # Run the x86 peephole pass (compiler/optimizer.py) over the final
+    # listing. Off only to diff raw codegen output.
+    peephole: bool = True
+    # Print the peephole per-rule hit counters to stderr.
+    peephole_stats: bool = False
+    # Expand small functions / methods / single-call statics in place
+    # (compiler/inliner.py). `--no-inline` turns it off, `@inline` /
+    # `@noinline` steer it per function.
+    inline: bool = True
+    # Print every inlining decision to stderr.
+    inline_report: bool = False
+    # Give leaf functions whose params/locals fit in FRAMELESS_REGS no
+    # %rbp frame. `--keep-frame-pointer` keeps every function walkable
+    # by an rbp-chain unwinder.
+    omit_frame_pointer: bool = True
+    # Lower `return f(args)` to `leave; jmp f` (sibling call).
+    tail_calls: bool = True
+    # Fully unroll small `for` loops with a constant trip count.
+    unroll: bool = True
+    # Lower dense `match` / if-elif dispatch through a jump table. An
+    # indirect `jmp` needs a retpoline / IBT landing pad in a hardened
+    # kernel; `--no-jump-tables` keeps such builds to compare trees.
+    jump_tables: bool = True
+    # Optional instruction-set extensions (X86_CPU_FEATURES) the bit
+    # intrinsics may use. Empty means baseline x86_64.
+    cpu_features: frozenset = frozenset()
+    # Alignment of the per-CPU template and of its total size, so every
+    # CPU's copy starts on a fresh cache line (`--percpu-align`).
+    percpu_align: int = CACHE_LINE_SIZE
+    # Print each struct's size, alignment, padding holes and fields
+    # that straddle a cache line to stderr.
+    layout_report: bool = False
+    # One of INSTRUMENT_MODES, or None for an uninstrumented build.
+    instrument: Optional[str] = None
+    # fnmatch patterns over `module.name` and the bare symbol; a leading
+    # `-` excludes. Empty instruments every function.
+    instrument_filter: tuple = ()
+    # Start every function with `call __fentry__` and list the call
+    # sites in fentry.FENTRY_SECTION for a boot-time NOP-out.
+    fentry: bool = False
+    # Entry counts (`--profile-use`) steering function placement and
+    # the inlining and unrolling budgets.
+    profile: Optional[Profile] = None
+    # `-g`: a DWARF line table (`.file` / `.loc` per statement) and
+    # call-frame information (debuginfo.annotate_cfi).
+    debug_info: bool = False
+
+
 def _span_location(span) -> str:
     """Format a Span as 'file:line' or '<unknown>' for error messages.
 
@@ -117,6 +362,10 @@ def _span_location(span) -> str:
     return f"{fn}:{ln}"
 
 
+def _bytes(n: int) -> str:
+    return f"{n} byte" if n == 1 else f"{n} bytes"
+
+
 def _reject_unsupported_type(t, where: str) -> None:
     """Raise CodeGenError if `t` is one of the deliberately-not-supported
     parametric type annotations (List/Dict/Tuple/Optional). Recurses into
@@ -175,6 +424,58 @@ def _reject_unsupported_type(t, where: str) -> None:
         return
 
 
+_U64_MASK = (1 << 64) - 1
+
+
+def _udiv_magic(d: int) -> tuple[int, int]:
+    """Magic multiplier for unsigned 64-bit division by constant `d`.
+
+    Returns `(m, s)` such that `x // d == (x * m) >> (64 + s)` for every
+    0 <= x < 2**64 (Granlund & Montgomery, "Division by Invariant
+    Integers using Multiplication", thm 4.2). `m` may need 65 bits; the
+    caller detects `m >= 2**64` and emits the add-back fixup sequence
+    instead of a plain high-half shift. Requires 2 <= d < 2**63.
+    """
+    for s in range(65):
+        m = -((-(1 << (64 + s))) // d)          # ceil(2**(64+s) / d)
+        if m * d - (1 << (64 + s)) <= (1 << s):
+            return m, s
+    raise CodeGenError(f"x86: no unsigned division magic for {d}")
+
+
+def _sdiv_magic(d: int) -> tuple[int, int]:
+    """Magic multiplier for signed (truncating) 64-bit division by `d`.
+
+    Hacker's Delight 10-1 `magic()`, widened to 64 bits. Returns the
+    signed 64-bit multiplier `m` and post-shift `s`; the quotient is
+    `hi64(x * m)` corrected by +/- x when the signs of `m` and `d`
+    disagree, arithmetic-shifted by `s`, plus one when negative.
+    Requires 2 <= |d| < 2**63.
+    """
+    two63 = 1 << 63
+    ad = abs(d)
+    t = two63 + (1 if d < 0 else 0)
+    anc = t - 1 - t % ad                        # |nc|
+    p = 63
+    q1, r1 = divmod(two63, anc)
+    q2, r2 = divmod(two63, ad)
+    while True:
+        p += 1
+        q1, r1 = 2 * q1, 2 * r1
+        if r1 >= anc:
+            q1, r1 = q1 + 1, r1 - anc
+        q2, r2 = 2 * q2, 2 * r2
+        if r2 >= ad:
+            q2, r2 = q2 + 1, r2 - ad
+        delta = ad - r2
+        if not (q1 < delta or (q1 == delta and r1 == 0)):
+            break
+    m = (-(q2 + 1) if d < 0 else q2 + 1) & _U64_MASK
+    if m >= two63:
+        m -= 1 << 64
+    return m, p - 64
+
+
 @dataclass
 class LocalVar:
     """A local variable in the current function's stack frame."""
@@ -182,6 +483,9 @@ class LocalVar:
     offset: int           # Negative offset from %rbp
     size: int = 8         # Slot size in bytes (uniform 8 for M2.0)
     var_type: Optional[Type] = None
+    # Register home in a frameless function or for a `for` loop's
+    # induction variable (offset is then unused).
+    reg: Optional[str] = None
 
 
 @dataclass
@@ -189,7 +493,33 @@ class StructInfo:
     """Field layout of a Adder class used as a C-ABI-compatible struct."""
     name: str
     fields: list[tuple[str, Type, int]]  # (field name, type, byte offset)
-    total_size: int                       # 8-byte-aligned total
+    total_size: int                       # a multiple of `align`
+    align: int = 8                        # 8 unless @packed / @align(N)
+    # field name -> (type, byte offset); member access looks fields up
+    # here instead of scanning `fields`.
+    index: dict[str, tuple[Type, int]] = field(init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        self.index = {}
+        for fname, ftype, foff in self.fields:
+            # First match wins, as the linear scans did.
+            self.index.setdefault(fname, (ftype, foff))
+
+    def lookup(self, member: str) -> Optional[tuple[Type, int]]:
+        """(type, byte offset) of `member`, or None."""
+        return self.index.get(member)
+
+
+@dataclass
+class BodyFacts:
+    """What gen_function must know about a body before generating it,
+    gathered in a single walk by X86CodeGen._scan_body."""
+    inline_asm: bool = False
+    # Any `&` (the operand may be a field or element of a local), and
+    # the bare names it is applied to.
+    addr_of: bool = False
+    addr_taken: set[str] = field(default_factory=set)
+    aggregate_local: bool = False
 
 
 @dataclass
@@ -206,6 +536,17 @@ class LoopContext:
     continue_label: str = ""
 
 
+@dataclass
+class InlineFrame:
+    """An in-progress inline expansion. A `return` inside the expanded
+    body leaves its value in %rax and jumps to `exit_label` instead of
+    running the caller's epilogue; `used` records whether any did, so
+    an unreferenced exit label is not emitted."""
+    symbol: str
+    exit_label: str
+    used: bool = False
+
+
 @dataclass
 class FunctionContext:
     """Per-function code-generation state."""
@@ -223,16 +564,77 @@ class FunctionContext:
     # target used by ReturnStmt and the fallthrough.
     needs_canary: bool = False
     epilogue_label: str = ""
+    # Inline expansions currently being generated, innermost last. The
+    # symbols double as the recursion guard for nested expansion.
+    inline_stack: list[InlineFrame] = field(default_factory=list)
+    # Frame-pointer omission: when `reg_pool` is not None the function
+    # has no %rbp frame and every local is homed in a register taken
+    # from the pool (gen_function has checked that enough are left).
+    reg_pool: Optional[list[str]] = None
+    # `return f(args)` may become `leave; jmp f`: no canary check has to
+    # run after the callee, and no local's address can have escaped.
+    allow_tail_calls: bool = False
+    # Free LOOP_REGS for `for` counters and bounds (None: the function
+    # is frameless or has inline asm that may clobber them), the ones
+    # handed out so far (saved in the prologue, restored before every
+    # `leave`), and the names whose address is taken (never homed in a
+    # register).
+    loop_regs: Optional[list[str]] = None
+    saved_regs: list[str] = field(default_factory=list)
+    addr_taken: set[str] = field(default_factory=set)
+    # --instrument=cycles: %rbp offset of the 16-byte block (entry
+    # timestamp, saved call-path node) the profiler hooks share. Like
+    # the canary it routes every return through epilogue_label.
+    prof_block: Optional[int] = None
+    # The out-of-line blocks of unlikely branches (_gen_cold_block)
+    # emitted so far; the first one carries the `<name>.cold` symbol.
+    cold_blocks: int = 0
+
+    @property
+    def frameless(self) -> bool:
+        return self.reg_pool is not None
+
+    @property
+    def shared_epilogue(self) -> bool:
+        return self.needs_canary or self.prof_block is not None
 
     def alloc_local(self, name: str, size: int = 8,
-                    var_type: Optional[Type] = None) -> LocalVar:
-        """Allocate a stack slot. Slot size is rounded up to 8 bytes."""
+                    var_type: Optional[Type] = None,
+                    reg: Optional[str] = None) -> LocalVar:
+        """Allocate a stack slot (or, in a frameless function, a
+        register). Slot size is rounded up to 8 bytes."""
+        if self.reg_pool is not None:
+            if reg is None:
+                reg = self.reg_pool.pop(0)
+            else:
+                self.reg_pool.remove(reg)
+            var = LocalVar(name, 0, size, var_type, reg)
+            self.locals[name] = var
+            return var
         slot = (size + 7) & ~7
         self.stack_size += slot
         var = LocalVar(name, -self.stack_size, size, var_type)
         self.locals[name] = var
         return var
 
+    def alloc_loop_local(self, name: str, size: int = 8,
+                         var_type: Optional[Type] = None) -> LocalVar:
+        """Allocate a `for` counter or hoisted bound: a free LOOP_REGS
+        register when there is one, else whatever alloc_local gives."""
+        if self.loop_regs and name not in self.addr_taken:
+            reg = self.loop_regs.pop(0)
+            if reg not in self.saved_regs:
+                self.saved_regs.append(reg)
+            var = LocalVar(name, 0, size, var_type, reg)
+            self.locals[name] = var
+            return var
+        return self.alloc_local(name, size, var_type)
+
+    def release_loop_local(self, var: LocalVar) -> None:
+        """Hand a LOOP_REGS register back once its loop has ended."""
+        if self.loop_regs is not None and var.reg in LOOP_REGS:
+            self.loop_regs.insert(0, var.reg)
+
     def new_label(self, prefix: str = "L") -> str:
         self.label_counter += 1
         return f".{prefix}_{self.name}_{self.label_counter}"
@@ -253,7 +655,9 @@ class FunctionContext:
 class X86CodeGen:
     """x86_64 (System V AMD64) code generator for the kernel-module target."""
 
-    def __init__(self, bare_metal: bool = False) -> None:
+    def __init__(self, bare_metal: bool = False,
+                 options: Optional[CodeGenOptions] = None) -> None:
+        self.options = options or CodeGenOptions()
         self.output: list[str] = []
         self.string_literals: dict[str, str] = {}
         self.string_counter: int = 0
@@ -278,6 +682,8 @@ class X86CodeGen:
         self.percpu_globals: set[str] = set()
         self.percpu_offsets: dict[str, int] = {}
         self.percpu_size: int = 0
+        # Template alignment: --percpu-align, or an over-aligned var's.
+        self.percpu_align: int = self.options.percpu_align
         self.structs: dict[str, StructInfo] = {}
         # Per-class method tables: class_methods[cls_name][method_name]
         # = (owner_class_name, FunctionDef, receiver_offset). owner is
@@ -292,6 +698,50 @@ class X86CodeGen:
             str, dict[str, tuple[str, "FunctionDef", int]]
         ] = {}
         self.ctx: Optional[FunctionContext] = None
+        # Inliner state (compiler/inliner.py). inline_plan maps a callee
+        # symbol to its InlineCandidate; built in gen_program when
+        # options.inline is set. inline_expansions counts the call sites
+        # expanded per symbol, symbol_refs the references that stayed
+        # real (`call sym` / `leaq sym(%rip)`): a single-site static
+        # with no real references left has its out-of-line copy — the
+        # function_spans range of self.output — dropped.
+        self.inline_plan: dict[str, InlineCandidate] = {}
+        self.inline_expansions: Counter = Counter()
+        self.symbol_refs: Counter = Counter()
+        self.function_spans: dict[str, tuple[int, int]] = {}
+        # --instrument: the functions given a profile record, in
+        # emission order, and the per-CPU offset of the cycles table.
+        self.prof_funcs: list[str] = []
+        self.prof_pcpu_offset: Optional[int] = None
+        # --fentry: the functions that start with `call __fentry__`.
+        self.fentry_funcs: list[str] = []
+        # "hot" / "cold" for the functions whose heat the source fixes:
+        # `@hot` / `@cold`, and the panic paths. Built in pass 1;
+        # --profile-use fills in the rest.
+        self.function_heat: dict[str, str] = {}
+        # -g: the `.file` number of each source path, the last `.loc`
+        # emitted, the one the statement being generated starts with,
+        # and one to re-emit ahead of the next instruction once a
+        # nested statement is done (see gen_stmt).
+        self.debug_files: dict[str, int] = {}
+        self.debug_loc: Optional[tuple[int, int, int]] = None
+        self.stmt_loc: Optional[tuple[int, int, int]] = None
+        self.loc_pending: Optional[tuple[int, int, int]] = None
+        self.inline_serial: int = 0
+        # The program being compiled, and its UPPER_CASE constant
+        # globals (built lazily by _constant_globals for case labels).
+        self.program: Optional[Program] = None
+        self.constant_globals: Optional[dict[str, int]] = None
+        # get_expr_type results for the current function, keyed by node
+        # id. The node is kept in the entry so its id cannot be reused
+        # by a temporary built during codegen.
+        self.expr_types: dict[int, tuple[Expr, Optional[Type]]] = {}
+        # `Final[T]` globals (emitted to .rodata), and the value of each
+        # scalar one, normalised to its type: reads fold to an immediate.
+        self.final_globals: set[str] = set()
+        # Numbers `%=` in extended-asm templates, unique per output file.
+        self.asm_serial = 0
+        self.final_values: dict[str, int] = {}
         # Bare-metal target compiles a standalone kernel ELF: skip
         # kbuild-specific bits like the .modinfo license stamp that modpost
         # consumes when building a .ko inside the Linux source tree.
@@ -300,6 +750,9 @@ class X86CodeGen:
     # -- emission helpers ---------------------------------------------------
 
     def emit(self, line: str = "") -> None:
+        if self.loc_pending is not None and line.startswith("    ") \
+                and line[4:5] not in (".", "#"):
+            self._emit_loc_line(self.loc_pending)
         self.output.append(line)
 
     def add_string(self, s: str) -> str:
@@ -348,16 +801,37 @@ class X86CodeGen:
         return sizes.get(name, 8)
 
     def natural_align(self, t: Type) -> int:
-        """C-ABI natural alignment of a type (max 8)."""
+        """C-ABI natural alignment of a type: max 8 for scalars, the
+        layout's alignment for a struct (1 if @packed, N if @align(N))."""
         if isinstance(t, ArrayType):
             return self.natural_align(t.element_type)
+        if isinstance(t, PercpuType):
+            return self.natural_align(t.base_type)
+        name = getattr(t, "name", None)
+        if name in self.structs:
+            return self.structs[name].align
         size = self.get_type_size(t)
         # Cap at 8 (x86_64); int8 -> 1, int16 -> 2, int32 -> 4, ptr/int64 -> 8
         return max(1, min(size, 8))
 
     def get_expr_type(self, expr: Expr) -> Optional[Type]:
         """Best-effort type of an expression. Returns None when unknown
-        (callers must have a safe default)."""
+        (callers must have a safe default).
+
+        Each node is typed once per function and the result memoised:
+        pointer scaling, signedness and member access all ask about the
+        same operands, and a deep `a.b.c[i].d` chain would otherwise be
+        re-walked from the root at every level. A node's type is fixed
+        once codegen reaches it — the locals it can see are declared
+        by then."""
+        hit = self.expr_types.get(id(expr))
+        if hit is not None and hit[0] is expr:
+            return hit[1]
+        t = self._infer_expr_type(expr)
+        self.expr_types[id(expr)] = (expr, t)
+        return t
+
+    def _infer_expr_type(self, expr: Expr) -> Optional[Type]:
         if isinstance(expr, Identifier):
             if self.ctx is not None and expr.name in self.ctx.locals:
                 return self.ctx.locals[expr.name].var_type
@@ -378,9 +852,9 @@ class X86CodeGen:
             obj_type = self.get_expr_type(expr.obj)
             if obj_type is not None and hasattr(obj_type, "name") \
                     and obj_type.name in self.structs:
-                for fname, ftype, _ in self.structs[obj_type.name].fields:
-                    if fname == expr.member:
-                        return ftype
+                hit = self.structs[obj_type.name].lookup(expr.member)
+                if hit is not None:
+                    return hit[0]
             return None
         if isinstance(expr, UnaryExpr) and expr.op is UnaryOp.DEREF:
             base_type = self.get_expr_type(expr.operand)
@@ -405,6 +879,8 @@ class X86CodeGen:
             # None — those go through function pointers whose return
             # type isn't carried in our metadata yet.
             if isinstance(expr.func, Identifier):
+                if self._is_soft_intrinsic(expr.func.name):
+                    return self._intrinsic_result_type(expr)
                 return self.func_return_types.get(expr.func.name)
             return None
         if isinstance(expr, ContainerOfExpr):
@@ -492,23 +968,35 @@ class X86CodeGen:
         byte layout matches what Ptr[T] writes through `&local` would
         expose) and a plain `movq` for everything else."""
         sz = self._scalar_local_size(var)
+        if var.reg is not None:
+            # Register home: extend on the way in, exactly as the slot's
+            # sized store + extending load would, so reads are a movq.
+            if sz is None:
+                if val_reg != var.reg:
+                    self.emit(f"    movq {val_reg}, {var.reg}")
+            elif sz == 4 and self._is_unsigned_type(var.var_type) is not False:
+                self.emit(f"    movl {_REG_LOW[val_reg][4]}, "
+                          f"{_REG_LOW[var.reg][4]}")
+            else:
+                signed = self._is_unsigned_type(var.var_type) is False
+                mnem = ("movs" if signed else "movz") + \
+                    {1: "bq", 2: "wq", 4: "lq"}[sz]
+                self.emit(f"    {mnem} {_REG_LOW[val_reg][sz]}, {var.reg}")
+            return
         if sz is None:
             self.emit(f"    movq {val_reg}, {var.offset}(%rbp)")
             return
-        low_map = {
-            "%rax": (None, "%al", "%ax", None, "%eax"),
-            "%rcx": (None, "%cl", "%cx", None, "%ecx"),
-            "%rdx": (None, "%dl", "%dx", None, "%edx"),
-        }
-        low = low_map[val_reg]
         mnem = {1: "movb", 2: "movw", 4: "movl"}[sz]
-        self.emit(f"    {mnem} {low[sz]}, {var.offset}(%rbp)")
+        self.emit(f"    {mnem} {_REG_LOW[val_reg][sz]}, {var.offset}(%rbp)")
 
     def _emit_local_load(self, var: "LocalVar",
                          dst: str = "%rax") -> None:
         """Load the value from the stack slot for `var` into `dst`,
         sign-extending sub-8-byte signed scalars (so `if rc < 0:`
         works) and zero-extending unsigned ones."""
+        if var.reg is not None:
+            self.emit(f"    movq {var.reg}, {dst}")
+            return
         sz = self._scalar_local_size(var)
         if sz is None:
             self.emit(f"    movq {var.offset}(%rbp), {dst}")
@@ -558,6 +1046,7 @@ class X86CodeGen:
     # -- program ------------------------------------------------------------
 
     def gen_program(self, program: Program) -> str:
+        self.program = program
         self.emit("# Adder generated x86_64 assembly")
         self.emit("# Target: x86_64-linux-kernel-module (System V AMD64)")
         self.emit()
@@ -576,6 +1065,8 @@ class X86CodeGen:
         for decl in program.declarations:
             if isinstance(decl, ClassDef):
                 self.layout_struct(decl, program)
+        if self.options.layout_report:
+            print(self._format_layout_report(program), file=sys.stderr)
         # Build the per-class method table BEFORE Pass-1 symbol
         # registration so the registration loop can register each
         # method's mangled symbol (`Class__method`) as a defined
@@ -593,6 +1084,7 @@ class X86CodeGen:
                     self.defined_funcs.add(name)
                     if decl.return_type is not None:
                         self.func_return_types[name] = decl.return_type
+                    self._record_heat(name, decl)
                 case ClassDef():
                     # Register each method's mangled symbol + return type.
                     # Methods inherited via first-match flattening are
@@ -608,13 +1100,18 @@ class X86CodeGen:
                         self.defined_funcs.add(sym)
                         if mdef.return_type is not None:
                             self.func_return_types[sym] = mdef.return_type
+                        self._record_heat(sym, mdef)
                 case VarDecl(name=name, var_type=var_type):
                     self.global_var_types[name] = var_type
                     if isinstance(var_type, PercpuType):
                         # Assign a per-CPU area byte offset to this var.
-                        # Pack with natural alignment of the base type.
+                        # Pack with natural alignment of the base type,
+                        # after the self pointer at offset 0.
+                        if not self.percpu_globals:
+                            self.percpu_size = PERCPU_SELF_SIZE
                         base = var_type.base_type
-                        align = self.natural_align(base)
+                        align = max(self.natural_align(base), decl.align or 1)
+                        self.percpu_align = max(self.percpu_align, align)
                         size = self.get_type_size(base)
                         self.percpu_size = (
                             (self.percpu_size + align - 1) & ~(align - 1)
@@ -622,6 +1119,34 @@ class X86CodeGen:
                         self.percpu_globals.add(name)
                         self.percpu_offsets[name] = self.percpu_size
                         self.percpu_size += size
+        if self.options.instrument == "cycles":
+            # The call-path table goes last in the per-CPU template, on
+            # a cache line of its own.
+            size = max(self.percpu_size, PERCPU_SELF_SIZE)
+            self.prof_pcpu_offset = (
+                (size + CACHE_LINE_SIZE - 1) & ~(CACHE_LINE_SIZE - 1)
+            )
+            self.percpu_size = self.prof_pcpu_offset + PROF_PCPU_SIZE
+
+        # Pass 1a: fold scalar Final globals. In declaration order, so a
+        # Final may be initialised with an earlier one.
+        for decl in program.declarations:
+            if isinstance(decl, VarDecl) and decl.is_const:
+                self.final_globals.add(decl.name)
+                value = self._constant_int(decl.value)
+                if value is not None \
+                        and not self._is_aggregate_type(decl.var_type) \
+                        and not isinstance(decl.var_type,
+                                           FunctionPointerType):
+                    self.final_values[decl.name] = self._normalize_int(
+                        value, decl.var_type
+                    )
+
+        # Pass 1b: pick the call sites to expand in place. Needs the
+        # struct layouts and method tables built above.
+        planner = None
+        if self.options.inline:
+            planner = self._plan_inlining(program)
 
         # Pass 2: emit code.
         self.emit('    .text')
@@ -646,12 +1171,155 @@ class X86CodeGen:
                         f"x86: top-level {type(decl).__name__} not yet supported"
                     )
 
+        dropped = self._drop_inlined_statics()
+        if self.options.profile is not None:
+            self._report_stale_profile()
+        if planner is not None and self.options.inline_report:
+            print(format_report(planner.decisions, self.inline_expansions,
+                                dropped), file=sys.stderr)
+
         self.gen_data(program)
         self.gen_rodata()
+        if self.options.instrument:
+            self.gen_prof_records(dropped)
+        if self.options.fentry:
+            self.gen_fentry_table(dropped)
         if not self.bare_metal:
             self.gen_modinfo()
+        if self.options.peephole:
+            peephole = X86PeepholeOptimizer()
+            self.output = peephole.optimize(self.output)
+            if self.options.peephole_stats:
+                print(peephole.format_stats(), file=sys.stderr)
+        if self.options.debug_info:
+            self.output = self._debug_file_table() \
+                + annotate_cfi(self.output)
         return "\n".join(self.output) + "\n"
 
+    # -- inlining -----------------------------------------------------------
+
+    def _plan_inlining(self, program: Program) -> InlinePlanner:
+        """Run the inliner's planner over the program and install its
+        plan. An `@inline` the planner had to refuse is an error: the
+        programmer asked for a guarantee the codegen cannot give."""
+        methods: dict[str, FunctionDef] = {}
+        for decl in program.declarations:
+            if isinstance(decl, ClassDef):
+                for m in decl.methods:
+                    methods[self._method_symbol(decl.name, m.name)] = m
+        builtins = frozenset(X86_INTRINSICS
+                             | {"min", "max", "abs", "strlen", "clamp",
+                                "range"}
+                             | {f"__syscall{n}" for n in range(7)}
+                             | ASM_OPERAND_MARKERS
+                             | ((X86_ATOMIC_INTRINSICS | X86_BIT_INTRINSICS
+                                 | X86_HINT_INTRINSICS)
+                                - self.defined_funcs - self.extern_funcs)
+                             | (X86_MEM_INTRINSICS - self.defined_funcs))
+        planner = InlinePlanner(
+            program, methods, builtins, set(self.structs),
+            is_cold=lambda f: not self._function_may_be_inlined(f),
+            profile=self.options.profile,
+        )
+        self.inline_plan = planner.plan()
+        for d in planner.decisions:
+            if d.forced and not d.inlined:
+                raise CodeGenError(
+                    f"x86: @inline function '{d.symbol}' cannot be "
+                    f"inlined ({d.reason}) at {_span_location(d.span)}"
+                )
+        return planner
+
+    @staticmethod
+    def _function_may_be_inlined(func: FunctionDef) -> bool:
+        """Panic paths and the stack-protector runtime stay out of
+        line: they are cold by construction, and the skip lists name
+        exactly those."""
+        name = func.orig_name if func.orig_name is not None else func.name
+        if name in STACK_PROTECTOR_SKIP_NAMES or "cold" in func.decorators:
+            return False
+        return not name.startswith(STACK_PROTECTOR_SKIP_PREFIXES)
+
+    def _record_heat(self, sym: str, func: FunctionDef) -> None:
+        """Note `sym` in function_heat if its decorators or its name fix
+        its heat: `@hot`, `@cold`, or a STACK_PROTECTOR_SKIP_PREFIXES
+        panic path."""
+        name = func.orig_name if func.orig_name is not None else func.name
+        if "cold" in func.decorators \
+                or name.startswith(STACK_PROTECTOR_SKIP_PREFIXES):
+            self.function_heat[sym] = "cold"
+        elif "hot" in func.decorators:
+            self.function_heat[sym] = "hot"
+
+    def _try_inline_call(self, name: str, call: CallExpr) -> bool:
+        """Expand a direct call to `name` in place if the plan allows
+        it here. Returns False to fall back to a real call."""
+        cand = self.inline_plan.get(name)
+        if cand is None or self.ctx is None:
+            return False
+        stack = self.ctx.inline_stack
+        if len(stack) >= MAX_INLINE_DEPTH \
+                or any(f.symbol == name for f in stack):
+            return False
+        if len(call.args) != len(cand.func.params):
+            return False
+        if any(n in self.ctx.locals for n in cand.free_names):
+            return False
+        self.gen_inline_call(cand, call.args)
+        return True
+
+    def gen_inline_call(self, cand: InlineCandidate,
+                        args: list[Expr]) -> None:
+        """Generate `cand`'s body in place of a call, result in %rax.
+
+        Arguments are evaluated left to right, like the register args of
+        a real call, each straight into its renamed parameter local (a
+        sized store, as the callee's prologue spill would do). The body
+        runs with the caller's loop stack hidden so its `break` /
+        `continue` cannot bind to a caller loop.
+        """
+        self.inline_serial += 1
+        params, body = instantiate(cand.func, f"__inl{self.inline_serial}")
+        self.emit(f"    # inline {cand.symbol}")
+        for param, arg in zip(params, args):
+            var = self.ctx.alloc_local(
+                param.name, self.get_type_size(param.param_type),
+                param.param_type,
+            )
+            self.gen_expr(arg)
+            self._emit_local_store(var, "%rax")
+
+        frame = InlineFrame(cand.symbol, self.ctx.new_label("inl_ret"))
+        saved_loops = self.ctx.loop_stack
+        self.ctx.loop_stack = []
+        self.ctx.inline_stack.append(frame)
+        # A trailing `return v` just leaves v in %rax: the exit label
+        # follows immediately.
+        tail = body[-1] if body and isinstance(body[-1], ReturnStmt) \
+            else None
+        for stmt in (body[:-1] if tail is not None else body):
+            self.gen_stmt(stmt)
+        if tail is not None and tail.value is not None:
+            self.gen_expr(tail.value)
+        self.ctx.inline_stack.pop()
+        self.ctx.loop_stack = saved_loops
+        if frame.used:
+            self.emit(f"{frame.exit_label}:")
+        self.inline_expansions[cand.symbol] += 1
+
+    def _drop_inlined_statics(self) -> set[str]:
+        """Delete the out-of-line copies of single-site statics whose
+        every reference was expanded. Returns the dropped symbols."""
+        dead = [sym for sym, cand in self.inline_plan.items()
+                if cand.drop_body and self.inline_expansions[sym]
+                and not self.symbol_refs[sym]
+                and sym in self.function_spans]
+        for sym in sorted(dead, key=lambda s: self.function_spans[s][0],
+                          reverse=True):
+            start, end = self.function_spans[sym]
+            del self.output[start:end]
+        return set(dead)
+
     # -- method name mangling + table building ------------------------------
 
     @staticmethod
@@ -705,10 +1373,11 @@ class X86CodeGen:
             if isinstance(decl, ClassDef):
                 classes[decl.name] = decl
 
-        def end_of_fields(cls_name: str) -> int:
+        def end_of_fields(cls_name: str, packed: bool) -> int:
             """Return the offset just past `cls_name`'s last field,
-            mirroring layout_struct's per-field alignment walk WITHOUT
-            the trailing 8-byte round-up. This is the right "where
+            mirroring layout_struct's per-field alignment walk (no
+            padding at all if the class being laid out is `packed`)
+            WITHOUT the trailing round-up. This is the right "where
             does the next adjacent struct start?" answer for placing
             base classes during multi-base flattening — total_size
             would over-count by up to 7 bytes because of the .bss
@@ -727,7 +1396,7 @@ class X86CodeGen:
                     if bc is not None:
                         _walk_fields(bc)
                 for f in c.fields:
-                    align = self.natural_align(f.field_type)
+                    align = 1 if packed else self.natural_align(f.field_type)
                     offset = (offset + align - 1) & ~(align - 1)
                     offset += self.get_type_size(f.field_type)
             _walk_fields(cls)
@@ -759,7 +1428,8 @@ class X86CodeGen:
                 # the .bss-padded total_size — that would push the
                 # next base past where layout_struct actually placed
                 # its fields).
-                running_offset += end_of_fields(base)
+                running_offset += end_of_fields(
+                    base, "packed" in cls.decorators)
             # Class's own methods override inherited ones (first-match
             # wins from the perspective of the resolved table the
             # CHILD exposes). The class's own methods always sit at
@@ -805,9 +1475,16 @@ class X86CodeGen:
     def layout_struct(self, cls: ClassDef,
                       program: Optional[Program] = None) -> None:
         """Compute a C-ABI-compatible field layout. Each field is aligned to
-        its natural alignment (capped at 8); the total is rounded up to 8
-        bytes so the struct can be placed in `.bss` without sub-8-byte
-        padding surprises.
+        its natural alignment (capped at 8 for scalars); the total is
+        rounded up to the struct's alignment — 8, or the largest field
+        alignment if that is more — so the struct can be placed in
+        `.bss` without sub-8-byte padding surprises.
+
+        `@packed` places every field at alignment 1 and leaves the total
+        unrounded (descriptor rings, wire headers). `@align(N)` raises
+        the struct's alignment, and so the array stride and the
+        alignment of any global of this type, to at least N; combined
+        with `@packed` it rounds the packed total up to N.
 
         Inheritance: `class Dog(Animal):` prepends Animal's fields to
         Dog's. Multiple bases are walked left-to-right, each base's
@@ -821,6 +1498,8 @@ class X86CodeGen:
         fields: list[tuple[str, Type, int]] = []
         offset = 0
         seen_names: set[str] = set()
+        packed = "packed" in cls.decorators
+        struct_align = 1 if packed else 8
 
         # Walk the bases first (left-to-right), prepending their fields.
         # We accept either: (a) the parent already laid out in
@@ -859,7 +1538,8 @@ class X86CodeGen:
                         f"{_span_location(cls.span)}"
                     )
                 seen_names.add(pf.name)
-                align = self.natural_align(pf.field_type)
+                align = 1 if packed else self.natural_align(pf.field_type)
+                struct_align = max(struct_align, align)
                 offset = (offset + align - 1) & ~(align - 1)
                 fields.append((pf.name, pf.field_type, offset))
                 offset += self.get_type_size(pf.field_type)
@@ -872,12 +1552,48 @@ class X86CodeGen:
                     f"Adder classes are flat structs — no overrides"
                 )
             seen_names.add(f.name)
-            align = self.natural_align(f.field_type)
+            align = 1 if packed else self.natural_align(f.field_type)
+            struct_align = max(struct_align, align)
             offset = (offset + align - 1) & ~(align - 1)
             fields.append((f.name, f.field_type, offset))
             offset += self.get_type_size(f.field_type)
-        total = (offset + 7) & ~7
-        self.structs[cls.name] = StructInfo(cls.name, fields, total)
+        if cls.align is not None:
+            struct_align = max(struct_align, cls.align)
+        total = (offset + struct_align - 1) & ~(struct_align - 1)
+        self.structs[cls.name] = StructInfo(cls.name, fields, total,
+                                            struct_align)
+
+    def _format_layout_report(self, program: Program) -> str:
+        """Render the `--layout-report` table: per class, its size and
+        alignment, every padding hole (between fields and at the tail)
+        and every field of at most a cache line that straddles one,
+        counting from a cache-line-aligned struct start."""
+        lines = []
+        for decl in program.declarations:
+            if not isinstance(decl, ClassDef):
+                continue
+            si = self.structs[decl.name]
+            lines.append(f"layout: {si.name}: size {si.total_size}, "
+                         f"align {si.align}")
+            end = 0
+            prev = None
+            for fname, ftype, foff in si.fields:
+                if foff > end:
+                    where = f"after '{prev}'" if prev else "at the start"
+                    lines.append(f"layout:   hole of {_bytes(foff - end)} "
+                                 f"at offset {end} {where}")
+                size = self.get_type_size(ftype)
+                if 1 < size <= CACHE_LINE_SIZE and \
+                        foff // CACHE_LINE_SIZE \
+                        != (foff + size - 1) // CACHE_LINE_SIZE:
+                    lines.append(f"layout:   '{fname}' ({size} bytes at "
+                                 f"offset {foff}) straddles a cache line")
+                end = max(end, foff + size)
+                prev = fname
+            if si.total_size > end:
+                lines.append(f"layout:   tail padding of "
+                             f"{_bytes(si.total_size - end)}")
+        return "\n".join(lines)
 
     def _validate_program_supported(self, program: Program) -> None:
         """Pre-codegen sweep: reject declarations LANGUAGE.md marks as
@@ -902,33 +1618,32 @@ class X86CodeGen:
         """
         for decl in program.declarations:
             if isinstance(decl, ClassDef):
-                if decl.decorators:
-                    raise CodeGenError(
-                        f"x86: decorators are not supported "
-                        f"(class '{decl.name}', got @{decl.decorators[0]} "
-                        f"at {_span_location(decl.span)}); define fields "
-                        f"in C-ABI order — no @packed-driven layout"
-                    )
+                for dec in decl.decorators:
+                    if dec not in CLASS_DECORATORS:
+                        raise CodeGenError(
+                            f"x86: decorator @{dec} is not supported "
+                            f"(class '{decl.name}' at "
+                            f"{_span_location(decl.span)}); classes accept "
+                            f"only @packed and @align(N)"
+                        )
+                self._validate_align(decl.align, f"class '{decl.name}'",
+                                     decl.span)
                 for f in decl.fields:
                     _reject_unsupported_type(
                         f.field_type,
                         f"class '{decl.name}' field '{f.name}'",
                     )
                 # Methods: validated like free functions. Default
-                # params and decorators on methods are still rejected
-                # (no decorator semantics; default values silently
-                # corrupt arg regs). `self` was synthesised by the
+                # params are still rejected (default values silently
+                # corrupt arg regs), and so is any decorator outside
+                # FUNCTION_DECORATORS. `self` was synthesised by the
                 # parser as Parameter(name='self', type=Ptr[Class]) —
                 # it has no default and a known type, so this loop
                 # accepts it transparently.
                 for m in decl.methods:
-                    if m.decorators:
-                        raise CodeGenError(
-                            f"x86: decorators are not supported "
-                            f"(method '{decl.name}.{m.name}', got "
-                            f"@{m.decorators[0]} at "
-                            f"{_span_location(m.span)})"
-                        )
+                    self._validate_function_decorators(
+                        m, f"method '{decl.name}.{m.name}'"
+                    )
                     for p in m.params:
                         if p.default is not None:
                             raise CodeGenError(
@@ -950,13 +1665,9 @@ class X86CodeGen:
                         m.body, f"method '{decl.name}.{m.name}'"
                     )
             elif isinstance(decl, FunctionDef):
-                if decl.decorators:
-                    raise CodeGenError(
-                        f"x86: decorators are not supported "
-                        f"(function '{decl.name}', got "
-                        f"@{decl.decorators[0]} at "
-                        f"{_span_location(decl.span)})"
-                    )
+                self._validate_function_decorators(
+                    decl, f"function '{decl.name}'"
+                )
                 for p in decl.params:
                     if p.default is not None:
                         raise CodeGenError(
@@ -997,6 +1708,96 @@ class X86CodeGen:
                 _reject_unsupported_type(
                     decl.var_type, f"global '{decl.name}'"
                 )
+                self._validate_align(decl.align, f"global '{decl.name}'",
+                                     decl.span)
+                if decl.is_const and decl.value is None:
+                    raise CodeGenError(
+                        f"x86: Final global '{decl.name}' needs an "
+                        f"initializer (at {_span_location(decl.span)})"
+                    )
+                if decl.is_const and isinstance(decl.var_type, PercpuType):
+                    raise CodeGenError(
+                        f"x86: global '{decl.name}' cannot be both Final "
+                        f"and Percpu (at {_span_location(decl.span)})"
+                    )
+        self._validate_final_writes(program)
+
+    def _validate_final_writes(self, program: Program) -> None:
+        """Reject an assignment (or an `asm_out` operand) to a Final
+        global, or to an element of a Final array, anywhere it is not
+        shadowed by a local of the same name. (A store through a Final
+        pointer is not a write to the Final.)"""
+        finals = {d.name: d.var_type for d in program.declarations
+                  if isinstance(d, VarDecl) and d.is_const}
+        if not finals:
+            return
+        funcs = [d for d in program.declarations
+                 if isinstance(d, FunctionDef)]
+        for d in program.declarations:
+            if isinstance(d, ClassDef):
+                funcs.extend(d.methods)
+        for func in funcs:
+            local = {p.name for p in func.params}
+            for node in iter_nodes(func.body):
+                if isinstance(node, VarDecl):
+                    local.add(node.name)
+                elif isinstance(node, ForStmt):
+                    local.add(node.var)
+                elif isinstance(node, ForUnpackStmt):
+                    local.update(node.vars)
+            for node in iter_nodes(func.body):
+                if isinstance(node, Assignment):
+                    target, span = node.target, node.span
+                elif isinstance(node, CallExpr) \
+                        and isinstance(node.func, Identifier) \
+                        and node.func.name == "asm_out" \
+                        and len(node.args) == 2:
+                    target, span = node.args[1], node.func.span
+                else:
+                    continue
+                base = target
+                while isinstance(base, IndexExpr):
+                    base = base.obj
+                if not isinstance(base, Identifier) \
+                        or base.name not in finals or base.name in local:
+                    continue
+                if base is target \
+                        or isinstance(finals[base.name], ArrayType):
+                    raise CodeGenError(
+                        f"x86: cannot assign to Final global "
+                        f"'{base.name}' (at {_span_location(span)})"
+                    )
+
+    @staticmethod
+    def _validate_align(align: Optional[int], where: str, span) -> None:
+        """`@align(N)` takes a power of two up to a page."""
+        if align is None:
+            return
+        if align < 1 or align > 4096 or align & (align - 1):
+            raise CodeGenError(
+                f"x86: @align({align}) on {where} is not a power of two "
+                f"from 1 to 4096 (at {_span_location(span)})"
+            )
+
+    @staticmethod
+    def _validate_function_decorators(func: FunctionDef, where: str) -> None:
+        """Reject decorators outside FUNCTION_DECORATORS and
+        contradictory combinations on a function or method."""
+        for dec in func.decorators:
+            if dec not in FUNCTION_DECORATORS:
+                raise CodeGenError(
+                    f"x86: decorator @{dec} is not supported ({where} at "
+                    f"{_span_location(func.span)}); functions accept "
+                    f"only "
+                    + ", ".join(f"@{d}" for d in sorted(FUNCTION_DECORATORS))
+                )
+        for a, b in (("inline", "noinline"), ("hot", "cold"),
+                     ("inline", "cold")):
+            if a in func.decorators and b in func.decorators:
+                raise CodeGenError(
+                    f"x86: {where} is both @{a} and @{b} at "
+                    f"{_span_location(func.span)}"
+                )
 
     def _validate_stmts_supported(self, stmts, where: str) -> None:
         """Walk a list of statements and reject any local VarDecl with
@@ -1015,6 +1816,12 @@ class X86CodeGen:
                 _reject_unsupported_type(
                     s.var_type, f"{where} local '{s.name}'"
                 )
+                if s.is_const:
+                    raise CodeGenError(
+                        f"x86: Final is only supported on module-level "
+                        f"globals ({where} local '{s.name}' at "
+                        f"{_span_location(s.span)})"
+                    )
             elif isinstance(s, _IfStmt):
                 self._validate_stmts_supported(s.then_body, where)
                 for _cond, body in s.elif_branches:
@@ -1039,11 +1846,14 @@ class X86CodeGen:
         regular_zero = []
         percpu_init  = []
         percpu_zero  = []
+        final_init   = []
         for d in program.declarations:
             if not isinstance(d, VarDecl):
                 continue
             is_percpu = isinstance(d.var_type, PercpuType)
-            if d.value is not None:
+            if d.is_const:
+                final_init.append(d)
+            elif d.value is not None:
                 (percpu_init if is_percpu else regular_init).append(d)
             else:
                 (percpu_zero if is_percpu else regular_zero).append(d)
@@ -1079,7 +1889,7 @@ class X86CodeGen:
                         f"({len(raw)} bytes) overflows Array[{cap}, ...]"
                     )
                 self.emit(f"    .globl {g.name}")
-                self.emit(f"    .align 8")
+                self.emit(f"    .align {self._global_align(g)}")
                 self.emit(f"{g.name}:")
                 self.emit(f'    .ascii "{self._escape(value.value)}"')
                 # Pad with NULs out to the declared length so the symbol
@@ -1088,6 +1898,15 @@ class X86CodeGen:
                 if cap > len(raw):
                     self.emit(f"    .zero {cap - len(raw)}")
                 return
+            # Static tables: `name: Array[N, T] = [v0, v1, ...]` and
+            # `name: Array[N, uint8] = bytes_from_file("blob.bin")` are
+            # laid out by the assembler, so nothing fills them at boot.
+            if isinstance(value, ListLiteral):
+                self._emit_array_literal(g)
+                return
+            if self._is_bytes_from_file(value):
+                self._emit_file_bytes(g)
+                return
             # Function-pointer global: `name: Fn[R, A...] = some_func`.
             # The initialiser is a bare function name; emit an 8-byte
             # slot holding a relocation against that function symbol so
@@ -1108,28 +1927,28 @@ class X86CodeGen:
                         f"initialiser '{fn}' is not a known function"
                     )
                 self.emit(f"    .globl {g.name}")
-                self.emit(f"    .align 8")
+                self.emit(f"    .align {self._global_align(g)}")
                 self.emit(f"{g.name}:")
                 self.emit(f"    .quad {fn}")
                 return
-            neg = False
-            if isinstance(value, UnaryExpr) and value.op is UnaryOp.NEG \
-                    and isinstance(value.operand, IntLiteral):
-                neg = True
-                value = value.operand
-            if not isinstance(value, IntLiteral):
+            # Integer constant, or the name of a Final / constant
+            # global holding one.
+            const = self.final_values.get(g.name, self._constant_int(value))
+            if const is None:
                 raise CodeGenError(
                     f"x86: global '{g.name}' must have an integer "
                     f"initializer (got {type(g.value).__name__})"
                 )
             self.emit(f"    .globl {g.name}")
+            if self._global_align(g) > 8:
+                self.emit(f"    .align {self._global_align(g)}")
             self.emit(f"{g.name}:")
-            self.emit(f"    .quad {-value.value if neg else value.value}")
+            self.emit(f"    .quad {const}")
 
         def emit_zero(g: VarDecl):
             size = max(self.get_type_size(g.var_type), 8)
             self.emit(f"    .globl {g.name}")
-            self.emit(f"    .align 8")
+            self.emit(f"    .align {self._global_align(g)}")
             self.emit(f"{g.name}:")
             self.emit(f"    .zero {(size + 7) & ~7}")
 
@@ -1143,24 +1962,39 @@ class X86CodeGen:
             self.emit('    .section .bss')
             for g in regular_zero:
                 emit_zero(g)
+        # Final globals: read-only, so they share write-protected pages
+        # with the string literals. Scalar reads are folded; the symbol
+        # stays for `&name` and for C code that links against it.
+        if final_init:
+            self.emit()
+            self.emit('    .section .rodata')
+            self.emit('    .align 8')
+            for g in final_init:
+                emit_init(g)
 
         # Per-CPU template: PROGBITS section, packed in offset order so
         # the linker preserves the exact byte layout our access sites
         # assume. We pad between vars when natural alignment requires
-        # gaps. Two linker-visible markers at the boundaries let
-        # setup_per_cpu_areas() know what to memcpy. Note: no symbol
-        # name is emitted for the per-CPU vars themselves — their
-        # identity in generated code is their offset, not a symbol —
-        # but we keep them as `.globl` for ease of debugging via nm.
-        if percpu_init or percpu_zero:
+        # gaps. Offset 0 is the self-pointer slot (PERCPU_SELF_SIZE),
+        # zero in the template; the template's start and size are both
+        # multiples of `percpu_align` so back-to-back per-CPU copies
+        # each begin on a cache line. Two linker-visible markers at the
+        # boundaries let setup_per_cpu_areas() know what to memcpy.
+        # Note: no symbol name is needed for the per-CPU vars
+        # themselves — their identity in generated code is their
+        # offset, not a symbol — but we keep them as `.globl` for ease
+        # of debugging via nm.
+        if percpu_init or percpu_zero or self.prof_pcpu_offset is not None:
+            align = self.percpu_align
             ordered = sorted(percpu_init + percpu_zero,
                              key=lambda g: self.percpu_offsets[g.name])
             self.emit()
             self.emit('    .section .data..percpu, "aw"')
-            self.emit('    .align 8')
+            self.emit(f'    .align {align}')
             self.emit('    .globl __per_cpu_template_start')
             self.emit('__per_cpu_template_start:')
-            cursor = 0
+            self.emit(f"    .zero {PERCPU_SELF_SIZE}")
+            cursor = PERCPU_SELF_SIZE
             for g in ordered:
                 want = self.percpu_offsets[g.name]
                 if want > cursor:
@@ -1168,6 +2002,9 @@ class X86CodeGen:
                     cursor = want
                 self.emit(f"    .globl {g.name}")
                 self.emit(f"{g.name}:")
+                size = self.get_type_size(g.var_type)
+                directive = {1: ".byte", 2: ".short", 4: ".long",
+                             8: ".quad"}.get(size)
                 if g.value is not None:
                     # Same constant-fold path as gen_data's init helper.
                     value = g.value
@@ -1177,19 +2014,366 @@ class X86CodeGen:
                             and isinstance(value.operand, IntLiteral):
                         neg = True
                         value = value.operand
-                    if not isinstance(value, IntLiteral):
+                    if not isinstance(value, IntLiteral) \
+                            or directive is None:
                         raise CodeGenError(
                             f"x86: percpu '{g.name}' needs an integer "
                             f"initialiser"
                         )
-                    self.emit(f"    .quad {-value.value if neg else value.value}")
+                    self.emit(f"    {directive} "
+                              f"{-value.value if neg else value.value}")
                 else:
-                    size = self.get_type_size(g.var_type)
-                    self.emit(f"    .zero {(size + 7) & ~7}")
-                cursor += self.get_type_size(g.var_type)
+                    self.emit(f"    .zero {size}")
+                cursor += size
+            if self.prof_pcpu_offset is not None:
+                if self.prof_pcpu_offset > cursor:
+                    self.emit(f"    .zero {self.prof_pcpu_offset - cursor}")
+                self.emit(f"    .globl {PROF_PCPU_START}")
+                self.emit(f"{PROF_PCPU_START}:")
+                self.emit(f"    .quad 0, {PROF_NODES}")
+                self.emit(f"    .zero {PROF_PCPU_SIZE - 16}")
+                self.emit(f"    .globl {PROF_PCPU_END}")
+                self.emit(f"{PROF_PCPU_END}:")
+                cursor = self.prof_pcpu_offset + PROF_PCPU_SIZE
+            padded = (cursor + align - 1) & ~(align - 1)
+            if padded > cursor:
+                self.emit(f"    .zero {padded - cursor}")
             self.emit('    .globl __per_cpu_template_end')
             self.emit('__per_cpu_template_end:')
 
+    @staticmethod
+    def _prof_label(sym: str) -> str:
+        return f".Lprof_{sym}"
+
+    def _instrumented(self, func: FunctionDef) -> bool:
+        """Whether `--instrument` applies to `func`: every function, or
+        those `--instrument-filter` selects. A pattern matches the
+        symbol or `module.name`; `-pattern` excludes and wins."""
+        if not self.options.instrument:
+            return False
+        names = [func.name]
+        if func.module:
+            names.append(f"{func.module}.{func.orig_name or func.name}")
+        keep = all(p.startswith("-")
+                   for p in self.options.instrument_filter)
+        for pattern in self.options.instrument_filter:
+            exclude = pattern.startswith("-")
+            if any(fnmatchcase(n, pattern.lstrip("-")) for n in names):
+                if exclude:
+                    return False
+                keep = True
+        return keep
+
+    def gen_prof_records(self, dropped: set[str]) -> None:
+        """The `--instrument` table: one prof.py record per instrumented
+        function still in the listing, bracketed by PROF_START /
+        PROF_END so a kernel or test driver can copy it out whole."""
+        if self.options.instrument == "cycles":
+            self._gen_prof_hooks()
+        self.emit()
+        self.emit(f'    .section {PROF_SECTION}, "aw"')
+        self.emit('    .align 8')
+        self.emit(f'    .globl {PROF_START}')
+        self.emit(f'{PROF_START}:')
+        for sym in self.prof_funcs:
+            if sym in dropped:
+                continue
+            size = prof_record_size(sym)
+            self.emit(f'{self._prof_label(sym)}:')
+            self.emit('    .quad 0')
+            self.emit(f'    .quad {sym}')
+            self.emit(f'    .long {size}, {len(sym)}')
+            self.emit(f'    .ascii "{sym}"')
+            if size > PROF_HEADER_SIZE + len(sym):
+                self.emit(f'    .zero {size - PROF_HEADER_SIZE - len(sym)}')
+        self.emit(f'    .globl {PROF_END}')
+        self.emit(f'{PROF_END}:')
+
+    def _function_heat(self, sym: str) -> Optional[str]:
+        """"hot", "cold" or None for `sym`: what its decorators or name
+        say (function_heat), else its `--profile-use` class."""
+        heat = self.function_heat.get(sym)
+        if heat is not None or self.options.profile is None:
+            return heat
+        return self.options.profile.heat(sym)
+
+    def _place_function(self, sym: str) -> None:
+        """Switch to the section `sym` belongs in (see TEXT_HOT_SECTION).
+        Once anything is placed every function names its section: an
+        inlined static's copy, directive included, may be dropped."""
+        profile = self.options.profile
+        if profile is None and not self.function_heat:
+            return
+        heat = self._function_heat(sym)
+        if heat == "hot":
+            rank = len(profile.hot) if profile is not None else 0
+            if profile is not None:
+                rank = profile.hot.get(sym, rank)
+            self.emit(f'    .section {TEXT_HOT_SECTION}, "ax", @progbits')
+            self.emit(f"    .subsection {rank}")
+            self.emit("    .p2align 4")
+        elif heat == "cold":
+            self.emit(f'    .section {TEXT_UNLIKELY_SECTION}, "ax", '
+                      f'@progbits')
+        else:
+            self.emit("    .text")
+
+    def _report_stale_profile(self) -> None:
+        """Warn about `--profile-use` entries for functions this program
+        does not have: renamed, deleted, or a profile of another
+        build. They are ignored."""
+        stale = sorted(set(self.options.profile.counts)
+                       - set(self.function_spans))
+        if not stale:
+            return
+        shown = ", ".join(stale[:8]) + (", ..." if len(stale) > 8 else "")
+        print(f"warning: profile: {len(stale)} stale "
+              f"entr{'y' if len(stale) == 1 else 'ies'} not in this "
+              f"program ignored: {shown}", file=sys.stderr)
+
+    @staticmethod
+    def _fentry_label(sym: str) -> str:
+        return f".Lfentry_{sym}"
+
+    def gen_fentry_table(self, dropped: set[str]) -> None:
+        """The `--fentry` call-site table: the address of every emitted
+        function's `call __fentry__`, bracketed by FENTRY_START /
+        FENTRY_END (layout in fentry.py)."""
+        self.emit()
+        self.emit(f'    .section {FENTRY_SECTION}, "aw"')
+        self.emit('    .align 8')
+        self.emit(f'    .globl {FENTRY_START}')
+        self.emit(f'{FENTRY_START}:')
+        for sym in self.fentry_funcs:
+            if sym not in dropped:
+                self.emit(f'    .quad {self._fentry_label(sym)}')
+        self.emit(f'    .globl {FENTRY_END}')
+        self.emit(f'{FENTRY_END}:')
+
+    def _gen_prof_hooks(self) -> None:
+        """__adder_prof_enter / __adder_prof_exit, called with the
+        function's 16-byte block in %rdi: [0] the entry timestamp,
+        [8] the caller's call-path node + 1 (`cur`), or -1 when
+        PROF_ARMED was clear at entry and nothing is recorded.
+
+        enter (%rsi = the function) looks up the node for (cur, %rsi)
+        in this CPU's table — a multiplicative hash, then linear
+        probing — claims a free slot with `cmpxchg`, bumps its calls
+        and makes it `cur`. exit adds the elapsed cycles to `cur`'s
+        node and restores the caller's `cur`, keeping %rax. Every
+        table update is one instruction, so an interrupt that runs
+        instrumented code in between sees consistent state; no `lock`
+        is needed because no other CPU touches this table.
+        """
+        cur = self.prof_pcpu_offset
+        table = cur + PROF_PCPU_HEADER_SIZE
+        shift = 64 - (PROF_NODES.bit_length() - 1)
+        scale = PROF_NODE_SIZE.bit_length() - 1
+        lines = [
+            "",
+            "    .text",
+            "    .type __adder_prof_enter, @function",
+            "__adder_prof_enter:",
+            "    rdtsc",
+            "    shlq $32, %rdx",
+            "    orq %rdx, %rax",
+            "    movq %rax, (%rdi)",
+            "    movq $-1, 8(%rdi)",
+            f"    cmpq $0, {PROF_ARMED}(%rip)",
+            "    je .Lprof_enter_done",
+            f"    movq %gs:{cur}, %rcx",
+            "    movq %rcx, 8(%rdi)",
+            "    leaq 1(%rcx), %r8",
+            "    shlq $32, %r8",
+            "    movl %esi, %eax",
+            "    orq %rax, %r8",
+            "    movabsq $0x9e3779b97f4a7c15, %rdx",
+            "    imulq %r8, %rdx",
+            f"    shrq ${shift}, %rdx",
+            f"    movl ${PROF_PROBES}, %r10d",
+            ".Lprof_enter_probe:",
+            "    movq %rdx, %r9",
+            f"    shlq ${scale}, %r9",
+            f"    cmpq %r8, %gs:{table}(%r9)",
+            "    je .Lprof_enter_found",
+            "    xorl %eax, %eax",
+            f"    cmpxchgq %r8, %gs:{table}(%r9)",
+            "    je .Lprof_enter_claimed",
+            "    cmpq %r8, %rax",
+            "    je .Lprof_enter_found",
+            "    incq %rdx",
+            f"    andq ${PROF_NODES - 1}, %rdx",
+            "    decl %r10d",
+            "    jnz .Lprof_enter_probe",
+            f"    movl ${PROF_NODES}, %edx",
+            f"    movl ${PROF_NODES * PROF_NODE_SIZE}, %r9d",
+            "    jmp .Lprof_enter_found",
+            ".Lprof_enter_claimed:",
+            f"    movq %rsi, %gs:{table + 24}(%r9)",
+            ".Lprof_enter_found:",
+            f"    incq %gs:{table + 8}(%r9)",
+            "    incq %rdx",
+            f"    movq %rdx, %gs:{cur}",
+            ".Lprof_enter_done:",
+            "    ret",
+            "    .size __adder_prof_enter, .-__adder_prof_enter",
+            "",
+            "    .type __adder_prof_exit, @function",
+            "__adder_prof_exit:",
+            "    cmpq $-1, 8(%rdi)",
+            "    je .Lprof_exit_done",
+            "    movq %rax, %r11",
+            "    rdtsc",
+            "    shlq $32, %rdx",
+            "    orq %rdx, %rax",
+            "    subq (%rdi), %rax",
+            f"    movq %gs:{cur}, %rdx",
+            f"    shlq ${scale}, %rdx",
+            # Node cur - 1's cycles. A cur of 0 (a context switch mixed
+            # two call paths) lands in the header's padding instead.
+            f"    addq %rax, %gs:{table - PROF_NODE_SIZE + 16}(%rdx)",
+            "    movq 8(%rdi), %rdx",
+            f"    movq %rdx, %gs:{cur}",
+            "    movq %r11, %rax",
+            ".Lprof_exit_done:",
+            "    ret",
+            "    .size __adder_prof_exit, .-__adder_prof_exit",
+            "",
+            "    .section .data",
+            "    .align 8",
+            f"    .globl {PROF_ARMED}",
+            f"{PROF_ARMED}:",
+            "    .quad 0",
+        ]
+        for line in lines:
+            self.emit(line)
+
+    def _static_array_type(self, g: VarDecl, what: str) -> ArrayType:
+        t = g.var_type
+        if not isinstance(t, ArrayType):
+            raise CodeGenError(
+                f"x86: global '{g.name}' has {what} but is not typed "
+                f"Array[N, T] (at {_span_location(g.span)})"
+            )
+        return t
+
+    def _emit_array_literal(self, g: VarDecl) -> None:
+        """Emit `g`'s `[v0, v1, ...]` initialiser as data directives,
+        zero-padded out to the declared length. Elements are integer
+        constants (`_constant_int`), or function names for an array of
+        `Fn[...]`."""
+        t = self._static_array_type(g, "a list initializer")
+        elements = g.value.elements
+        if len(elements) > t.size:
+            raise CodeGenError(
+                f"x86: global '{g.name}': {len(elements)} initializers "
+                f"overflow Array[{t.size}, ...] (at "
+                f"{_span_location(g.span)})"
+            )
+        elem = t.element_type
+        if isinstance(elem, FunctionPointerType):
+            size, values = 8, []
+            for e in elements:
+                if not isinstance(e, Identifier) or (
+                        e.name not in self.defined_funcs
+                        and e.name not in self.extern_funcs):
+                    raise CodeGenError(
+                        f"x86: global '{g.name}': Fn[...] array elements "
+                        f"must be function names (at "
+                        f"{_span_location(e.span)})"
+                    )
+                values.append(e.name)
+        elif self._is_aggregate_type(elem) \
+                or isinstance(elem, PointerType):
+            raise CodeGenError(
+                f"x86: global '{g.name}': list initializers need an "
+                f"integer or Fn[...] element type (at "
+                f"{_span_location(g.span)})"
+            )
+        else:
+            size = self.get_type_size(elem)
+            lo = -(1 << (8 * size - 1))
+            hi = (1 << (8 * size)) - 1
+            values = []
+            for e in elements:
+                v = self._constant_int(e)
+                if v is None:
+                    raise CodeGenError(
+                        f"x86: global '{g.name}': list initializer "
+                        f"elements must be integer constants (at "
+                        f"{_span_location(e.span)})"
+                    )
+                if not lo <= v <= hi:
+                    raise CodeGenError(
+                        f"x86: global '{g.name}': {v} does not fit a "
+                        f"{size}-byte element (at {_span_location(e.span)})"
+                    )
+                values.append(str(v & hi))
+        directive = {1: ".byte", 2: ".short", 4: ".long", 8: ".quad"}[size]
+        self.emit(f"    .globl {g.name}")
+        self.emit(f"    .align {self._global_align(g)}")
+        self.emit(f"{g.name}:")
+        for i in range(0, len(values), 16):
+            self.emit(f"    {directive} {', '.join(values[i:i + 16])}")
+        self._emit_static_padding(g, len(values) * size)
+
+    def _global_align(self, g: VarDecl) -> int:
+        """Alignment of global `g`: 8, or more for an `@align(N)` global
+        or a type whose layout asks for it (an `@align(N)` class)."""
+        return max(8, self.natural_align(g.var_type), g.align or 1)
+
+    def _emit_static_padding(self, g: VarDecl, used: int) -> None:
+        """Zero-fill `g` from `used` bytes to its declared size, rounded
+        up to 8 like a .bss slot so the next global stays aligned."""
+        total = (self.get_type_size(g.var_type) + 7) & ~7
+        if total > used:
+            self.emit(f"    .zero {total - used}")
+
+    @staticmethod
+    def _is_bytes_from_file(value: Optional[Expr]) -> bool:
+        return (isinstance(value, CallExpr)
+                and isinstance(value.func, Identifier)
+                and value.func.name == "bytes_from_file")
+
+    def _emit_file_bytes(self, g: VarDecl) -> None:
+        """Emit `g`'s `bytes_from_file("path")` initialiser as an
+        `.incbin` of the file. A relative path is resolved against the
+        directory of the declaring source file."""
+        t = self._static_array_type(g, "a bytes_from_file() initializer")
+        where = _span_location(g.span)
+        args = g.value.args
+        if len(args) != 1 or not isinstance(args[0], StringLiteral):
+            raise CodeGenError(
+                f"x86: global '{g.name}': bytes_from_file() takes one "
+                f"string literal path (at {where})"
+            )
+        if self.get_type_size(t.element_type) != 1:
+            raise CodeGenError(
+                f"x86: global '{g.name}': bytes_from_file() needs a "
+                f"1-byte element type (at {where})"
+            )
+        path = Path(args[0].value)
+        if not path.is_absolute() and g.span is not None \
+                and Path(g.span.filename).is_file():
+            path = Path(g.span.filename).parent / path
+        try:
+            size = path.stat().st_size
+        except OSError as e:
+            raise CodeGenError(
+                f"x86: global '{g.name}': bytes_from_file(): cannot read "
+                f"'{path}' ({e.strerror}) (at {where})"
+            )
+        if size > t.size:
+            raise CodeGenError(
+                f"x86: global '{g.name}': '{path}' ({size} bytes) "
+                f"overflows Array[{t.size}, ...] (at {where})"
+            )
+        self.emit(f"    .globl {g.name}")
+        self.emit(f"    .align {self._global_align(g)}")
+        self.emit(f"{g.name}:")
+        self.emit(f'    .incbin "{self._escape(str(path.resolve()))}"')
+        self._emit_static_padding(g, size)
+
     def gen_rodata(self) -> None:
         if not self.string_literals:
             return
@@ -1372,9 +2556,16 @@ class X86CodeGen:
     # -- functions ----------------------------------------------------------
 
     def gen_function(self, func: FunctionDef) -> None:
+        start = len(self.output)
         self.ctx = FunctionContext(name=func.name)
+        self.expr_types = {}
+        facts = self._scan_body(func)
         self.ctx.needs_canary = self._function_needs_canary(func)
         self.ctx.epilogue_label = f".__epilogue_{func.name}"
+        prof = self._instrumented(func)
+        if prof:
+            self.prof_funcs.append(func.name)
+        cycles = prof and self.options.instrument == "cycles"
 
         # Stack-protector V0: when needs_canary is set, reserve the 8-byte
         # canary slot at the TOP of the frame (closest to saved %rbp / the
@@ -1387,25 +2578,59 @@ class X86CodeGen:
         # epilogue check trips before the bogus `ret` does.
         if self.ctx.needs_canary:
             self.ctx.alloc_local("__canary", 8, None)
+        elif not cycles and self._can_omit_frame(func):
+            self.ctx.reg_pool = list(FRAMELESS_REGS)
+        if cycles:
+            self.ctx.prof_block = self.ctx.alloc_local("__prof", 16).offset
+        self.ctx.allow_tail_calls = (
+            self.options.tail_calls
+            and not self.ctx.shared_epilogue
+            and not self.ctx.frameless
+            and not self._may_expose_frame(func, facts)
+        )
+        # Inline asm may clobber any register, so a function containing
+        # some keeps its loop counters on the stack.
+        if not self.ctx.frameless and not facts.inline_asm:
+            self.ctx.loop_regs = list(LOOP_REGS)
+        self.ctx.addr_taken = facts.addr_taken
 
         # Parameters become locals: allocate slots up front so the body can
         # see them via the same symbol-lookup path as VarDecl-introduced
         # locals. SysV passes the first 6 ints in ARG_REGS; args 7+ live on
         # the caller's stack and the callee reads them at positive %rbp
         # offsets (+16 for arg 7, +24 for arg 8, ...).
-        for param in func.params:
+        for i, param in enumerate(func.params):
+            home = None
+            if self.ctx.frameless:
+                home = _FRAMELESS_PARAM_HOME.get(ARG_REGS[i], ARG_REGS[i])
             self.ctx.alloc_local(
                 param.name,
                 self.get_type_size(param.param_type),
                 param.param_type,
+                home,
             )
 
         self.emit()
+        self._place_function(func.name)
         self.emit(f"    .globl {func.name}")
         self.emit(f"    .type {func.name}, @function")
         self.emit(f"{func.name}:")
+        if self.options.debug_info:
+            self.emit("    .cfi_startproc")
+            self._emit_loc(func.span)
         if EMIT_ENDBR:
             self.emit("    endbr64")
+        if self.options.fentry and func.name != FENTRY_SYMBOL:
+            self.fentry_funcs.append(func.name)
+            self.emit(f"{self._fentry_label(func.name)}:")
+            self.emit(f"    call {FENTRY_SYMBOL}")
+        if prof and not cycles:
+            self.emit(f"    lock incq {self._prof_label(func.name)}(%rip)")
+        if self.ctx.frameless:
+            self._gen_frameless_function(func)
+            self.function_spans[func.name] = (start, len(self.output))
+            self.ctx = None
+            return
         self.emit("    pushq %rbp")
         self.emit("    movq %rsp, %rbp")
 
@@ -1413,6 +2638,8 @@ class X86CodeGen:
         # body is walked (VarDecls may allocate more locals). Patched below.
         reserve_idx = len(self.output)
         self.emit("    # @STACK_RESERVE@")
+        if self.ctx.loop_regs is not None:
+            self.emit("    # @CALLEE_SAVE@")
 
         # Stack-protector prologue: load the current __stack_chk_guard
         # value (a non-zero magic before __stack_chk_init runs, or the
@@ -1458,10 +2685,26 @@ class X86CodeGen:
                 self.emit(f"    movq {stack_off}(%rbp), %rax")
                 self._emit_local_store(var, "%rax")
 
+        # Cycles profiling starts once the arguments are in their slots:
+        # the hook may use every caller-saved register.
+        if cycles:
+            self.emit(f"    leaq {self.ctx.prof_block}(%rbp), %rdi")
+            self.emit(f"    leaq {func.name}(%rip), %rsi")
+            self.emit("    call __adder_prof_enter")
+
         # Body.
         for stmt in func.body:
             self.gen_stmt(stmt)
 
+        # Save slots for the LOOP_REGS the body used; the placeholders
+        # become the saves and restores (or vanish).
+        saves: list[str] = []
+        restores: list[str] = []
+        for reg in self.ctx.saved_regs:
+            slot = self.ctx.alloc_local(f"__save_{reg[1:]}", 8, None)
+            saves.append(f"    movq {reg}, {slot.offset}(%rbp)")
+            restores.append(f"    movq {slot.offset}(%rbp), {reg}")
+
         # Patch the reserve placeholder with the final 16-byte-aligned frame
         # size. (At function entry, %rsp ≡ 8 (mod 16); after pushq %rbp it is
         # 0 (mod 16); subtracting a multiple of 16 keeps it aligned for the
@@ -1481,7 +2724,7 @@ class X86CodeGen:
         # __stack_chk_fail which never returns.
         last_is_return = (func.body
                           and isinstance(func.body[-1], ReturnStmt))
-        if self.ctx.needs_canary:
+        if self.ctx.shared_epilogue:
             # If the body falls through (no explicit trailing return)
             # we still need to enter the epilogue; emit an explicit
             # jmp to keep the label as a join point rather than the
@@ -1492,33 +2735,185 @@ class X86CodeGen:
             if not last_is_return:
                 self.emit(f"    jmp {self.ctx.epilogue_label}")
             self.emit(f"{self.ctx.epilogue_label}:")
-            # CRITICAL: the canary check MUST NOT clobber %rax — that
-            # holds the function's return value at this point (set by
-            # the body before the jmp here). Use %rcx as the scratch
-            # for the XOR-and-test. %rcx is caller-saved in SysV so we
-            # don't owe the caller anything, and our own epilogue is
-            # the only code between here and `ret`.
-            self.emit("    movq -8(%rbp), %rcx")
-            self.emit("    xorq __stack_chk_guard(%rip), %rcx")
-            # testq sets ZF=1 iff %rcx==0 (canary matched the guard);
-            # jnz on ZF=0 (mismatch) tail-calls __stack_chk_fail which
-            # never returns. %rax is preserved across this whole
-            # sequence so the eventual `ret` hands the right value
-            # back to the caller.
-            self.emit("    testq %rcx, %rcx")
-            self.emit("    jnz __stack_chk_fail")
-            self.emit("    leave")
+            # __adder_prof_exit keeps %rax, the return value.
+            if cycles:
+                self.emit(f"    leaq {self.ctx.prof_block}(%rbp), %rdi")
+                self.emit("    call __adder_prof_exit")
+            if self.ctx.needs_canary:
+                # CRITICAL: the canary check MUST NOT clobber %rax — that
+                # holds the function's return value at this point (set by
+                # the body before the jmp here). Use %rcx as the scratch
+                # for the XOR-and-test. %rcx is caller-saved in SysV so we
+                # don't owe the caller anything, and our own epilogue is
+                # the only code between here and `ret`.
+                self.emit("    movq -8(%rbp), %rcx")
+                self.emit("    xorq __stack_chk_guard(%rip), %rcx")
+                # testq sets ZF=1 iff %rcx==0 (canary matched the guard);
+                # jnz on ZF=0 (mismatch) tail-calls __stack_chk_fail which
+                # never returns. %rax is preserved across this whole
+                # sequence so the eventual `ret` hands the right value
+                # back to the caller.
+                self.emit("    testq %rcx, %rcx")
+                self.emit("    jnz __stack_chk_fail")
+            self._emit_leave()
             self.emit("    ret")
         else:
-            # Non-canary path: same shape as before. Skipping the
+            # Plain path: same shape as before. Skipping the
             # fallthrough epilogue after an explicit return suppresses
             # objtool's "unreachable instruction" warning.
             if not last_is_return:
-                self.emit("    leave")
+                self._emit_leave()
                 self.emit("    ret")
+        self._end_cold_blocks()
+        self._end_debug_function()
         self.emit(f"    .size {func.name}, .-{func.name}")
+        if self.ctx.loop_regs is not None:
+            patched: list[str] = []
+            for line in self.output[reserve_idx:]:
+                if line == "    # @CALLEE_SAVE@":
+                    patched.extend(saves)
+                elif line == "    # @CALLEE_RESTORE@":
+                    patched.extend(restores)
+                else:
+                    patched.append(line)
+            self.output[reserve_idx:] = patched
+        self.function_spans[func.name] = (start, len(self.output))
         self.ctx = None
 
+    def _emit_leave(self) -> None:
+        """`leave`, preceded by the restore of any LOOP_REGS the function
+        used (a placeholder until gen_function knows which)."""
+        if self.ctx.loop_regs is not None:
+            self.emit("    # @CALLEE_RESTORE@")
+        self.emit("    leave")
+
+    def _gen_frameless_function(self, func: FunctionDef) -> None:
+        """Body + epilogue of a function with no %rbp frame: params are
+        normalised into their register homes (the sized-store + extending
+        load a stack slot would do) and every return is a bare `ret`."""
+        for i, param in enumerate(func.params):
+            self._emit_local_store(self.ctx.locals[param.name], ARG_REGS[i])
+        for stmt in func.body:
+            self.gen_stmt(stmt)
+        if not (func.body and isinstance(func.body[-1], ReturnStmt)):
+            self.emit("    ret")
+        self._end_cold_blocks()
+        self._end_debug_function()
+        self.emit(f"    .size {func.name}, .-{func.name}")
+
+    def _can_omit_frame(self, func: FunctionDef) -> bool:
+        """True when `func` is a leaf whose params and locals are all
+        scalars that fit in FRAMELESS_REGS, so it needs no stack slot and
+        no %rbp frame. Inline asm disqualifies it (it may address the
+        frame), as does any `&` (a register has no address)."""
+        from .ast_nodes import MethodCallExpr as _MethodCallExpr
+        if not self.options.omit_frame_pointer:
+            return False
+        if len(func.params) > len(ARG_REGS):
+            return False
+        if any(self._is_aggregate_type(p.param_type) for p in func.params):
+            return False
+        homes = len(func.params)
+        range_calls = set()
+        for node in iter_nodes(func.body):
+            if isinstance(node, CallExpr):
+                if id(node) in range_calls:
+                    continue
+                name = (node.func.name if isinstance(node.func, Identifier)
+                        else None)
+                if (name not in FRAMELESS_BUILTINS
+                        or name in self.defined_funcs
+                        or name in self.extern_funcs):
+                    return False
+            elif isinstance(node, UnaryExpr) and node.op is UnaryOp.ADDR:
+                return False
+            elif isinstance(node, VarDecl):
+                if self._is_aggregate_type(node.var_type):
+                    return False
+                homes += 1
+            elif isinstance(node, ForStmt):
+                # range(): the counter plus a non-constant bound / step;
+                # Array: hidden index + element.
+                if self._is_range_call(node.iterable):
+                    range_calls.add(id(node.iterable))
+                    args = node.iterable.args
+                    bounds = args[1:] if len(args) > 1 else args
+                    homes += 1 + sum(
+                        self._imm32(self._const_int_value(arg)) is None
+                        for arg in bounds
+                    )
+                else:
+                    homes += 2
+            elif isinstance(node, (_MethodCallExpr, ForUnpackStmt)):
+                return False
+        return homes <= len(FRAMELESS_REGS)
+
+    def _scan_body(self, func: FunctionDef) -> BodyFacts:
+        """Walk `func`'s body once for the facts the prologue needs."""
+        facts = BodyFacts()
+        for node in iter_nodes(func.body):
+            if isinstance(node, CallExpr):
+                if isinstance(node.func, Identifier) \
+                        and node.func.name == "asm_volatile":
+                    facts.inline_asm = True
+            elif isinstance(node, UnaryExpr) and node.op is UnaryOp.ADDR:
+                facts.addr_of = True
+                if isinstance(node.operand, Identifier):
+                    facts.addr_taken.add(node.operand.name)
+            elif isinstance(node, VarDecl) \
+                    and self._is_aggregate_type(node.var_type):
+                facts.aggregate_local = True
+        return facts
+
+    def _may_expose_frame(self, func: FunctionDef,
+                          facts: BodyFacts) -> bool:
+        """True if a pointer into `func`'s frame may be live when it
+        returns — a `&`, an Array/struct local or param (they decay to
+        their address), or inline asm. Such a function must not `leave`
+        before its last call, so it gets no tail calls."""
+        if any(self._is_aggregate_type(p.param_type) for p in func.params):
+            return True
+        return facts.inline_asm or facts.addr_of or facts.aggregate_local
+
+    def _is_aggregate_type(self, t: Optional[Type]) -> bool:
+        return isinstance(t, ArrayType) or (
+            t is not None and hasattr(t, "name") and t.name in self.structs
+        )
+
+    def _struct_copy_size(self, t: Optional[Type],
+                          value: Expr) -> Optional[int]:
+        """Byte size of assigning `value` by value to a target of type
+        `t` when both are the same struct, else None."""
+        if isinstance(t, PercpuType) or t is None \
+                or getattr(t, "name", None) not in self.structs:
+            return None
+        vt = self.get_expr_type(value)
+        if isinstance(vt, PercpuType) or getattr(vt, "name", None) != t.name:
+            return None
+        return self.get_type_size(t)
+
+    def _gen_struct_copy(self, target: Expr, value: Expr, size: int) -> None:
+        """`target = value` for a struct: copy its bytes from the
+        source's address to the target's (unrolled up to
+        BULK_UNROLL_MAX, else `rep movsb`)."""
+        if isinstance(value, UnaryExpr) and value.op is UnaryOp.DEREF:
+            self.gen_expr(value.operand)
+        elif isinstance(value, (Identifier, IndexExpr, MemberExpr)):
+            self.gen_addr_of(value)
+        else:
+            span = getattr(value, "span", None)
+            if span is None and isinstance(value, CallExpr):
+                span = value.func.span
+            raise CodeGenError(
+                f"x86: struct assignment needs a variable, field, element "
+                f"or *p source, got {type(value).__name__} "
+                f"(at {_span_location(span)})"
+            )
+        self.emit("    pushq %rax")
+        self.gen_addr_of(target)
+        self.emit("    popq %rcx")
+        self._emit_bulk_copy(size)
+
     # -- statements ---------------------------------------------------------
 
     def _ctor_call_class(self, value: Expr) -> Optional[str]:
@@ -1571,6 +2966,53 @@ class X86CodeGen:
         self.gen_call(synth)
 
     def gen_stmt(self, stmt: Stmt) -> None:
+        """Generate `stmt`. Under -g it starts with its `.loc`, and the
+        enclosing statement's is re-emitted ahead of whatever that one
+        generates next."""
+        if not self.options.debug_info or stmt.span is None:
+            self._gen_stmt(stmt)
+            return
+        outer = self.stmt_loc
+        self._emit_loc(stmt.span)
+        self._gen_stmt(stmt)
+        self.stmt_loc = outer
+        if outer is not None and outer != self.debug_loc:
+            self.loc_pending = outer
+
+    def _emit_loc(self, span: Optional[Span]) -> None:
+        """Start the `.loc` of `span`'s line and column."""
+        if span is None:
+            return
+        number = self.debug_files.setdefault(span.filename,
+                                             len(self.debug_files) + 1)
+        self.stmt_loc = (number, span.start_line, span.start_col)
+        self.loc_pending = None
+        if self.stmt_loc != self.debug_loc:
+            self._emit_loc_line(self.stmt_loc)
+
+    def _emit_loc_line(self, loc: tuple[int, int, int]) -> None:
+        self.loc_pending = None
+        self.debug_loc = loc
+        self.output.append(f"    .loc {loc[0]} {loc[1]} {loc[2]}")
+
+    def _end_debug_function(self) -> None:
+        """Close the function's `.cfi_startproc` and forget its
+        statement context."""
+        if not self.options.debug_info:
+            return
+        self.emit("    .cfi_endproc")
+        self.stmt_loc = None
+        self.loc_pending = None
+
+    def _debug_file_table(self) -> list[str]:
+        """The `.file` directive for each source path a `.loc` uses."""
+        lines = []
+        for path, number in self.debug_files.items():
+            quoted = path.replace("\\", "\\\\").replace('"', '\\"')
+            lines.append(f'    .file {number} "{quoted}"')
+        return lines
+
+    def _gen_stmt(self, stmt: Stmt) -> None:
         match stmt:
             case ExprStmt(expr=expr):
                 self.gen_expr(expr)
@@ -1585,8 +3027,11 @@ class X86CodeGen:
                     # return values, so we can't go through the normal
                     # evaluate-then-store path.
                     cname = self._ctor_call_class(value)
+                    size = self._struct_copy_size(var_type, value)
                     if cname is not None:
                         self._emit_ctor_init(var, cname, value)
+                    elif size is not None:
+                        self._gen_struct_copy(Identifier(name), value, size)
                     else:
                         self.gen_expr(value)
                         # Sized store for sub-8-byte scalar locals so the
@@ -1612,18 +3057,30 @@ class X86CodeGen:
                 self.gen_assignment(target, value, op)
 
             case ReturnStmt(value=value):
+                if self._gen_tail_call(value):
+                    return
                 if value is not None:
                     self.gen_expr(value)
-                # Canary-protected functions route every return through
-                # the shared epilogue label so the check happens exactly
-                # once per function regardless of how many `return`s the
-                # body contains. Plain functions emit leave/ret inline
-                # (preserves the pre-canary asm shape that compiler-test
-                # asm-grepping relies on).
-                if self.ctx is not None and self.ctx.needs_canary:
+                # Inside an inline expansion `return` leaves the
+                # expanded body, not the caller.
+                if self.ctx is not None and self.ctx.inline_stack:
+                    frame = self.ctx.inline_stack[-1]
+                    frame.used = True
+                    self.emit(f"    jmp {frame.exit_label}")
+                    return
+                # Canary-protected and cycles-profiled functions route
+                # every return through the shared epilogue label so the
+                # check / exit hook runs exactly once per function
+                # regardless of how many `return`s the body contains.
+                # Plain functions emit leave/ret inline (preserves the
+                # pre-canary asm shape that compiler-test asm-grepping
+                # relies on).
+                if self.ctx is not None and self.ctx.shared_epilogue:
                     self.emit(f"    jmp {self.ctx.epilogue_label}")
+                elif self.ctx is not None and self.ctx.frameless:
+                    self.emit("    ret")
                 else:
-                    self.emit("    leave")
+                    self._emit_leave()
                     self.emit("    ret")
 
             case IfStmt(condition=cond, then_body=then_body,
@@ -1654,6 +3111,9 @@ class X86CodeGen:
             case PassStmt():
                 self.emit("    # pass")
 
+            case MatchStmt():
+                self.gen_match(stmt)
+
             case _:
                 raise CodeGenError(
                     f"x86: statement {type(stmt).__name__} not yet supported"
@@ -1695,43 +3155,13 @@ class X86CodeGen:
                 self.gen_assignment(target, expanded_value, None)
                 return
 
+            slot = self._percpu_slot(target)
+            if slot is not None and not self._is_aggregate_type(slot[3]):
+                # Per-CPU field / element: `%gs:`-relative both ways.
+                self._gen_percpu_store(slot, value, bin_op)
+                return
+
             if isinstance(target, MemberExpr):
-                # Special-case: Percpu struct field.  Fall through to the
-                # read-modify-write path via address.
-                info = self._percpu_aggregate_info(target.obj)
-                if info is not None:
-                    name, base_offset, base_type = info
-                    if base_type is not None and hasattr(base_type, "name") \
-                            and base_type.name in self.structs:
-                        si = self.structs[base_type.name]
-                        for fname, ftype, foff in si.fields:
-                            if fname == target.member:
-                                if isinstance(ftype, ArrayType):
-                                    raise CodeGenError(
-                                        f"x86: Percpu[{base_type.name}].{fname} "
-                                        f"is an array — compound assignment not "
-                                        f"supported."
-                                    )
-                                size = self.get_type_size(ftype)
-                                abs_off = base_offset + foff
-                                # Load old value.
-                                self._emit_gs_load_sized(size, abs_off, "", "%rax")
-                                self.emit("    pushq %rax")       # old val
-                                self.gen_expr(value)
-                                self.emit("    popq %rcx")        # old val into rcx
-                                # rhs in rax, lhs (old) in rcx — swap to match
-                                # gen_binary convention (right is rax, left is rcx
-                                # after pop).  Here we want lhs OP rhs, so:
-                                # rax = rcx OP rax — call gen_binary helpers
-                                # directly for the arithmetic part.
-                                # Simplest: push rhs, move old into rax, pop into rcx
-                                self.emit("    pushq %rax")       # rhs
-                                self.emit("    movq %rcx, %rax")  # old -> rax
-                                self.emit("    popq %rcx")        # rhs -> rcx
-                                # Now %rax = old (left), %rcx = rhs (right).
-                                self._emit_arith_rax_rcx(bin_op)
-                                self._emit_gs_store_sized(size, abs_off, "", "%rax")
-                                return
                 # Address-based path.
                 self.gen_member_address(target.obj, target.member)
                 self.emit("    pushq %rax")   # save addr
@@ -1748,26 +3178,6 @@ class X86CodeGen:
                 return
 
             if isinstance(target, IndexExpr):
-                # Percpu array path.
-                info = self._percpu_aggregate_info(target.obj)
-                if info is not None and isinstance(info[2], ArrayType):
-                    name, offset, base = info
-                    elem_size = self.get_type_size(base.element_type)
-                    # Compute scaled index, push.
-                    self.gen_expr(target.index)
-                    self._emit_scale_reg("%rax", elem_size)
-                    self.emit("    pushq %rax")   # scaled index
-                    # Load old value from percpu array.
-                    self.emit("    movq %rax, %rcx")
-                    self._emit_gs_load_sized(elem_size, offset, "(%rcx)", "%rax")
-                    self.emit("    pushq %rax")   # old value
-                    self.gen_expr(value)          # rhs -> rax
-                    self.emit("    movq %rax, %rcx")
-                    self.emit("    popq %rax")    # old value -> rax
-                    self._emit_arith_rax_rcx(bin_op)
-                    self.emit("    popq %rcx")    # scaled index -> rcx
-                    self._emit_gs_store_sized(elem_size, offset, "(%rcx)", "%rax")
-                    return
                 # Regular array/pointer index.
                 self.gen_index_address(target)
                 self.emit("    pushq %rax")   # save addr
@@ -1788,6 +3198,11 @@ class X86CodeGen:
                 f"not yet supported"
             )
 
+        size = self._struct_copy_size(self.get_expr_type(target), value)
+        if size is not None:
+            self._gen_struct_copy(target, value, size)
+            return
+
         if isinstance(target, Identifier):
             self.gen_expr(value)
             name = target.name
@@ -1822,31 +3237,13 @@ class X86CodeGen:
                 raise CodeGenError(f"x86: assignment to unknown identifier '{name}'")
             return
 
-        if isinstance(target, MemberExpr):
-            # Special-case Percpu[Struct].field store: %gs:-prefixed.
-            info = self._percpu_aggregate_info(target.obj)
-            if info is not None:
-                name, base_offset, base_type = info
-                if base_type is not None and hasattr(base_type, "name") \
-                        and base_type.name in self.structs:
-                    si = self.structs[base_type.name]
-                    for fname, ftype, foff in si.fields:
-                        if fname == target.member:
-                            if isinstance(ftype, ArrayType):
-                                raise CodeGenError(
-                                    f"x86: Percpu[{base_type.name}].{fname} "
-                                    f"is an array — assigning a whole array "
-                                    f"is not a meaningful operation. Use a "
-                                    f"separate Percpu[Array[N, T]] global "
-                                    f"and assign per-element."
-                                )
-                            size = self.get_type_size(ftype)
-                            self.gen_expr(value)
-                            self._emit_gs_store_sized(
-                                size, base_offset + foff, "", "%rax"
-                            )
-                            return
+        slot = self._percpu_slot(target)
+        if slot is not None and not self._is_aggregate_type(slot[3]):
+            # Per-CPU field / element: `%gs:disp` or `%gs:disp(%rcx)`.
+            self._gen_percpu_store(slot, value)
+            return
 
+        if isinstance(target, MemberExpr):
             # Compute target field address, save, evaluate value, store sized.
             self.gen_member_address(target.obj, target.member)
             self.emit("    pushq %rax")
@@ -1857,23 +3254,6 @@ class X86CodeGen:
             return
 
         if isinstance(target, IndexExpr):
-            # Special-case Percpu[Array[N, T]] indexed STORE: emit a
-            # `%gs:`-prefixed store. gen_index_address would leaq the
-            # symbol's flat-address copy and lose the per-CPU base.
-            info = self._percpu_aggregate_info(target.obj)
-            if info is not None and isinstance(info[2], ArrayType):
-                name, offset, base = info
-                elem_size = self.get_type_size(base.element_type)
-                # %rcx = index * elem_size; preserve over value-eval.
-                self.gen_expr(target.index)
-                self._emit_scale_reg("%rax", elem_size)
-                self.emit("    pushq %rax")
-                self.gen_expr(value)
-                self.emit("    popq %rcx")
-                # Now %rax holds the value, %rcx the scaled index.
-                self._emit_gs_store_sized(elem_size, offset, "(%rcx)", "%rax")
-                return
-
             # arr[i] = value : compute element address, save, eval value, store
             self.gen_index_address(target)
             self.emit("    pushq %rax")
@@ -1890,60 +3270,409 @@ class X86CodeGen:
     def gen_if(self, cond: Expr, then_body: list[Stmt],
                elifs: list[tuple[Expr, list[Stmt]]],
                else_body: Optional[list[Stmt]]) -> None:
+        chain = self._switch_chain(cond, then_body, elifs)
+        if chain is not None:
+            scrutinee, arms = chain
+            self.gen_expr(scrutinee)
+            self._gen_switch(arms, else_body or None,
+                             self._is_unsigned_type(
+                                 self.get_expr_type(scrutinee)) is True)
+            return
+
         end_label = self.ctx.new_label("endif")
         else_label = self.ctx.new_label("else")
-
-        self.gen_expr(cond)
-        self.emit("    testq %rax, %rax")
-        if elifs or else_body:
-            self.emit(f"    jz {else_label}")
-        else:
-            self.emit(f"    jz {end_label}")
-
-        for s in then_body:
-            self.gen_stmt(s)
-        self.emit(f"    jmp {end_label}")
-
-        for i, (elif_cond, elif_body) in enumerate(elifs):
-            self.emit(f"{else_label}:")
-            else_label = self.ctx.new_label("else")
-            self.gen_expr(elif_cond)
+        arms = [(cond, then_body)] + list(elifs)
+        # After a `likely` last test the else is the rare way out.
+        cold_else = None
+        if else_body and self._branch_is_cold(
+                "unlikely" if self._branch_hint(arms[-1][0])[1] == "likely"
+                else None, else_body):
+            cold_else = self.ctx.new_label("unlikely")
+
+        for i, (arm_cond, arm_body) in enumerate(arms):
+            if i:
+                self.emit(f"{else_label}:")
+                else_label = self.ctx.new_label("else")
+            if i == len(arms) - 1 and cold_else is not None:
+                else_label = cold_else
+            arm_cond, hint = self._branch_hint(arm_cond)
+            self.gen_expr(arm_cond)
             self.emit("    testq %rax, %rax")
-            if i < len(elifs) - 1 or else_body:
+            last_cold = self._branch_is_cold(hint, arm_body)
+            if last_cold:
+                # Taken rarely: the test falls through to the next arm
+                # and the body lives out of line.
+                cold_label = self.ctx.new_label("unlikely")
+                self.emit(f"    jnz {cold_label}")
+                self._gen_cold_block(cold_label, arm_body, end_label)
+                continue
+            if i < len(arms) - 1 or else_body:
                 self.emit(f"    jz {else_label}")
             else:
                 self.emit(f"    jz {end_label}")
-            for s in elif_body:
+            for s in arm_body:
                 self.gen_stmt(s)
             self.emit(f"    jmp {end_label}")
 
-        if else_body:
+        if cold_else is not None:
+            if last_cold:
+                self.emit(f"    jmp {cold_else}")
+            self._gen_cold_block(cold_else, else_body, end_label)
+        elif else_body:
             self.emit(f"{else_label}:")
             for s in else_body:
                 self.gen_stmt(s)
 
         self.emit(f"{end_label}:")
 
-    def gen_while(self, cond: Expr, body: list[Stmt]) -> None:
-        start_label = self.ctx.new_label("while")
-        end_label = self.ctx.new_label("endwhile")
-        self.ctx.push_loop(start_label, end_label)
-
-        self.emit(f"{start_label}:")
-        self.gen_expr(cond)
-        self.emit("    testq %rax, %rax")
-        self.emit(f"    jz {end_label}")
+    def _branch_hint(self, cond: Expr) -> tuple[Expr, Optional[str]]:
+        """Peel a `likely(c)` / `unlikely(c)` off a branch condition:
+        (c, "likely" / "unlikely"), or (cond, None) without one."""
+        if isinstance(cond, CallExpr) and isinstance(cond.func, Identifier) \
+                and cond.func.name in X86_HINT_INTRINSICS \
+                and len(cond.args) == 1 and not cond.kwargs \
+                and self._is_soft_intrinsic(cond.func.name):
+            return cond.args[0], cond.func.name
+        return cond, None
+
+    def _branch_is_cold(self, hint: Optional[str],
+                        body: list[Stmt]) -> bool:
+        """True if a branch to `body` should be laid out out of line:
+        its test is `unlikely(...)`, or, unhinted, the body itself calls
+        a cold function (`@cold`, or a STACK_PROTECTOR_SKIP_PREFIXES
+        panic path). Never inside a function that is cold as a whole."""
+        if hint == "likely" or self._function_heat(self.ctx.name) == "cold":
+            return False
+        if hint == "unlikely":
+            return True
+        for s in body:
+            call = s.expr if isinstance(s, ExprStmt) else \
+                s.value if isinstance(s, ReturnStmt) else None
+            if not isinstance(call, CallExpr) \
+                    or not isinstance(call.func, Identifier):
+                continue
+            name = call.func.name
+            if name in self.ctx.locals:
+                continue
+            if self.function_heat.get(name) == "cold" or (
+                    name in self.extern_funcs
+                    and name.startswith(STACK_PROTECTOR_SKIP_PREFIXES)):
+                return True
+        return False
 
+    def _gen_cold_block(self, label: str, body: list[Stmt],
+                        resume: str) -> None:
+        """Emit `label: body; jmp resume` into TEXT_UNLIKELY_SECTION. The
+        first such block of a function starts the local `<name>.cold`
+        function symbol, closed by _end_cold_blocks."""
+        self.emit(f'    .pushsection {TEXT_UNLIKELY_SECTION}, "ax", '
+                  f'@progbits')
+        if not self.ctx.cold_blocks:
+            self.emit(f"    .type {self.ctx.name}.cold, @function")
+            self.emit(f"{self.ctx.name}.cold:")
+        self.ctx.cold_blocks += 1
+        self.emit(f"{label}:")
         for s in body:
             self.gen_stmt(s)
+        if not (body and isinstance(body[-1], (ReturnStmt, BreakStmt,
+                                               ContinueStmt))):
+            self.emit(f"    jmp {resume}")
+        self.emit("    .popsection")
+
+    def _end_cold_blocks(self) -> None:
+        """Size the `<name>.cold` symbol: its blocks are contiguous in
+        TEXT_UNLIKELY_SECTION, since nothing else is emitted there while
+        one function is generated."""
+        if not self.ctx.cold_blocks:
+            return
+        sym = f"{self.ctx.name}.cold"
+        self.emit(f'    .pushsection {TEXT_UNLIKELY_SECTION}, "ax", '
+                  f'@progbits')
+        self.emit(f"    .size {sym}, .-{sym}")
+        self.emit("    .popsection")
+
+    # -- integer dispatch -----------------------------------------------------
+
+    def gen_match(self, stmt: MatchStmt) -> None:
+        """`match x:` over an integer scrutinee. Each `case` lists value
+        patterns (`1 | 2`, `-1`, `'a'`, or an UPPER_CASE constant
+        global); `case _:` is the default and must come last. The
+        scrutinee is evaluated once and dispatched by _gen_switch; no
+        arm falls through to the next."""
+        where = _span_location(stmt.span)
+        t = self.get_expr_type(stmt.expr)
+        if self._is_aggregate_type(t):
+            raise CodeGenError(
+                f"x86: match on a {t.name if hasattr(t, 'name') else 'Array'}"
+                f" value is not supported (integer scrutinees only) at "
+                f"{where}"
+            )
+        arms: list[tuple[list[int], list[Stmt]]] = []
+        default: Optional[list[Stmt]] = None
+        for i, arm in enumerate(stmt.arms):
+            if default is not None:
+                raise CodeGenError(
+                    f"x86: match arm after `case _:` is unreachable at "
+                    f"{_span_location(arm.span or arm.pattern.span)}"
+                )
+            values = self._pattern_values(arm.pattern)
+            if values is None:
+                default = arm.body
+            else:
+                arms.append((values, arm.body))
+        self.gen_expr(stmt.expr)
+        self._gen_switch(arms, default, self._is_unsigned_type(t) is True)
 
-        self.emit(f"    jmp {start_label}")
-        self.emit(f"{end_label}:")
-        self.ctx.pop_loop()
+    def _pattern_values(self, pattern: Pattern) -> Optional[list[int]]:
+        """The integer values a `case` pattern matches; None for `_`."""
+        if pattern.name == "_":
+            return None
+        where = _span_location(pattern.span)
+        if pattern.bindings or (not pattern.values
+                                and pattern.name in ("None", "Some")):
+            raise CodeGenError(
+                f"x86: match pattern {pattern.name}"
+                f"({', '.join(pattern.bindings)}) is not supported "
+                f"(integer value patterns only) at {where}"
+            )
+        exprs = pattern.values or [Identifier(pattern.name, pattern.span)]
+        values = []
+        for expr in exprs:
+            value = self._constant_int(expr)
+            if value is None:
+                name = getattr(expr, "name", type(expr).__name__)
+                raise CodeGenError(
+                    f"x86: match pattern {name} is not a compile-time "
+                    f"integer constant at {where}"
+                )
+            values.append(value)
+        return values
+
+    def _constant_int(self, expr: Expr) -> Optional[int]:
+        """Compile-time value of a case label or static initialiser
+        element: an integer / char / bool literal (optionally negated),
+        a scalar Final global, or an UPPER_CASE global initialised with
+        a literal and never assigned or address-taken."""
+        if isinstance(expr, CharLiteral):
+            return ord(expr.value)
+        if isinstance(expr, BoolLiteral):
+            return int(expr.value)
+        if isinstance(expr, Identifier):
+            value = self._const_int_value(expr)
+            if value is not None:
+                return value
+            return self._constant_globals().get(expr.name)
+        return self._const_int_value(expr)
+
+    def _constant_globals(self) -> dict[str, int]:
+        """UPPER_CASE globals whose literal initialiser is their value
+        for the whole program. Computed on first use."""
+        if self.constant_globals is not None:
+            return self.constant_globals
+        inits: dict[str, int] = {}
+        bodies: list = []
+        for decl in self.program.declarations:
+            if isinstance(decl, VarDecl):
+                name = decl.orig_name or decl.name
+                value = (self._const_int_value(decl.value)
+                         if decl.value is not None else None)
+                if value is not None and name.isupper() \
+                        and not isinstance(decl.var_type, PercpuType):
+                    inits[decl.name] = value
+            elif isinstance(decl, FunctionDef):
+                bodies.append(decl.body)
+            elif isinstance(decl, ClassDef):
+                bodies.extend(m.body for m in decl.methods)
+        for node in iter_nodes(bodies):
+            if isinstance(node, Assignment) \
+                    and isinstance(node.target, Identifier):
+                inits.pop(node.target.name, None)
+            elif isinstance(node, UnaryExpr) and node.op is UnaryOp.ADDR \
+                    and isinstance(node.operand, Identifier):
+                inits.pop(node.operand.name, None)
+        self.constant_globals = inits
+        return inits
+
+    def _switch_chain(self, cond: Expr, then_body: list[Stmt],
+                      elifs: list[tuple[Expr, list[Stmt]]]
+                      ) -> Optional[tuple[Identifier,
+                                          list[tuple[list[int],
+                                                     list[Stmt]]]]]:
+        """Recognise `if x == C1: ... elif x == C2 or x == C3: ...` over a
+        single scalar variable with at least SWITCH_MIN_CASES constant
+        labels in all. Returns (x, arms) for _gen_switch, or None. The
+        variable is read once instead of once per test — no arm body
+        runs between the tests, so that is the same value."""
+        if not elifs:
+            return None
+        scrutinee: Optional[Identifier] = None
+        arms = []
+        for test, body in [(cond, then_body)] + list(elifs):
+            values = []
+            for term in self._or_terms(test):
+                if not (isinstance(term, BinaryExpr)
+                        and term.op is BinOp.EQ):
+                    return None
+                for var, const in ((term.left, term.right),
+                                   (term.right, term.left)):
+                    value = self._constant_int(const)
+                    if isinstance(var, Identifier) and value is not None:
+                        break
+                else:
+                    return None
+                if scrutinee is None:
+                    if self._is_aggregate_type(self.get_expr_type(var)) \
+                            or var.name in self.defined_funcs \
+                            or var.name in self.extern_funcs:
+                        return None
+                    scrutinee = var
+                elif var.name != scrutinee.name:
+                    return None
+                values.append(value)
+            arms.append((values, body))
+        if sum(len(values) for values, _ in arms) < SWITCH_MIN_CASES:
+            return None
+        return scrutinee, arms
 
-    def gen_do_while(self, body: list[Stmt], cond: Expr) -> None:
-        # do-body-while-cond: execute body unconditionally first, then
-        # test. Lowered as:
+    @staticmethod
+    def _or_terms(expr: Expr) -> list[Expr]:
+        if isinstance(expr, BinaryExpr) and expr.op is BinOp.OR:
+            return (X86CodeGen._or_terms(expr.left)
+                    + X86CodeGen._or_terms(expr.right))
+        return [expr]
+
+    def _gen_switch(self, arms: list[tuple[list[int], list[Stmt]]],
+                    default: Optional[list[Stmt]], unsigned: bool) -> None:
+        """Dispatch on the value in %rax: jump to the first arm listing
+        it, else to `default` (or past the whole switch)."""
+        end_label = self.ctx.new_label("endswitch")
+        default_label = (self.ctx.new_label("switch_default")
+                         if default is not None else end_label)
+        labels = [self.ctx.new_label("case") for _ in arms]
+
+        # Compare domain: 64-bit two's complement, ordered as the
+        # scrutinee's signedness orders it. The first arm naming a
+        # value wins, as in the if/elif chain it replaces.
+        targets: dict[int, str] = {}
+        for (values, _), label in zip(arms, labels):
+            for v in values:
+                v &= (1 << 64) - 1
+                if not unsigned and v >= 1 << 63:
+                    v -= 1 << 64
+                targets.setdefault(v, label)
+        cases = sorted(targets.items())
+        self._emit_switch_search(cases, default_label, unsigned)
+
+        blocks = [(label, body) for label, (_, body) in zip(labels, arms)]
+        if default is not None:
+            blocks.append((default_label, default))
+        for label, body in blocks:
+            self.emit(f"{label}:")
+            for s in body:
+                self.gen_stmt(s)
+            if not (body and isinstance(body[-1], (ReturnStmt, BreakStmt,
+                                                   ContinueStmt))):
+                self.emit(f"    jmp {end_label}")
+        self.emit(f"{end_label}:")
+
+    def _emit_switch_search(self, cases: list[tuple[int, str]],
+                            default_label: str, unsigned: bool) -> None:
+        """Binary search over sorted (value, label) `cases`; a dense run
+        becomes a jump table, a short one a row of compares."""
+        if not cases:
+            self.emit(f"    jmp {default_label}")
+            return
+        lo, hi = cases[0][0], cases[-1][0]
+        span = hi - lo + 1
+        if (self.options.jump_tables
+                and len(cases) >= JUMP_TABLE_MIN_CASES
+                and span <= JUMP_TABLE_DENSITY * len(cases)
+                and span <= JUMP_TABLE_MAX_SPAN):
+            self._emit_jump_table(cases, default_label)
+            return
+        if len(cases) <= SWITCH_LINEAR_MAX:
+            for value, label in cases:
+                self._emit_cmp_rax_imm(value)
+                self.emit(f"    je {label}")
+            self.emit(f"    jmp {default_label}")
+            return
+        mid = len(cases) // 2
+        value, label = cases[mid]
+        left_label = self.ctx.new_label("switch_lt")
+        self._emit_cmp_rax_imm(value)
+        self.emit(f"    je {label}")
+        self.emit(f"    {'jb' if unsigned else 'jl'} {left_label}")
+        self._emit_switch_search(cases[mid + 1:], default_label, unsigned)
+        self.emit(f"{left_label}:")
+        self._emit_switch_search(cases[:mid], default_label, unsigned)
+
+    def _emit_jump_table(self, cases: list[tuple[int, str]],
+                         default_label: str) -> None:
+        """Index a table of 32-bit label offsets relative to the table
+        (position-independent, no relocations in .rodata) by
+        `%rax - lo`; the unsigned range check also catches values
+        below `lo`."""
+        lo, hi = cases[0][0], cases[-1][0]
+        table = self.ctx.new_label("jumptable")
+        if lo != 0:
+            if self._imm32(-lo) is not None and lo < 0:
+                self.emit(f"    addq ${-lo}, %rax")
+            elif self._imm32(lo) is not None:
+                self.emit(f"    subq ${lo}, %rax")
+            else:
+                self.emit(f"    movabsq ${lo}, %rcx")
+                self.emit("    subq %rcx, %rax")
+        self.emit(f"    cmpq ${hi - lo}, %rax")
+        self.emit(f"    ja {default_label}")
+        self.emit(f"    leaq {table}(%rip), %rcx")
+        self.emit("    movslq (%rcx,%rax,4), %rdx")
+        self.emit("    addq %rdx, %rcx")
+        self.emit("    jmp *%rcx")
+        slots = dict(cases)
+        self.emit("    .pushsection .rodata")
+        self.emit("    .balign 4")
+        self.emit(f"{table}:")
+        for v in range(lo, hi + 1):
+            self.emit(f"    .long {slots.get(v, default_label)} - {table}")
+        self.emit("    .popsection")
+
+    def _emit_cmp_rax_imm(self, value: int) -> None:
+        if self._imm32(value) is not None:
+            self.emit(f"    cmpq ${value}, %rax")
+        else:
+            self.emit(f"    movabsq ${value}, %rcx")
+            self.emit("    cmpq %rcx, %rax")
+
+    def gen_while(self, cond: Expr, body: list[Stmt]) -> None:
+        start_label = self.ctx.new_label("while")
+        end_label = self.ctx.new_label("endwhile")
+        self.ctx.push_loop(start_label, end_label)
+
+        self.emit(f"{start_label}:")
+        cond, hint = self._branch_hint(cond)
+        self.gen_expr(cond)
+        self.emit("    testq %rax, %rax")
+        if hint == "unlikely" and self._branch_is_cold(hint, body):
+            # `while unlikely(c)`: the loop is rarely entered, so the
+            # body lives out of line and the test falls through.
+            cold_label = self.ctx.new_label("unlikely")
+            self.emit(f"    jnz {cold_label}")
+            self._gen_cold_block(cold_label, body, start_label)
+            self.emit(f"{end_label}:")
+            self.ctx.pop_loop()
+            return
+        self.emit(f"    jz {end_label}")
+
+        for s in body:
+            self.gen_stmt(s)
+
+        self.emit(f"    jmp {start_label}")
+        self.emit(f"{end_label}:")
+        self.ctx.pop_loop()
+
+    def gen_do_while(self, body: list[Stmt], cond: Expr) -> None:
+        # do-body-while-cond: execute body unconditionally first, then
+        # test. Lowered as:
         #   start:  <body>
         #   cont:   <eval cond -> rax>
         #           testq %rax, %rax
@@ -1973,15 +3702,29 @@ class X86CodeGen:
                 and isinstance(expr.func, Identifier)
                 and expr.func.name == "range")
 
+    def _normalize_int(self, value: int, t: Optional[Type]) -> int:
+        """`value` as a load of a `t`-typed slot holding it would see:
+        truncated to the type's width, then sign- or zero-extended."""
+        bits = 8 * self.get_type_size(t)
+        value &= (1 << bits) - 1
+        if self._is_unsigned_type(t) is False and value >> (bits - 1):
+            value -= 1 << bits
+        return value
+
     def _const_int_value(self, expr: Expr) -> Optional[int]:
         """Compile-time integer value of `expr`, or None if non-constant.
 
-        Handles a bare `IntLiteral` and the `UnaryExpr(NEG, IntLiteral)`
-        the parser produces for a negative literal like `-1`. Used to
-        decide a constant range() step's loop direction at compile
-        time."""
+        Handles a bare `IntLiteral`, the `UnaryExpr(NEG, IntLiteral)`
+        the parser produces for a negative literal like `-1`, and a
+        scalar `Final` global not shadowed by a local. Used to decide a
+        constant range() step's loop direction at compile time, and
+        wherever an immediate operand beats a register."""
         if isinstance(expr, IntLiteral):
             return expr.value
+        if isinstance(expr, Identifier):
+            if self.ctx is not None and expr.name in self.ctx.locals:
+                return None
+            return self.final_values.get(expr.name)
         if isinstance(expr, UnaryExpr) and expr.op is UnaryOp.NEG:
             inner = self._const_int_value(expr.operand)
             return None if inner is None else -inner
@@ -2023,7 +3766,14 @@ class X86CodeGen:
 
     def gen_for_range(self, var: str, call: "CallExpr",
                       body: list[Stmt]) -> None:
-        """`for var in range(...)` — integer counter loop."""
+        """`for var in range(...)` — integer counter loop.
+
+        `start`, `stop` and `step` are evaluated once, before the first
+        iteration, as in Python; a constant bound or step that fits an
+        imm32 is folded into the compare / add. The counter and any
+        hoisted bound or step live in registers while LOOP_REGS has free
+        ones, and the loop is bottom-tested, so an iteration costs the
+        body plus one add, one `cmp` and one `jcc`."""
         args = call.args
         if len(args) == 1:
             start_expr: Expr = IntLiteral(0)
@@ -2058,89 +3808,217 @@ class X86CodeGen:
         if const_step == 0:
             raise CodeGenError("x86: range() step must not be zero")
         descending = const_step is not None and const_step < 0
-        cmp_op = BinOp.GT if descending else BinOp.LT
-
-        var_id = Identifier(var)
-        loop_var = self.ctx.alloc_local(
-            var, self.get_type_size(loop_type), loop_type
-        )
 
-        start_label = self.ctx.new_label("for")
-        step_label = self.ctx.new_label("for_step")
-        end_label = self.ctx.new_label("endfor")
-
-        # i = start
-        self.gen_expr(start_expr)
-        self._emit_local_store(loop_var, "%rax")
-
-        self.ctx.push_loop(start_label, end_label, continue_label=step_label)
-        self.emit(f"{start_label}:")
-        # while (i </> stop)
-        self.gen_expr(BinaryExpr(cmp_op, var_id, stop_expr))
-        self.emit("    testq %rax, %rax")
-        self.emit(f"    jz {end_label}")
+        const_start = self._const_int_value(start_expr)
+        const_stop = self._const_int_value(stop_expr)
+        if None not in (const_start, const_stop, const_step):
+            trips = range(const_start, const_stop, const_step)
+            if self._can_unroll(var, len(trips), body):
+                loop_var = self.ctx.alloc_local(
+                    var, self.get_type_size(loop_type), loop_type
+                )
+                for value in trips:
+                    self.gen_expr(IntLiteral(value))
+                    self._emit_local_store(loop_var, "%rax")
+                    for s in body:
+                        self.gen_stmt(s)
+                return
 
-        for s in body:
-            self.gen_stmt(s)
+        stop_imm = self._imm32(const_stop)
+        step_imm = self._imm32(const_step)
+        operands = [start_expr]
+        if stop_imm is None:
+            operands.append(stop_expr)
+        if step_imm is None:
+            operands.append(step_expr)
+        # Evaluate every operand before binding `var`, so a `range(i,
+        # i + 4)` over an outer `i` still reads the outer one.
+        for i, expr in enumerate(operands):
+            if i:
+                self.emit("    pushq %rax")
+            self.gen_expr(expr)
 
-        # i = i + step  (continue lands here)
-        self.emit(f"{step_label}:")
-        self.gen_assignment(var_id, BinaryExpr(BinOp.ADD, var_id, step_expr),
-                            None)
-        self.emit(f"    jmp {start_label}")
-        self.emit(f"{end_label}:")
-        self.ctx.pop_loop()
+        serial = self.ctx.label_counter
+        loop_var = self.ctx.alloc_loop_local(
+            var, self.get_type_size(loop_type), loop_type
+        )
+        homes = [loop_var]
+        stop_var = step_var = None
+        if stop_imm is None:
+            stop_var = self.ctx.alloc_loop_local(f"__for_stop_{serial}")
+            homes.append(stop_var)
+        if step_imm is None:
+            step_var = self.ctx.alloc_loop_local(f"__for_step_{serial}")
+            homes.append(step_var)
+        for i, home in enumerate(reversed(homes)):
+            if i:
+                self.emit("    popq %rax")
+            self._emit_local_store(home, "%rax")
+
+        cc = self._rel_cc("g" if descending else "l", Identifier(var),
+                          stop_expr)
+        self._gen_counted_loop(
+            loop_var, stop_var, stop_imm, step_var, step_imm, cc, body,
+            prefix="for",
+        )
+        for hidden in (stop_var, step_var):
+            if hidden is not None:
+                self.ctx.release_loop_local(hidden)
+        self._spill_loop_var(loop_var)
 
     def gen_for_array(self, var: str, iterable: Expr, arr_type: ArrayType,
                       body: list[Stmt]) -> None:
         """`for var in arr` over a fixed-size `Array[N, T]`.
 
-        Lowered with a hidden index counter walking 0..N-1; the loop
-        variable is re-bound to `arr[idx]` at the top of each iteration.
-        The loop variable is a private copy of the element (assigning to
-        it inside the body does NOT write back into the array), matching
-        Python's by-value binding for scalar element types."""
+        Lowered with a hidden index counter walking 0..N-1 (the same
+        bottom-tested, register-counter loop as gen_for_range, bound N
+        as an immediate); the loop variable is re-bound to `arr[idx]` at
+        the top of each iteration. The loop variable is a private copy
+        of the element (assigning to it inside the body does NOT write
+        back into the array), matching Python's by-value binding for
+        scalar element types."""
         n = arr_type.size
         elem_type = arr_type.element_type
 
+        if self._can_unroll(var, n, body):
+            loop_var = self.ctx.alloc_local(
+                var, self.get_type_size(elem_type), elem_type
+            )
+            for k in range(n):
+                self.gen_expr(IndexExpr(iterable, IntLiteral(k)))
+                self._emit_local_store(loop_var, "%rax")
+                for s in body:
+                    self.gen_stmt(s)
+            return
+
         idx_name = f"__for_idx_{self.ctx.label_counter}"
-        idx_var = self.ctx.alloc_local(idx_name, 8, Type("int64"))
+        idx_var = self.ctx.alloc_loop_local(idx_name, 8, Type("int64"))
         idx_id = Identifier(idx_name)
 
         loop_var = self.ctx.alloc_local(
             var, self.get_type_size(elem_type), elem_type
         )
 
-        start_label = self.ctx.new_label("forarr")
-        step_label = self.ctx.new_label("forarr_step")
-        end_label = self.ctx.new_label("endforarr")
-
         # idx = 0
         self.emit("    movq $0, %rax")
         self._emit_local_store(idx_var, "%rax")
 
-        self.ctx.push_loop(start_label, end_label, continue_label=step_label)
-        self.emit(f"{start_label}:")
-        # while (idx < n)
-        self.gen_expr(BinaryExpr(BinOp.LT, idx_id, IntLiteral(n)))
-        self.emit("    testq %rax, %rax")
-        self.emit(f"    jz {end_label}")
-
-        # var = arr[idx]
-        self.gen_expr(IndexExpr(iterable, idx_id))
-        self._emit_local_store(loop_var, "%rax")
-
+        self._gen_counted_loop(
+            idx_var, None, n, None, 1, "l", body, prefix="forarr",
+            bind=(loop_var, IndexExpr(iterable, idx_id)),
+        )
+        self.ctx.release_loop_local(idx_var)
+
+    def _gen_counted_loop(self, counter: LocalVar,
+                          stop_var: Optional[LocalVar],
+                          stop_imm: Optional[int],
+                          step_var: Optional[LocalVar],
+                          step_imm: Optional[int], cc: str,
+                          body: list[Stmt], prefix: str,
+                          bind: Optional[tuple[LocalVar, Expr]] = None
+                          ) -> None:
+        """Bottom-tested loop over an initialised `counter`:
+
+                jmp  test
+            body:
+                <bind: var = expr>
+                <body>
+            step:                       (continue lands here)
+                counter += step
+            test:
+                cmpq stop, counter
+                j<cc> body
+            end:                        (break lands here)
+        """
+        body_label = self.ctx.new_label(prefix)
+        step_label = self.ctx.new_label(f"{prefix}_step")
+        test_label = self.ctx.new_label(f"{prefix}_test")
+        end_label = self.ctx.new_label(f"end{prefix}")
+
+        self.emit(f"    jmp {test_label}")
+        self.ctx.push_loop(body_label, end_label, continue_label=step_label)
+        self.emit(f"{body_label}:")
+        if bind is not None:
+            self.gen_expr(bind[1])
+            self._emit_local_store(bind[0], "%rax")
         for s in body:
             self.gen_stmt(s)
 
-        # idx = idx + 1  (continue lands here)
         self.emit(f"{step_label}:")
-        self.gen_assignment(idx_id, BinaryExpr(BinOp.ADD, idx_id,
-                                               IntLiteral(1)), None)
-        self.emit(f"    jmp {start_label}")
+        if step_imm is not None:
+            step = f"${step_imm}"
+        elif step_var.reg is not None:
+            step = step_var.reg
+        else:
+            self._emit_local_load(step_var, "%rcx")
+            step = "%rcx"
+        if counter.reg is not None \
+                and self._scalar_local_size(counter) is None:
+            self.emit(f"    addq {step}, {counter.reg}")
+        else:
+            self._emit_local_load(counter, "%rax")
+            self.emit(f"    addq {step}, %rax")
+            self._emit_local_store(counter, "%rax")
+
+        self.emit(f"{test_label}:")
+        if counter.reg is not None:
+            current = counter.reg
+        else:
+            self._emit_local_load(counter, "%rax")
+            current = "%rax"
+        if stop_imm is not None:
+            bound = f"${stop_imm}"
+        elif stop_var.reg is not None:
+            bound = stop_var.reg
+        else:
+            self._emit_local_load(stop_var, "%rcx")
+            bound = "%rcx"
+        self.emit(f"    cmpq {bound}, {current}")
+        self.emit(f"    j{cc} {body_label}")
         self.emit(f"{end_label}:")
         self.ctx.pop_loop()
 
+    def _spill_loop_var(self, var: LocalVar) -> None:
+        """A counter homed in a LOOP_REGS register keeps its last value
+        after the loop (Python semantics) in a fresh stack slot, and the
+        register goes back to the pool."""
+        if var.reg not in LOOP_REGS:
+            return
+        slot = self.ctx.alloc_local(var.name, var.size, var.var_type)
+        self._emit_local_store(slot, var.reg)
+        self.ctx.release_loop_local(var)
+
+    def _can_unroll(self, var: str, trips: int, body: list[Stmt]) -> bool:
+        """True if a loop with a constant trip count should be emitted as
+        `trips` straight-line copies of its body. The body must not
+        `break` / `continue`, declare locals or nest another `for` (each
+        copy would get its own slots), nor assign the loop variable.
+        The limits follow the function's heat (_function_heat)."""
+        heat = self._function_heat(self.ctx.name)
+        if not self.options.unroll or heat == "cold":
+            return False
+        scale = PROFILE_HOT_UNROLL_SCALE if heat == "hot" else 1
+        if trips > UNROLL_MAX_TRIPS * scale:
+            return False
+        if trips * node_size(body) > UNROLL_BUDGET * scale:
+            return False
+        for node in iter_nodes(body):
+            if isinstance(node, (BreakStmt, ContinueStmt, VarDecl,
+                                 ForStmt, ForUnpackStmt)):
+                return False
+            if isinstance(node, Assignment) \
+                    and isinstance(node.target, Identifier) \
+                    and node.target.name == var:
+                return False
+        return True
+
+    @staticmethod
+    def _imm32(value: Optional[int]) -> Optional[int]:
+        """`value` if it is a constant that fits a sign-extended imm32."""
+        if value is not None and -(1 << 31) <= value < (1 << 31):
+            return value
+        return None
+
     # -- expressions --------------------------------------------------------
 
     def gen_expr(self, expr: Expr) -> None:
@@ -2224,16 +4102,13 @@ class X86CodeGen:
                     raise CodeGenError(
                         f"x86: container_of: unknown struct '{tn}'"
                     )
-                off = None
-                for fname, _, fo in si.fields:
-                    if fname == fn:
-                        off = fo
-                        break
-                if off is None:
+                hit = si.lookup(fn)
+                if hit is None:
                     raise CodeGenError(
                         f"x86: container_of: struct '{tn}' has no "
                         f"field '{fn}'"
                     )
+                off = hit[1]
                 self.gen_expr(inner)
                 if off:
                     self.emit(f"    subq ${off}, %rax")
@@ -2282,41 +4157,33 @@ class X86CodeGen:
                 # locals — preserves the historical behaviour for
                 # everything that wasn't broken.
                 self._emit_local_load(var, "%rax")
+        elif name in self.final_values:
+            # Scalar Final global: the value is known, skip the load.
+            value = self.final_values[name]
+            if -(1 << 31) <= value < (1 << 31):
+                self.emit(f"    movq ${value}, %rax")
+            else:
+                self.emit(f"    movabsq ${value}, %rax")
         elif name in self.defined_funcs or name in self.extern_funcs:
             # Function reference: load the symbol's address (RIP-relative).
+            self.symbol_refs[name] += 1
             self.emit(f"    leaq {name}(%rip), %rax")
         elif name in self.global_var_types:
             if name in self.percpu_globals:
                 # Per-CPU scalar: literal `%gs:offset` displacement. No
                 # symbol relocation involved — the encoder writes the
-                # 32-bit imm directly into the instruction. Aggregates
-                # are not yet supported (would need `&%gs:offset` which
-                # x86 can't compute in a single instruction).
-                t = self.global_var_types[name]
-                base = t.base_type if isinstance(t, PercpuType) else t
-                if isinstance(base, ArrayType) or (
-                    base is not None and hasattr(base, "name")
-                    and base.name in self.structs
-                ):
-                    raise CodeGenError(
-                        f"x86: Percpu[{base.name}] aggregate access not "
-                        f"yet supported (variable '{name}')"
-                    )
-                size = self.get_type_size(base)
-                offset = self.percpu_offsets[name]
-                if size == 8:
-                    self.emit(f"    movq %gs:{offset}, %rax")
-                elif size == 4:
-                    self.emit(f"    movl %gs:{offset}, %eax")
-                elif size == 2:
-                    self.emit(f"    movzwq %gs:{offset}, %rax")
-                elif size == 1:
-                    self.emit(f"    movzbq %gs:{offset}, %rax")
+                # 32-bit imm directly into the instruction. An aggregate
+                # decays to this CPU's address of it, like any other
+                # array / struct global.
+                slot = (self.percpu_offsets[name], None, 1,
+                        self.global_var_types[name].base_type)
+                if self._is_aggregate_type(slot[3]):
+                    self._gen_percpu_address(slot)
                 else:
-                    raise CodeGenError(
-                        f"x86: Percpu base size {size} not supported "
-                        f"(variable '{name}')"
-                    )
+                    # Sign-extend signed scalars, as for locals: the
+                    # slot holds only the type's bytes.
+                    self._gen_percpu_load(
+                        slot, self._is_unsigned_type(slot[3]) is False)
                 return
             t = self.global_var_types[name]
             is_aggregate = (
@@ -2533,6 +4400,13 @@ class X86CodeGen:
             self.gen_chained_compare(chain)
             return
 
+        # `*`, `//`, `%` by a compile-time constant: strength-reduce to
+        # shifts / masks / lea / magic-reciprocal multiplies instead of
+        # the generic imulq / divq / idivq sequence.
+        if op in (BinOp.MUL, BinOp.DIV, BinOp.IDIV, BinOp.MOD):
+            if self._gen_binary_const(op, left, right):
+                return
+
         # Evaluate right first, push, then left. After pop, %rax = left,
         # %rcx = right. This mirrors codegen_arm's stack-machine style.
         self.gen_expr(right)
@@ -2702,33 +4576,111 @@ class X86CodeGen:
             }[signed_cc]
         return signed_cc
 
-    def _percpu_aggregate_info(self, obj: Expr) -> Optional[tuple]:
-        """If `obj` is a bare Identifier naming a Percpu[Array]/Percpu[struct]
-        global, return `(name, offset, base_type)` where `base_type` is the
-        ArrayType / struct Type wrapped by the PercpuType. Else None.
+    def _percpu_slot(self, expr: Expr) -> Optional[tuple]:
+        """If `expr` is a Percpu global or a member / index chain into
+        one (`rq.nr_running`, `mags[cpu_mag].count`, `grid[2][j]`),
+        return `(disp, index, scale, type)`: the place is
+        `%gs:disp + index * scale`, with constant indices and field
+        offsets folded into `disp` and `index` the one non-constant
+        index expression (or None). Else None — including chains
+        through a pointer or with a second variable index, which go
+        through the `%gs:0` self pointer in gen_addr_of instead.
+
+        Used by every load / store / address path so that accesses to
+        per-CPU storage stay `%gs:`-relative instead of decaying to
+        `leaq sym(%rip)` (which would erase the per-CPU base and
+        silently hit the master template)."""
+        if isinstance(expr, Identifier):
+            name = expr.name
+            if name not in self.percpu_globals or (
+                    self.ctx is not None and name in self.ctx.locals):
+                return None
+            t = self.global_var_types[name]
+            return (self.percpu_offsets[name], None, 1, t.base_type)
+        if isinstance(expr, MemberExpr):
+            slot = self._percpu_slot(expr.obj)
+            if slot is None:
+                return None
+            disp, index, scale, t = slot
+            if isinstance(t, (ArrayType, PointerType, FunctionPointerType)):
+                return None
+            si = self.structs.get(getattr(t, "name", None))
+            hit = si.lookup(expr.member) if si is not None else None
+            if hit is None:
+                return None
+            ftype, foff = hit
+            return (disp + foff, index, scale, ftype)
+        if isinstance(expr, IndexExpr):
+            slot = self._percpu_slot(expr.obj)
+            if slot is None or not isinstance(slot[3], ArrayType):
+                return None
+            disp, index, scale, t = slot
+            elem_size = self.get_type_size(t.element_type)
+            k = self._const_int_value(expr.index)
+            if k is not None:
+                return (disp + k * elem_size, index, scale, t.element_type)
+            if index is not None:
+                return None
+            return (disp, expr.index, elem_size, t.element_type)
+        return None
 
-        Used by the indexed-load / store / member-access paths so that
-        accesses to a per-CPU aggregate stay `%gs:`-prefixed instead of
-        decaying to `leaq buf(%rip)` (which would erase the per-CPU base
-        and silently miscompile)."""
-        if not isinstance(obj, Identifier):
-            return None
-        name = obj.name
-        if name not in self.percpu_globals:
-            return None
-        t = self.global_var_types.get(name)
-        if not isinstance(t, PercpuType):
-            return None
-        base = t.base_type
-        is_aggregate = (
-            isinstance(base, ArrayType)
-            or (base is not None and hasattr(base, "name")
-                and base.name in self.structs)
-        )
-        if not is_aggregate:
-            return None
-        offset = self.percpu_offsets[name]
-        return (name, offset, base)
+    def _gen_percpu_index(self, slot: tuple) -> str:
+        """Leave the scaled variable index of `slot` in %rax and return
+        the `%gs:disp` address suffix it needs once moved to %rcx
+        ("(%rcx)"), or "" when the slot has no variable index."""
+        _, index, scale, _ = slot
+        if index is None:
+            return ""
+        self.gen_expr(index)
+        self._emit_scale_reg("%rax", scale)
+        return "(%rcx)"
+
+    def _gen_percpu_load(self, slot: tuple, signed: bool = False) -> None:
+        """Load the scalar at per-CPU `slot` into %rax, zero-extended
+        like any field / element load unless `signed`."""
+        disp, _, _, t = slot
+        suffix = self._gen_percpu_index(slot)
+        if suffix:
+            self.emit("    movq %rax, %rcx")
+        self._emit_gs_load_sized(self.get_type_size(t), disp, suffix, "%rax",
+                                 signed)
+
+    def _gen_percpu_store(self, slot: tuple, value: Expr,
+                          bin_op: Optional[BinOp] = None) -> None:
+        """`slot = value`, or `slot = slot <bin_op> value` for a compound
+        assignment, with the index evaluated once."""
+        disp, _, _, t = slot
+        size = self.get_type_size(t)
+        suffix = self._gen_percpu_index(slot)
+        if suffix:
+            self.emit("    pushq %rax")   # scaled index
+        if bin_op is not None:
+            if suffix:
+                self.emit("    movq %rax, %rcx")
+            self._emit_gs_load_sized(size, disp, suffix, "%rax")
+            self.emit("    pushq %rax")   # old value
+        self.gen_expr(value)
+        if bin_op is not None:
+            self.emit("    movq %rax, %rcx")   # rhs -> rcx
+            self.emit("    popq %rax")         # old value -> rax
+            self._emit_arith_rax_rcx(bin_op)   # rax = old OP rhs
+        if suffix:
+            self.emit("    popq %rcx")    # scaled index -> rcx
+        self._emit_gs_store_sized(size, disp, suffix, "%rax")
+
+    def _gen_percpu_address(self, slot: tuple) -> None:
+        """Leave this CPU's linear address of `slot` in %rax: the self
+        pointer at %gs:0 plus the slot's offset (leaq can't honour a
+        segment override)."""
+        disp, _, _, _ = slot
+        if self._gen_percpu_index(slot):
+            self.emit("    movq %rax, %rcx")
+            self.emit("    movq %gs:0, %rax")
+            self.emit(f"    leaq {disp}(%rax,%rcx), %rax")
+            return
+        self.emit("    movq %gs:0, %rax")
+        if disp:
+            self.emit(f"    addq ${disp}, %rax")
 
     def _is_pointer_type(self, t: Optional[Type]) -> bool:
         """True if `t` is a pointer-shaped type (Ptr[T]/FnPtr). ArrayType
@@ -2779,18 +4731,178 @@ class X86CodeGen:
 
     def _emit_scale_reg(self, reg: str, scale: int) -> None:
         """Multiply `reg` by `scale` in-place. Prefers shifts for the
-        power-of-two cases (1/2/4/8 bytes — int16/int32/int64/Ptr) and
-        falls back to imulq for odd struct sizes."""
-        if scale == 1:
-            return
-        if scale == 2:
-            self.emit(f"    shlq $1, {reg}")
-        elif scale == 4:
-            self.emit(f"    shlq $2, {reg}")
-        elif scale == 8:
-            self.emit(f"    shlq $3, {reg}")
+        power-of-two cases (1/2/4/8 bytes — int16/int32/int64/Ptr),
+        lea(+shift) for 3/5/9-multiple struct sizes (12, 24, 40, ...)
+        and falls back to imulq for the remaining odd struct sizes."""
+        seq = self._mul_const_seq(reg, scale)
+        if seq is None:
+            seq = [f"movabsq ${scale}, %rdx", f"imulq %rdx, {reg}"]
+        for insn in seq:
+            self.emit(f"    {insn}")
+
+    # lea computes base + index*{2,4,8}: i.e. x*3, x*5, x*9 in one uop.
+    _LEA_MULTIPLIERS = ((3, 2), (5, 4), (9, 8))
+
+    def _mul_const_seq(self, reg: str, c: int) -> Optional[list[str]]:
+        """Instructions computing `reg *= c` for a compile-time constant,
+        or None when `c` only fits a 64-bit immediate (the caller keeps
+        the generic register-register imulq).
+
+        Multiplication is sign-agnostic in the low 64 bits, so the same
+        sequence serves signed and unsigned operands:
+          0 -> zero, 1 -> nothing, -1 -> negq, 2**k -> shlq,
+          {3,5,9} * 2**k -> leaq (+ shlq), other imm32 -> imulq $c.
+        """
+        if c == 0:
+            return [f"movq $0, {reg}"]
+        if c == 1:
+            return []
+        if c == -1:
+            return [f"negq {reg}"]
+        if c > 0 and c & (c - 1) == 0:
+            return [f"shlq ${c.bit_length() - 1}, {reg}"]
+        for lea_mul, scale in self._LEA_MULTIPLIERS:
+            rest = c // lea_mul
+            if c > 0 and c % lea_mul == 0 and rest & (rest - 1) == 0:
+                seq = [f"leaq ({reg},{reg},{scale}), {reg}"]
+                if rest > 1:
+                    seq.append(f"shlq ${rest.bit_length() - 1}, {reg}")
+                return seq
+        if -(1 << 31) <= c < (1 << 31):
+            return [f"imulq ${c}, {reg}, {reg}"]
+        return None
+
+    @staticmethod
+    def _mod_from_quotient(d: int) -> list[str]:
+        """With the quotient in %rax and the dividend in %rcx, leave the
+        remainder `x - q*d` in %rax."""
+        if -(1 << 31) <= d < (1 << 31):
+            seq = [f"imulq ${d}, %rax, %rax"]
+        else:
+            seq = [f"movabsq ${d}, %rdx", "imulq %rdx, %rax"]
+        return seq + ["subq %rax, %rcx", "movq %rcx, %rax"]
+
+    def _udiv_const_seq(self, c: int, mod: bool) -> Optional[list[str]]:
+        """Unsigned `%rax // c` (or `% c` when `mod`) without divq.
+
+        Powers of two become shrq / andq. Other divisors multiply by the
+        fixed-point reciprocal from _udiv_magic and keep the high half of
+        the 128-bit mulq product; 65-bit multipliers use the
+        `((x - t) >> 1) + t` add-back so nothing overflows. Returns None
+        for 0 (keep the #DE trap) and divisors >= 2**63.
+        """
+        d = c & _U64_MASK
+        if d == 0 or d >= 1 << 63:
+            return None
+        if d == 1:
+            return ["movq $0, %rax"] if mod else []
+        if d & (d - 1) == 0:
+            if not mod:
+                return [f"shrq ${d.bit_length() - 1}, %rax"]
+            mask = d - 1
+            if mask < 1 << 31:
+                return [f"andq ${mask}, %rax"]
+            if mask == 0xFFFFFFFF:
+                return ["movl %eax, %eax"]
+            return [f"movabsq ${mask:#x}, %rcx", "andq %rcx, %rax"]
+        m, s = _udiv_magic(d)
+        seq = ["movq %rax, %rcx",
+               f"movabsq ${m & _U64_MASK:#x}, %rdx",
+               "mulq %rdx"]
+        if m < 1 << 64:
+            if s:
+                seq.append(f"shrq ${s}, %rdx")
+            seq.append("movq %rdx, %rax")
+        else:
+            seq += ["movq %rcx, %rax",
+                    "subq %rdx, %rax",
+                    "shrq $1, %rax",
+                    "addq %rdx, %rax"]
+            if s > 1:
+                seq.append(f"shrq ${s - 1}, %rax")
+        if mod:
+            seq += self._mod_from_quotient(d)
+        return seq
+
+    def _sdiv_const_seq(self, c: int, mod: bool) -> Optional[list[str]]:
+        """Signed (truncating, idivq-compatible) `%rax // c` / `% c`.
+
+        Powers of two add a bias of `2**k - 1` to negative dividends
+        before the arithmetic shift so the quotient rounds toward zero
+        like idivq; the remainder takes the dividend's sign, so
+        `x % -2**k == x % 2**k`. Other divisors use the signed
+        reciprocal from _sdiv_magic. Returns None for 0 and -2**63.
+        """
+        if c == 0 or not -(1 << 63) < c < (1 << 63):
+            return None
+        if c in (1, -1):
+            if mod:
+                return ["movq $0, %rax"]
+            return [] if c == 1 else ["negq %rax"]
+        ad = abs(c)
+        if ad & (ad - 1) == 0:
+            k = ad.bit_length() - 1
+            # %rcx = (x < 0) ? 2**k - 1 : 0
+            if k == 1:
+                bias = ["movq %rax, %rcx", "shrq $63, %rcx"]
+            else:
+                bias = ["movq %rax, %rcx", "sarq $63, %rcx",
+                        f"shrq ${64 - k}, %rcx"]
+            if mod:
+                if k <= 31:
+                    mask = [f"andq ${-ad}, %rcx"]
+                else:
+                    mask = [f"movabsq ${-ad}, %rdx", "andq %rdx, %rcx"]
+                return bias + ["addq %rax, %rcx"] + mask + ["subq %rcx, %rax"]
+            seq = bias + ["addq %rcx, %rax", f"sarq ${k}, %rax"]
+            if c < 0:
+                seq.append("negq %rax")
+            return seq
+        m, s = _sdiv_magic(c)
+        seq = ["movq %rax, %rcx", f"movabsq ${m}, %rdx", "imulq %rdx"]
+        if c > 0 and m < 0:
+            seq.append("addq %rcx, %rdx")
+        elif c < 0 and m > 0:
+            seq.append("subq %rcx, %rdx")
+        if s:
+            seq.append(f"sarq ${s}, %rdx")
+        # Round toward zero: add 1 when the shifted quotient is negative.
+        seq += ["movq %rdx, %rax", "shrq $63, %rax", "addq %rdx, %rax"]
+        if mod:
+            seq += self._mod_from_quotient(c)
+        return seq
+
+    def _gen_binary_const(self, op: BinOp, left: Expr, right: Expr) -> bool:
+        """Strength-reduced `*` / `//` / `%` when an operand is a
+        compile-time integer (the right one for `//` / `%`, either one
+        for the commutative `*`). Emits the operation with the result in
+        %rax and returns True; returns False, emitting nothing, when the
+        constant has no cheaper lowering so gen_binary falls through to
+        the generic sequence.
+
+        Division signedness follows _binop_signed_op exactly like the
+        divq / idivq path, so `x // 8` over a uint64 is a logical shift
+        and over an int64 the bias-adjusted arithmetic shift.
+        """
+        c = self._const_int_value(right)
+        operand = left
+        if c is None and op is BinOp.MUL:
+            c = self._const_int_value(left)
+            operand = right
+        if c is None:
+            return False
+        if op is BinOp.MUL:
+            seq = self._mul_const_seq("%rax", c)
+        elif self._binop_signed_op(left, right):
+            seq = self._sdiv_const_seq(c, op is BinOp.MOD)
         else:
-            self.emit(f"    imulq ${scale}, {reg}, {reg}")
+            seq = self._udiv_const_seq(c, op is BinOp.MOD)
+        if seq is None:
+            return False
+        self.gen_expr(operand)
+        for insn in seq:
+            self.emit(f"    {insn}")
+        return True
 
     def _binop_signed_op(self, left: Expr, right: Expr) -> bool:
         """Decide whether a `>>` / `/` / `%` should use the SIGNED machine
@@ -2859,6 +4971,10 @@ class X86CodeGen:
 
     def gen_addr_of(self, operand: Expr) -> None:
         """Place the address of `operand` into %rax."""
+        slot = self._percpu_slot(operand)
+        if slot is not None:
+            self._gen_percpu_address(slot)
+            return
         if isinstance(operand, Identifier):
             name = operand.name
             if self.ctx is not None and name in self.ctx.locals:
@@ -2867,17 +4983,10 @@ class X86CodeGen:
             elif name in self.defined_funcs or name in self.extern_funcs:
                 self.emit(f"    leaq {name}(%rip), %rax")
             elif name in self.percpu_globals:
-                # `&percpu_global` (any T) can't be expressed as a single
-                # linear address — the value lives at %gs:offset, which
-                # is a CPU-relative address. leaq can't honour segment
-                # overrides. Reject explicitly so this doesn't silently
-                # decay to `leaq buf(%rip)` and miscompile.
-                raise CodeGenError(
-                    f"x86: cannot take address of Percpu global '{name}' — "
-                    f"the value lives at %gs:offset per CPU, not at a "
-                    f"single linear address. Read/write the value or "
-                    f"index/member-access it directly instead."
-                )
+                # The value lives at %gs:offset, which leaq can't form:
+                # the self pointer at %gs:0 supplies this CPU's base.
+                self._gen_percpu_address(
+                    (self.percpu_offsets[name], None, 1, None))
             elif name in self.global_var_types:
                 self.emit(f"    leaq {name}(%rip), %rax")
             else:
@@ -2885,27 +4994,9 @@ class X86CodeGen:
                     f"x86: cannot take address of unknown identifier '{name}'"
                 )
         elif isinstance(operand, IndexExpr):
-            # &percpu_arr[i] would need %gs-relative leaq, not expressible.
-            info = self._percpu_aggregate_info(operand.obj)
-            if info is not None:
-                name, _, _ = info
-                raise CodeGenError(
-                    f"x86: cannot take address of '{name}[i]' — "
-                    f"'{name}' is a Percpu global, lives at %gs:offset "
-                    f"per CPU. Read/write the element directly instead."
-                )
             # &arr[i] : compute base + scaled index, leave in %rax.
             self.gen_index_address(operand)
         elif isinstance(operand, MemberExpr):
-            # &percpu_struct.field would need %gs-relative leaq.
-            info = self._percpu_aggregate_info(operand.obj)
-            if info is not None:
-                name, _, _ = info
-                raise CodeGenError(
-                    f"x86: cannot take address of '{name}.{operand.member}' "
-                    f"— '{name}' is a Percpu global, lives at %gs:offset "
-                    f"per CPU. Read/write the field directly instead."
-                )
             # &obj.field : compute base + field offset, leave in %rax.
             self.gen_member_address(operand.obj, operand.member)
         else:
@@ -2949,34 +5040,32 @@ class X86CodeGen:
 
     def gen_index_load(self, expr: IndexExpr) -> None:
         """Load value at expr.obj[expr.index] into %rax."""
-        # Special-case Percpu[Array[N, T]] indexing: emit a `%gs:`-prefixed
-        # load using disp(%rcx) addressing so the per-CPU base is honoured.
-        # Falling through to gen_index_address would `leaq buf(%rip)` and
-        # silently lose the per-CPU offset.
-        info = self._percpu_aggregate_info(expr.obj)
-        if info is not None and isinstance(info[2], ArrayType):
-            name, offset, base = info
-            elem_size = self.get_type_size(base.element_type)
-            # %rcx = index * elem_size
-            self.gen_expr(expr.index)
-            self.emit("    movq %rax, %rcx")
-            self._emit_scale_reg("%rcx", elem_size)
-            self._emit_gs_load_sized(elem_size, offset, "(%rcx)", "%rax")
+        # Per-CPU element: a `%gs:`-prefixed load using disp(%rcx)
+        # addressing so the per-CPU base is honoured. Falling through to
+        # gen_index_address would take the address via the self pointer:
+        # correct, but two loads instead of one.
+        slot = self._percpu_slot(expr)
+        if slot is not None and not self._is_aggregate_type(slot[3]):
+            self._gen_percpu_load(slot)
             return
         self.gen_index_address(expr)
         size = self.element_size_of(expr.obj)
         self.emit_load_sized(size, "%rax", "%rax")
 
     def _emit_gs_load_sized(self, size: int, disp: int, addr_suffix: str,
-                            dst: str) -> None:
+                            dst: str, signed: bool = False) -> None:
         """Emit a `%gs:disp+addr_suffix -> dst` load of `size` bytes.
 
         `addr_suffix` is the extra address term after the displacement
         (e.g. "(%rcx)" for SIB-less, or "" for a literal disp). The
-        full operand is `%gs:disp{addr_suffix}`. Loads zero-extend into
-        the 64-bit destination, matching the non-segment helpers."""
+        full operand is `%gs:disp{addr_suffix}`. Loads sign-extend into
+        the 64-bit destination if `signed`, else zero-extend, like
+        emit_load_sized_signed."""
         operand = f"%gs:{disp}{addr_suffix}"
-        if size == 8:
+        if signed and size in (1, 2, 4):
+            mnem = {1: "movsbq", 2: "movswq", 4: "movslq"}[size]
+            self.emit(f"    {mnem} {operand}, {dst}")
+        elif size == 8:
             self.emit(f"    movq {operand}, {dst}")
         elif size == 4:
             dst32 = dst.replace("%r", "%e") if dst.startswith("%r") else dst
@@ -2987,7 +5076,7 @@ class X86CodeGen:
             self.emit(f"    movzbq {operand}, {dst}")
         else:
             raise CodeGenError(
-                f"x86: Percpu aggregate element size {size} not supported"
+                f"x86: Percpu access size {size} not supported"
             )
 
     def _emit_gs_store_sized(self, size: int, disp: int, addr_suffix: str,
@@ -3011,7 +5100,7 @@ class X86CodeGen:
             self.emit(f"    movb {low[0]}, {operand}")
         else:
             raise CodeGenError(
-                f"x86: Percpu aggregate element size {size} not supported"
+                f"x86: Percpu access size {size} not supported"
             )
 
     def _resolve_struct(self, obj: Expr) -> StructInfo:
@@ -3049,10 +5138,12 @@ class X86CodeGen:
 
     def _field_size(self, obj: Expr, member: str) -> int:
         si = self._resolve_struct(obj)
-        for fname, ftype, _ in si.fields:
-            if fname == member:
-                return self.get_type_size(ftype)
-        raise CodeGenError(f"x86: struct '{si.name}' has no field '{member}'")
+        hit = si.lookup(member)
+        if hit is None:
+            raise CodeGenError(
+                f"x86: struct '{si.name}' has no field '{member}'"
+            )
+        return self.get_type_size(hit[0])
 
     def gen_member_address(self, obj: Expr, member: str) -> None:
         """Leave the address of obj.member in %rax.
@@ -3064,15 +5155,12 @@ class X86CodeGen:
         inside method bodies (`self: Ptr[Foo]`).
         """
         si = self._resolve_struct(obj)
-        field_offset: Optional[int] = None
-        for fname, _, off in si.fields:
-            if fname == member:
-                field_offset = off
-                break
-        if field_offset is None:
+        hit = si.lookup(member)
+        if hit is None:
             raise CodeGenError(
                 f"x86: struct '{si.name}' has no field '{member}'"
             )
+        field_offset = hit[1]
         if self._obj_is_pointer(obj):
             self.gen_expr(obj)
         else:
@@ -3084,40 +5172,27 @@ class X86CodeGen:
         """Load the value of expr.obj.expr.member into %rax. For array fields
         the result is the field's ADDRESS (mirroring how Identifier of an
         array yields its address, not its 16-byte contents)."""
-        # Special-case Percpu[Struct] field load: emit a `%gs:`-prefixed
-        # load directly. The default path leaqs the flat-address copy
-        # of the symbol and loses the per-CPU base.
-        info = self._percpu_aggregate_info(expr.obj)
-        if info is not None:
-            name, base_offset, base_type = info
-            if base_type is not None and hasattr(base_type, "name") \
-                    and base_type.name in self.structs:
-                si = self.structs[base_type.name]
-                for fname, ftype, foff in si.fields:
-                    if fname == expr.member:
-                        if isinstance(ftype, ArrayType):
-                            raise CodeGenError(
-                                f"x86: Percpu[{base_type.name}].{fname} is "
-                                f"an array — taking its address would need "
-                                f"%gs-relative leaq which x86 can't form. "
-                                f"Index/store individual elements via a "
-                                f"separate Percpu[Array[N, T]] global."
-                            )
-                        size = self.get_type_size(ftype)
-                        self._emit_gs_load_sized(
-                            size, base_offset + foff, "", "%rax"
-                        )
-                        return
+        # Per-CPU field: a `%gs:`-prefixed load. The default path would
+        # go through the self pointer; an array / struct field decays to
+        # this CPU's address of it either way.
+        slot = self._percpu_slot(expr)
+        if slot is not None:
+            if self._is_aggregate_type(slot[3]):
+                self._gen_percpu_address(slot)
+            else:
+                self._gen_percpu_load(slot)
+            return
         self.gen_member_address(expr.obj, expr.member)
         si = self._resolve_struct(expr.obj)
-        for fname, ftype, _ in si.fields:
-            if fname == expr.member:
-                if isinstance(ftype, ArrayType):
-                    # Address already in %rax — array decays to pointer.
-                    return
-                size = self.get_type_size(ftype)
-                self.emit_load_sized(size, "%rax", "%rax")
+        hit = si.lookup(expr.member)
+        if hit is not None:
+            ftype, _ = hit
+            if isinstance(ftype, ArrayType):
+                # Address already in %rax — array decays to pointer.
                 return
+            size = self.get_type_size(ftype)
+            self.emit_load_sized(size, "%rax", "%rax")
+            return
 
     def _gen_min_max_inline(self, which: str, a: Expr, b: Expr) -> None:
         """Inline min(a, b) / max(a, b) using cmpq + cmovl/cmovg.
@@ -3169,40 +5244,77 @@ class X86CodeGen:
         self.emit("    cmovns %rcx, %rax") # if x >= 0, use original
 
     def _gen_strlen_inline(self, s: Expr) -> None:
-        """Inline strlen(s) using repne scasb.
+        """Inline strlen(s), a word at a time.
 
-        Counts bytes until the first NUL byte in the string pointed to by s.
-        Equivalent to the C `strlen` function but emitted inline — no call,
-        no hidden allocation.
+        `repne scasb` is microcoded at about a byte per cycle; instead
+        read aligned qwords (an aligned load never crosses into the next
+        page, so reading past the NUL is safe) and test all eight bytes
+        at once with the has-zero trick of Linux's word-at-a-time.h:
+        (x - 0x01..01) & ~x & 0x80..80 is non-zero iff x has a zero
+        byte, and its lowest set bit marks the first one.
 
         Emits:
             <eval s> → rax
-            movq %rax, %rdi     ; rdi = pointer to string
-            xorq %rcx, %rcx     ; clear rcx
-            notq %rcx           ; rcx = 0xffffffffffffffff (max scan count)
-            xorb %al, %al       ; al = 0 (byte to search for — NUL)
-            cld                 ; ensure DF=0 (forward scan)
-            repne scasb         ; scan: rdi++, rcx-- while *rdi != 0
-            notq %rcx           ; rcx = bytes consumed (incl. NUL)
-            decq %rcx           ; subtract 1 for the NUL byte itself
-            movq %rcx, %rax     ; return length
-
-        Registers clobbered: rax, rcx, rdi (all caller-saved in SysV AMD64).
-        Result (string length, not counting NUL) lands in %rax.
+            movq %rax, %rdi     ; rdi = s
+            movl %eax, %ecx
+            andq $-8, %rax      ; rax = s rounded down to a qword
+            shll $3, %ecx       ; cl = 8 * (s & 7): bits before s
+            movl $1, %esi
+            shlq %cl, %rsi
+            decq %rsi           ; rsi = 0xff in each byte before s
+            movq (%rax), %rdx
+            orq %rsi, %rdx      ; those bytes can't read as NUL
+            movabsq $0x0101010101010101, %r8
+            movabsq $0x8080808080808080, %r9
+            jmp .Lcheck
+          .Lnext:
+            addq $8, %rax
+            movq (%rax), %rdx
+          .Lcheck:
+            movq %rdx, %rsi
+            subq %r8, %rsi
+            notq %rdx
+            andq %rdx, %rsi
+            andq %r9, %rsi      ; one 0x80 per zero byte
+            jz .Lnext
+            bsfq %rsi, %rsi
+            shrq $3, %rsi       ; index of the NUL in the qword
+            addq %rsi, %rax
+            subq %rdi, %rax     ; length
+
+        Registers clobbered: rax, rcx, rdx, rsi, rdi, r8, r9 (all
+        caller-saved; strlen is not a FRAMELESS_BUILTINS name, so a
+        leaf that calls it keeps a frame). Result lands in %rax.
         """
-        # Need a unique label in case ctx is None (global init — unlikely but
-        # guard it). If ctx is available use ctx.new_label to prevent clashes
-        # when multiple strlen() calls appear in the same function.
+        nxt = self.ctx.new_label("strlen_next")
+        check = self.ctx.new_label("strlen_check")
         self.gen_expr(s)                       # pointer → %rax
         self.emit("    movq %rax, %rdi")       # rdi = s
-        self.emit("    xorq %rcx, %rcx")       # rcx = 0
-        self.emit("    notq %rcx")             # rcx = 0xffff...
-        self.emit("    xorb %al, %al")         # al = NUL terminator
-        self.emit("    cld")                   # DF = 0 (forward)
-        self.emit("    repne scasb")           # scan forward for NUL
-        self.emit("    notq %rcx")             # rcx = bytes scanned (incl. NUL)
-        self.emit("    decq %rcx")             # subtract NUL byte
-        self.emit("    movq %rcx, %rax")       # result → rax
+        self.emit("    movl %eax, %ecx")
+        self.emit("    andq $-8, %rax")        # aligned qword holding s
+        self.emit("    shll $3, %ecx")         # cl = bits before s (mod 64)
+        self.emit("    movl $1, %esi")
+        self.emit("    shlq %cl, %rsi")
+        self.emit("    decq %rsi")             # 0xff over the bytes before s
+        self.emit("    movq (%rax), %rdx")
+        self.emit("    orq %rsi, %rdx")        # ...so they never read as NUL
+        self.emit("    movabsq $0x0101010101010101, %r8")
+        self.emit("    movabsq $0x8080808080808080, %r9")
+        self.emit(f"    jmp {check}")
+        self.emit(f"{nxt}:")
+        self.emit("    addq $8, %rax")
+        self.emit("    movq (%rax), %rdx")
+        self.emit(f"{check}:")
+        self.emit("    movq %rdx, %rsi")
+        self.emit("    subq %r8, %rsi")
+        self.emit("    notq %rdx")
+        self.emit("    andq %rdx, %rsi")
+        self.emit("    andq %r9, %rsi")        # 0x80 in each zero byte
+        self.emit(f"    jz {nxt}")
+        self.emit("    bsfq %rsi, %rsi")
+        self.emit("    shrq $3, %rsi")         # byte index of the NUL
+        self.emit("    addq %rsi, %rax")
+        self.emit("    subq %rdi, %rax")       # result → rax
 
     def _gen_clamp_inline(self, x: Expr, lo: Expr, hi: Expr) -> None:
         """Inline clamp(x, lo, hi) — ensures lo <= result <= hi.
@@ -3236,7 +5348,29 @@ class X86CodeGen:
         self.emit("    cmpq %rcx, %rax")       # result vs hi
         self.emit("    cmovg %rcx, %rax")      # if result > hi: rax = hi
 
-    def gen_call(self, call: CallExpr) -> None:
+    def _gen_tail_call(self, value: Optional[Expr]) -> bool:
+        """Lower `return f(args)` to a sibling call when it is safe:
+        a direct call to a real function symbol with every argument in a
+        register, from a function that allows tail calls (see
+        gen_function), outside any inline expansion. Returns False
+        without emitting anything otherwise."""
+        if self.ctx is None or not self.ctx.allow_tail_calls \
+                or self.ctx.inline_stack:
+            return False
+        if not isinstance(value, CallExpr) or value.kwargs \
+                or not isinstance(value.func, Identifier):
+            return False
+        name = value.func.name
+        if (name not in self.defined_funcs and name not in self.extern_funcs) \
+                or name in self.ctx.locals or name in X86_INTRINSICS \
+                or name in self.inline_plan or self._is_soft_intrinsic(name):
+            return False
+        if len(value.args) > len(ARG_REGS):
+            return False
+        self.gen_call(value, tail=True)
+        return True
+
+    def gen_call(self, call: CallExpr, tail: bool = False) -> None:
         if call.kwargs:
             fname = (call.func.name if isinstance(call.func, Identifier)
                      else type(call.func).__name__)
@@ -3257,12 +5391,35 @@ class X86CodeGen:
         # all compose for free. Indirect calls emit `call *%r11`.
         name = call.func.name if isinstance(call.func, Identifier) else None
 
+        if self._is_bytes_from_file(call) and name not in self.defined_funcs:
+            raise CodeGenError(
+                f"x86: bytes_from_file() only initializes a global "
+                f"Array[N, uint8] (at {_span_location(call.func.span)})"
+            )
+
+        if name in ASM_OPERAND_MARKERS and name not in self.defined_funcs \
+                and name not in self.extern_funcs:
+            raise CodeGenError(
+                f"x86: {name}() is only an asm_volatile operand "
+                f"(at {_span_location(call.func.span)})"
+            )
+
         # Intrinsics short-circuit before the standard ABI shuffle — they
         # need operands in specific registers (AL/DX) rather than the
         # standard arg-regs, and emit a bare instruction instead of `call`.
         if name is not None and name in X86_INTRINSICS:
             self.gen_io_intrinsic(name, call.args)
             return
+        if name is not None and self._is_soft_intrinsic(name):
+            if name in X86_BIT_INTRINSICS:
+                self.gen_bit_intrinsic(name, call)
+            elif name in X86_HINT_INTRINSICS:
+                self.gen_hint_intrinsic(name, call)
+            elif name in X86_MEM_INTRINSICS:
+                self.gen_mem_intrinsic(name, call)
+            else:
+                self.gen_atomic_intrinsic(name, call)
+            return
 
         # ---- raw Linux x86_64 syscall builtins -----------------------------
         # `__syscallN(num, a1..aN)` (N in 1..6) issues a bare `syscall` with
@@ -3308,6 +5465,8 @@ class X86CodeGen:
             and (name in self.defined_funcs or name in self.extern_funcs)
             and not (self.ctx is not None and name in self.ctx.locals)
         )
+        if is_direct and self._try_inline_call(name, call):
+            return
 
         n_args = len(call.args)
         n_reg  = min(n_args, len(ARG_REGS))
@@ -3363,7 +5522,17 @@ class X86CodeGen:
         for i in reversed(range(n_reg)):
             self.emit(f"    popq {ARG_REGS[i]}")
 
+        if is_direct and tail:
+            # Sibling call (_gen_tail_call vetted it): the arguments are
+            # all in registers, so tear the frame down and let the
+            # callee return straight to our caller.
+            self.symbol_refs[name] += 1
+            self.emit("    xorl %eax, %eax")
+            self._emit_leave()
+            self.emit(f"    jmp {name}")
+            return
         if is_direct:
+            self.symbol_refs[name] += 1
             self.emit("    xorl %eax, %eax")
             self.emit(f"    call {name}")
         else:
@@ -3542,12 +5711,16 @@ class X86CodeGen:
             self.emit("    xorq %rax, %rax")
             self.emit("    inw %dx, %ax")
         elif name == "asm_volatile":
-            # asm_volatile("instruction") emits the literal instruction.
-            # The arg must be a string literal; zero-operand only.
-            if len(args) != 1 or not isinstance(args[0], StringLiteral):
+            # asm_volatile("instruction") emits the literal instruction;
+            # with asm_in / asm_out / asm_clobber operands it is the
+            # GCC-style constrained form (gen_asm_operands).
+            if not args or not isinstance(args[0], StringLiteral):
                 raise CodeGenError(
-                    "asm_volatile expects a single string-literal argument"
+                    "asm_volatile expects a string-literal template"
                 )
+            if len(args) > 1:
+                self.gen_asm_operands(args[0].value, args[1:])
+                return
             for line in args[0].value.splitlines():
                 line = line.strip()
                 if line:
@@ -3555,6 +5728,825 @@ class X86CodeGen:
         else:
             raise CodeGenError(f"x86: unknown intrinsic '{name}'")
 
+    def _asm_operand(self, arg: Expr) -> tuple[str, list[Expr], str]:
+        """Split an asm_volatile operand into (marker, args, location),
+        rejecting anything that is not an asm_in / asm_out / asm_clobber
+        call."""
+        if isinstance(arg, CallExpr) and isinstance(arg.func, Identifier) \
+                and arg.func.name in ASM_OPERAND_MARKERS:
+            return arg.func.name, arg.args, _span_location(arg.func.span)
+        raise CodeGenError(
+            f"x86: asm_volatile operands must be asm_in(...), asm_out(...) "
+            f"or asm_clobber(...), got {type(arg).__name__}"
+        )
+
+    def gen_asm_operands(self, template: str, operands: list[Expr]) -> None:
+        """Lower `asm_volatile(template, asm_out(...), asm_in(...),
+        asm_clobber(...))` — the GCC extended-asm shape.
+
+        Operands number outputs first, then inputs, each in argument
+        order. Every operand gets a register of its own (outputs never
+        share one with an input), fixed by its constraint letter
+        (ASM_REG_CONSTRAINTS) or picked from ASM_SCRATCH_REGS for "r";
+        "i" / "n" inputs are compile-time constants. The sequence is:
+
+          1. push any callee-saved register the asm uses or clobbers
+             (a caller's `for` counter may live there);
+          2. evaluate each input, and the old value of each "+" output,
+             and push it; then pop them all into their registers, so no
+             evaluation can clobber an operand already in place;
+          3. emit the template;
+          4. store each output register — straight into a stack-slot
+             local, else into a hidden `__asm_outN` slot;
+          5. pop the saved registers and assign the hidden slots to
+             their lvalues.
+
+        Nothing else is live in a register across a call in this
+        backend, so no other state needs saving.
+        """
+        outputs: list[tuple[str, Expr]] = []    # (constraint, lvalue)
+        inputs: list[tuple[str, Expr]] = []     # (constraint, expr)
+        clobbers: set[str] = set()
+        for arg in operands:
+            marker, margs, where = self._asm_operand(arg)
+            if marker == "asm_clobber":
+                for c in margs:
+                    if not isinstance(c, StringLiteral):
+                        raise CodeGenError(
+                            f"x86: asm_clobber() takes string literals "
+                            f"(at {where})"
+                        )
+                    reg = c.value.lstrip("%")
+                    if reg in ("memory", "cc"):
+                        # Memory is never cached in a register and
+                        # flags never live across a statement.
+                        continue
+                    if f"%{reg}" not in _REG_LOW:
+                        raise CodeGenError(
+                            f"x86: asm_clobber('{c.value}') names no "
+                            f"usable register (at {where})"
+                        )
+                    clobbers.add(f"%{reg}")
+                continue
+            if len(margs) != 2 or not isinstance(margs[0], StringLiteral):
+                raise CodeGenError(
+                    f"x86: {marker}() takes a constraint string and "
+                    f"{'an lvalue' if marker == 'asm_out' else 'a value'} "
+                    f"(at {where})"
+                )
+            con = margs[0].value
+            if marker == "asm_out":
+                if len(con) != 2 or con[0] not in "=+" \
+                        or con[1] not in ASM_REG_CONSTRAINTS:
+                    raise CodeGenError(
+                        f"x86: bad asm_out constraint '{con}' (at {where}); "
+                        f"use '=' or '+' and one of "
+                        f"{''.join(ASM_REG_CONSTRAINTS)}"
+                    )
+                if not isinstance(margs[1], (Identifier, MemberExpr,
+                                             IndexExpr)):
+                    raise CodeGenError(
+                        f"x86: asm_out() needs a variable, field or "
+                        f"element to write (at {where})"
+                    )
+                outputs.append((con, margs[1]))
+            else:
+                if con not in ASM_REG_CONSTRAINTS and con not in ("i", "n"):
+                    raise CodeGenError(
+                        f"x86: bad asm_in constraint '{con}' (at {where}); "
+                        f"use one of {''.join(ASM_REG_CONSTRAINTS)}, i, n"
+                    )
+                if con in ("i", "n") \
+                        and self._const_int_value(margs[1]) is None:
+                    raise CodeGenError(
+                        f"x86: asm_in('{con}') needs a compile-time "
+                        f"constant (at {where})"
+                    )
+                inputs.append((con, margs[1]))
+
+        # Registers: fixed constraints first, then "r" from the pool.
+        # An input may share a fixed register with a "=" output (cpuid's
+        # "a" in, "=a" out); a "+" output is both, and a clobber or an
+        # "r" operand shares with nothing.
+        ops = ([(con[1], expr) for con, expr in outputs]
+               + [(con, expr) for con, expr in inputs])
+        regs: list[Optional[str]] = [None] * len(ops)
+        claimed_in = set(clobbers)
+        claimed_out = set(clobbers)
+        for i, (con, _) in enumerate(ops):
+            reg = ASM_REG_CONSTRAINTS.get(con)
+            if reg is None:
+                continue
+            is_out = i < len(outputs)
+            is_in = not is_out or outputs[i][0][0] == "+"
+            if (is_out and reg in claimed_out) \
+                    or (is_in and reg in claimed_in):
+                raise CodeGenError(
+                    f"x86: asm operand %{i} wants {reg}, which another "
+                    f"operand or a clobber already claims"
+                )
+            regs[i] = reg
+            if is_out:
+                claimed_out.add(reg)
+            if is_in:
+                claimed_in.add(reg)
+        taken = claimed_in | claimed_out
+        free = [r for r in ASM_SCRATCH_REGS if r not in taken]
+        for i, (con, _) in enumerate(ops):
+            if con == "r":
+                if not free:
+                    raise CodeGenError(
+                        "x86: asm_volatile has more \"r\" operands than "
+                        "free scratch registers"
+                    )
+                regs[i] = free.pop(0)
+                taken.add(regs[i])
+        saved = [r for r in LOOP_REGS if r in taken]
+
+        # Template operands: a register at the operand's width, or an
+        # immediate.
+        texts: list[dict[str, str]] = []
+        for i, (con, expr) in enumerate(ops):
+            if regs[i] is None:
+                value = self._const_int_value(expr)
+                texts.append({"": f"${value}", "c": str(value)})
+                continue
+            size = self.get_type_size(self.get_expr_type(expr))
+            full = regs[i]
+            sized = {8: full, **_REG_LOW[full]}
+            texts.append({
+                "": sized.get(size, full),
+                "b": sized[1], "w": sized[2], "k": sized[4], "q": full,
+            })
+        body = self._expand_asm_template(template, texts)
+
+        for reg in saved:
+            self.emit(f"    pushq {reg}")
+        loaded = [(regs[i], expr) for i, (con, expr) in enumerate(outputs)
+                  if con[0] == "+"]
+        loaded += [(regs[len(outputs) + i], expr)
+                   for i, (_, expr) in enumerate(inputs)
+                   if regs[len(outputs) + i] is not None]
+        for _, expr in loaded:
+            self.gen_expr(expr)
+            self.emit("    pushq %rax")
+        for reg, _ in reversed(loaded):
+            self.emit(f"    popq {reg}")
+        for line in body.splitlines():
+            line = line.strip()
+            if line:
+                self.emit(f"    {line}")
+
+        deferred: list[tuple[Expr, LocalVar]] = []
+        for i, (_, lvalue) in enumerate(outputs):
+            var = (self.ctx.locals.get(lvalue.name)
+                   if isinstance(lvalue, Identifier) else None)
+            if var is not None and var.reg is None:
+                self._emit_local_store(var, regs[i])
+                continue
+            slot = f"__asm_out{i}"
+            tmp = self.ctx.locals.get(slot) \
+                or self.ctx.alloc_local(slot, 8, Type("uint64"))
+            self.emit(f"    movq {regs[i]}, {tmp.offset}(%rbp)")
+            deferred.append((lvalue, tmp))
+        for reg in reversed(saved):
+            self.emit(f"    popq {reg}")
+        for lvalue, tmp in deferred:
+            self.gen_assignment(lvalue, Identifier(tmp.name), None)
+
+    def _expand_asm_template(self, template: str,
+                             texts: list[dict[str, str]]) -> str:
+        """Substitute `%N` / `%bN` `%wN` `%kN` `%qN` (register at 8, 16,
+        32, 64 bits) / `%cN` (bare constant) / `%=` (a number unique to
+        this asm) / `%%` in an extended-asm template."""
+        out: list[str] = []
+        i = 0
+        unique = None
+        while i < len(template):
+            ch = template[i]
+            if ch != "%":
+                out.append(ch)
+                i += 1
+                continue
+            nxt = template[i + 1:i + 2]
+            if nxt == "%":
+                out.append("%")
+                i += 2
+                continue
+            if nxt == "=":
+                if unique is None:
+                    self.asm_serial += 1
+                    unique = str(self.asm_serial)
+                out.append(unique)
+                i += 2
+                continue
+            j = i + 1
+            mod = ""
+            if nxt in ("b", "w", "k", "q", "c"):
+                mod = nxt
+                j += 1
+            k = j
+            while k < len(template) and template[k].isdigit():
+                k += 1
+            if k == j:
+                raise CodeGenError(
+                    f"x86: bad asm template escape "
+                    f"'{template[i:k + 1]}' (write %% for a literal %)"
+                )
+            n = int(template[j:k])
+            if n >= len(texts):
+                raise CodeGenError(
+                    f"x86: asm template refers to %{n} but there are "
+                    f"only {len(texts)} operands"
+                )
+            if mod not in texts[n]:
+                raise CodeGenError(
+                    f"x86: asm template modifier '%{mod}{n}' does not "
+                    f"apply to that operand"
+                )
+            out.append(texts[n][mod])
+            i = k
+        return "".join(out)
+
+    def _is_soft_intrinsic(self, name: str) -> bool:
+        """True if a call to `name` lowers to an atomic / fence / bit /
+        bulk-memory / branch-hint intrinsic: the name is one of
+        X86_ATOMIC_INTRINSICS, X86_BIT_INTRINSICS, X86_HINT_INTRINSICS
+        or X86_MEM_INTRINSICS and nothing shadows it (an `extern def` of
+        a memory intrinsic does not)."""
+        if name in X86_MEM_INTRINSICS:
+            return (name not in self.defined_funcs
+                    and (self.ctx is None or name not in self.ctx.locals))
+        return ((name in X86_ATOMIC_INTRINSICS
+                 or name in X86_BIT_INTRINSICS
+                 or name in X86_HINT_INTRINSICS)
+                and name not in self.defined_funcs
+                and name not in self.extern_funcs
+                and (self.ctx is None or name not in self.ctx.locals))
+
+    def _intrinsic_result_type(self, call: CallExpr) -> Optional[Type]:
+        """Static type of an atomic, bit or memory intrinsic's result:
+        the old value (the pointer's element type) for fetch_add / cas /
+        xchg, a bool for the *_and_test forms, int64 for the bit counts,
+        the operand's type for the rotates, the unsigned N-bit type for
+        the byte-order forms, C's types for memcpy / memset / memcmp, a
+        bool for the branch hints, nothing for the rest."""
+        name = call.func.name
+        if name in X86_HINT_INTRINSICS:
+            return Type("bool")
+        if name in ("memcpy", "memset"):
+            return PointerType(Type("uint8"))
+        if name == "memcmp":
+            return Type("int32")
+        if name in ("ctz", "clz", "popcount"):
+            return Type("int64")
+        if name in ("rotl", "rotr") and call.args:
+            return self._bit_operand(call.args[0])[1]
+        if name[:-2] in ("bswap", "load_be"):
+            return Type(f"uint{name[-2:]}")
+        if name in ("atomic_inc_and_test", "atomic_dec_and_test"):
+            return Type("bool")
+        if name in ("atomic_fetch_add", "atomic_cas", "atomic_xchg") \
+                and call.args:
+            t = self.get_expr_type(call.args[0])
+            if isinstance(t, PointerType):
+                return t.base_type
+        return None
+
+    # Register names by operand width, for the sized atomic instructions.
+    _SIZED_RAX = {1: "%al", 2: "%ax", 4: "%eax", 8: "%rax"}
+    _SIZED_RDX = {1: "%dl", 2: "%dx", 4: "%edx", 8: "%rdx"}
+    _SIZE_SUFFIX = {1: "b", 2: "w", 4: "l", 8: "q"}
+
+    def gen_atomic_intrinsic(self, name: str, call: CallExpr) -> None:
+        """Lower an atomic / memory-ordering intrinsic inline. The
+        pointer is always the first argument and ends up in %rcx; values
+        travel in %rax / %rdx, so nothing outside the expression scratch
+        registers is touched. Results are left in %rax, sign- or
+        zero-extended from the element width like a load of that type.
+
+          atomic_add(p, v)             lock add      -> nothing
+          atomic_fetch_add(p, v)       lock xadd     -> old *p
+          atomic_cas(p, expected, new) lock cmpxchg  -> old *p
+          atomic_xchg(p, v)            xchg          -> old *p
+          atomic_inc_and_test(p)       lock inc      -> new *p == 0
+          atomic_dec_and_test(p)       lock dec      -> new *p == 0
+          smp_mb()                     lock orq $0, (%rsp)
+          smp_rmb() / smp_wmb() / barrier()
+                                       no instruction (x86 is TSO and
+                                       the backend never caches a
+                                       global or pointee in a register)
+        """
+        args = call.args
+        where = _span_location(call.func.span)
+        arity = {"atomic_add": 2, "atomic_fetch_add": 2, "atomic_cas": 3,
+                 "atomic_xchg": 2, "atomic_inc_and_test": 1,
+                 "atomic_dec_and_test": 1}.get(name, 0)
+        if len(args) != arity:
+            raise CodeGenError(
+                f"x86: {name}() takes {arity} argument"
+                f"{'' if arity == 1 else 's'}, got {len(args)} (at {where})"
+            )
+        if name == "smp_mb":
+            # A locked no-op RMW on the stack top is a full barrier and
+            # is cheaper than mfence on every x86 since Nehalem.
+            self.emit("    lock orq $0, (%rsp)")
+            return
+        if arity == 0:
+            # Loads are not reordered with loads, nor stores with
+            # stores, under x86-TSO; the compiler side is already
+            # ordered because the backend emits memory accesses in
+            # source order.
+            self.emit(f"    # {name}")
+            return
+
+        ptr_type = self.get_expr_type(args[0])
+        if not isinstance(ptr_type, PointerType):
+            raise CodeGenError(
+                f"x86: {name}() needs a Ptr[T] first argument "
+                f"(at {where})"
+            )
+        size = self.get_type_size(ptr_type.base_type)
+        if size not in self._SIZE_SUFFIX:
+            raise CodeGenError(
+                f"x86: {name}() on a {size}-byte "
+                f"'{ptr_type.base_type.name}' (atomics are 1, 2, 4 or "
+                f"8 bytes wide) (at {where})"
+            )
+        sfx = self._SIZE_SUFFIX[size]
+        rax = self._SIZED_RAX[size]
+
+        if name in ("atomic_inc_and_test", "atomic_dec_and_test"):
+            op = "inc" if name == "atomic_inc_and_test" else "dec"
+            self.gen_expr(args[0])
+            self.emit(f"    lock {op}{sfx} (%rax)")
+            self.emit("    sete %al")
+            self.emit("    movzbq %al, %rax")
+            return
+
+        if name == "atomic_add":
+            imm = self._const_int_value(args[1])
+            lo, hi = ((-(1 << 31), (1 << 31) - 1) if size == 8
+                      else (-(1 << (8 * size - 1)), (1 << (8 * size)) - 1))
+            if imm is not None and lo <= imm <= hi:
+                self.gen_expr(args[0])
+                self.emit(f"    lock add{sfx} ${imm}, (%rax)")
+                return
+
+        self.gen_expr(args[0])
+        self.emit("    pushq %rax")
+        if name == "atomic_cas":
+            self.gen_expr(args[1])               # expected
+            self.emit("    pushq %rax")
+            self.gen_expr(args[2])               # new
+            self.emit("    movq %rax, %rdx")
+            self.emit("    popq %rax")
+            self.emit("    popq %rcx")
+            self.emit(f"    lock cmpxchg{sfx} {self._SIZED_RDX[size]}, (%rcx)")
+        else:
+            self.gen_expr(args[1])
+            self.emit("    popq %rcx")
+            if name == "atomic_add":
+                self.emit(f"    lock add{sfx} {rax}, (%rcx)")
+                return
+            if name == "atomic_fetch_add":
+                self.emit(f"    lock xadd{sfx} {rax}, (%rcx)")
+            else:
+                # xchg with a memory operand is implicitly locked.
+                self.emit(f"    xchg{sfx} {rax}, (%rcx)")
+        self._widen_low_bytes(size, ptr_type.base_type)
+
+    def _widen_low_bytes(self, size: int, elem: Optional[Type]) -> None:
+        """Widen the value an intrinsic left in the low `size` bytes of
+        %rax to 64 bits, honouring the element type's signedness."""
+        if size == 8:
+            return
+        signed = self._is_unsigned_type(elem) is False
+        if size == 4:
+            self.emit("    movslq %eax, %rax" if signed
+                      else "    movl %eax, %eax")
+        elif size == 2:
+            self.emit("    movswq %ax, %rax" if signed
+                      else "    movzwq %ax, %rax")
+        else:
+            self.emit("    movsbq %al, %rax" if signed
+                      else "    movzbq %al, %rax")
+
+    # Arithmetic whose result keeps its operands' width for the bit
+    # intrinsics (shifts keep the left operand's).
+    _BIT_WIDTH_OPS = frozenset({
+        BinOp.ADD, BinOp.SUB, BinOp.MUL, BinOp.DIV, BinOp.IDIV, BinOp.MOD,
+        BinOp.BIT_OR, BinOp.BIT_AND, BinOp.BIT_XOR, BinOp.SHL, BinOp.SHR,
+    })
+
+    def _bit_operand(self, expr: Expr) -> tuple[int, Optional[Type]]:
+        """Width in bytes and static type of a bit intrinsic's integer
+        operand. Arithmetic on typed values takes its widest typed
+        operand, so `rotl(a ^ b, 7)` over two uint32s is a 32-bit
+        rotate; an untyped expression (a literal, say) is 64 bits."""
+        t = self.get_expr_type(expr)
+        if t is None and isinstance(expr, BinaryExpr) \
+                and expr.op in self._BIT_WIDTH_OPS:
+            sides = [self._bit_operand(expr.left)]
+            if expr.op not in (BinOp.SHL, BinOp.SHR):
+                sides.append(self._bit_operand(expr.right))
+            typed = [side for side in sides if side[1] is not None]
+            return max(typed, key=lambda side: side[0]) if typed \
+                else (8, None)
+        if t is None and isinstance(expr, UnaryExpr) \
+                and expr.op in (UnaryOp.NEG, UnaryOp.BIT_NOT):
+            return self._bit_operand(expr.operand)
+        return self.get_type_size(t), t
+
+    def gen_hint_intrinsic(self, name: str, call: CallExpr) -> None:
+        """`likely(c)` / `unlikely(c)` used as a value: `c != 0` in %rax.
+        As the whole condition of an `if` / `while` they are peeled off
+        by _branch_hint instead and only steer the layout."""
+        if len(call.args) != 1:
+            raise CodeGenError(
+                f"x86: {name}() takes 1 argument, got {len(call.args)} "
+                f"(at {_span_location(call.func.span)})"
+            )
+        self.gen_expr(call.args[0])
+        self.emit("    testq %rax, %rax")
+        self.emit("    setne %al")
+        self.emit("    movzbq %al, %rax")
+
+    def gen_bit_intrinsic(self, name: str, call: CallExpr) -> None:
+        """Lower a bit-scan / rotate / byte-order intrinsic inline, using
+        only %rax, %rcx and %rdx. The value is left in %rax.
+
+          ctz(x), clz(x)       trailing / leading zero bits of x at its
+                               own width; the width when x == 0
+          popcount(x)          set bits of x at its own width
+          rotl(x, n), rotr(x, n)
+                               rotate x at its own width by n mod width
+          bswap16/32/64(x)     reverse the low 2 / 4 / 8 bytes
+          load_be16/32/64(p)   big-endian load from a Ptr (any alignment)
+          store_be16/32/64(p, v)
+                               big-endian store of the low bytes of v
+
+        The tzcnt / lzcnt / popcnt / movbe forms are used only when
+        `cpu_features` enables them; the fallbacks are baseline x86_64.
+        """
+        args = call.args
+        where = _span_location(call.func.span)
+        feats = self.options.cpu_features
+        arity = 2 if name in ("rotl", "rotr") \
+            or name.startswith("store_be") else 1
+        if len(args) != arity:
+            raise CodeGenError(
+                f"x86: {name}() takes {arity} argument"
+                f"{'' if arity == 1 else 's'}, got {len(args)} (at {where})"
+            )
+
+        if name.startswith(("load_be", "store_be")):
+            size = int(name[-2:]) // 8
+            if not isinstance(self.get_expr_type(args[0]), PointerType):
+                raise CodeGenError(
+                    f"x86: {name}() needs a Ptr[T] first argument "
+                    f"(at {where})"
+                )
+            rax = self._SIZED_RAX[size]
+            sfx = self._SIZE_SUFFIX[size]
+            self.gen_expr(args[0])
+            if name.startswith("load_be"):
+                if "movbe" in feats:
+                    self.emit(f"    movbe{sfx} (%rax), {rax}")
+                    if size == 2:
+                        self.emit("    movzwl %ax, %eax")
+                elif size == 2:
+                    self.emit("    movzwl (%rax), %eax")
+                    self.emit("    rolw $8, %ax")
+                else:
+                    self.emit(f"    mov{sfx} (%rax), {rax}")
+                    self.emit(f"    bswap{sfx} {rax}")
+                return
+            self.emit("    pushq %rax")
+            self.gen_expr(args[1])
+            self.emit("    popq %rcx")
+            if "movbe" in feats:
+                self.emit(f"    movbe{sfx} {rax}, (%rcx)")
+                return
+            if size == 2:
+                self.emit("    rolw $8, %ax")
+            else:
+                self.emit(f"    bswap{sfx} {rax}")
+            self.emit(f"    mov{sfx} {rax}, (%rcx)")
+            return
+
+        if name.startswith("bswap"):
+            self.gen_expr(args[0])
+            if name == "bswap16":
+                self.emit("    rolw $8, %ax")
+                self.emit("    movzwl %ax, %eax")
+            elif name == "bswap32":
+                self.emit("    bswapl %eax")
+            else:
+                self.emit("    bswapq %rax")
+            return
+
+        size, t = self._bit_operand(args[0])
+        if isinstance(t, ArrayType) or getattr(t, "name", None) in self.structs:
+            raise CodeGenError(
+                f"x86: {name}() needs an integer operand, got "
+                f"'{t.name}' (at {where})"
+            )
+        bits = 8 * size
+
+        if name in ("rotl", "rotr"):
+            op = "rol" if name == "rotl" else "ror"
+            insn = f"{op}{self._SIZE_SUFFIX[size]}"
+            rax = self._SIZED_RAX[size]
+            count = self._const_int_value(args[1])
+            if count is not None:
+                self.gen_expr(args[0])
+                if count % bits:
+                    self.emit(f"    {insn} ${count % bits}, {rax}")
+            else:
+                self.gen_expr(args[0])
+                self.emit("    pushq %rax")
+                self.gen_expr(args[1])
+                self.emit("    movq %rax, %rcx")
+                self.emit("    popq %rax")
+                self.emit(f"    {insn} %cl, {rax}")
+            # A 32-bit rotate already zero-extended %rax.
+            rotated = count is None or count % bits != 0
+            if not (size == 4 and rotated
+                    and self._is_unsigned_type(t) is not False):
+                self._widen_low_bytes(size, t)
+            return
+
+        self.gen_expr(args[0])
+        if name == "ctz":
+            tz = "tzcntq" if "bmi1" in feats else "bsfq"
+            if size < 8:
+                # A set bit just above the operand makes ctz(0) == bits
+                # and keeps bsf's source non-zero.
+                self.emit(f"    btsq ${bits}, %rax")
+                self.emit(f"    {tz} %rax, %rax")
+            elif "bmi1" in feats:
+                self.emit("    tzcntq %rax, %rax")
+            else:
+                self.emit("    movl $64, %ecx")
+                self.emit("    bsfq %rax, %rax")
+                self.emit("    cmovzq %rcx, %rax")
+            return
+
+        # clz / popcount count within the operand: drop any sign bits.
+        self._widen_low_bytes(size, None)
+        if name == "clz":
+            if "lzcnt" in feats:
+                if size == 8:
+                    self.emit("    lzcntq %rax, %rax")
+                else:
+                    self.emit("    lzcntl %eax, %eax")
+                    if bits < 32:
+                        self.emit(f"    subl ${32 - bits}, %eax")
+            else:
+                # bsr gives the top bit's index i, and clz = i ^ (bits-1);
+                # a zero source sets ZF and takes 2*bits-1, which maps
+                # to `bits`.
+                q = size == 8
+                self.emit(f"    movl ${2 * bits - 1}, %ecx")
+                self.emit("    bsrq %rax, %rax" if q
+                          else "    bsrl %eax, %eax")
+                self.emit("    cmovzq %rcx, %rax" if q
+                          else "    cmovzl %ecx, %eax")
+                self.emit(f"    xorl ${bits - 1}, %eax")
+            return
+
+        if "popcnt" in feats:
+            self.emit("    popcntq %rax, %rax")
+            return
+        # Portable popcount: sum bits in pairs, nibbles, then bytes, and
+        # add the bytes up with one multiply.
+        self.emit("    movq %rax, %rcx")
+        self.emit("    shrq $1, %rcx")
+        self.emit("    movabsq $0x5555555555555555, %rdx")
+        self.emit("    andq %rdx, %rcx")
+        self.emit("    subq %rcx, %rax")
+        self.emit("    movabsq $0x3333333333333333, %rdx")
+        self.emit("    movq %rax, %rcx")
+        self.emit("    shrq $2, %rax")
+        self.emit("    andq %rdx, %rcx")
+        self.emit("    andq %rdx, %rax")
+        self.emit("    addq %rcx, %rax")
+        self.emit("    movq %rax, %rcx")
+        self.emit("    shrq $4, %rcx")
+        self.emit("    addq %rcx, %rax")
+        self.emit("    movabsq $0x0f0f0f0f0f0f0f0f, %rdx")
+        self.emit("    andq %rdx, %rax")
+        self.emit("    movabsq $0x0101010101010101, %rdx")
+        self.emit("    imulq %rdx, %rax")
+        self.emit("    shrq $56, %rax")
+
+    def gen_mem_intrinsic(self, name: str, call: CallExpr) -> None:
+        """Lower a bulk-memory intrinsic inline.
+
+          memcpy(dst, src, n)    copy n bytes (no overlap); dst in %rax
+          memset(dst, v, n)      fill n bytes with v's low byte; dst
+          memzero(dst, n)        memset(dst, 0, n)
+          memcmp(a, b, n)        -1 / 0 / 1 by the first differing
+                                 byte, compared unsigned
+
+        A constant n up to BULK_UNROLL_MAX is unrolled (see
+        _bulk_pieces); anything else is `rep movsb`, `rep stosq` (a
+        constant multiple of 8) or `rep stosb`, and memcmp's qword loop.
+        """
+        args = call.args
+        where = _span_location(call.func.span)
+        arity = 2 if name == "memzero" else 3
+        if len(args) != arity:
+            raise CodeGenError(
+                f"x86: {name}() takes {arity} arguments, got {len(args)} "
+                f"(at {where})"
+            )
+        n = self._const_int_value(args[-1])
+        if n is not None and n < 0:
+            raise CodeGenError(
+                f"x86: {name}() of negative size {n} (at {where})"
+            )
+        if name == "memcmp":
+            self._gen_memcmp(args, n)
+            return
+        if name == "memcpy":
+            self.gen_expr(args[0])
+            self.emit("    pushq %rax")
+            self.gen_expr(args[1])
+            self.emit("    pushq %rax")
+            if n is None:
+                self.gen_expr(args[2])
+                self.emit("    movq %rax, %rdx")
+            self.emit("    popq %rcx")
+            self.emit("    popq %rax")
+            self._emit_bulk_copy(n)
+            return
+
+        v = 0 if name == "memzero" else self._const_int_value(args[1])
+        fill = None if v is None else (v & 0xff) * 0x0101010101010101
+        unrolled = n is not None and n <= BULK_UNROLL_MAX
+        self.gen_expr(args[0])
+        if unrolled and fill is not None:
+            self._emit_fill_pattern(fill, "%rdx")
+            self._emit_bulk_store(n)
+            return
+        self.emit("    pushq %rax")
+        if fill is None:
+            self.gen_expr(args[1])
+            self.emit("    pushq %rax")
+        if n is None:
+            self.gen_expr(args[-1])
+            self.emit("    movq %rax, %rcx")
+        quad = n is not None and n % 8 == 0
+        if fill is None:
+            self.emit("    popq %rax")
+            if unrolled or quad:
+                self.emit("    movzbl %al, %eax")
+                self.emit("    movabsq $0x0101010101010101, %rdx")
+                self.emit("    imulq %rdx, %rax")
+        else:
+            self._emit_fill_pattern(fill, "%rax")
+        if unrolled:
+            self.emit("    movq %rax, %rdx")
+            self.emit("    popq %rax")
+            self._emit_bulk_store(n)
+            return
+        self.emit("    popq %rdx")
+        if n is not None:
+            self.emit(f"    movq ${n // 8 if quad else n}, %rcx")
+        self.emit("    movq %rdx, %rdi")
+        self.emit("    rep stosq" if quad else "    rep stosb")
+        self.emit("    movq %rdx, %rax")
+
+    @staticmethod
+    def _bulk_pieces(n: int) -> list[tuple[int, int]]:
+        """(offset, size) moves covering n bytes: qwords, then at most
+        one dword, word and byte."""
+        pieces = []
+        off = 0
+        for size in (8, 4, 2, 1):
+            while n - off >= size:
+                pieces.append((off, size))
+                off += size
+        return pieces
+
+    def _emit_fill_pattern(self, fill: int, reg: str) -> None:
+        """Load the 64-bit byte-broadcast `fill` into `reg`."""
+        if fill == 0:
+            r32 = reg.replace("%r", "%e")
+            self.emit(f"    xorl {r32}, {r32}")
+            return
+        signed = fill - (1 << 64) if fill >= 1 << 63 else fill
+        if -(1 << 31) <= signed < (1 << 31):
+            self.emit(f"    movq ${signed}, {reg}")
+        else:
+            self.emit(f"    movabsq ${fill:#x}, {reg}")
+
+    def _emit_bulk_store(self, n: int) -> None:
+        """Store the pattern in %rdx over n bytes at %rax (unrolled)."""
+        for off, size in self._bulk_pieces(n):
+            disp = f"{off}(%rax)" if off else "(%rax)"
+            self.emit(f"    mov{self._SIZE_SUFFIX[size]} "
+                      f"{self._SIZED_RDX[size]}, {disp}")
+
+    def _emit_bulk_copy(self, n: Optional[int]) -> None:
+        """Copy n bytes (the count in %rdx when n is None) from %rcx to
+        %rax, leaving the destination in %rax. Unrolled through %rdx up
+        to BULK_UNROLL_MAX, else `rep movsb`; a frameless leaf keeps
+        params in %rdi / %rsi, so they are saved around it."""
+        if n is not None and n <= BULK_UNROLL_MAX:
+            for off, size in self._bulk_pieces(n):
+                sfx = self._SIZE_SUFFIX[size]
+                rdx = self._SIZED_RDX[size]
+                self.emit(f"    mov{sfx} {off}(%rcx), {rdx}" if off
+                          else f"    mov{sfx} (%rcx), {rdx}")
+                self.emit(f"    mov{sfx} {rdx}, {off}(%rax)" if off
+                          else f"    mov{sfx} {rdx}, (%rax)")
+            return
+        frameless = self.ctx is not None and self.ctx.frameless
+        if frameless:
+            self.emit("    pushq %rdi")
+            self.emit("    pushq %rsi")
+        self.emit("    movq %rcx, %rsi")
+        self.emit("    movq %rdx, %rcx" if n is None
+                  else f"    movq ${n}, %rcx")
+        self.emit("    movq %rax, %rdi")
+        self.emit("    movq %rax, %rdx")
+        self.emit("    rep movsb")
+        self.emit("    movq %rdx, %rax")
+        if frameless:
+            self.emit("    popq %rsi")
+            self.emit("    popq %rdi")
+
+    def _gen_memcmp(self, args: list[Expr], n: Optional[int]) -> None:
+        """memcmp(a, b, n): compare a qword (or smaller piece) at a
+        time; on the first mismatch, byte-swap both words so an
+        unsigned compare orders them by their first differing byte."""
+        self.gen_expr(args[0])
+        self.emit("    pushq %rax")
+        self.gen_expr(args[1])
+        self.emit("    pushq %rax")
+        if n is None:
+            self.gen_expr(args[2])
+            self.emit("    movq %rax, %rcx")
+        self.emit("    popq %rsi")
+        self.emit("    popq %rdi")
+        if n == 0:
+            self.emit("    xorl %eax, %eax")
+            return
+        diff = self.ctx.new_label("memcmp_diff")
+        equal = self.ctx.new_label("memcmp_eq")
+        load = {8: "movq {}, %rax", 4: "movl {}, %eax",
+                2: "movzwl {}, %eax", 1: "movzbl {}, %eax"}
+        if n is not None and n <= BULK_UNROLL_MAX:
+            for off, size in self._bulk_pieces(n):
+                disp = f"{off}" if off else ""
+                self.emit("    " + load[size].format(f"{disp}(%rdi)"))
+                self.emit("    " + load[size].format(f"{disp}(%rsi)")
+                          .replace("%eax", "%edx").replace("%rax", "%rdx"))
+                self.emit("    cmpq %rdx, %rax")
+                self.emit(f"    jne {diff}")
+        else:
+            if n is not None:
+                self.emit(f"    movq ${n}, %rcx")
+            words = self.ctx.new_label("memcmp_words")
+            tail = self.ctx.new_label("memcmp_bytes")
+            self.emit(f"{words}:")
+            self.emit("    cmpq $8, %rcx")
+            self.emit(f"    jb {tail}")
+            self.emit("    movq (%rdi), %rax")
+            self.emit("    movq (%rsi), %rdx")
+            self.emit("    cmpq %rdx, %rax")
+            self.emit(f"    jne {diff}")
+            self.emit("    addq $8, %rdi")
+            self.emit("    addq $8, %rsi")
+            self.emit("    subq $8, %rcx")
+            self.emit(f"    jmp {words}")
+            self.emit(f"{tail}:")
+            self.emit("    testq %rcx, %rcx")
+            self.emit(f"    jz {equal}")
+            self.emit("    movzbl (%rdi), %eax")
+            self.emit("    movzbl (%rsi), %edx")
+            self.emit("    cmpq %rdx, %rax")
+            self.emit(f"    jne {diff}")
+            self.emit("    incq %rdi")
+            self.emit("    incq %rsi")
+            self.emit("    decq %rcx")
+            self.emit(f"    jmp {tail}")
+        self.emit(f"{equal}:")
+        self.emit("    xorl %eax, %eax")
+        end = self.ctx.new_label("memcmp_end")
+        self.emit(f"    jmp {end}")
+        self.emit(f"{diff}:")
+        self.emit("    bswapq %rax")
+        self.emit("    bswapq %rdx")
+        self.emit("    cmpq %rdx, %rax")
+        self.emit("    movl $0, %eax")
+        self.emit("    seta %al")
+        self.emit("    sbbq $0, %rax")
+        self.emit(f"{end}:")
+
     @staticmethod
     def _is_syscall_builtin(name: str) -> int:
         """Return N (1..6) if `name` is `__syscallN`, else 0."""
@@ -3590,6 +6582,8 @@ class X86CodeGen:
         self.emit("    syscall")
 
 
-def generate(program: Program, bare_metal: bool = False) -> str:
+def generate(program: Program, bare_metal: bool = False,
+             options: Optional[CodeGenOptions] = None) -> str:
     """Generate x86_64 assembly from a Adder AST."""
-    return X86CodeGen(bare_metal=bare_metal).gen_program(program)
+    return X86CodeGen(bare_metal=bare_metal,
+                      options=options).gen_program(program)
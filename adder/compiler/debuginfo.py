@@ -0,0 +1,212 @@
+"""
+Adder `-g` support: DWARF call-frame information for the x86 listing.
+
+X86CodeGen emits the line table itself: `.file N "path"` for every
+source file (listed at the top of the output) and `.loc N line col`
+ahead of each statement. It also brackets every function with
+`.cfi_startproc` / `.cfi_endproc`. The rest of the frame description
+depends on the finished instruction stream, after the peephole pass
+has folded pushes and pops, so annotate_cfi() fills it in afterwards.
+It tracks the canonical frame address (CFA) through each function in
+listing order:
+
+  pushq %rbp; movq %rsp, %rbp     CFA = %rbp + 16, %rbp saved at CFA-16
+  movq %rbx, -N(%rbp)             (right after the prologue) %rbx saved
+  pushq / popq / subq, addq $n, %rsp
+                                  while the CFA is %rsp-based (frameless
+                                  leaves): the CFA offset follows %rsp
+  movq -N(%rbp), %rbx ... leave   remember the body's state, describe
+  ... ret / jmp                   the unwound frame, restore the state
+                                  for the code after the exit
+
+The codegen's stack discipline makes a linear walk exact: every `if`
+arm and loop body leaves %rsp where it found it, and a function exits
+only at statement level.
+
+Out-of-line blocks (`.pushsection .text.unlikely` ... `.popsection`)
+sit in the middle of their function in the listing but cannot share
+its FDE, which covers one section. Each is moved after the function's
+`.cfi_endproc`, still in order, and gets its own FDE that starts from
+the state at its branch, so the bytes of every section stay exactly as
+a build without `-g`.
+
+The frames go to both .eh_frame (read by user-space unwinders) and
+.debug_frame (kept by kernel.lds, which discards .eh_frame).
+"""
+
+import re
+from dataclasses import dataclass, field
+from typing import Optional
+
+
+CFI_SECTIONS = "    .cfi_sections .eh_frame, .debug_frame"
+
+# Callee-saved registers gen_function may save in its frame (LOOP_REGS).
+_SAVE = re.compile(r"^movq (%rbx|%r1[2-5]), (-?\d+)\(%rbp\)$")
+_RESTORE = re.compile(r"^movq (-?\d+)\(%rbp\), (%rbx|%r1[2-5])$")
+_RSP_ADJUST = re.compile(r"^(sub|add)q \$(\d+), %rsp$")
+
+
+@dataclass
+class _Frame:
+    """The CFA rule and saved registers at one point of a function."""
+    reg: str = "%rsp"
+    offset: int = 8
+    # Register -> its slot's offset from the CFA.
+    saved: dict[str, int] = field(default_factory=dict)
+    prologue: bool = False
+
+    def copy(self) -> "_Frame":
+        return _Frame(self.reg, self.offset, dict(self.saved), False)
+
+    def establish(self) -> list[str]:
+        """Directives that set this state up in a fresh FDE."""
+        lines = [f"    .cfi_def_cfa {self.reg}, {self.offset}"]
+        lines += [f"    .cfi_offset {reg}, {off}"
+                  for reg, off in self.saved.items()]
+        return lines
+
+
+class _Annotator:
+    """annotate_cfi's walk over one function."""
+
+    def __init__(self) -> None:
+        self.frame = _Frame()
+        self.remembered: Optional[_Frame] = None
+
+    def step(self, insn: str) -> tuple[list[str], list[str]]:
+        """Directives to put before and after the instruction `insn`,
+        updating the tracked frame."""
+        f = self.frame
+        before: list[str] = []
+        after: list[str] = []
+        mnemonic = insn.split(None, 1)[0]
+        if insn == "pushq %rbp" and f.reg == "%rsp" and not f.saved:
+            f.offset += 8
+            f.saved["%rbp"] = -f.offset
+            after = [f"    .cfi_def_cfa_offset {f.offset}",
+                     f"    .cfi_offset %rbp, {-f.offset}"]
+        elif insn == "movq %rsp, %rbp" and f.reg == "%rsp" \
+                and "%rbp" in f.saved:
+            f.reg = "%rbp"
+            f.offset = -f.saved["%rbp"]
+            f.prologue = True
+            after = ["    .cfi_def_cfa_register %rbp"]
+        elif f.prologue and _SAVE.match(insn):
+            reg, slot = _SAVE.match(insn).groups()
+            f.saved[reg] = int(slot) - f.offset
+            after = [f"    .cfi_offset {reg}, {f.saved[reg]}"]
+        elif _RESTORE.match(insn) and f.reg == "%rbp" and \
+                f.saved.get(_RESTORE.match(insn).group(2)) \
+                == int(_RESTORE.match(insn).group(1)) - f.offset:
+            reg = _RESTORE.match(insn).group(2)
+            before = self._remember()
+            del f.saved[reg]
+            after = [f"    .cfi_restore {reg}"]
+        elif mnemonic == "leave" and f.reg == "%rbp":
+            before = self._remember()
+            f.reg, f.offset = "%rsp", 8
+            f.saved.pop("%rbp", None)
+            after = ["    .cfi_def_cfa %rsp, 8", "    .cfi_restore %rbp"]
+        elif mnemonic in ("ret", "retq", "jmp") and \
+                self.remembered is not None:
+            self.frame = self.remembered
+            self.remembered = None
+            after = ["    .cfi_restore_state"]
+        elif f.reg == "%rsp" and mnemonic in ("pushq", "pushfq", "popq",
+                                              "popfq"):
+            f.offset += 8 if mnemonic.startswith("push") else -8
+            after = [f"    .cfi_def_cfa_offset {f.offset}"]
+        elif f.reg == "%rsp" and _RSP_ADJUST.match(insn):
+            op, n = _RSP_ADJUST.match(insn).groups()
+            f.offset += int(n) if op == "sub" else -int(n)
+            after = [f"    .cfi_def_cfa_offset {f.offset}"]
+        if f.prologue and not (mnemonic == "subq" or _SAVE.match(insn)
+                               or insn == "movq %rsp, %rbp"):
+            f.prologue = False
+        return before, after
+
+    def _remember(self) -> list[str]:
+        if self.remembered is not None:
+            return []
+        self.remembered = self.frame.copy()
+        return ["    .cfi_remember_state"]
+
+    def annotate(self, lines: list[str]) -> list[str]:
+        """`lines` runs from `.cfi_startproc` to `.cfi_endproc`."""
+        main: list[str] = []
+        moved: list[str] = []
+        # One entry per open .pushsection: for an out-of-line block,
+        # the frame to resume after it and the directive that opened
+        # it; None for a data section.
+        sections: list[Optional[tuple[_Frame, str]]] = []
+        piece: list[str] = []
+        piece_head: list[str] = []
+
+        def close_piece() -> None:
+            if any(_is_insn(line) for line in piece):
+                moved.extend(piece_head[:1] + ["    .cfi_startproc"]
+                             + piece_head[1:] + piece
+                             + ["    .cfi_endproc", "    .popsection"])
+            else:
+                moved.extend(piece_head[:1] + piece + ["    .popsection"])
+            piece.clear()
+            piece_head.clear()
+
+        def open_piece(push: str) -> None:
+            piece_head.extend([push] + self.frame.establish())
+
+        for line in lines:
+            s = line.strip()
+            in_block = any(entry is not None for entry in sections)
+            out = piece if in_block else main
+            if s.startswith(".pushsection"):
+                if s.split(None, 1)[1].startswith(".text"):
+                    if in_block:
+                        close_piece()
+                    sections.append((self.frame.copy(), line))
+                    open_piece(line)
+                else:
+                    sections.append(None)
+                    out.append(line)
+                continue
+            if s == ".popsection" and sections:
+                entry = sections.pop()
+                if entry is None:
+                    out.append(line)
+                    continue
+                close_piece()
+                self.frame = entry[0]
+                outer = [e for e in sections if e is not None]
+                if outer:
+                    open_piece(outer[-1][1])
+                continue
+            if _is_insn(line):
+                before, after = self.step(" ".join(s.split(None, 1)))
+                out.extend(before + [line] + after)
+            else:
+                out.append(line)
+        return main + moved
+
+
+def _is_insn(line: str) -> bool:
+    s = line.strip()
+    return bool(s) and not s.startswith((".", "#")) and not s.endswith(":")
+
+
+def annotate_cfi(lines: list[str]) -> list[str]:
+    """Fill in the frame description of every `.cfi_startproc` ...
+    `.cfi_endproc` function in `lines` (see the module docstring)."""
+    out: list[str] = [CFI_SECTIONS]
+    i = 0
+    while i < len(lines):
+        if lines[i].strip() != ".cfi_startproc":
+            out.append(lines[i])
+            i += 1
+            continue
+        j = i
+        while lines[j].strip() != ".cfi_endproc":
+            j += 1
+        out.extend(_Annotator().annotate(lines[i:j + 1]))
+        i = j + 1
+    return out
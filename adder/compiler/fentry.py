@@ -0,0 +1,191 @@
+"""
+Adder `--fentry` call sites: the table layout the codegen emits and a
+host-side decoder for it.
+
+A `--fentry` build starts every function with
+
+    endbr64                 (when EMIT_ENDBR)
+    call __fentry__         e8 rel32, 5 bytes
+
+and lists the address of every such call in the FENTRY_SECTION
+section, between the global FENTRY_START and FENTRY_END labels: one
+8-byte address per emitted function, in listing order, like Linux's
+`__mcount_loc`. A kernel walks that table at boot to turn each site
+into a 5-byte NOP (FENTRY_NOP), and can later patch a site back into a
+`call` to a tracer of its choosing.
+
+The table holds bare addresses; names come from the ELF symbol table.
+decode_elf() reads a linked image and reports, for every site, the
+function it is in and the state of its five bytes in the file.
+"""
+
+import struct
+from dataclasses import dataclass
+from typing import Optional
+
+
+FENTRY_SECTION = ".data.adder_mcount_loc"
+FENTRY_START = "__adder_mcount_loc_start"
+FENTRY_END = "__adder_mcount_loc_end"
+FENTRY_SYMBOL = "__fentry__"
+FENTRY_CALL = 0xE8
+FENTRY_JMP = 0xE9
+# The recommended 5-byte NOP: nopl 0x0(%rax,%rax,1).
+FENTRY_NOP = bytes.fromhex("0f1f440000")
+FENTRY_SITE_SIZE = 5
+
+_ET_REL = 1
+_SHT_SYMTAB = 2
+_SHT_NOBITS = 8
+_SHF_ALLOC = 2
+_STT_FUNC = 2
+_SECTION = struct.Struct("<IIQQQQIIQQ")
+_SYMBOL = struct.Struct("<IBBHQQ")
+
+
+class FentryDecodeError(Exception):
+    """An image without a readable `--fentry` call-site table."""
+
+
+@dataclass
+class FentrySite:
+    address: int
+    function: str
+    offset: int
+    # "call" (still `call __fentry__`), "nop", "call <sym>" / "jmp <sym>"
+    # (patched to another target) or "bytes <hex>".
+    state: str
+
+
+@dataclass
+class _Section:
+    addr: int
+    offset: int
+    size: int
+    nobits: bool
+
+
+def _cstr(blob: bytes, start: int) -> str:
+    end = blob.index(b"\0", start)
+    return blob[start:end].decode(errors="replace")
+
+
+class _Elf:
+    """The few parts of an ELF64 little-endian image decode_elf needs:
+    allocated sections and the symbol table."""
+
+    def __init__(self, data: bytes):
+        if data[:4] != b"\x7fELF" or data[4:6] != b"\x02\x01":
+            raise FentryDecodeError("not an ELF64 little-endian file")
+        e_type = struct.unpack_from("<H", data, 16)[0]
+        if e_type == _ET_REL:
+            raise FentryDecodeError(
+                "relocatable object: the table is filled in at link "
+                "time, decode the linked image"
+            )
+        shoff = struct.unpack_from("<Q", data, 40)[0]
+        shentsize, shnum = struct.unpack_from("<HH", data, 58)
+        self.data = data
+        self.sections: list[_Section] = []
+        self.symbols: dict[str, int] = {}
+        self.functions: list[tuple[int, int, str]] = []
+        headers = [_SECTION.unpack_from(data, shoff + i * shentsize)
+                   for i in range(shnum)]
+        for (_, kind, flags, addr, offset, size,
+             link, _, _, entsize) in headers:
+            if flags & _SHF_ALLOC:
+                self.sections.append(
+                    _Section(addr, offset, size, kind == _SHT_NOBITS))
+            if kind == _SHT_SYMTAB:
+                strtab = headers[link]
+                names = data[strtab[4]:strtab[4] + strtab[5]]
+                for i in range(size // entsize):
+                    name, info, _, shndx, value, sym_size = \
+                        _SYMBOL.unpack_from(data, offset + i * entsize)
+                    if not name or shndx == 0:
+                        continue
+                    sym = _cstr(names, name)
+                    self.symbols.setdefault(sym, value)
+                    if info & 0xF == _STT_FUNC:
+                        self.functions.append((value, sym_size, sym))
+        self.functions.sort()
+
+    def read(self, address: int, n: int) -> bytes:
+        for sec in self.sections:
+            if sec.addr <= address and address + n <= sec.addr + sec.size:
+                if sec.nobits:
+                    return bytes(n)
+                start = sec.offset + address - sec.addr
+                return self.data[start:start + n]
+        raise FentryDecodeError(f"0x{address:x} is not in the image")
+
+    def function_at(self, address: int) -> tuple[str, int]:
+        best: Optional[tuple[int, int, str]] = None
+        for func in self.functions:
+            if func[0] > address:
+                break
+            best = func
+        if best is None:
+            return "?", address
+        return best[2], address - best[0]
+
+    def name_at(self, address: int) -> str:
+        name, offset = self.function_at(address)
+        return name if offset == 0 else f"{name}+0x{offset:x}"
+
+
+def _site_state(elf: _Elf, address: int, fentry: Optional[int]) -> str:
+    code = elf.read(address, FENTRY_SITE_SIZE)
+    if code == FENTRY_NOP:
+        return "nop"
+    if code[0] in (FENTRY_CALL, FENTRY_JMP):
+        rel = struct.unpack_from("<i", code, 1)[0]
+        target = address + FENTRY_SITE_SIZE + rel
+        if code[0] == FENTRY_CALL and target == fentry:
+            return "call"
+        op = "call" if code[0] == FENTRY_CALL else "jmp"
+        return f"{op} {elf.name_at(target)}"
+    return f"bytes {code.hex()}"
+
+
+def decode_elf(data: bytes) -> list[FentrySite]:
+    """The call sites of a linked `--fentry` image, in table order."""
+    try:
+        elf = _Elf(data)
+    except (struct.error, IndexError, ValueError):
+        raise FentryDecodeError("truncated or malformed ELF file")
+    start = elf.symbols.get(FENTRY_START)
+    end = elf.symbols.get(FENTRY_END)
+    if start is None or end is None:
+        raise FentryDecodeError(
+            f"no {FENTRY_START} / {FENTRY_END}: not built with --fentry"
+        )
+    if (end - start) % 8:
+        raise FentryDecodeError(
+            f"table is {end - start} bytes, not a multiple of 8")
+    raw = elf.read(start, end - start)
+    fentry = elf.symbols.get(FENTRY_SYMBOL)
+    sites = []
+    for (address,) in struct.iter_unpack("<Q", raw):
+        name, offset = elf.function_at(address)
+        sites.append(FentrySite(address, name, offset,
+                                _site_state(elf, address, fentry)))
+    return sites
+
+
+def format_sites(sites: list[FentrySite]) -> str:
+    """One line per site, then how many sites are in each state."""
+    lines = [f"{'address':>18}  {'state':<16}  function"]
+    states: dict[str, int] = {}
+    for site in sites:
+        where = site.function if site.offset == 0 \
+            else f"{site.function}+0x{site.offset:x}"
+        lines.append(f"{site.address:>#18x}  {site.state:<16}  {where}")
+        kind = site.state
+        if " " in kind:
+            kind = "other" if kind.startswith("bytes") else "patched"
+        states[kind] = states.get(kind, 0) + 1
+    summary = ", ".join(f"{n} {kind}" for kind, n in sorted(states.items()))
+    lines.append(f"{len(sites)} call sites" + (f": {summary}" if summary
+                                                else ""))
+    return "\n".join(lines)
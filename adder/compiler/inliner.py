@@ -0,0 +1,424 @@
+"""
+Adder AST-level inliner.
+
+Decides, over the merged Program, which direct calls X86CodeGen should
+expand in place instead of lowering to the SysV shuffle + `call` +
+`pushq %rbp` frame + parameter spills. Three kinds of callee qualify:
+
+  leaf      a function that calls nothing but builtins/intrinsics and
+            whose body is at most INLINE_LEAF_BUDGET AST nodes
+            (one-line accessors, flag tests, small arithmetic helpers)
+  method    a `Class__method` whose symbol is never address-taken and
+            whose body is at most INLINE_METHOD_BUDGET nodes — the
+            `obj.method()` calls gen_method_call lowers
+  (Above INLINE_TINY_BUDGET nodes a leaf or method must also keep
+  size x call sites within INLINE_GROWTH_BUDGET: a 20-node helper
+  called from 2000 table-setup lines stays a call.)
+  static    a module-private (`_name`) function with exactly one call
+            site and no address-taken uses, up to INLINE_STATIC_BUDGET
+            nodes; once that site is expanded the out-of-line copy of
+            a mangled private is dead and the codegen drops it
+
+`@inline` forces a callee regardless of size or call count (it must
+still pass the structural checks, or compilation fails); `@noinline`
+opts out.
+
+Under `--profile-use` the budgets follow the callee's entry count: a
+hot callee gets PROFILE_HOT_INLINE_SCALE times the leaf, method and
+growth budgets, and one the profile saw never entered is only
+expanded when it is tiny.
+
+The planner only decides. The expansion itself lives in
+X86CodeGen.gen_inline_call, which binds the arguments to fresh locals
+and generates an `instantiate()`d copy of the body whose locals carry a
+per-expansion `__inl<N>` suffix, so they never collide with the
+caller's locals or with another expansion of the same callee. Labels
+need no renaming: the body is generated inside the caller's
+FunctionContext, whose new_label() already numbers them per caller.
+"""
+
+import copy
+import dataclasses
+import functools
+import re
+from collections import Counter
+from dataclasses import dataclass
+from typing import Callable, Iterator, Optional
+
+from .prof import Profile
+from .ast_nodes import (
+    Program, FunctionDef, ClassDef, ExternDecl, VarDecl, Parameter,
+    CallExpr, MethodCallExpr, Identifier, StringLiteral, UnaryExpr, UnaryOp,
+    ForStmt, ForUnpackStmt, Span,
+    Type, PointerType, FunctionPointerType, ArrayType, PercpuType,
+    ListType, DictType, TupleType, OptionalType, GenericType, VolatileType,
+    UnionType,
+)
+
+
+# Size budgets, in AST nodes (every Expr and Stmt counts one). A body
+# of at most INLINE_TINY_BUDGET nodes is no bigger than the argument
+# marshalling it replaces, so it is expanded at any number of sites.
+INLINE_TINY_BUDGET = 8
+INLINE_LEAF_BUDGET = 24
+INLINE_METHOD_BUDGET = 32
+INLINE_STATIC_BUDGET = 120
+INLINE_GROWTH_BUDGET = 240
+
+# Nested expansions (an inlined body calling another candidate) stop at
+# this depth; deeper calls stay real calls.
+MAX_INLINE_DEPTH = 4
+
+# --profile-use: budget multiplier for callees the profile calls hot.
+PROFILE_HOT_INLINE_SCALE = 2
+
+# Arguments are bound to locals, so the register-arg limit is not a
+# hard constraint — but a callee with stack-passed args is never small.
+MAX_INLINE_PARAMS = 6
+
+# `asm_volatile("1: ...")`: a label defined by inline asm would be
+# duplicated by every expansion.
+_ASM_LABEL = re.compile(r"(^|[;\n])\s*[\w.$]+:")
+
+_TYPE_NODES = (Type, PointerType, FunctionPointerType, ArrayType,
+               PercpuType, ListType, DictType, TupleType, OptionalType,
+               GenericType, VolatileType, UnionType)
+
+
+@dataclass
+class InlineCandidate:
+    """A callee the codegen may expand at its direct call sites."""
+    symbol: str
+    func: FunctionDef
+    reason: str                 # "leaf", "method", "static", "@inline"
+    size: int
+    # Names the body binds (params, VarDecls, loop vars) — renamed per
+    # expansion — and every other name it references. A call site
+    # whose caller has a local shadowing one of `free_names` is not
+    # expanded: the renamed body would capture the caller's local.
+    local_names: frozenset[str] = frozenset()
+    free_names: frozenset[str] = frozenset()
+    # True when the out-of-line copy may be deleted once every
+    # reference to it has been expanded (single-site mangled statics).
+    drop_body: bool = False
+
+
+@dataclass
+class InlineDecision:
+    """One line of the `--inline-report` output."""
+    symbol: str
+    inlined: bool
+    reason: str
+    size: int
+    forced: bool = False
+    span: Optional[Span] = None
+
+
+@functools.lru_cache(maxsize=None)
+def _field_names(cls: type) -> Optional[tuple[str, ...]]:
+    """Field names of a dataclass type, None for anything else.
+    `dataclasses.fields()` rebuilds its tuple on every call, which
+    dominated every whole-program walk."""
+    if not dataclasses.is_dataclass(cls):
+        return None
+    return tuple(f.name for f in dataclasses.fields(cls))
+
+
+def _children(node) -> Iterator:
+    """Yield the child values of an AST node (the same structural walk
+    as adder.py's _iter_child_nodes)."""
+    names = _field_names(type(node))
+    if names is not None:
+        for name in names:
+            yield getattr(node, name)
+    elif isinstance(node, (list, tuple)):
+        yield from node
+    elif isinstance(node, dict):
+        yield from node.values()
+
+
+def iter_nodes(node) -> Iterator:
+    """Pre-order walk over every AST node below `node`. Types and spans
+    are leaves: nothing under them names a value."""
+    stack = [node]
+    while stack:
+        cur = stack.pop()
+        if cur is None or isinstance(cur, (str, int, float, bool, Span)):
+            continue
+        if isinstance(cur, _TYPE_NODES):
+            continue
+        names = _field_names(type(cur))
+        if names is not None:
+            yield cur
+            stack.extend(getattr(cur, name) for name in reversed(names))
+        elif isinstance(cur, (list, tuple)):
+            stack.extend(reversed(cur))
+        elif isinstance(cur, dict):
+            stack.extend(reversed(list(cur.values())))
+
+
+def node_size(body: list) -> int:
+    """Body size in AST nodes — the unit the budgets are expressed in."""
+    return sum(1 for n in iter_nodes(body) if not isinstance(n, Parameter))
+
+
+def _bound_names(func: FunctionDef) -> set[str]:
+    names = {p.name for p in func.params}
+    for n in iter_nodes(func.body):
+        if isinstance(n, VarDecl):
+            names.add(n.name)
+        elif isinstance(n, ForStmt):
+            names.add(n.var)
+        elif isinstance(n, ForUnpackStmt):
+            names.update(n.vars)
+    return names
+
+
+def instantiate(func: FunctionDef, suffix: str
+                ) -> tuple[list[Parameter], list]:
+    """Deep-copy `func`'s params and body with every bound name renamed
+    to `<name><suffix>`. The original AST is left untouched."""
+    rename = {name: name + suffix for name in _bound_names(func)}
+    params = copy.deepcopy(func.params)
+    body = copy.deepcopy(func.body)
+    for p in params:
+        p.name = rename[p.name]
+    for n in iter_nodes(body):
+        if isinstance(n, Identifier):
+            n.name = rename.get(n.name, n.name)
+        elif isinstance(n, VarDecl):
+            n.name = rename[n.name]
+        elif isinstance(n, ForStmt):
+            n.var = rename[n.var]
+        elif isinstance(n, ForUnpackStmt):
+            n.vars = [rename[v] for v in n.vars]
+    return params, body
+
+
+class InlinePlanner:
+    """Pick the inline candidates of a merged Program.
+
+    `methods` maps each mangled `Class__method` symbol to its
+    FunctionDef. `builtins` are the call names the codegen lowers
+    without a `call` (intrinsics, min/max/..., range) — calling only
+    those still makes a function a leaf. `structs` is the set of class
+    names (a struct-typed parameter is an aggregate). `is_cold` flags
+    one-way-door functions (panic paths) that are never worth
+    expanding. `profile` is the `--profile-use` profile, if any.
+    """
+
+    def __init__(self, program: Program, methods: dict[str, FunctionDef],
+                 builtins: frozenset[str], structs: set[str],
+                 is_cold: Callable[[FunctionDef], bool],
+                 profile: Optional[Profile] = None) -> None:
+        self.program = program
+        self.methods = methods
+        self.builtins = builtins
+        self.structs = structs
+        self.is_cold = is_cold
+        self.profile = profile
+        self.decisions: list[InlineDecision] = []
+        self.calls: Counter = Counter()
+        # `obj.name(...)` sites by method name: without receiver types
+        # this over-counts across classes, which only makes the growth
+        # check more conservative.
+        self.method_calls: Counter = Counter()
+        self.address_taken: set[str] = set()
+
+    def plan(self) -> dict[str, InlineCandidate]:
+        functions: list[tuple[str, FunctionDef, bool]] = []
+        global_names: set[str] = set()
+        for decl in self.program.declarations:
+            if isinstance(decl, FunctionDef):
+                functions.append((decl.name, decl, False))
+                global_names.add(decl.name)
+            elif isinstance(decl, (ExternDecl, VarDecl)):
+                global_names.add(decl.name)
+        for sym, mdef in self.methods.items():
+            functions.append((sym, mdef, True))
+            global_names.add(sym)
+
+        for decl in self.program.declarations:
+            if isinstance(decl, ClassDef):
+                for m in decl.methods:
+                    self._count_refs(m.body)
+            elif isinstance(decl, (FunctionDef, VarDecl)):
+                self._count_refs(decl)
+
+        plan: dict[str, InlineCandidate] = {}
+        for sym, func, is_method in functions:
+            cand = self._consider(sym, func, is_method, global_names)
+            if cand is not None:
+                plan[sym] = cand
+        return plan
+
+    # -- reference counting -------------------------------------------------
+
+    def _count_refs(self, node) -> None:
+        """Direct calls go to `calls`; any other mention of a name (a
+        function pointer stored in a table, passed as a callback, or
+        loaded by `&fn`) marks it address-taken."""
+        stack = [node]
+        while stack:
+            cur = stack.pop()
+            if isinstance(cur, CallExpr) and isinstance(cur.func, Identifier):
+                self.calls[cur.func.name] += 1
+                stack.extend(cur.args)
+                stack.extend(cur.kwargs.values())
+                continue
+            if isinstance(cur, Identifier):
+                self.address_taken.add(cur.name)
+                continue
+            if isinstance(cur, MethodCallExpr):
+                self.method_calls[cur.method] += 1
+            if cur is None or isinstance(cur, (str, int, float, bool, Span)):
+                continue
+            stack.extend(_children(cur))
+
+    # -- policy -------------------------------------------------------------
+
+    def _consider(self, sym: str, func: FunctionDef, is_method: bool,
+                  global_names: set[str]) -> Optional[InlineCandidate]:
+        forced = "inline" in func.decorators
+        size = node_size(func.body)
+
+        def decide(inlined: bool, reason: str) -> None:
+            self.decisions.append(InlineDecision(
+                sym, inlined, reason, size, forced, func.span))
+
+        if "noinline" in func.decorators:
+            decide(False, "@noinline")
+            return None
+        blocker = self._structural_blocker(sym, func, global_names)
+        if blocker is not None:
+            decide(False, blocker)
+            return None
+
+        heat = self.profile.heat(sym) if self.profile else None
+        if heat == "cold" and not forced and size > INLINE_TINY_BUDGET:
+            decide(False, "never entered in the profile")
+            return None
+        scale = PROFILE_HOT_INLINE_SCALE if heat == "hot" else 1
+        leaf_budget = INLINE_LEAF_BUDGET * scale
+        method_budget = INLINE_METHOD_BUDGET * scale
+        growth_budget = INLINE_GROWTH_BUDGET * scale
+
+        source_name = func.orig_name or func.name
+        private = not is_method and source_name.startswith("_")
+        if is_method:
+            sites = self.method_calls[func.name]
+            if func.name == "__init__":
+                # `x: Foo = Foo(args)` constructor sugar.
+                sites += self.calls[sym[:-len("____init__")]]
+        else:
+            sites = self.calls[sym]
+        growth = size * sites
+        too_much_growth = (size > INLINE_TINY_BUDGET
+                           and growth > growth_budget)
+        if forced:
+            reason = "@inline"
+        elif is_method:
+            if sym in self.address_taken:
+                decide(False, "address taken")
+                return None
+            if size > method_budget:
+                decide(False, f"method too large "
+                              f"({size} > {method_budget})")
+                return None
+            if too_much_growth:
+                decide(False, f"would grow code ({size} x {sites} sites "
+                              f"> {growth_budget})")
+                return None
+            reason = "method"
+        elif (size <= leaf_budget and self._is_leaf(func)
+                and not too_much_growth):
+            reason = "leaf"
+        elif (private and self.calls[sym] == 1
+                and sym not in self.address_taken):
+            if size > INLINE_STATIC_BUDGET:
+                decide(False, f"single-call static too large "
+                              f"({size} > {INLINE_STATIC_BUDGET})")
+                return None
+            reason = "static"
+        elif size > leaf_budget:
+            decide(False, f"too large ({size} > {leaf_budget})")
+            return None
+        elif too_much_growth and self._is_leaf(func):
+            decide(False, f"would grow code ({size} x {sites} sites "
+                          f"> {growth_budget})")
+            return None
+        else:
+            decide(False, "not a leaf")
+            return None
+
+        bound = _bound_names(func)
+        free = {n.name for n in iter_nodes(func.body)
+                if isinstance(n, Identifier)} - bound
+        # Only a mangled private (its source `_name` differs from the
+        # emitted symbol) is invisible outside the merged program; a
+        # plain `.globl` may still be called from C or assembly.
+        drop = (not is_method and sym not in self.address_taken
+                and self.calls[sym] == 1 and func.orig_name is not None
+                and func.orig_name != func.name)
+        if heat == "hot":
+            reason += ", hot"
+        decide(True, reason)
+        return InlineCandidate(sym, func, reason, size,
+                               frozenset(bound), frozenset(free), drop)
+
+    def _structural_blocker(self, sym: str, func: FunctionDef,
+                            global_names: set[str]) -> Optional[str]:
+        """Why `func` can never be expanded in place, or None."""
+        if self.is_cold(func):
+            return "cold path"
+        if len(func.params) > MAX_INLINE_PARAMS:
+            return f"more than {MAX_INLINE_PARAMS} parameters"
+        for p in func.params:
+            t = p.param_type
+            if isinstance(t, ArrayType) or (
+                    isinstance(t, Type) and t.name in self.structs):
+                return f"aggregate parameter '{p.name}'"
+        for n in iter_nodes(func.body):
+            if isinstance(n, CallExpr) and isinstance(n.func, Identifier):
+                if n.func.name == sym:
+                    return "recursive"
+                if (n.func.name == "asm_volatile" and n.args
+                        and isinstance(n.args[0], StringLiteral)
+                        and _ASM_LABEL.search(n.args[0].value)):
+                    return "asm_volatile defines a label"
+            elif isinstance(n, UnaryExpr) and n.op is UnaryOp.ADDR:
+                # The caller's stack-protector decision is made from
+                # its own body; an escaping local would go unguarded.
+                return "takes an address"
+            elif isinstance(n, VarDecl) and isinstance(n.var_type, ArrayType):
+                return "array local"
+        shadowing = sorted(_bound_names(func) & global_names)
+        if shadowing:
+            return f"local '{shadowing[0]}' shadows a global"
+        return None
+
+    def _is_leaf(self, func: FunctionDef) -> bool:
+        for n in iter_nodes(func.body):
+            if isinstance(n, MethodCallExpr):
+                return False
+            if isinstance(n, CallExpr) and not (
+                    isinstance(n.func, Identifier)
+                    and n.func.name in self.builtins):
+                return False
+        return True
+
+
+def format_report(decisions: list[InlineDecision],
+                  expansions: Counter, dropped: set[str]) -> str:
+    """Render the `--inline-report` table, one decision per line."""
+    lines = []
+    for d in decisions:
+        if d.inlined:
+            n = expansions[d.symbol]
+            note = ", out-of-line copy dropped" if d.symbol in dropped else ""
+            lines.append(f"inline: {d.symbol}: inlined ({d.reason}, "
+                         f"size {d.size}), {n} call site"
+                         f"{'' if n == 1 else 's'} expanded{note}")
+        else:
+            lines.append(f"inline: {d.symbol}: not inlined: {d.reason}")
+    return "\n".join(lines)
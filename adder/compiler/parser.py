@@ -112,6 +112,18 @@ class Parser:
     # Type parsing
     # -------------------------------------------------------------------------
 
+    def parse_decl_type(self) -> tuple[Type, bool]:
+        """Parse a declaration's type annotation. `Final[T]` marks the
+        variable read-only: returns (T, True)."""
+        if self.check(TokenType.IDENT) and self.current().value == "Final" \
+                and self.peek().type is TokenType.LBRACKET:
+            self.advance()
+            self.advance()
+            inner = self.parse_type()
+            self.expect(TokenType.RBRACKET)
+            return inner, True
+        return self.parse_type(), False
+
     def parse_type(self) -> Type:
         """Parse a type annotation."""
         tok = self.current()
@@ -950,12 +962,13 @@ class Parser:
 
             # Type annotation: x: int32 or x: int32 = value
             if self.match(TokenType.COLON):
-                var_type = self.parse_type()
+                var_type, is_const = self.parse_decl_type()
                 value = None
                 if self.match(TokenType.ASSIGN):
                     value = self.parse_expression()
                 self.expect(TokenType.NEWLINE)
-                return VarDecl(name, var_type, value, span=self.make_span(tok))
+                return VarDecl(name, var_type, value, is_const,
+                               span=self.make_span(tok))
 
             # Assignment: x = value or x += value
             if self.match(TokenType.ASSIGN):
@@ -1020,6 +1033,14 @@ class Parser:
             self.advance()
             return Pattern("_", [], self.make_span(tok))
 
+        # Value alternatives: 1 | -2 | 'a' | NAME
+        if not self.check(TokenType.IDENT) \
+                or self.peek().type is TokenType.PIPE:
+            values = [self.parse_pattern_value()]
+            while self.match(TokenType.PIPE):
+                values.append(self.parse_pattern_value())
+            return Pattern("", [], self.make_span(tok), values)
+
         # Variant with optional bindings: Some(x) or None
         name = self.expect(TokenType.IDENT).value
         bindings = []
@@ -1032,6 +1053,22 @@ class Parser:
 
         return Pattern(name, bindings, self.make_span(tok))
 
+    def parse_pattern_value(self) -> Expr:
+        """One value pattern: an integer or char literal, optionally
+        negated, or a constant name."""
+        tok = self.current()
+        if self.match(TokenType.MINUS):
+            num = self.expect(TokenType.NUMBER)
+            return UnaryExpr(UnaryOp.NEG,
+                             IntLiteral(num.value, self.make_span(num)),
+                             self.make_span(tok))
+        if self.match(TokenType.NUMBER):
+            return IntLiteral(tok.value, self.make_span(tok))
+        if self.match(TokenType.CHAR_LIT):
+            return CharLiteral(tok.value, self.make_span(tok))
+        name = self.expect(TokenType.IDENT).value
+        return Identifier(name, self.make_span(tok))
+
     # -------------------------------------------------------------------------
     # Declaration parsing
     # -------------------------------------------------------------------------
@@ -1345,10 +1382,19 @@ class Parser:
 
         while not self.check(TokenType.EOF):
             try:
-                # Decorators
+                # Decorators. `@packed` is a keyword token; `@align(N)`
+                # is the one decorator with an argument.
                 decorators = []
+                align = None
                 while self.match(TokenType.AT):
-                    dec_name = self.expect(TokenType.IDENT).value
+                    if self.check(TokenType.PACKED):
+                        dec_name = self.advance().value
+                    else:
+                        dec_name = self.expect(TokenType.IDENT).value
+                    if dec_name == "align":
+                        self.expect(TokenType.LPAREN)
+                        align = self.expect(TokenType.NUMBER).value
+                        self.expect(TokenType.RPAREN)
                     decorators.append(dec_name)
                     self.expect(TokenType.NEWLINE)
 
@@ -1372,7 +1418,9 @@ class Parser:
 
                 # Class
                 if self.check(TokenType.CLASS):
-                    declarations.append(self.parse_class(decorators))
+                    cls = self.parse_class(decorators)
+                    cls.align = align
+                    declarations.append(cls)
                     self.skip_newlines()
                     continue
 
@@ -1384,14 +1432,21 @@ class Parser:
 
                 # Global variable
                 if self.check(TokenType.IDENT):
-                    name = self.advance().value
+                    tok = self.advance()
+                    name = tok.value
                     if self.match(TokenType.COLON):
-                        var_type = self.parse_type()
+                        if any(d != "align" for d in decorators):
+                            raise ParseError(
+                                "Only @align(N) applies to a global", tok)
+                        var_type, is_const = self.parse_decl_type()
                         value = None
                         if self.match(TokenType.ASSIGN):
                             value = self.parse_expression()
                         self.expect(TokenType.NEWLINE)
-                        declarations.append(VarDecl(name, var_type, value))
+                        declarations.append(VarDecl(
+                            name, var_type, value, is_const,
+                            span=self.make_span(tok), align=align
+                        ))
                         self.skip_newlines()
                         continue
                     # Back up
@@ -0,0 +1,350 @@
+"""
+Adder profile records: the layout `--instrument` emits and the host-side
+reader for dumps of it.
+
+An instrumented build gets one record per instrumented function in the
+PROF_SECTION section, between the global PROF_START and PROF_END
+labels:
+
+  offset  size  field
+  0       8     entry count (`lock incq` at the function's first byte;
+                0 under --instrument=cycles)
+  8       8     the function's address
+  16      4     record size in bytes (a multiple of 8)
+  20      4     name length
+  24      n     the symbol name, zero-padded to the record size
+
+Records are self-describing, so a raw copy of [PROF_START, PROF_END)
+is all the reader needs — no symbol table, no matching ELF. A kernel
+can hand it out through a /dev-style file, or print it over serial as
+a hex dump; read_dump() takes either.
+
+`--instrument=cycles` adds a call-path table to the per-CPU template,
+between PROF_PCPU_START and PROF_PCPU_END, so every CPU has its own:
+
+  offset  size  field
+  0       8     current node + 1 (0 outside any instrumented call)
+  8       8     node count N
+  64      32    N + 1 nodes; node N collects calls the full table
+                could not place
+
+and each node, one per distinct call path, is
+
+  0       8     key: (parent node + 2) << 32 | low 32 bits of the
+                function address (0 = free; parent -1 = a root call)
+  8       8     calls
+  16      8     inclusive TSC cycles of the calls that returned
+  24      8     the function's address
+
+The flat profile and the folded stacks for a flame graph both come
+from walking those nodes (cycles_profile()).
+
+`adder prof --json` saves merged entry counts as the profile
+`--profile-use` reads back (format_profile / load_profile):
+
+  {"version": 1, "counts": {"<symbol>": <entries>, ...}}
+
+keyed by emitted symbol (`Class__method`, mangled privates).
+"""
+
+import json
+import re
+import struct
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Optional
+
+
+PROF_SECTION = ".data.adder_prof"
+PROF_START = "__adder_prof_start"
+PROF_END = "__adder_prof_end"
+PROF_HEADER_SIZE = 24
+
+PROF_PCPU_START = "__adder_prof_pcpu_start"
+PROF_PCPU_END = "__adder_prof_pcpu_end"
+# Set non-zero once %gs points at a per-CPU area; until then the
+# cycles hooks only take timestamps.
+PROF_ARMED = "__adder_prof_armed"
+PROF_PCPU_HEADER_SIZE = 64
+PROF_NODE_SIZE = 32
+PROF_NODES = 4096
+# Slots a new call path may probe before it is counted as lost.
+PROF_PROBES = 16
+PROF_PCPU_SIZE = PROF_PCPU_HEADER_SIZE + (PROF_NODES + 1) * PROF_NODE_SIZE
+
+PROFILE_VERSION = 1
+# The hottest functions that together make up this share of all
+# entries are "hot" under --profile-use; functions never entered are
+# "cold".
+PROFILE_HOT_FRACTION = 0.99
+
+_HEADER = struct.Struct("<QQII")
+_NODE = struct.Struct("<QQQQ")
+
+
+class ProfDumpError(Exception):
+    """A dump that is not a sequence of profile records."""
+
+
+@dataclass
+class ProfRecord:
+    name: str
+    address: int
+    count: int
+
+
+def prof_record_size(name: str) -> int:
+    """Bytes a record for `name` occupies: header plus padded name."""
+    return PROF_HEADER_SIZE + ((len(name.encode()) + 7) & ~7)
+
+
+_HEX_LINE = re.compile(r"^[0-9a-fA-F\s]*$")
+
+
+def read_dump(data: bytes) -> bytes:
+    """Turn a dump into the raw section bytes.
+
+    Binary input is returned as is. Text input is a hex dump: plain hex
+    (`xxd -p`), `hexdump -C` (leading offset column, trailing `|...|`
+    text column) or `ADDR: bytes` lines. Blank lines are skipped.
+    """
+    try:
+        text = data.decode("ascii")
+    except UnicodeDecodeError:
+        return data
+    if not text.strip() or any(c not in "\t\n\r" and not c.isprintable()
+                               for c in text):
+        return data
+    out = bytearray()
+    offsets = False
+    for lineno, line in enumerate(text.splitlines(), 1):
+        line = line.split("|", 1)[0]
+        if ":" in line:
+            line = line.split(":", 1)[1]
+        tokens = line.split()
+        if tokens == ["*"]:
+            raise ProfDumpError(f"line {lineno}: squeezed repeat "
+                                f"(`*`); dump with hexdump -v")
+        if len(tokens) > 1 and len(tokens[0]) >= 7 \
+                and all(len(t) == 2 for t in tokens[1:]):
+            tokens = tokens[1:]
+            offsets = True
+        elif offsets and len(tokens) == 1:
+            continue  # hexdump's closing line: just the end offset
+        digits = "".join(tokens)
+        if not _HEX_LINE.match(digits) or len(digits) % 2:
+            raise ProfDumpError(f"line {lineno}: not a hex dump line")
+        out += bytes.fromhex(digits)
+    return bytes(out)
+
+
+def parse_records(raw: bytes) -> list[ProfRecord]:
+    """Decode the records in `raw`. Zero padding after the last record
+    (a page-sized device read, say) ends the walk."""
+    records: list[ProfRecord] = []
+    offset = 0
+    while offset + PROF_HEADER_SIZE <= len(raw):
+        count, address, size, name_len = _HEADER.unpack_from(raw, offset)
+        if size == 0:
+            break
+        if size % 8 or size < PROF_HEADER_SIZE + name_len \
+                or offset + size > len(raw):
+            raise ProfDumpError(
+                f"offset {offset}: bad record size {size} "
+                f"(name length {name_len})"
+            )
+        start = offset + PROF_HEADER_SIZE
+        name = raw[start:start + name_len].decode(errors="replace")
+        records.append(ProfRecord(name, address, count))
+        offset += size
+    return records
+
+
+def merge_records(runs: list[list[ProfRecord]]) -> list[ProfRecord]:
+    """Sum the counts of same-named functions over several dumps."""
+    merged: dict[str, ProfRecord] = {}
+    for records in runs:
+        for rec in records:
+            if rec.name in merged:
+                merged[rec.name].count += rec.count
+            else:
+                merged[rec.name] = ProfRecord(rec.name, rec.address,
+                                              rec.count)
+    return list(merged.values())
+
+
+def format_counts_report(records: list[ProfRecord],
+                         top: int = 0) -> str:
+    """Hot-function report: entered functions by count, descending,
+    with their share of all entries and the running total."""
+    hot = sorted((r for r in records if r.count),
+                 key=lambda r: (-r.count, r.name))
+    total = sum(r.count for r in hot)
+    lines = [f"{'count':>14}  {'%':>6}  {'cum%':>6}  function"]
+    cum = 0
+    for rec in hot[:top or None]:
+        cum += rec.count
+        lines.append(f"{rec.count:>14}  {100 * rec.count / total:>6.2f}  "
+                     f"{100 * cum / total:>6.2f}  {rec.name}")
+    lines.append(f"{total} entries into {len(hot)} of {len(records)} "
+                 f"instrumented functions")
+    return "\n".join(lines)
+
+
+@dataclass
+class ProfNode:
+    parent: int   # node index, -1 for a root call
+    address: int
+    calls: int
+    cycles: int
+
+
+def parse_pcpu_table(raw: bytes) -> dict[int, ProfNode]:
+    """Decode one CPU's call-path table into its used nodes, by index.
+    The lost-call node appears at index N, address 0, when it has
+    calls."""
+    if len(raw) < PROF_PCPU_HEADER_SIZE:
+        raise ProfDumpError("per-CPU table shorter than its header")
+    nodes = struct.unpack_from("<Q", raw, 8)[0]
+    want = PROF_PCPU_HEADER_SIZE + (nodes + 1) * PROF_NODE_SIZE
+    if nodes == 0 or len(raw) < want:
+        raise ProfDumpError(
+            f"per-CPU table of {len(raw)} bytes, header says {nodes} "
+            f"nodes ({want} bytes)"
+        )
+    table: dict[int, ProfNode] = {}
+    for i in range(nodes + 1):
+        key, calls, cycles, address = _NODE.unpack_from(
+            raw, PROF_PCPU_HEADER_SIZE + i * PROF_NODE_SIZE)
+        if i == nodes:
+            if calls:
+                table[i] = ProfNode(-1, 0, calls, cycles)
+        elif key:
+            table[i] = ProfNode((key >> 32) - 2, address, calls, cycles)
+    return table
+
+
+@dataclass
+class CyclesRow:
+    name: str
+    calls: int = 0
+    inclusive: int = 0
+    self_cycles: int = 0
+
+
+def cycles_profile(records: list[ProfRecord],
+                   tables: list[dict[int, ProfNode]]
+                   ) -> tuple[list[CyclesRow], dict[str, int]]:
+    """Merge per-CPU call-path tables into a flat profile and folded
+    stacks (`a;b;c self-cycles`, the flame graph input).
+
+    A node's self time is its inclusive cycles minus its children's.
+    A function's inclusive time only counts its outermost frames, so a
+    recursive function is not counted once per level.
+    """
+    names = {r.address: r.name for r in records}
+    rows: dict[str, CyclesRow] = {}
+    folded: dict[str, int] = defaultdict(int)
+    for table in tables:
+        child_cycles: dict[int, int] = defaultdict(int)
+        for node in table.values():
+            child_cycles[node.parent] += node.cycles
+
+        def name_of(i: int) -> str:
+            if i not in table:
+                return "[unknown]"
+            addr = table[i].address
+            if addr == 0:
+                return "[lost]"
+            return names.get(addr, f"0x{addr:x}")
+
+        for i, node in table.items():
+            path = [name_of(i)]
+            seen = {i}
+            p = node.parent
+            while p != -1:
+                path.append(name_of(p))
+                if p not in table or p in seen:
+                    break
+                seen.add(p)
+                p = table[p].parent
+            path.reverse()
+            own = max(0, node.cycles - child_cycles[i])
+            row = rows.setdefault(path[-1], CyclesRow(path[-1]))
+            row.calls += node.calls
+            row.self_cycles += own
+            if path[-1] not in path[:-1]:
+                row.inclusive += node.cycles
+            if own:
+                folded[";".join(path)] += own
+    return list(rows.values()), dict(folded)
+
+
+def format_cycles_report(rows: list[CyclesRow], top: int = 0) -> str:
+    """Flat profile: functions by self cycles, descending."""
+    hot = sorted((r for r in rows if r.calls or r.self_cycles),
+                 key=lambda r: (-r.self_cycles, -r.inclusive, r.name))
+    total = sum(r.self_cycles for r in hot)
+    lines = [f"{'calls':>12}  {'inclusive':>16}  {'self':>16}  "
+             f"{'self%':>6}  function"]
+    for row in hot[:top or None]:
+        share = 100 * row.self_cycles / total if total else 0.0
+        lines.append(f"{row.calls:>12}  {row.inclusive:>16}  "
+                     f"{row.self_cycles:>16}  {share:>6.2f}  {row.name}")
+    lines.append(f"{total} cycles in {len(hot)} functions")
+    return "\n".join(lines)
+
+
+def format_folded(folded: dict[str, int]) -> str:
+    """One `frame;frame;frame cycles` line per call path, the input
+    format of flamegraph.pl and its ports."""
+    return "".join(f"{path} {n}\n" for path, n in sorted(folded.items()))
+
+
+@dataclass
+class Profile:
+    """A `--profile-use` profile: entry counts by symbol, with the hot
+    functions ranked hottest first and the never-entered ones."""
+    counts: dict[str, int]
+    hot: dict[str, int]
+    cold: frozenset[str]
+
+    def heat(self, sym: str) -> Optional[str]:
+        """"hot", "cold", or None for lukewarm and unprofiled code."""
+        if sym in self.hot:
+            return "hot"
+        if sym in self.cold:
+            return "cold"
+        return None
+
+
+def format_profile(records: list[ProfRecord]) -> str:
+    """The JSON profile for merged `--instrument=counts` records."""
+    counts = {r.name: r.count for r in records}
+    return json.dumps({"version": PROFILE_VERSION, "counts": counts},
+                      indent=1, sort_keys=True) + "\n"
+
+
+def load_profile(text: str) -> Profile:
+    """Parse a format_profile() document and rank its functions."""
+    try:
+        doc = json.loads(text)
+    except ValueError as e:
+        raise ProfDumpError(f"not JSON: {e}")
+    if not isinstance(doc, dict) or doc.get("version") != PROFILE_VERSION:
+        raise ProfDumpError(f"not a version {PROFILE_VERSION} profile")
+    counts = doc.get("counts")
+    if not isinstance(counts, dict) or not all(
+            isinstance(n, int) and not isinstance(n, bool) and n >= 0
+            for n in counts.values()):
+        raise ProfDumpError("`counts` must map symbols to entry counts")
+    total = sum(counts.values())
+    hot: dict[str, int] = {}
+    covered = 0
+    for sym, n in sorted(counts.items(), key=lambda kv: (-kv[1], kv[0])):
+        if n == 0 or covered >= PROFILE_HOT_FRACTION * total:
+            break
+        hot[sym] = len(hot)
+        covered += n
+    cold = frozenset(sym for sym, n in counts.items() if n == 0)
+    return Profile(dict(counts), hot, cold)
@@ -0,0 +1,379 @@
+"""
+Adder `--size-report`: where a build's bytes go, per module and per
+symbol, measured from the assembled object.
+
+`adder compile --size-report` assembles the compiler's output once
+more into a relocatable object and splits every allocated section
+among the symbols in it. A symbol owns the bytes from its address up
+to the next symbol in the same section, so alignment padding is
+charged to the symbol before it and the rows add up to the section
+sizes exactly. Sections are binned by their flags:
+
+  text    executable              .text, .text.hot, .text.unlikely
+  rodata  read-only               .rodata, .modinfo
+  data    writable                .data, .data..percpu, .data.adder_prof
+  bss     writable, no file bytes .bss
+
+The codegen's `.`-prefixed labels are not owners. In code they are
+branch targets inside the function before them. In data they are
+string literals and jump tables, charged to the symbol whose
+relocation first refers to them, so a function's rodata column is the
+literals it uses; any left over are `(anonymous)`.
+
+Each symbol belongs to the module whose FunctionDef / VarDecl /
+ClassDef declares it (symbol_owners() in compiler/adder.py), and so
+does its out-of-line `<function>.cold` part; what the codegen adds on
+its own (the `--instrument` runtime, per-CPU template
+bounds) belongs to `(compiler)`. Only the Adder object is measured:
+hand-written .S files and the runtime are not in it.
+
+`--size-json` saves the rows (format_sizes / load_sizes) and
+`adder size OLD NEW` reports what changed between two builds:
+
+  {"version": 1, "symbols": [{"symbol": "<emitted name>",
+    "module": "<dotted path>", "name": "<source name>",
+    "text": N, "rodata": N, "data": N, "bss": N}, ...]}
+"""
+
+import bisect
+import json
+import struct
+from collections import defaultdict
+from dataclasses import dataclass
+
+
+SIZE_KINDS = ("text", "rodata", "data", "bss")
+SIZES_VERSION = 1
+COMPILER_MODULE = "(compiler)"
+ANONYMOUS = "(anonymous)"
+# Symbols listed by a compile-time report; `adder size --top` for more.
+SIZE_REPORT_TOP = 20
+
+_ET_REL = 1
+_SHT_SYMTAB = 2
+_SHT_RELA = 4
+_SHT_NOBITS = 8
+_SHF_WRITE = 1
+_SHF_ALLOC = 2
+_SHF_EXECINSTR = 4
+_STT_SECTION = 3
+_STT_FILE = 4
+# PC-relative relocations: the addend is the target minus the 4-byte
+# field the reference patches.
+_R_PC_RELATIVE = frozenset({2, 4})     # R_X86_64_PC32, R_X86_64_PLT32
+_SECTION = struct.Struct("<IIQQQQIIQQ")
+_SYMBOL = struct.Struct("<IBBHQQ")
+_RELA = struct.Struct("<QQq")
+
+
+class SizeReportError(Exception):
+    """An object or saved report the size report cannot read."""
+
+
+@dataclass
+class SymbolSize:
+    symbol: str
+    module: str
+    name: str         # as written in source, before private mangling
+    text: int = 0
+    rodata: int = 0
+    data: int = 0
+    bss: int = 0
+
+    @property
+    def total(self) -> int:
+        return self.text + self.rodata + self.data + self.bss
+
+
+def _cstr(blob: bytes, start: int) -> str:
+    end = blob.index(b"\0", start)
+    return blob[start:end].decode(errors="replace")
+
+
+def _section_kind(sh_type: int, flags: int) -> str:
+    if flags & _SHF_EXECINSTR:
+        return "text"
+    if sh_type == _SHT_NOBITS:
+        return "bss"
+    if flags & _SHF_WRITE:
+        return "data"
+    return "rodata"
+
+
+def _owner_of(symbol: str,
+              owners: dict[str, tuple[str, str]]) -> tuple[str, str]:
+    if symbol in owners:
+        return owners[symbol]
+    base, dot, part = symbol.partition(".")
+    if dot and base in owners:
+        module, source = owners[base]
+        return module, f"{source}.{part}"
+    return COMPILER_MODULE, symbol
+
+
+def _owner_at(extents: list[tuple[int, int, str]], starts: list[int],
+              offset: int) -> str:
+    i = bisect.bisect_right(starts, offset) - 1
+    if i < 0 or offset >= extents[i][1]:
+        return ""
+    return extents[i][2]
+
+
+def measure_object(data: bytes,
+                   owners: dict[str, tuple[str, str]]) -> list[SymbolSize]:
+    """Split the allocated sections of a relocatable ELF64 object among
+    its symbols. `owners` maps a symbol to (module, source name)."""
+    try:
+        return _measure(data, owners)
+    except (struct.error, IndexError, ValueError):
+        raise SizeReportError("truncated or malformed ELF file")
+
+
+def _measure(data: bytes,
+             owners: dict[str, tuple[str, str]]) -> list[SymbolSize]:
+    if data[:4] != b"\x7fELF" or data[4:6] != b"\x02\x01":
+        raise SizeReportError("not an ELF64 little-endian file")
+    if struct.unpack_from("<H", data, 16)[0] != _ET_REL:
+        raise SizeReportError(
+            "not a relocatable object: linked images have lost which "
+            "module a local label came from"
+        )
+    shoff = struct.unpack_from("<Q", data, 40)[0]
+    shentsize, shnum = struct.unpack_from("<HH", data, 58)
+    headers = [_SECTION.unpack_from(data, shoff + i * shentsize)
+               for i in range(shnum)]
+
+    kinds: dict[int, str] = {}
+    for i, (_, sh_type, flags, _, _, size, _, _, _, _) in \
+            enumerate(headers):
+        if flags & _SHF_ALLOC and size:
+            kinds[i] = _section_kind(sh_type, flags)
+
+    # Every symbol-table entry, by index, for the relocations below:
+    # (name, section index, value, type).
+    symbols: list[tuple[str, int, int, int]] = []
+    for (_, sh_type, _, _, offset, size, link, _, _, entsize) in headers:
+        if sh_type != _SHT_SYMTAB:
+            continue
+        strtab = headers[link]
+        names = data[strtab[4]:strtab[4] + strtab[5]]
+        for i in range(size // entsize):
+            name, info, _, shndx, value, _ = \
+                _SYMBOL.unpack_from(data, offset + i * entsize)
+            symbols.append((_cstr(names, name) if name else "", shndx,
+                            value, info & 0xF))
+        break
+
+    # Owner extents per section. Of several symbols at one address
+    # (a table's start marker and its first entry), a declared symbol
+    # gets the bytes, then the last one in the symbol table.
+    placed: dict[int, list[tuple[int, bool, int, str]]] = defaultdict(list)
+    for index, (name, shndx, value, st_type) in enumerate(symbols):
+        if not name or shndx not in kinds \
+                or st_type in (_STT_SECTION, _STT_FILE):
+            continue
+        if kinds[shndx] == "text" and name.startswith("."):
+            continue
+        placed[shndx].append((value, name in owners, index, name))
+    extents: dict[int, list[tuple[int, int, str]]] = {}
+    for shndx in kinds:
+        size = headers[shndx][5]
+        syms = sorted(placed[shndx])
+        spans = []
+        if not syms or syms[0][0] > 0:
+            spans.append((0, syms[0][0] if syms else size, ANONYMOUS))
+        for i, (value, _, _, name) in enumerate(syms):
+            end = syms[i + 1][0] if i + 1 < len(syms) else size
+            spans.append((value, end, name))
+        extents[shndx] = spans
+    starts = {shndx: [s[0] for s in spans]
+              for shndx, spans in extents.items()}
+
+    # A data label goes to the first symbol that refers to it.
+    referrer: dict[str, str] = {}
+    for (_, sh_type, _, _, offset, size, _, info, _, entsize) in headers:
+        if sh_type != _SHT_RELA or info not in extents:
+            continue
+        for i in range(size // entsize):
+            r_offset, r_info, addend = \
+                _RELA.unpack_from(data, offset + i * entsize)
+            name, shndx, _, st_type = symbols[r_info >> 32]
+            if st_type == _STT_SECTION:
+                if shndx not in extents:
+                    continue
+                if r_info & 0xFFFFFFFF in _R_PC_RELATIVE:
+                    addend += 4
+                name = _owner_at(extents[shndx], starts[shndx], addend)
+            if not name.startswith(".") or name in referrer:
+                continue
+            by = _owner_at(extents[info], starts[info], r_offset)
+            if by and by != name:
+                referrer[name] = by
+
+    def owner_of(name: str) -> str:
+        seen = set()
+        while name.startswith(".") and name not in seen:
+            seen.add(name)
+            name = referrer.get(name, ANONYMOUS)
+        return ANONYMOUS if name.startswith(".") else name
+
+    rows: dict[str, SymbolSize] = {}
+    for shndx, spans in extents.items():
+        for start, end, name in spans:
+            if end == start:
+                continue
+            sym = owner_of(name)
+            row = rows.get(sym)
+            if row is None:
+                module, source = _owner_of(sym, owners)
+                row = rows[sym] = SymbolSize(sym, module, source)
+            kind = kinds[shndx]
+            setattr(row, kind, getattr(row, kind) + end - start)
+    return sorted(rows.values(), key=lambda r: (-r.total, r.symbol))
+
+
+def module_sizes(rows: list[SymbolSize]) -> list[SymbolSize]:
+    """The rows summed per module, largest first."""
+    modules: dict[str, SymbolSize] = {}
+    for row in rows:
+        total = modules.setdefault(
+            row.module, SymbolSize(row.module, row.module, row.module))
+        for kind in SIZE_KINDS:
+            setattr(total, kind, getattr(total, kind) + getattr(row, kind))
+    return sorted(modules.values(), key=lambda r: (-r.total, r.symbol))
+
+
+def duplicate_names(rows: list[SymbolSize]) -> list[list[SymbolSize]]:
+    """Functions of the same source name in more than one module (the
+    same private helper copied into each), by bytes wasted."""
+    by_name: dict[str, list[SymbolSize]] = defaultdict(list)
+    for row in rows:
+        if row.text and row.module != COMPILER_MODULE:
+            by_name[row.name].append(row)
+    dups = [sorted(group, key=lambda r: r.module)
+            for group in by_name.values() if len(group) > 1]
+    return sorted(dups, key=lambda g: (-sum(r.total for r in g),
+                                       g[0].name))
+
+
+def _size_columns(row: SymbolSize) -> str:
+    return "".join(f"{getattr(row, kind):>10}" for kind in SIZE_KINDS) \
+        + f"{row.total:>10}"
+
+
+def _header(label: str) -> str:
+    return f"{label:<40}" + "".join(f"{k:>10}" for k in SIZE_KINDS) \
+        + f"{'total':>10}"
+
+
+def format_size_report(rows: list[SymbolSize],
+                       top: int = SIZE_REPORT_TOP) -> str:
+    """Bytes per module, the `top` largest symbols (0: all), and
+    helpers that more than one module carries a copy of."""
+    modules = module_sizes(rows)
+    lines = [_header("module")]
+    for mod in modules:
+        lines.append(f"{mod.module:<40}{_size_columns(mod)}")
+    everything = SymbolSize("", "", "")
+    for kind in SIZE_KINDS:
+        setattr(everything, kind, sum(getattr(m, kind) for m in modules))
+    lines.append(f"{'total':<40}{_size_columns(everything)}")
+    lines.append("")
+    lines.append(_header("symbol") + "  module")
+    for row in rows[:top or None]:
+        lines.append(f"{row.symbol:<40}{_size_columns(row)}  {row.module}")
+    lines.append(f"{len(rows)} symbols in {len(modules)} modules")
+    dups = duplicate_names(rows)
+    if dups:
+        lines.append("")
+        lines.append("defined in more than one module:")
+        for group in dups:
+            where = ", ".join(r.module for r in group)
+            lines.append(f"  {group[0].name}: {len(group)} copies, "
+                         f"{sum(r.total for r in group)} bytes ({where})")
+    return "\n".join(lines)
+
+
+def _delta(old: int, new: int) -> str:
+    if not old:
+        return "new" if new else "0"
+    return f"{100 * (new - old) / old:+.1f}%"
+
+
+def _changes(old: SymbolSize, new: SymbolSize) -> str:
+    return ", ".join(
+        f"{kind} {getattr(new, kind) - getattr(old, kind):+d}"
+        for kind in SIZE_KINDS if getattr(new, kind) != getattr(old, kind))
+
+
+def format_size_diff(old_rows: list[SymbolSize],
+                     new_rows: list[SymbolSize], top: int = 0) -> str:
+    """What changed between two builds: per module, then per symbol
+    (the `top` largest changes, 0: all), each with the sections that
+    moved; symbols only one build has are `(new)` / `(gone)`."""
+    lines = []
+    for label, old, new, key in (
+            ("module", module_sizes(old_rows), module_sizes(new_rows),
+             lambda r: r.module),
+            ("symbol", old_rows, new_rows, lambda r: r.symbol)):
+        before = {key(r): r for r in old}
+        after = {key(r): r for r in new}
+        changed = []
+        for name in before.keys() | after.keys():
+            empty = SymbolSize(name, "", name)
+            a = before.get(name, empty)
+            b = after.get(name, empty)
+            if any(getattr(a, k) != getattr(b, k) for k in SIZE_KINDS):
+                changed.append((name, a, b))
+        changed.sort(key=lambda c: (-abs(c[2].total - c[1].total), c[0]))
+        if label == "symbol":
+            lines.append("")
+            changed = changed[:top or None]
+        lines.append(f"{label:<40}{'old':>10}{'new':>10}{'delta':>10}"
+                     f"{'':>8}  sections")
+        for name, a, b in changed:
+            tag = ""
+            if label == "symbol":
+                tag = " (new)" if name not in before else \
+                    " (gone)" if name not in after else ""
+            lines.append(f"{name + tag:<40}{a.total:>10}{b.total:>10}"
+                         f"{b.total - a.total:>+10}"
+                         f"{_delta(a.total, b.total):>8}  {_changes(a, b)}")
+    old_total = sum(r.total for r in old_rows)
+    new_total = sum(r.total for r in new_rows)
+    lines.append(f"total {old_total} -> {new_total} bytes "
+                 f"({new_total - old_total:+d}, "
+                 f"{_delta(old_total, new_total)})")
+    return "\n".join(lines)
+
+
+def format_sizes(rows: list[SymbolSize]) -> str:
+    """The JSON document `--size-json` writes, one symbol per line."""
+    symbols = ",\n".join(
+        json.dumps({"symbol": r.symbol, "module": r.module, "name": r.name,
+                    **{kind: getattr(r, kind) for kind in SIZE_KINDS}})
+        for r in rows)
+    return f'{{"version": {SIZES_VERSION}, "symbols": [\n{symbols}\n]}}\n'
+
+
+def load_sizes(text: str) -> list[SymbolSize]:
+    """Parse a format_sizes() document."""
+    try:
+        doc = json.loads(text)
+    except ValueError as e:
+        raise SizeReportError(f"not JSON: {e}")
+    if not isinstance(doc, dict) or doc.get("version") != SIZES_VERSION:
+        raise SizeReportError(f"not a version {SIZES_VERSION} size report")
+    rows = []
+    for entry in doc.get("symbols") or []:
+        try:
+            row = SymbolSize(entry["symbol"], entry["module"],
+                             entry["name"],
+                             *(entry[kind] for kind in SIZE_KINDS))
+        except (KeyError, TypeError):
+            raise SizeReportError(f"malformed symbol entry: {entry!r}")
+        if not all(isinstance(getattr(row, k), int) and getattr(row, k) >= 0
+                   for k in SIZE_KINDS):
+            raise SizeReportError(f"sizes must be byte counts: {entry!r}")
+        rows.append(row)
+    return rows
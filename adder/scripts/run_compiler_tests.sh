@@ -53,6 +53,28 @@ TESTS=(
     "unsupported_rejected:bash scripts/test_compiler_unsupported_rejected.sh"
     "string_concat:bash scripts/test_compiler_string_concat.sh"
     "augmented_assign:bash scripts/test_compiler_augmented_assign.sh"
+    "strength_reduce:bash scripts/test_compiler_strength_reduce.sh"
+    "peephole:bash scripts/test_compiler_peephole.sh"
+    "inline:bash scripts/test_compiler_inline.sh"
+    "frame_elision:bash scripts/test_compiler_frame_elision.sh"
+    "loop_opt:bash scripts/test_compiler_loop_opt.sh"
+    "match:bash scripts/test_compiler_match.sh"
+    "static_init:bash scripts/test_compiler_static_init.sh"
+    "final:bash scripts/test_compiler_final.sh"
+    "atomic:bash scripts/test_compiler_atomic.sh"
+    "bitops:bash scripts/test_compiler_bitops.sh"
+    "asm_operands:bash scripts/test_compiler_asm_operands.sh"
+    "bulkmem:bash scripts/test_compiler_bulkmem.sh"
+    "percpu_access:bash scripts/test_compiler_percpu_access.sh"
+    "layout:bash scripts/test_compiler_layout.sh"
+    "instrument:bash scripts/test_compiler_instrument.sh"
+    "instrument_cycles:bash scripts/test_compiler_instrument_cycles.sh"
+    "fentry:bash scripts/test_compiler_fentry.sh"
+    "profile_use:bash scripts/test_compiler_profile_use.sh"
+    "branch_hints:bash scripts/test_compiler_branch_hints.sh"
+    "debug_info:bash scripts/test_compiler_debug_info.sh"
+    "linux_user:bash scripts/test_compiler_linux_user.sh"
+    "size_report:bash scripts/test_compiler_size_report.sh"
 )
 
 results=()
@@ -0,0 +1,192 @@
+#!/usr/bin/env bash
+# scripts/test_compiler_asm_operands.sh — asm_volatile with operands
+#
+# Background: asm_volatile emitted a zero-operand string, so rdtsc,
+# cpuid, rdmsr/wrmsr, invlpg and friends each needed a .S helper and a
+# call. asm_volatile(template, asm_out(...), asm_in(...),
+# asm_clobber(...)) is the GCC extended-asm shape: operands are bound
+# to registers by constraint letter, outputs are written back to
+# lvalues, and callee-saved registers the asm touches are saved around
+# it.
+#
+# This is a HOST-SIDE test: compile the fixture, check the listing and
+# the rejected forms, then link the asm against a C driver that checks
+# every entry point (cpuid against <cpuid.h>).
+#
+# PASS criterion: asm shape + rejection checks hold, the driver prints
+# ALL PASS, exit 0.
+
+set -uo pipefail
+cd "$(dirname "$0")/.."
+ROOT="$(pwd)"
+TMP="$(mktemp -d)"
+trap "rm -rf $TMP" EXIT
+
+FIX=tests/test_compiler_asm_operands.ad
+
+echo "[asm_operands] (1/4) Compile fixture to x86_64 asm"
+if ! python3 -m compiler.adder asm --target=x86_64-adder-user \
+        "$FIX" -o "$TMP/out.s" >"$TMP/asm.log" 2>&1; then
+    echo "[asm_operands] FAIL: fixture did not compile to asm"
+    cat "$TMP/asm.log"
+    exit 1
+fi
+
+echo "[asm_operands] (2/4) Asm-shape sanity check"
+# body FN — the listing of one function.
+body() { sed -n "/^$1:/,/\.size $1,/p" "$TMP/out.s"; }
+fail=0
+expect() {  # expect FN REGEX WHAT
+    if ! body "$1" | grep -qE "$2"; then
+        echo "[asm_operands] FAIL: $1: $3"
+        fail=1
+    fi
+}
+expect rdtsc '^\s+rdtsc$' "no inline rdtsc"
+expect cpuid '^\s+pushq %rbx$' "%rbx not saved around cpuid"
+expect cpuid '^\s+popq %rbx$' "%rbx not restored after cpuid"
+expect scaled_add '^\s+leaq \(%r8,%r9,4\), %r8$' "%c operand / r registers wrong"
+expect scaled_add '^\s+addq \$4, %r8$' "i operand not an immediate"
+expect swap32 '^\s+bswap %r8d$' "uint32 operand not 32 bits wide"
+expect low_byte_to_q '^\s+movzbq %r9b, %r8$' "%q / byte operand wrong"
+expect bits2 '^\s+andq %rax, %r9$' "%% not a literal %"
+expect loop_sum '^\s+pushq %rbx$' "clobbered %rbx not saved in the loop"
+labels=$(body bits2 | grep -cE '^\s*1[0-9]+:$')
+if [ "$labels" -ne 2 ]; then
+    echo "[asm_operands] FAIL: bits2 has $labels %= loop labels, want 2"
+    fail=1
+fi
+if body loop_sum | grep -qE '^\s+call'; then
+    echo "[asm_operands] FAIL: plus_one was not inlined"
+    fail=1
+fi
+if grep -qE '^\s+call' "$TMP/out.s"; then
+    echo "[asm_operands] FAIL: an asm helper is still a call"
+    fail=1
+fi
+[ "$fail" -eq 0 ] || exit 1
+echo "[asm_operands] OK: operands bound, widths and modifiers honoured, %rbx saved"
+
+echo "[asm_operands] (3/4) Rejected forms"
+CASES=(
+"constraint|def f(x: int64):
+    asm_volatile(\"nop\", asm_out(\"=q\", x))
+"
+"outside|def f(x: int64) -> int64:
+    return asm_in(\"r\", x)
+"
+"not_constant|def f(x: int64):
+    asm_volatile(\"nop %0\", asm_in(\"i\", x))
+"
+"conflict|def f(x: int64, y: int64):
+    asm_volatile(\"nop\", asm_in(\"a\", x), asm_in(\"a\", y))
+"
+"clobbered|def f(x: int64):
+    asm_volatile(\"nop\", asm_in(\"c\", x), asm_clobber(\"rcx\"))
+"
+"range|def f(x: int64):
+    asm_volatile(\"incq %1\", asm_out(\"+r\", x))
+"
+"escape|def f(x: int64):
+    asm_volatile(\"movq %rax, %0\", asm_out(\"=r\", x))
+"
+"frame_reg|def f(x: int64):
+    asm_volatile(\"nop\", asm_in(\"r\", x), asm_clobber(\"rsp\"))
+"
+"not_lvalue|def f(x: int64):
+    asm_volatile(\"nop\", asm_out(\"=r\", x + 1))
+"
+"final|K: Final[int64] = 1
+def f():
+    asm_volatile(\"incq %0\", asm_out(\"+r\", K))
+"
+)
+for entry in "${CASES[@]}"; do
+    name="${entry%%|*}"
+    printf '%s' "${entry#*|}" > "$TMP/case_$name.ad"
+    if python3 -m compiler.adder asm --target=x86_64-adder-user \
+            "$TMP/case_$name.ad" -o "$TMP/case_$name.s" \
+            >"$TMP/case_$name.log" 2>&1; then
+        echo "[asm_operands] FAIL: $name compiled cleanly"
+        exit 1
+    fi
+    if ! grep -qE "x86: .*(asm|Final)" "$TMP/case_$name.log"; then
+        echo "[asm_operands] FAIL: $name was not rejected with an asm CodeGenError"
+        cat "$TMP/case_$name.log"
+        exit 1
+    fi
+done
+echo "[asm_operands] OK: bad constraints / placement / conflicts / templates / lvalues rejected"
+
+echo "[asm_operands] (4/4) Link with host C driver and run"
+cat > "$TMP/driver.c" <<'CEOF'
+#include <stdio.h>
+#include <stdint.h>
+#include <cpuid.h>
+
+typedef struct { uint32_t eax, ebx, ecx, edx; } Regs;
+extern int64_t counter;
+uint64_t rdtsc(void);
+void cpuid(uint32_t, uint32_t, Regs *);
+int64_t scaled_add(int64_t, int64_t), bump(void), xchg(int64_t *, int64_t);
+uint32_t swap32(uint32_t);
+int64_t low_byte_to_q(uint8_t), bits2(uint64_t, uint64_t);
+int64_t loop_sum(int64_t);
+void split(uint64_t, uint32_t *);
+
+static int fails;
+#define CHECK(got, want) do {                                             \
+    int64_t g = (int64_t)(got), w = (int64_t)(want);                      \
+    if (g != w && fails++ < 20)                                           \
+        printf("[asm_operands]   %s = %lld, want %lld\n", #got,          \
+               (long long)g, (long long)w);                               \
+} while (0)
+
+int main(void) {
+    uint64_t t0 = rdtsc(), t1 = rdtsc();
+    CHECK(t1 >= t0, 1);
+    CHECK(t0 != 0, 1);
+
+    Regs r = {0};
+    unsigned a, b, c, d;
+    __cpuid_count(0, 0, a, b, c, d);
+    cpuid(0, 0, &r);
+    CHECK(r.eax, a); CHECK(r.ebx, b); CHECK(r.ecx, c); CHECK(r.edx, d);
+    __cpuid_count(7, 0, a, b, c, d);
+    cpuid(7, 0, &r);
+    CHECK(r.ebx, b); CHECK(r.ecx, c);
+
+    CHECK(scaled_add(10, 4), 10 + 4 * 4 + 4);
+    CHECK(scaled_add(-5, -2), -5 - 2 * 4 + 4);
+    counter = 41;
+    CHECK(bump(), 42);
+    CHECK(counter, 42);
+    int64_t cell = 7;
+    CHECK(xchg(&cell, 99), 7);
+    CHECK(cell, 99);
+    CHECK(swap32(0x11223344u), 0x44332211u);
+    CHECK(low_byte_to_q(0xfe), 0xfe);
+    CHECK(bits2(0, 0xff00ff), 16);
+    CHECK(bits2(0xffffffffffffffffULL, 5), 6402);
+    CHECK(loop_sum(100), 100 * 101 / 2);
+    uint32_t halves[2] = {0, 0};
+    split(0x0123456789abcdefULL, halves);
+    CHECK(halves[0], 0x89abcdefu);
+    CHECK(halves[1], 0x01234567u);
+
+    printf("[asm_operands] %s\n", fails == 0 ? "ALL PASS" : "SOME FAILED");
+    return fails == 0 ? 0 : 1;
+}
+CEOF
+if ! gcc -O1 "$TMP/driver.c" "$TMP/out.s" -o "$TMP/run" 2>"$TMP/link.log"; then
+    echo "[asm_operands] FAIL: asm did not link against the C driver"
+    cat "$TMP/link.log"
+    exit 1
+fi
+if ! "$TMP/run"; then
+    echo "[asm_operands] FAIL: wrong values"
+    exit 1
+fi
+
+echo "[asm_operands] PASS"
+exit 0
@@ -0,0 +1,225 @@
+#!/usr/bin/env bash
+# scripts/test_compiler_atomic.sh — atomic and memory-ordering intrinsics
+#
+# Background: every lock acquire, refcount drop and per-CPU counter bump
+# called a hand-written .S helper. atomic_add / atomic_fetch_add /
+# atomic_cas / atomic_xchg / atomic_inc_and_test / atomic_dec_and_test
+# now lower to a single `lock`-prefixed instruction sized by the
+# pointer's element type, and smp_mb / smp_rmb / smp_wmb / barrier to
+# the fence x86-TSO needs (a locked no-op for smp_mb, nothing for the
+# rest).
+#
+# This is a HOST-SIDE test: compile the fixture, check the listing and
+# the rejected calls, then link the asm against a C driver that checks
+# every return value and runs a multi-threaded stress test.
+#
+# PASS criterion: asm shape + rejection checks hold, the driver prints
+# ALL PASS, exit 0.
+
+set -uo pipefail
+cd "$(dirname "$0")/.."
+ROOT="$(pwd)"
+TMP="$(mktemp -d)"
+trap "rm -rf $TMP" EXIT
+
+FIX=tests/test_compiler_atomic.ad
+
+echo "[atomic] (1/4) Compile fixture to x86_64 asm"
+if ! python3 -m compiler.adder asm --target=x86_64-adder-user \
+        "$FIX" -o "$TMP/out.s" >"$TMP/asm.log" 2>&1; then
+    echo "[atomic] FAIL: fixture did not compile to asm"
+    cat "$TMP/asm.log"
+    exit 1
+fi
+
+echo "[atomic] (2/4) Asm-shape sanity check"
+# body FN — the listing of one function.
+body() { sed -n "/^$1:/,/\.size $1,/p" "$TMP/out.s"; }
+fail=0
+expect() {  # expect FN REGEX WHAT
+    if ! body "$1" | grep -qE "$2"; then
+        echo "[atomic] FAIL: $1: $3"
+        fail=1
+    fi
+}
+expect add_imm '^\s+lock addq \$1, \(%rax\)$' "no lock addq of an immediate"
+expect add_reg '^\s+lock addq %rax, \(%rcx\)$' "no lock addq of a register"
+expect add_byte '^\s+lock addb %al, \(%rcx\)$' "no byte-wide lock add"
+expect fetch_add64 '^\s+lock xaddq %rax, \(%rcx\)$' "no lock xaddq"
+expect fetch_add32 '^\s+movslq %eax, %rax$' "int32 result not sign-extended"
+expect fetch_add_u16 '^\s+lock xaddw %ax, \(%rcx\)$' "no lock xaddw"
+expect cas64 '^\s+lock cmpxchgq %rdx, \(%rcx\)$' "no lock cmpxchgq"
+expect cas8 '^\s+lock cmpxchgb %dl, \(%rcx\)$' "no byte-wide cmpxchg"
+expect xchg32 '^\s+xchgl %eax, \(%rcx\)$' "no xchgl"
+expect ref_put '^\s+lock decl \(%rax\)$' "no lock decl"
+expect inc_test '^\s+lock incq \(%rax\)$' "no lock incq"
+expect full_fence '^\s+lock orq \$0, \(%rsp\)$' "smp_mb is not a locked no-op"
+for fn in add_imm fetch_add64 cas64 xchg32 ref_put inc_test spin_lock \
+          spin_unlock publish consume full_fence; do
+    if body "$fn" | grep -qE '^\s+call'; then
+        echo "[atomic] FAIL: $fn still makes a call"
+        fail=1
+    fi
+done
+for fn in publish consume spin_unlock; do
+    if body "$fn" | grep -qE '^\s+(lock|[lsm]fence)'; then
+        echo "[atomic] FAIL: $fn emits a fence x86-TSO does not need"
+        fail=1
+    fi
+done
+[ "$fail" -eq 0 ] || exit 1
+echo "[atomic] OK: one locked instruction per intrinsic, no calls"
+
+echo "[atomic] (3/4) Rejected calls and shadowing"
+CASES=(
+"arity|def f(p: Ptr[int64]):
+    atomic_add(p)
+"
+"not_pointer|def f(x: int64):
+    atomic_add(x, 1)
+"
+"wide|class Pair:
+    a: int64
+    b: int64
+def f(p: Ptr[Pair]):
+    atomic_xchg(p, 0)
+"
+)
+for entry in "${CASES[@]}"; do
+    name="${entry%%|*}"
+    printf '%s' "${entry#*|}" > "$TMP/case_$name.ad"
+    if python3 -m compiler.adder asm --target=x86_64-adder-user \
+            "$TMP/case_$name.ad" -o "$TMP/case_$name.s" \
+            >"$TMP/case_$name.log" 2>&1; then
+        echo "[atomic] FAIL: $name compiled cleanly"
+        exit 1
+    fi
+    if ! grep -q "x86: atomic_" "$TMP/case_$name.log"; then
+        echo "[atomic] FAIL: $name was not rejected with an atomic CodeGenError"
+        cat "$TMP/case_$name.log"
+        exit 1
+    fi
+done
+# A program's own `barrier` / `atomic_add` are ordinary functions.
+printf 'extern def barrier()\ndef atomic_add(p: Ptr[int64], v: int64):\n    p[0] = p[0] + v\ndef f(p: Ptr[int64]):\n    barrier()\n    atomic_add(p, 1)\n' \
+    > "$TMP/shadow.ad"
+if ! python3 -m compiler.adder asm --target=x86_64-adder-user --no-inline \
+        "$TMP/shadow.ad" -o "$TMP/shadow.s" >"$TMP/shadow.log" 2>&1; then
+    echo "[atomic] FAIL: user-defined barrier / atomic_add did not compile"
+    cat "$TMP/shadow.log"
+    exit 1
+fi
+sed -n '/^f:/,/\.size f,/p' "$TMP/shadow.s" > "$TMP/shadow_f.s"
+if ! grep -qE '^\s+call barrier' "$TMP/shadow_f.s" \
+        || ! grep -qE '^\s+call atomic_add' "$TMP/shadow_f.s"; then
+    echo "[atomic] FAIL: a user-defined name was lowered as an intrinsic"
+    exit 1
+fi
+echo "[atomic] OK: bad arity / non-pointer / wide pointee rejected, shadowing honoured"
+
+echo "[atomic] (4/4) Link with host C driver and run"
+cat > "$TMP/driver.c" <<'CEOF'
+#include <stdio.h>
+#include <stdint.h>
+#include <pthread.h>
+
+extern int64_t shared;
+void spin_lock(int32_t *), spin_unlock(int32_t *);
+void locked_bump(int32_t *, int64_t);
+void add_imm(int64_t *), add_reg(int64_t *, int64_t);
+void add_byte(uint8_t *, uint8_t);
+int64_t fetch_add64(int64_t *, int64_t), fetch_add32(int32_t *, int32_t);
+int64_t fetch_add_u16(uint16_t *, uint16_t);
+int64_t cas64(int64_t *, int64_t, int64_t), cas8(int8_t *, int8_t, int8_t);
+int64_t xchg32(uint32_t *, uint32_t);
+void ref_get(int32_t *);
+int64_t ref_put(int32_t *), inc_test(int64_t *);
+void atomic_max(int64_t *, int64_t);
+void publish(int64_t *, int64_t *, int64_t);
+int64_t consume(int64_t *, int64_t *), full_fence(int64_t *);
+
+static int fails;
+#define CHECK(got, want) do {                                             \
+    int64_t g = (int64_t)(got), w = (int64_t)(want);                      \
+    if (g != w && fails++ < 20)                                           \
+        printf("[atomic]   %s = %lld, want %lld\n", #got,                \
+               (long long)g, (long long)w);                               \
+} while (0)
+
+#define THREADS 4
+#define ITERS 200000
+static int32_t lock;
+static int64_t counter, hits, maxv;
+
+static void *worker(void *arg) {
+    int64_t id = (int64_t)arg;
+    for (int64_t i = 0; i < ITERS; i++) {
+        add_imm(&counter);
+        fetch_add64(&hits, 2);
+        atomic_max(&maxv, id * ITERS + i);
+    }
+    locked_bump(&lock, ITERS);
+    return NULL;
+}
+
+int main(void) {
+    int64_t q = 10;
+    add_imm(&q);                CHECK(q, 11);
+    add_reg(&q, -20);           CHECK(q, -9);
+    CHECK(fetch_add64(&q, 9), -9);           CHECK(q, 0);
+    int32_t d = -5;
+    CHECK(fetch_add32(&d, 3), -5);           CHECK(d, -2);
+    uint16_t w = 0xffff;
+    CHECK(fetch_add_u16(&w, 2), 0xffff);     CHECK(w, 1);
+    uint8_t b = 250;
+    add_byte(&b, 10);           CHECK(b, 4);
+    int64_t c = 7;
+    CHECK(cas64(&c, 8, 100), 7);             CHECK(c, 7);
+    CHECK(cas64(&c, 7, 100), 7);             CHECK(c, 100);
+    int8_t s = -3;
+    CHECK(cas8(&s, -3, 4), -3);              CHECK(s, 4);
+    CHECK(cas8(&s, -3, 9), 4);               CHECK(s, 4);
+    uint32_t x = 0xdeadbeef;
+    CHECK(xchg32(&x, 1), 0xdeadbeef);        CHECK(x, 1);
+    int32_t ref = 1;
+    ref_get(&ref);
+    CHECK(ref_put(&ref), 0);
+    CHECK(ref_put(&ref), 1);                 CHECK(ref, 0);
+    int64_t t = -2;
+    CHECK(inc_test(&t), 0);
+    CHECK(inc_test(&t), 1);
+    CHECK(inc_test(&t), 0);
+    int64_t slot = 0, flag = 0;
+    CHECK(consume(&slot, &flag), -1);
+    publish(&slot, &flag, 42);
+    CHECK(consume(&slot, &flag), 42);
+    CHECK(full_fence(&slot), 5);
+
+    pthread_t th[THREADS];
+    for (int64_t i = 0; i < THREADS; i++)
+        pthread_create(&th[i], NULL, worker, (void *)i);
+    for (int i = 0; i < THREADS; i++)
+        pthread_join(th[i], NULL);
+    CHECK(counter, (int64_t)THREADS * ITERS);
+    CHECK(hits, (int64_t)THREADS * ITERS * 2);
+    CHECK(maxv, (int64_t)THREADS * ITERS - 1);
+    CHECK(shared, (int64_t)THREADS * ITERS);
+    CHECK(lock, 0);
+
+    printf("[atomic] %s\n", fails == 0 ? "ALL PASS" : "SOME FAILED");
+    return fails == 0 ? 0 : 1;
+}
+CEOF
+if ! gcc -O1 -pthread "$TMP/driver.c" "$TMP/out.s" -o "$TMP/run" \
+        2>"$TMP/link.log"; then
+    echo "[atomic] FAIL: asm did not link against the C driver"
+    cat "$TMP/link.log"
+    exit 1
+fi
+if ! "$TMP/run"; then
+    echo "[atomic] FAIL: wrong values"
+    exit 1
+fi
+
+echo "[atomic] PASS"
+exit 0
@@ -0,0 +1,269 @@
+#!/usr/bin/env bash
+# scripts/test_compiler_bitops.sh — bit-scan, rotate and byte-order
+# intrinsics
+#
+# Background: bitmap scans, CRC / hash rotates and network byte-order
+# conversions were Adder loops and shift/or sequences. ctz / clz /
+# popcount / rotl / rotr / bswap16/32/64 / load_be* / store_be* now lower
+# to one or two instructions at the operand's width, with the BMI1 /
+# LZCNT / POPCNT / MOVBE forms behind --cpu-features and baseline
+# x86_64 fallbacks otherwise.
+#
+# This is a HOST-SIDE test: compile the fixture for both instruction
+# sets, check the listings and the rejected calls, then link each build
+# against a C driver that compares every entry point with a reference.
+#
+# PASS criterion: asm shape + rejection checks hold, both builds print
+# ALL PASS, exit 0.
+
+set -uo pipefail
+cd "$(dirname "$0")/.."
+ROOT="$(pwd)"
+TMP="$(mktemp -d)"
+trap "rm -rf $TMP" EXIT
+
+FIX=tests/test_compiler_bitops.ad
+FEATURES=popcnt,lzcnt,bmi1,movbe
+
+echo "[bitops] (1/4) Compile fixture to x86_64 asm (baseline and $FEATURES)"
+for build in base feat; do
+    extra=()
+    [ "$build" = feat ] && extra=(--cpu-features=$FEATURES)
+    if ! python3 -m compiler.adder asm --target=x86_64-adder-user \
+            "${extra[@]}" "$FIX" -o "$TMP/$build.s" \
+            >"$TMP/$build.log" 2>&1; then
+        echo "[bitops] FAIL: fixture did not compile ($build)"
+        cat "$TMP/$build.log"
+        exit 1
+    fi
+done
+
+echo "[bitops] (2/4) Asm-shape sanity check"
+# body BUILD FN — the listing of one function.
+body() { sed -n "/^$2:/,/\.size $2,/p" "$TMP/$1.s"; }
+fail=0
+expect() {  # expect BUILD FN REGEX WHAT
+    if ! body "$1" "$2" | grep -qE "$3"; then
+        echo "[bitops] FAIL: $2 ($1): $4"
+        fail=1
+    fi
+}
+expect base ctz32 '^\s+btsq \$32, %rax$' "no guard bit above a 32-bit operand"
+expect base ctz64 '^\s+bsfq %rax, %rax$' "no bsfq"
+expect base clz64 '^\s+bsrq %rax, %rax$' "no bsrq"
+expect base clz_s8 '^\s+movzbq %al, %rax$' "sign bits not dropped"
+expect base rotl32 '^\s+roll %cl, %eax$' "no 32-bit rotate by %cl"
+expect base rotl8 '^\s+rolb %cl, %al$' "no 8-bit rotate"
+expect base rotr_s16 '^\s+movswq %ax, %rax$' "int16 rotate not sign-extended"
+expect base rotl32_7 '^\s+roll \$7, %eax$' "no rotate by an immediate"
+expect base rot_mixed '^\s+roll \$8, %eax$' "uint32 ^ uint32 not rotated at 32 bits"
+expect base bs16 '^\s+rolw \$8, %ax$' "bswap16 is not rolw"
+expect base bs32 '^\s+bswapl %eax$' "no bswapl"
+expect base ld64 '^\s+bswapq %rax$' "load_be64 has no bswapq"
+expect base st32 '^\s+bswapl %eax$' "store_be32 has no bswapl"
+expect feat popcount64 '^\s+popcntq %rax, %rax$' "no popcntq"
+expect feat clz64 '^\s+lzcntq %rax, %rax$' "no lzcntq"
+expect feat clz16 '^\s+subl \$16, %eax$' "lzcnt of a 16-bit operand not adjusted"
+expect feat ctz64 '^\s+tzcntq %rax, %rax$' "no tzcntq"
+expect feat ld32 '^\s+movbel \(%rax\), %eax$' "no movbe load"
+expect feat st16 '^\s+movbew %ax, \(%rcx\)$' "no movbe store"
+if body base rotr64_0 | grep -qE '^\s+ro[lr]'; then
+    echo "[bitops] FAIL: a rotate by the full width was emitted"
+    fail=1
+fi
+for fn in popcount64 clz64 ctz64 ld32 st16; do
+    if body base "$fn" | grep -qE '^\s+(popcnt|lzcnt|tzcnt|movbe)'; then
+        echo "[bitops] FAIL: $fn uses an optional extension in the baseline build"
+        fail=1
+    fi
+done
+if grep -qE '^\s+call' "$TMP/base.s" "$TMP/feat.s"; then
+    echo "[bitops] FAIL: an intrinsic was lowered to a call"
+    fail=1
+fi
+[ "$fail" -eq 0 ] || exit 1
+echo "[bitops] OK: one or two instructions per intrinsic, extensions only on request"
+
+echo "[bitops] (3/4) Rejected calls, unknown features, shadowing"
+CASES=(
+"arity|def f(x: uint64) -> int64:
+    return ctz()
+"
+"not_pointer|def f(x: uint64):
+    store_be32(x, 1)
+"
+"array|A: Array[4, uint8]
+def f() -> int64:
+    return popcount(A)
+"
+)
+for entry in "${CASES[@]}"; do
+    name="${entry%%|*}"
+    printf '%s' "${entry#*|}" > "$TMP/case_$name.ad"
+    if python3 -m compiler.adder asm --target=x86_64-adder-user \
+            "$TMP/case_$name.ad" -o "$TMP/case_$name.s" \
+            >"$TMP/case_$name.log" 2>&1; then
+        echo "[bitops] FAIL: $name compiled cleanly"
+        exit 1
+    fi
+    if ! grep -qE "x86: (ctz|store_be32|popcount)\(\)" "$TMP/case_$name.log"; then
+        echo "[bitops] FAIL: $name was not rejected with an intrinsic CodeGenError"
+        cat "$TMP/case_$name.log"
+        exit 1
+    fi
+done
+if python3 -m compiler.adder asm --target=x86_64-adder-user \
+        --cpu-features=popcnt,avx9 "$FIX" -o "$TMP/bad.s" \
+        >"$TMP/bad.log" 2>&1; then
+    echo "[bitops] FAIL: an unknown --cpu-features name was accepted"
+    exit 1
+fi
+if ! grep -q "unknown feature avx9" "$TMP/bad.log"; then
+    echo "[bitops] FAIL: unknown feature not named in the error"
+    cat "$TMP/bad.log"
+    exit 1
+fi
+printf 'def popcount(x: uint64) -> int64:\n    return 7\ndef f(x: uint64) -> int64:\n    return popcount(x)\n' \
+    > "$TMP/shadow.ad"
+if ! python3 -m compiler.adder asm --target=x86_64-adder-user --no-inline \
+        "$TMP/shadow.ad" -o "$TMP/shadow.s" >"$TMP/shadow.log" 2>&1; then
+    echo "[bitops] FAIL: a user-defined popcount did not compile"
+    cat "$TMP/shadow.log"
+    exit 1
+fi
+sed -n '/^f:/,/\.size f,/p' "$TMP/shadow.s" > "$TMP/shadow_f.s"
+if ! grep -qE '^\s+(call|jmp) popcount' "$TMP/shadow_f.s"; then
+    echo "[bitops] FAIL: a user-defined popcount was lowered as an intrinsic"
+    exit 1
+fi
+echo "[bitops] OK: bad arity / non-pointer / array operand / unknown feature rejected"
+
+echo "[bitops] (4/4) Link with host C driver and run"
+cat > "$TMP/driver.c" <<'CEOF'
+#include <stdio.h>
+#include <stdint.h>
+#include <string.h>
+
+int64_t ctz64(uint64_t), ctz32(uint32_t), ctz8(uint8_t);
+int64_t clz64(uint64_t), clz32(uint32_t), clz16(uint16_t), clz_s8(int8_t);
+int64_t popcount64(uint64_t), popcount32(uint32_t), popcount_s16(int16_t);
+uint32_t rotl32(uint32_t, int64_t);
+uint64_t rotr64(uint64_t, int64_t);
+uint8_t rotl8(uint8_t, int64_t);
+int64_t rotr_s16(int16_t, int64_t);
+uint32_t rotl32_7(uint32_t);
+uint64_t rotr64_0(uint64_t);
+int64_t rot_mixed(uint32_t, uint32_t);
+int64_t bs16(uint16_t), bs32(uint32_t);
+uint64_t bs64(uint64_t);
+int64_t ld16(const uint8_t *), ld32(const uint8_t *);
+uint64_t ld64(const uint8_t *);
+void st16(uint8_t *, uint64_t), st32(uint8_t *, uint64_t);
+void st64(uint8_t *, uint64_t);
+int64_t first_free(uint64_t *, int64_t), log2_floor(uint64_t);
+
+static int fails;
+#define CHECK(got, want) do {                                             \
+    int64_t g = (int64_t)(got), w = (int64_t)(want);                      \
+    if (g != w && fails++ < 20)                                           \
+        printf("[bitops]   %s = %lld, want %lld (x=%#llx)\n", #got,      \
+               (long long)g, (long long)w, (unsigned long long)x);        \
+} while (0)
+
+static int ctzw(uint64_t v, int w) { return v ? __builtin_ctzll(v) : w; }
+static int clzw(uint64_t v, int w) {
+    return v ? __builtin_clzll(v) - (64 - w) : w;
+}
+static uint64_t rolw(uint64_t v, int n, int w) {
+    uint64_t m = w == 64 ? ~0ULL : (1ULL << w) - 1;
+    n &= w - 1;
+    v &= m;
+    return n ? ((v << n) | (v >> (w - n))) & m : v;
+}
+
+int main(void) {
+    uint64_t s = 0x9e3779b97f4a7c15ULL;
+    for (int i = 0; i < 4000; i++) {
+        s ^= s << 13; s ^= s >> 7; s ^= s << 17;
+        /* Sparse and edge values as well as random ones. */
+        uint64_t x = i < 64 ? 1ULL << i : i < 70 ? (uint64_t)(i - 64) * ~0ULL
+                   : i & 1 ? s : s >> (s & 63);
+        int n = (int)(s >> 58);
+        CHECK(ctz64(x), ctzw(x, 64));
+        CHECK(ctz32((uint32_t)x), ctzw((uint32_t)x, 32));
+        CHECK(ctz8((uint8_t)x), ctzw((uint8_t)x, 8));
+        CHECK(clz64(x), clzw(x, 64));
+        CHECK(clz32((uint32_t)x), clzw((uint32_t)x, 32));
+        CHECK(clz16((uint16_t)x), clzw((uint16_t)x, 16));
+        CHECK(clz_s8((int8_t)x), clzw((uint8_t)x, 8));
+        CHECK(popcount64(x), __builtin_popcountll(x));
+        CHECK(popcount32((uint32_t)x), __builtin_popcount((uint32_t)x));
+        CHECK(popcount_s16((int16_t)x), __builtin_popcount((uint16_t)x));
+        CHECK(rotl32((uint32_t)x, n), rolw(x, n, 32));
+        CHECK(rotr64(x, n), rolw(x, 64 - (n & 63), 64));
+        CHECK(rotl8((uint8_t)x, n), rolw(x, n, 8));
+        CHECK(rotr_s16((int16_t)x, n), (int16_t)rolw(x, 16 - (n & 15), 16));
+        CHECK(rotl32_7((uint32_t)x), rolw(x, 7, 32));
+        CHECK(rotr64_0(x), x);
+        CHECK(rot_mixed((uint32_t)x, (uint32_t)s),
+              rolw((uint32_t)x ^ (uint32_t)s, 8, 32));
+        CHECK(bs16((uint16_t)x), __builtin_bswap16((uint16_t)x));
+        CHECK(bs32((uint32_t)x), __builtin_bswap32((uint32_t)x));
+        CHECK(bs64(x), __builtin_bswap64(x));
+        if (x)
+            CHECK(log2_floor(x), 63 - __builtin_clzll(x));
+
+        uint8_t buf[11], want[11];
+        for (int k = 0; k < 11; k++)
+            buf[k] = want[k] = (uint8_t)(s >> (k * 5));
+        const uint8_t *p = buf + 1;     /* deliberately misaligned */
+        CHECK(ld16(p), (p[0] << 8) | p[1]);
+        CHECK(ld32(p), ((uint32_t)p[0] << 24) | (p[1] << 16) | (p[2] << 8)
+                       | p[3]);
+        CHECK(ld64(p), __builtin_bswap64(*(const uint64_t *)(const void *)p));
+        st16(buf + 1, x);
+        want[1] = (uint8_t)(x >> 8); want[2] = (uint8_t)x;
+        CHECK(memcmp(buf, want, 11), 0);
+        st32(buf + 3, x);
+        for (int k = 0; k < 4; k++) want[3 + k] = (uint8_t)(x >> (24 - 8 * k));
+        CHECK(memcmp(buf, want, 11), 0);
+        st64(buf + 3, x);
+        for (int k = 0; k < 8; k++) want[3 + k] = (uint8_t)(x >> (56 - 8 * k));
+        CHECK(memcmp(buf, want, 11), 0);
+    }
+    uint64_t x = 0;
+    uint64_t map[3] = {~0ULL, ~0ULL, ~0ULL};
+    CHECK(first_free(map, 3), -1);
+    map[1] = ~(1ULL << 37);
+    CHECK(first_free(map, 3), 64 + 37);
+    map[0] = 0x7;
+    CHECK(first_free(map, 3), 3);
+    printf("[bitops] %s\n", fails == 0 ? "ALL PASS" : "SOME FAILED");
+    return fails == 0 ? 0 : 1;
+}
+CEOF
+for build in base feat; do
+    if ! gcc -O1 "$TMP/driver.c" "$TMP/$build.s" -o "$TMP/run_$build" \
+            2>"$TMP/link.log"; then
+        echo "[bitops] FAIL: asm did not link against the C driver ($build)"
+        cat "$TMP/link.log"
+        exit 1
+    fi
+done
+if ! "$TMP/run_base"; then
+    echo "[bitops] FAIL: wrong values (baseline)"
+    exit 1
+fi
+# The extension build needs a CPU that has them.
+if grep -qw popcnt /proc/cpuinfo && grep -qw bmi1 /proc/cpuinfo \
+        && grep -qw abm /proc/cpuinfo && grep -qw movbe /proc/cpuinfo; then
+    if ! "$TMP/run_feat"; then
+        echo "[bitops] FAIL: wrong values ($FEATURES)"
+        exit 1
+    fi
+else
+    echo "[bitops] SKIP: host CPU lacks one of $FEATURES; not running that build"
+fi
+
+echo "[bitops] PASS"
+exit 0
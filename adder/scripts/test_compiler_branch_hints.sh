@@ -0,0 +1,204 @@
+#!/usr/bin/env bash
+# scripts/test_compiler_branch_hints.sh — likely() / unlikely(),
+# @hot / @cold and out-of-line cold blocks
+#
+# Background: error paths (panic_* calls, error-count bumps, ENOMEM
+# fallbacks) were laid out inline, so every fast-path `if` jumped over
+# cold code. A branch whose test is `unlikely(...)` — or, unhinted,
+# whose body calls a cold function — now keeps its body in
+# .text.unlikely under a local `<function>.cold` symbol, and the hot
+# path falls through. `@hot` / `@cold` place whole functions in
+# .text.hot / .text.unlikely, and the panic_* / _hang* names are cold
+# without a decorator.
+#
+# This is a HOST-SIDE test: compile the fixture, check where each
+# function and block landed, check the decorator and hint errors, link
+# against a C driver that takes every branch both ways, and check the
+# linked layout keeps the cold code out of the hot functions.
+#
+# PASS criterion: asm shape holds, the bad programs are rejected, the
+# driver prints what C computes, exit 0.
+
+set -uo pipefail
+cd "$(dirname "$0")/.."
+ROOT="$(pwd)"
+TMP="$(mktemp -d)"
+trap "rm -rf $TMP" EXIT
+
+FIX=tests/test_compiler_branch_hints.ad
+adder() { python3 -m compiler.adder "$@"; }
+
+echo "[branch_hints] (1/4) Compile fixture to x86_64 asm"
+if ! adder asm --target=x86_64-adder-user "$FIX" -o "$TMP/hints.s" \
+        >"$TMP/asm.log" 2>&1; then
+    echo "[branch_hints] FAIL: fixture did not compile"
+    cat "$TMP/asm.log"
+    exit 1
+fi
+fail=0
+reject() {  # reject NAME WANT-ERROR SOURCE
+    printf '%s\n' "$3" >"$TMP/$1.ad"
+    if adder asm --target=x86_64-adder-user "$TMP/$1.ad" \
+            -o "$TMP/$1.s" >"$TMP/$1.log" 2>&1; then
+        echo "[branch_hints] FAIL: $1 compiled"
+        fail=1
+    elif ! grep -q "$2" "$TMP/$1.log"; then
+        echo "[branch_hints] FAIL: $1: wrong error"
+        cat "$TMP/$1.log"
+        fail=1
+    fi
+}
+reject hot_cold 'is both @hot and @cold' \
+    $'@hot\n@cold\ndef f() -> int64:\n    return 1'
+reject inline_cold 'is both @inline and @cold' \
+    $'@inline\n@cold\ndef f() -> int64:\n    return 1'
+reject arity 'likely() takes 1 argument, got 2' \
+    $'def f(x: int64) -> int64:\n    if likely(x, 1):\n        return 1\n    return 0'
+[ "$fail" -eq 0 ] || exit 1
+
+echo "[branch_hints] (2/4) Asm-shape sanity check"
+S="$TMP/hints.s"
+# section FN — the section directive(s) just before FN's label.
+section() {
+    grep -B5 "^$1:\$" "$S" | grep -E '^\s+\.(section|subsection|text|p2align)' \
+        | tr -s ' ' | paste -sd'|'
+}
+# hot FN / cold FN — FN's instructions in its own section / out of line.
+hot() {
+    sed -n "/^$1:/,/\.size $1,/p" "$S" \
+        | sed '/^\s*\.pushsection/,/^\s*\.popsection/d'
+}
+cold() {
+    sed -n "/^$1:/,/\.size $1,/p" "$S" \
+        | sed -n '/^\s*\.pushsection/,/^\s*\.popsection/p'
+}
+expect_section() {  # expect_section FN WANT
+    got="$(section "$1")"
+    if [ "$got" != "$2" ]; then
+        echo "[branch_hints] FAIL: $1 placed in '$got', want '$2'"
+        fail=1
+    fi
+}
+expect_section hot_mix \
+    ' .section .text.hot, "ax", @progbits| .subsection 0| .p2align 4'
+for fn in note_error _hang_here slow_path; do
+    expect_section "$fn" ' .section .text.unlikely, "ax", @progbits'
+done
+for fn in checked_div step guard classify drain flags; do
+    expect_section "$fn" ' .text'
+done
+# Each hinted or panicking branch body is out of line, once.
+expect_cold() {  # expect_cold FN PATTERN
+    if hot "$1" | grep -qE "$2" || ! cold "$1" | grep -qE "$2"; then
+        echo "[branch_hints] FAIL: $1: '$2' not out of line"
+        fail=1
+    fi
+    if [ "$(grep -c "^$1\.cold:\$" "$S")" != 1 ] \
+            || ! grep -q "\.size $1\.cold, \.-$1\.cold" "$S"; then
+        echo "[branch_hints] FAIL: no single $1.cold symbol"
+        fail=1
+    fi
+}
+expect_cold checked_div '(call|jmp) note_error'
+expect_cold classify '(call|jmp) note_error'
+expect_cold guard 'call panic_bad'
+expect_cold step 'movq \$0, %rax'
+expect_cold drain 'jmp \.while_drain'
+if ! hot step | grep -qE '^\s+jz \.unlikely_' \
+        || ! hot guard | grep -qE '^\s+jnz \.unlikely_'; then
+    echo "[branch_hints] FAIL: hot path does not branch to the cold block"
+    fail=1
+fi
+# Hints as values, and branches inside a cold function, stay inline.
+for fn in flags slow_path hot_mix; do
+    if cold "$fn" | grep -q . || grep -q "^$fn\.cold:" "$S"; then
+        echo "[branch_hints] FAIL: $fn has out-of-line blocks"
+        fail=1
+    fi
+done
+if grep -q 'call \(likely\|unlikely\)' "$S"; then
+    echo "[branch_hints] FAIL: a hint was called"
+    fail=1
+fi
+[ "$fail" -eq 0 ] || exit 1
+echo "[branch_hints] OK: functions placed, cold blocks out of line"
+
+cat > "$TMP/driver.c" <<'CEOF'
+#include <stdio.h>
+#include <stdint.h>
+
+extern int64_t errors;
+int64_t checked_div(int64_t, int64_t), step(int64_t), guard(int64_t),
+    classify(int64_t), drain(int64_t *, int64_t), flags(int64_t),
+    slow_path(int64_t), hot_mix(int64_t), _hang_here(int64_t);
+static int64_t panicked;
+void panic_bad(int64_t code) { panicked = code; }
+
+int main(void) {
+    int64_t data[5] = {3, 0, 4, -1, 9};
+    printf("%lld %lld %lld %lld %lld\n", (long long)checked_div(7, 2),
+           (long long)checked_div(7, 0), (long long)step(5),
+           (long long)step(99), (long long)step(100));
+    int64_t g = guard(4), before = panicked;
+    printf("%lld %lld %lld\n", (long long)g, (long long)before,
+           (long long)guard(-3));
+    printf("%lld %lld %lld %lld %lld\n", (long long)classify(0),
+           (long long)classify(5000), (long long)classify(50),
+           (long long)classify(5), (long long)classify(-1));
+    printf("%lld %lld %lld %lld %lld\n", (long long)drain(data, 5),
+           (long long)drain(data, 2), (long long)drain(data, 0),
+           (long long)flags(0), (long long)flags(5));
+    printf("%lld %lld %lld %lld %lld %lld %lld\n", (long long)flags(7),
+           (long long)slow_path(3), (long long)slow_path(4),
+           (long long)hot_mix(2), (long long)_hang_here(1),
+           (long long)panicked, (long long)errors);
+    return 0;
+}
+CEOF
+
+echo "[branch_hints] (3/4) Link and run"
+if ! gcc -O1 "$TMP/driver.c" "$S" -o "$TMP/hints" 2>"$TMP/link.log"; then
+    echo "[branch_hints] FAIL: link failed"
+    cat "$TMP/link.log"
+    exit 1
+fi
+want="3 -1 6 100 0
+8 0 -6
+10 -5000 20 30 30
+7 3 0 1 2
+3 33 4 62 2 -3 2"
+got="$("$TMP/hints")"
+if [ "$got" != "$want" ]; then
+    echo "[branch_hints] FAIL: driver printed"
+    echo "$got"
+    echo "want"
+    echo "$want"
+    exit 1
+fi
+echo "[branch_hints] OK: every branch computes the same both ways"
+
+echo "[branch_hints] (4/4) Linked layout"
+# GNU ld's default script links .text.unlikely, then .text.hot, then
+# .text (kernel.lds puts .text.unlikely last); either way no cold code
+# sits between two hot functions.
+addr() { nm "$TMP/hints" | awk -v s="$1" '$3 == s { print $1 }'; }
+kind() { nm "$TMP/hints" | awk -v s="$1" '$3 == s { print $2 }'; }
+first="$(addr checked_div)"
+for fn in step guard classify drain flags; do
+    [[ "$(addr "$fn")" < "$first" ]] && first="$(addr "$fn")"
+done
+for sym in checked_div.cold guard.cold step.cold note_error slow_path \
+        _hang_here hot_mix; do
+    if [[ -z "$(addr "$sym")" || ! "$(addr "$sym")" < "$first" ]]; then
+        echo "[branch_hints] FAIL: $sym is linked among the .text functions"
+        exit 1
+    fi
+done
+if [ "$(kind checked_div.cold)" != t ]; then
+    echo "[branch_hints] FAIL: checked_div.cold is not a local text symbol"
+    exit 1
+fi
+echo "[branch_hints] OK: cold code linked apart from .text"
+
+echo "[branch_hints] PASS"
+exit 0
@@ -0,0 +1,293 @@
+#!/usr/bin/env bash
+# scripts/test_compiler_bulkmem.sh — inline memcpy / memset / memzero /
+# memcmp, word-at-a-time strlen, struct assignment
+#
+# Background: fixed-size copies and clears (packet headers, task
+# structs, page zeroing) were calls to arch/x86/lib/string_64.S or
+# Adder byte loops, strlen was `repne scasb`, and `a = b` on two struct
+# values stored b's address into a. The bulk-memory builtins now lower
+# inline — unrolled movs for a constant size up to 64 bytes, `rep
+# movsb` / `rep stosq` / `rep stosb` otherwise, a qword loop for
+# memcmp — and struct assignment is the same copy.
+#
+# This is a HOST-SIDE test: compile the fixture, check the listing and
+# the rejected forms, then link against a C driver that compares every
+# entry point with libc (strlen at every alignment, up to a PROT_NONE
+# page).
+#
+# PASS criterion: asm shape + rejection checks hold, the driver prints
+# ALL PASS, exit 0.
+
+set -uo pipefail
+cd "$(dirname "$0")/.."
+ROOT="$(pwd)"
+TMP="$(mktemp -d)"
+trap "rm -rf $TMP" EXIT
+
+FIX=tests/test_compiler_bulkmem.ad
+
+echo "[bulkmem] (1/4) Compile fixture to x86_64 asm"
+if ! python3 -m compiler.adder asm --target=x86_64-adder-user \
+        "$FIX" -o "$TMP/out.s" >"$TMP/asm.log" 2>&1; then
+    echo "[bulkmem] FAIL: fixture did not compile to asm"
+    cat "$TMP/asm.log"
+    exit 1
+fi
+
+echo "[bulkmem] (2/4) Asm-shape sanity check"
+# body FN — the listing of one function.
+body() { sed -n "/^$1:/,/\.size $1,/p" "$TMP/out.s"; }
+fail=0
+expect() {  # expect FN REGEX WHAT
+    if ! body "$1" | grep -qE "$2"; then
+        echo "[bulkmem] FAIL: $1: $3"
+        fail=1
+    fi
+}
+reject() {  # reject FN REGEX WHAT
+    if body "$1" | grep -qE "$2"; then
+        echo "[bulkmem] FAIL: $1: $3"
+        fail=1
+    fi
+}
+expect copy13 '^\s+movb 12\(%rcx\), %dl$' "13-byte copy not unrolled to 8+4+1"
+reject copy13 'rep ' "13-byte copy uses a rep string op"
+expect copy200 '^\s+rep movsb$' "200-byte copy is not rep movsb"
+expect copy_n '^\s+rep movsb$' "unknown-size copy is not rep movsb"
+expect fill7_a5 '^\s+movabsq \$0xa5a5a5a5a5a5a5a5, %rdx$' "0xa5 fill pattern not folded"
+expect fill15 '^\s+imulq %rdx, %rax$' "variable fill byte not broadcast"
+expect zero_page '^\s+rep stosq$' "page clear is not rep stosq"
+expect zero_page '^\s+movq \$512, %rcx$' "page clear count is not 512 qwords"
+expect fill_n '^\s+rep stosb$' "unknown-size fill is not rep stosb"
+expect cmp12 '^\s+movl 8\(%rsi\), %edx$' "12-byte compare not unrolled"
+expect cmp100 '^\s+cmpq \$8, %rcx$' "100-byte compare not the qword loop"
+expect hdr_roundtrip '^\s+movq 24\(%rcx\), %rdx$' "Hdr assignment not a 32-byte copy"
+expect big_copy '^\s+movq \$232, %rcx$' "Big assignment not a 232-byte rep movsb"
+expect big_copy_sum '^\s+pushq %rdi$' "frameless leaf does not save %rdi around rep movsb"
+if grep -qE '^\s+(call|jmp)\s+(memcpy|memset|memcmp|memzero|strlen)' "$TMP/out.s"; then
+    echo "[bulkmem] FAIL: a bulk-memory call survived"
+    fail=1
+fi
+if grep -q 'repne scasb' "$TMP/out.s"; then
+    echo "[bulkmem] FAIL: strlen still uses repne scasb"
+    fail=1
+fi
+[ "$fail" -eq 0 ] || exit 1
+echo "[bulkmem] OK: unrolled / rep forms chosen by size, struct copies, no calls"
+
+echo "[bulkmem] (3/4) Shadowing and rejected forms"
+cat > "$TMP/shadow.ad" <<'AEOF'
+@noinline
+def memcpy(dst: Ptr[uint8], src: Ptr[uint8], n: uint64) -> Ptr[uint8]:
+    return dst
+
+def use(d: Ptr[uint8], s: Ptr[uint8]) -> Ptr[uint8]:
+    return memcpy(d, s, 8)
+AEOF
+if ! python3 -m compiler.adder asm --target=x86_64-adder-user \
+        "$TMP/shadow.ad" -o "$TMP/shadow.s" >"$TMP/shadow.log" 2>&1 \
+        || ! grep -qE '^\s+(call|jmp)\s+memcpy' "$TMP/shadow.s"; then
+    echo "[bulkmem] FAIL: a def memcpy did not shadow the builtin"
+    exit 1
+fi
+CASES=(
+"arity|def f(p: Ptr[uint8]):
+    memset(p, 0)
+"
+"negative|def f(p: Ptr[uint8]):
+    memzero(p, -1)
+"
+"rvalue|class P:
+    x: int64
+    y: int64
+def mk(p: Ptr[P]) -> P:
+    return p[0]
+def f(p: Ptr[P]):
+    a: P
+    a = mk(p)
+"
+)
+for entry in "${CASES[@]}"; do
+    name="${entry%%|*}"
+    printf '%s' "${entry#*|}" > "$TMP/case_$name.ad"
+    if python3 -m compiler.adder asm --target=x86_64-adder-user \
+            "$TMP/case_$name.ad" -o "$TMP/case_$name.s" \
+            >"$TMP/case_$name.log" 2>&1; then
+        echo "[bulkmem] FAIL: $name compiled cleanly"
+        exit 1
+    fi
+    if ! grep -qE "x86: .*(argument|size|struct assignment)" \
+            "$TMP/case_$name.log"; then
+        echo "[bulkmem] FAIL: $name was not rejected with a CodeGenError"
+        cat "$TMP/case_$name.log"
+        exit 1
+    fi
+done
+echo "[bulkmem] OK: def shadows; bad arity / negative size / rvalue struct rejected"
+
+echo "[bulkmem] (4/4) Link with host C driver and run"
+cat > "$TMP/driver.c" <<'CEOF'
+#include <stdio.h>
+#include <stdint.h>
+#include <string.h>
+#include <sys/mman.h>
+
+typedef struct { uint8_t b[13]; } Rec13;
+typedef struct {
+    uint64_t seq; uint32_t len; uint16_t kind; uint8_t flags; Rec13 tag;
+} Hdr;
+typedef struct { int64_t words[25]; Hdr hdr; } Big;
+
+uint8_t *copy13(uint8_t *, const uint8_t *);
+void copy200(uint8_t *, const uint8_t *);
+uint8_t *copy_n(uint8_t *, const uint8_t *, uint64_t);
+void fill15(uint8_t *, int32_t);
+uint8_t *fill7_a5(uint8_t *);
+void zero_page(uint8_t *), fill_page(uint8_t *, int32_t);
+void fill_n(uint8_t *, int32_t, uint64_t);
+int32_t cmp12(const uint8_t *, const uint8_t *);
+int32_t cmp100(const uint8_t *, const uint8_t *);
+int32_t cmp_n(const uint8_t *, const uint8_t *, uint64_t);
+_Bool is_less(const uint8_t *, const uint8_t *, uint64_t);
+uint64_t slen(const char *);
+void hdr_roundtrip(const Hdr *, Hdr *, int64_t);
+void big_copy(Big *, const Big *), hdr_of(Hdr *, const Big *);
+void set_hdr(Big *, const Hdr *);
+int64_t big_copy_sum(Big *, const Big *);
+int64_t hdr_size(void), big_size(void);
+
+static int fails;
+#define CHECK(got, want) do {                                             \
+    int64_t g = (int64_t)(got), w = (int64_t)(want);                      \
+    if (g != w && fails++ < 20)                                           \
+        printf("[bulkmem]   line %d: %s = %lld, want %lld\n", __LINE__,   \
+               #got, (long long)g, (long long)w);                         \
+} while (0)
+
+static int sign(int v) { return (v > 0) - (v < 0); }
+static uint8_t a[8192], b[8192], c[8192];
+
+static void pattern(uint8_t *p, int n, int seed) {
+    for (int i = 0; i < n; i++) p[i] = (uint8_t)(i * 7 + seed);
+}
+
+int main(void) {
+    CHECK(hdr_size(), sizeof(Hdr));
+    CHECK(big_size(), sizeof(Big));
+
+    /* memcpy: guard bytes either side must survive. */
+    pattern(b, 300, 1);
+    memset(a, 0xee, 300);
+    CHECK(copy13(a + 1, b) == a + 1, 1);
+    CHECK(memcmp(a + 1, b, 13), 0);
+    CHECK(a[0], 0xee); CHECK(a[14], 0xee);
+    copy200(a + 3, b + 5);
+    CHECK(memcmp(a + 3, b + 5, 200), 0);
+    CHECK(a[203], 0xee);
+    for (int n = 0; n < 80; n++) {
+        memset(a, 0xee, 100);
+        CHECK(copy_n(a + 2, b + 1, n) == a + 2, 1);
+        CHECK(memcmp(a + 2, b + 1, n), 0);
+        CHECK(a[2 + n], 0xee);
+    }
+
+    /* memset / memzero. */
+    memset(a, 0xee, 4200);
+    fill15(a + 1, 0x1234);
+    for (int i = 1; i <= 15; i++) CHECK(a[i], 0x34);
+    CHECK(a[0], 0xee); CHECK(a[16], 0xee);
+    CHECK(fill7_a5(a + 20) == a + 20, 1);
+    for (int i = 20; i < 27; i++) CHECK(a[i], 0xa5);
+    CHECK(a[27], 0xee);
+    memset(a, 0xee, 4200);
+    zero_page(a + 8);
+    for (int i = 8; i < 4104; i++) if (a[i]) { CHECK(a[i], 0); break; }
+    CHECK(a[7], 0xee); CHECK(a[4104], 0xee);
+    fill_page(a + 8, -1);
+    for (int i = 8; i < 4104; i++) if (a[i] != 0xff) { CHECK(a[i], 0xff); break; }
+    for (int n = 0; n < 40; n++) {
+        memset(a, 0xee, 64);
+        fill_n(a + 1, 0x5a, n);
+        for (int i = 1; i <= n; i++) CHECK(a[i], 0x5a);
+        CHECK(a[n + 1], 0xee);
+    }
+
+    /* memcmp: every position of a single differing byte, both ways. */
+    pattern(a, 200, 3);
+    memcpy(b, a, 200);
+    CHECK(cmp12(a, b), 0); CHECK(cmp100(a, b), 0); CHECK(cmp_n(a, b, 200), 0);
+    CHECK(cmp_n(a, b, 0), 0);
+    for (int i = 0; i < 100; i++) {
+        pattern(a, 200, 3);
+        a[i] = 0x10; a[i + 1] = 0xff;
+        memcpy(b, a, 200);
+        b[i] = 0x20;       /* b > a at i; the next byte ordered the other way */
+        b[i + 1] = 0x00;
+        if (i < 12) { CHECK(cmp12(a, b), -1); CHECK(cmp12(b, a), 1); }
+        CHECK(cmp100(a, b), -1); CHECK(cmp100(b, a), 1);
+        CHECK(cmp_n(a, b, i + 1), -1);
+        CHECK(cmp_n(a, b, i), 0);
+        CHECK(is_less(a, b, 100), 1); CHECK(is_less(b, a, 100), 0);
+    }
+    a[5] = 0x80; b[5] = 0x7f;   /* bytes compare unsigned */
+    CHECK(sign(cmp12(a, b)), sign(memcmp(a, b, 12)));
+
+    /* strlen at every alignment and length, ending at a PROT_NONE page. */
+    uint8_t *pg = mmap(0, 8192, PROT_READ | PROT_WRITE,
+                       MAP_PRIVATE | MAP_ANONYMOUS, -1, 0);
+    mprotect(pg + 4096, 4096, PROT_NONE);
+    for (int align = 0; align < 16; align++)
+        for (int n = 0; n < 40; n++) {
+            memset(c, 'x', 64);
+            c[align + n] = 0;
+            CHECK(slen((char *)c + align), n);
+            char *s = (char *)pg + 4096 - n - 1;
+            memset(s, 'y', n);
+            s[n] = 0;
+            CHECK(slen(s), n);
+            s[n] = 'y';
+        }
+    memset(pg, 0x01, 4095); pg[4095] = 0;   /* bytes that trip a naive has-zero */
+    CHECK(slen((char *)pg + 3), 4092);
+    pg[100] = 0x80; pg[101] = 0;
+    CHECK(slen((char *)pg + 99), 2);
+
+    /* Struct assignment. */
+    Hdr h = { 0x1122334455667788ULL, 0xdeadbeef, 0x4242, 7,
+              { { 1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13 } } }, out;
+    memset(&out, 0, sizeof out);
+    hdr_roundtrip(&h, &out, 2);
+    CHECK(memcmp(&h, &out, sizeof h), 0);
+    static Big s, d;
+    for (int i = 0; i < 25; i++) s.words[i] = i * 1000 + 1;
+    s.hdr = h;
+    CHECK(big_copy_sum(&d, &s), 24001 + 1);
+    CHECK(memcmp(&s, &d, sizeof s), 0);
+    memset(&d, 0, sizeof d);
+    big_copy(&d, &s);
+    CHECK(memcmp(&s, &d, sizeof s), 0);
+    memset(&out, 0, sizeof out);
+    hdr_of(&out, &s);
+    CHECK(memcmp(&out, &h, sizeof h), 0);
+    memset(&d, 0, sizeof d);
+    set_hdr(&d, &h);
+    CHECK(memcmp(&d.hdr, &h, sizeof h), 0);
+    CHECK(d.words[24], 0);
+
+    printf("[bulkmem] %s\n", fails == 0 ? "ALL PASS" : "SOME FAILED");
+    return fails == 0 ? 0 : 1;
+}
+CEOF
+if ! gcc -O1 -fno-builtin "$TMP/driver.c" "$TMP/out.s" -o "$TMP/run" \
+        2>"$TMP/link.log"; then
+    echo "[bulkmem] FAIL: asm did not link against the C driver"
+    cat "$TMP/link.log"
+    exit 1
+fi
+if ! "$TMP/run"; then
+    echo "[bulkmem] FAIL: wrong values"
+    exit 1
+fi
+
+echo "[bulkmem] PASS"
+exit 0
@@ -0,0 +1,179 @@
+#!/usr/bin/env bash
+# scripts/test_compiler_debug_info.sh — `-g`: DWARF line tables and
+# call-frame information
+#
+# Background: crash addresses and profiler samples in Adder code could
+# only be matched to a function by hand, and no unwinder could walk
+# through an Adder frame. `-g` emits a `.file` / `.loc` line table and
+# a `.cfi_*` frame description for every function (and every
+# out-of-line cold block) without changing a byte of the code.
+#
+# This is a HOST-SIDE test: build several fixtures with and without -g
+# and compare the code, check the line-table and frame-description
+# shape, then link the fixture against a C driver that takes a
+# backtrace from inside the deepest call and resolve every frame back
+# to a function and a line of the fixture.
+#
+# PASS criterion: code identical, FDEs well formed, every frame
+# resolves to the expected function:line, exit 0.
+
+set -uo pipefail
+cd "$(dirname "$0")/.."
+ROOT="$(pwd)"
+TMP="$(mktemp -d)"
+trap "rm -rf $TMP" EXIT
+
+FIX=tests/test_compiler_debug_info.ad
+adder() { python3 -m compiler.adder "$@"; }
+
+echo "[debug_info] (1/4) -g leaves the code unchanged"
+fail=0
+# same NAME FIXTURE [FLAGS...] — build both ways, compare code and data.
+same() {
+    local name="$1" fix="$2"
+    shift 2
+    for g in "" -g; do
+        if ! adder asm --target=x86_64-adder-user $g "$@" "$fix" \
+                -o "$TMP/$name$g.s" >"$TMP/asm.log" 2>&1 \
+                || ! as "$TMP/$name$g.s" -o "$TMP/$name$g.o" \
+                    2>>"$TMP/asm.log"; then
+            echo "[debug_info] FAIL: $name$g did not build"
+            cat "$TMP/asm.log"
+            fail=1
+            return
+        fi
+    done
+    if ! cmp -s <(objdump -dr "$TMP/$name.o" | tail -n +3) \
+            <(objdump -dr "$TMP/$name-g.o" | tail -n +3) \
+            || ! cmp -s <(objdump -s -j .data -j .rodata -j .bss \
+                              "$TMP/$name.o" 2>/dev/null | tail -n +3) \
+                        <(objdump -s -j .data -j .rodata -j .bss \
+                              "$TMP/$name-g.o" 2>/dev/null | tail -n +3); then
+        echo "[debug_info] FAIL: $name: -g changed the code"
+        fail=1
+    fi
+}
+same debug "$FIX"
+same hints tests/test_compiler_branch_hints.ad
+same loops tests/test_compiler_loop_opt.ad
+same elide tests/test_compiler_frame_elision.ad
+same cycles tests/test_compiler_instrument_cycles.ad --instrument=cycles
+same fentry tests/test_compiler_fentry.ad --fentry --instrument=counts
+[ "$fail" -eq 0 ] || exit 1
+echo "[debug_info] OK: same code with and without -g"
+
+echo "[debug_info] (2/4) Line table and frame-description shape"
+S="$TMP/debug-g.s"
+if grep -qE '^\s+\.(loc|file|cfi_)' "$TMP/debug.s"; then
+    echo "[debug_info] FAIL: debug directives without -g"
+    fail=1
+fi
+if ! grep -q "^    \.file 1 \"$FIX\"\$" "$S" \
+        || ! grep -q '^    \.cfi_sections \.eh_frame, \.debug_frame$' "$S"; then
+    echo "[debug_info] FAIL: no .file / .cfi_sections header"
+    fail=1
+fi
+for loc in "11 1" "13 5" "20 9" "28 9" "33 5"; do
+    if ! grep -q "^    \.loc 1 $loc\$" "$S"; then
+        echo "[debug_info] FAIL: no '.loc 1 $loc'"
+        fail=1
+    fi
+done
+if [ "$(grep -c 'cfi_startproc' "$S")" != 5 ] \
+        || [ "$(grep -c 'cfi_endproc' "$S")" != 5 ]; then
+    echo "[debug_info] FAIL: want 5 FDEs (4 functions, 1 cold block)"
+    fail=1
+fi
+readelf --debug-dump=frames "$TMP/debug-g.o" >"$TMP/frames.txt" 2>&1
+if [ "$(grep -c ' FDE ' "$TMP/frames.txt")" != 10 ]; then
+    echo "[debug_info] FAIL: want each FDE in .eh_frame and .debug_frame"
+    fail=1
+fi
+[ "$fail" -eq 0 ] || exit 1
+echo "[debug_info] OK: .loc per statement, one FDE per code range"
+
+cat > "$TMP/driver.c" <<'CEOF'
+#include <stdio.h>
+#include <stdint.h>
+#include <execinfo.h>
+
+int64_t outer(int64_t), mix(int64_t, int64_t);
+static void *frames[32];
+static int nframes;
+
+/* Called from the deepest Adder frame: leaf <- middle.cold <- outer. */
+int64_t probe(int64_t depth) {
+    nframes = backtrace(frames, 32);
+    return depth;
+}
+
+int main(void) {
+    long long r = outer(4), m = mix(5, 2);
+    printf("%lld %lld\n", r, m);
+    /* Return addresses, less one so they fall inside the call. */
+    for (int i = 1; i < nframes; i++)
+        printf("%#lx\n", (unsigned long)frames[i] - 1);
+    return 0;
+}
+CEOF
+
+echo "[debug_info] (3/4) Link and run"
+# -no-pie: the pcs the driver prints are the ones addr2line reads.
+if ! gcc -O1 -no-pie "$TMP/driver.c" "$S" -o "$TMP/debug" 2>"$TMP/link.log"; then
+    echo "[debug_info] FAIL: link failed"
+    cat "$TMP/link.log"
+    exit 1
+fi
+"$TMP/debug" >"$TMP/run.txt"
+if [ "$(head -1 "$TMP/run.txt")" != "749 -38" ]; then
+    echo "[debug_info] FAIL: driver printed"
+    cat "$TMP/run.txt"
+    exit 1
+fi
+# frames FUNC — the CFA rules in FUNC's .eh_frame FDE, one per row.
+readelf --debug-dump=frames-interp "$TMP/debug" >"$TMP/interp.txt" 2>&1
+frames() {
+    local lo
+    lo="$(nm "$TMP/debug" | awk -v s="$1" '$3 == s { print $1 }')"
+    awk -v lo="$lo" '/^Contents of the .debug_frame/ { exit }
+        / FDE / { split($NF, r, "[=.]+"); on = (r[2] == lo); next }
+        on && length($1) == 16 { print $2 }' "$TMP/interp.txt" | paste -sd' '
+}
+expect_frames() {  # expect_frames FUNC WANT
+    got="$(frames "$1")"
+    if [ "$got" != "$2" ]; then
+        echo "[debug_info] FAIL: $1: CFA '$got', want '$2'"
+        fail=1
+    fi
+}
+expect_frames leaf 'rsp+8 rsp+16 rbp+16 rbp+16 rsp+8 rbp+16'
+expect_frames middle.cold 'rbp+16 rbp+16 rsp+8 rbp+16'
+expect_frames mix 'rsp+8 rsp+16 rsp+8 rsp+16 rsp+24 rsp+16 rsp+8'
+if ! grep -A12 "pc=$(nm "$TMP/debug" | awk '$3 == "outer" { print $1 }')" \
+        "$TMP/interp.txt" | grep -qE '^[0-9a-f]+ rbp\+16 +c-48 +c-16 +c-56'; then
+    echo "[debug_info] FAIL: outer: %rbx / %r12 saves not described"
+    fail=1
+fi
+[ "$fail" -eq 0 ] || exit 1
+echo "[debug_info] OK: fixture computes the same, frames unwind"
+
+echo "[debug_info] (4/4) Backtrace resolves to source lines"
+# The unwinder only reaches main through Adder frames if every FDE is
+# right; addr2line then maps each pc through the line table.
+got="$(tail -n +2 "$TMP/run.txt" | head -4 \
+    | addr2line -f -e "$TMP/debug" | paste - - \
+    | awk '{ n = split($2, p, "/"); print $1 ":" p[n] }' | paste -sd' ')"
+want="leaf:test_compiler_debug_info.ad:13"
+want+=" middle.cold:test_compiler_debug_info.ad:20"
+want+=" outer:test_compiler_debug_info.ad:28"
+if [ "${got%% main:*}" != "$want" ] || [[ "$got" != *" main:"* ]]; then
+    echo "[debug_info] FAIL: backtrace resolved to"
+    echo "$got"
+    echo "want"
+    echo "$want main:..."
+    exit 1
+fi
+echo "[debug_info] OK: $want main"
+
+echo "[debug_info] PASS"
+exit 0
@@ -0,0 +1,261 @@
+#!/usr/bin/env bash
+# scripts/test_compiler_fentry.sh — `--fentry` call sites, the
+# __mcount_loc-style table and `adder fentry`
+#
+# Background: Linux .ko files call __fentry__ from every function
+# (scripts/gen_autostubs.py stubs it), but Adder-compiled functions
+# had no such hook. With --fentry every function starts with a 5-byte
+# `call __fentry__` right after endbr64, and the address of each call
+# is listed between __adder_mcount_loc_start and
+# __adder_mcount_loc_end, so a kernel can NOP them all at boot and
+# patch single sites live into calls to a tracer.
+#
+# This is a HOST-SIDE test: compile the fixture with and without the
+# flag, check the listing, link against a C driver that counts hook
+# hits, NOPs every site out, patches one to its own tracer and back,
+# then decode the linked image with `adder fentry`, as built and with
+# two sites patched in the file.
+#
+# PASS criterion: asm shape holds, the driver prints ALL PASS, the
+# decoder reports every site and its state, exit 0.
+
+set -uo pipefail
+cd "$(dirname "$0")/.."
+ROOT="$(pwd)"
+TMP="$(mktemp -d)"
+trap "rm -rf $TMP" EXIT
+
+FIX=tests/test_compiler_fentry.ad
+FUNCS="Acc__add add3 halve mix fib fib_of"
+
+echo "[fentry] (1/4) Compile fixture to x86_64 asm"
+for variant in plain fentry counts; do
+    flags=()
+    [ "$variant" = fentry ] && flags=(--fentry)
+    [ "$variant" = counts ] && flags=(--fentry --instrument=counts)
+    if ! python3 -m compiler.adder asm --target=x86_64-adder-user \
+            "${flags[@]}" "$FIX" -o "$TMP/$variant.s" \
+            >"$TMP/asm.log" 2>&1; then
+        echo "[fentry] FAIL: fixture did not compile ($variant)"
+        cat "$TMP/asm.log"
+        exit 1
+    fi
+done
+
+echo "[fentry] (2/4) Asm-shape sanity check"
+# body VARIANT FN — the listing of one function.
+body() { sed -n "/^$2:/,/\.size $2,/p" "$TMP/$1.s"; }
+fail=0
+for fn in $FUNCS; do
+    # endbr64, the site label, then the call: nothing in between.
+    if [ "$(body fentry "$fn" | sed -n '2,4p' | tr -s ' ' | paste -sd'|')" \
+            != " endbr64|.Lfentry_$fn:| call __fentry__" ]; then
+        echo "[fentry] FAIL: $fn does not start with call __fentry__"
+        fail=1
+    fi
+    if ! body counts "$fn" | sed -n 5p | grep -q "lock incq .Lprof_$fn"; then
+        echo "[fentry] FAIL: $fn: counter bump does not follow the call"
+        fail=1
+    fi
+done
+if [ "$(grep -c 'call __fentry__' "$TMP/fentry.s")" -ne 6 ]; then
+    echo "[fentry] FAIL: expected exactly one call site per function"
+    fail=1
+fi
+if body fentry add3 | grep -q 'pushq %rbp'; then
+    echo "[fentry] FAIL: add3 lost its frameless form"
+    fail=1
+fi
+if ! body fentry fib_of | grep -qE '^\s+jmp fib$'; then
+    echo "[fentry] FAIL: fib_of no longer sibling-calls fib"
+    fail=1
+fi
+table="$(sed -n '/^__adder_mcount_loc_start:/,/^__adder_mcount_loc_end:/p' \
+         "$TMP/fentry.s" | grep -oE '\.Lfentry_\w+' | sed 's/.Lfentry_//' \
+         | paste -sd' ')"
+if [ "$table" != "$FUNCS" ]; then
+    echo "[fentry] FAIL: call-site table lists: $table"
+    fail=1
+fi
+if grep -qE '__fentry__|mcount_loc' "$TMP/plain.s"; then
+    echo "[fentry] FAIL: a build without --fentry carries call sites"
+    fail=1
+fi
+[ "$fail" -eq 0 ] || exit 1
+echo "[fentry] OK: one listed call site per function, none by default"
+
+echo "[fentry] (3/4) Link with host C driver and run"
+cat > "$TMP/driver.c" <<'CEOF'
+#include <stdio.h>
+#include <stdint.h>
+#include <string.h>
+#include <sys/mman.h>
+#include <unistd.h>
+
+extern uint64_t __adder_mcount_loc_start[], __adder_mcount_loc_end[];
+void Acc__add(void *, int64_t);
+int64_t add3(int64_t, int64_t, int64_t), halve(int64_t), mix(int64_t);
+int64_t fib(int64_t), fib_of(int64_t);
+void __fentry__(void), tracer(void);
+uint64_t fentry_hits, fentry_last, tracer_hits;
+
+/* Like a kernel's: keep every register, note who called. */
+__asm__(
+    ".globl __fentry__\n"
+    "__fentry__:\n"
+    "    lock incq fentry_hits(%rip)\n"
+    "    pushq %rax\n"
+    "    movq 8(%rsp), %rax\n"
+    "    movq %rax, fentry_last(%rip)\n"
+    "    popq %rax\n"
+    "    ret\n"
+    ".globl tracer\n"
+    "tracer:\n"
+    "    lock incq tracer_hits(%rip)\n"
+    "    ret\n");
+
+static int fails;
+#define CHECK(got, want) do {                                            \
+    int64_t g = (int64_t)(got), w = (int64_t)(want);                     \
+    if (g != w && fails++ < 20)                                          \
+        printf("[fentry]   line %d: %s = %lld, want %lld\n",             \
+               __LINE__, #got, (long long)g, (long long)w);              \
+} while (0)
+
+static const unsigned char NOP5[5] = { 0x0f, 0x1f, 0x44, 0x00, 0x00 };
+
+static void poke(uint64_t site, const unsigned char *code) {
+    long page = sysconf(_SC_PAGESIZE);
+    uintptr_t start = site & ~(uintptr_t)(page - 1);
+    mprotect((void *)start, 2 * page, PROT_READ | PROT_WRITE | PROT_EXEC);
+    memcpy((void *)site, code, 5);
+    mprotect((void *)start, 2 * page, PROT_READ | PROT_EXEC);
+}
+
+static void call_to(uint64_t site, void (*target)(void)) {
+    unsigned char code[5] = { 0xe8 };
+    int32_t rel = (int32_t)((uintptr_t)target - (site + 5));
+    memcpy(code + 1, &rel, 4);
+    poke(site, code);
+}
+
+int main(void) {
+    void *funcs[] = { (void *)Acc__add, (void *)add3, (void *)halve,
+                      (void *)mix, (void *)fib, (void *)fib_of };
+    uint64_t *sites = __adder_mcount_loc_start;
+    int n = __adder_mcount_loc_end - __adder_mcount_loc_start;
+    CHECK(n, 6);
+    for (int i = 0; i < n && i < 6; i++) {
+        const unsigned char *p = (const unsigned char *)sites[i];
+        int32_t rel;
+        CHECK(sites[i], (uintptr_t)funcs[i] + 4);   /* after endbr64 */
+        CHECK(p[0], 0xe8);
+        memcpy(&rel, p + 1, 4);
+        CHECK(sites[i] + 5 + rel, (uintptr_t)__fentry__);
+    }
+
+    /* As built: every entry through a site calls __fentry__. */
+    CHECK(mix(10), 18);                  /* add3 + inlined add, halve */
+    CHECK(fentry_hits, 2);
+    CHECK(fentry_last, sites[1] + 5);    /* add3's was the last */
+    CHECK(halve(9), 4);
+    CHECK(fentry_last, sites[2] + 5);
+    fentry_hits = 0;
+    CHECK(fib_of(10), 55);               /* fib_of + 177 fib entries */
+    CHECK(fentry_hits, 178);
+
+    /* Boot-time NOP-out: the functions run as before, hook-free. */
+    for (int i = 0; i < n; i++)
+        poke(sites[i], NOP5);
+    fentry_hits = 0;
+    CHECK(mix(10), 18);
+    CHECK(fib_of(10), 55);
+    CHECK(fentry_hits, 0);
+
+    /* Trace fib alone, then turn it off again. */
+    call_to(sites[4], tracer);
+    CHECK(fib_of(10), 55);
+    CHECK(mix(3), 7);
+    CHECK(tracer_hits, 177);
+    CHECK(fentry_hits, 0);
+    poke(sites[4], NOP5);
+    CHECK(fib_of(10), 55);
+    CHECK(tracer_hits, 177);
+
+    printf("[fentry] %s\n", fails == 0 ? "ALL PASS" : "SOME FAILED");
+    return fails == 0 ? 0 : 1;
+}
+CEOF
+if ! gcc -O1 "$TMP/driver.c" "$TMP/fentry.s" -o "$TMP/run" \
+        2>"$TMP/link.log"; then
+    echo "[fentry] FAIL: asm did not link against the C driver"
+    cat "$TMP/link.log"
+    exit 1
+fi
+if ! "$TMP/run"; then
+    echo "[fentry] FAIL: wrong values"
+    exit 1
+fi
+
+echo "[fentry] (4/4) adder fentry: decode the linked image"
+if ! python3 -m compiler.adder fentry "$TMP/run" >"$TMP/sites.txt" 2>&1; then
+    echo "[fentry] FAIL: adder fentry rejected the image"
+    cat "$TMP/sites.txt"
+    exit 1
+fi
+got="$(sed '1d;$d' "$TMP/sites.txt" | awk '{ print $3 "=" $2 }' \
+       | paste -sd' ')"
+want="Acc__add+0x4=call add3+0x4=call halve+0x4=call mix+0x4=call"
+want="$want fib+0x4=call fib_of+0x4=call"
+if [ "$got" != "$want" ] || \
+        [ "$(tail -1 "$TMP/sites.txt")" != "6 call sites: 6 call" ]; then
+    echo "[fentry] FAIL: decoded sites as built"
+    cat "$TMP/sites.txt"
+    exit 1
+fi
+# NOP mix's site and point fib's at add3, in a copy of the file.
+python3 - "$TMP/run" "$TMP/patched" <<'PYEOF'
+import struct, subprocess, sys
+src, dst = sys.argv[1:]
+syms = {}
+for line in subprocess.run(["nm", src], capture_output=True,
+                           text=True).stdout.splitlines():
+    f = line.split()
+    if len(f) == 3:
+        syms[f[2]] = int(f[0], 16)
+text = None
+for line in subprocess.run(["readelf", "-SW", src], capture_output=True,
+                           text=True).stdout.splitlines():
+    f = line.replace("[ ", "[").split()
+    if len(f) > 5 and f[1] == ".text":
+        text = (int(f[3], 16), int(f[4], 16))
+data = bytearray(open(src, "rb").read())
+off = lambda addr: addr - text[0] + text[1]
+mix_site, fib_site = syms["mix"] + 4, syms["fib"] + 4
+data[off(mix_site):off(mix_site) + 5] = bytes.fromhex("0f1f440000")
+rel = syms["add3"] - (fib_site + 5)
+data[off(fib_site):off(fib_site) + 5] = b"\xe8" + struct.pack("<i", rel)
+open(dst, "wb").write(data)
+PYEOF
+python3 -m compiler.adder fentry "$TMP/patched" >"$TMP/patched.txt" 2>&1
+if ! grep -qE ' nop +mix\+0x4$' "$TMP/patched.txt" \
+        || ! grep -qE ' call add3 +fib\+0x4$' "$TMP/patched.txt" \
+        || [ "$(tail -1 "$TMP/patched.txt")" != \
+             "6 call sites: 4 call, 1 nop, 1 patched" ]; then
+    echo "[fentry] FAIL: decoded sites after patching"
+    cat "$TMP/patched.txt"
+    exit 1
+fi
+# An unlinked object, an image without the table, not an ELF at all.
+gcc -c "$TMP/fentry.s" -o "$TMP/fentry.o"
+echo 'int main(void) { return 0; }' | gcc -x c - -o "$TMP/plain"
+for bad in "$TMP/fentry.o" "$TMP/plain" "$TMP/driver.c"; do
+    if python3 -m compiler.adder fentry "$bad" >/dev/null 2>&1; then
+        echo "[fentry] FAIL: adder fentry accepted $(basename "$bad")"
+        exit 1
+    fi
+done
+echo "[fentry] OK: call sites decoded as built and as patched"
+
+echo "[fentry] PASS"
+exit 0
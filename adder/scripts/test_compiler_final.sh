@@ -0,0 +1,199 @@
+#!/usr/bin/env bash
+# scripts/test_compiler_final.sh — read-only `Final[T]` globals
+#
+# Background: every initialised global went to .data and every read
+# was a load, including banners and tuning constants nothing ever
+# writes. `NAME: Final[T] = value` declares a read-only global: it is
+# emitted to .rodata, reads of a scalar one fold to an immediate, and
+# assigning to it is a compile error.
+#
+# This is a HOST-SIDE test: compile the fixture, check the listing and
+# the rejected writes, then link the asm against a C driver that checks
+# every value and entry point.
+#
+# PASS criterion: asm shape + rejection checks hold, the driver prints
+# ALL PASS, exit 0.
+
+set -uo pipefail
+cd "$(dirname "$0")/.."
+ROOT="$(pwd)"
+TMP="$(mktemp -d)"
+trap "rm -rf $TMP" EXIT
+
+FIX=tests/test_compiler_final.ad
+
+echo "[final] (1/4) Compile fixture to x86_64 asm"
+if ! python3 -m compiler.adder asm --target=x86_64-adder-user \
+        "$FIX" -o "$TMP/out.s" >"$TMP/asm.log" 2>&1; then
+    echo "[final] FAIL: fixture did not compile to asm"
+    cat "$TMP/asm.log"
+    exit 1
+fi
+
+echo "[final] (2/4) Asm-shape sanity check"
+# body FN — the listing of one function.
+body() { sed -n "/^$1:/,/\.size $1,/p" "$TMP/out.s"; }
+fail=0
+for sym in LIMIT SHIFT NEG_ONE WRAPPED BIG DERIVED lowercase_ok FLAG; do
+    if sed -n '/^\s*\.text/,/^\s*\.section/p' "$TMP/out.s" \
+            | grep -qE "\b$sym\(%rip\)"; then
+        echo "[final] FAIL: a read of $sym was not folded"
+        fail=1
+    fi
+done
+if ! body limit | grep -qE '^\s+movq \$10, %rax$'; then
+    echo "[final] FAIL: limit() does not return an immediate"
+    fail=1
+fi
+if ! body sum_to_limit | grep -qE '^\s+cmpq \$10, '; then
+    echo "[final] FAIL: range(LIMIT) does not compare against an immediate"
+    fail=1
+fi
+if ! body big | grep -qE '^\s+movabsq \$18364758544493064720, %rax$'; then
+    echo "[final] FAIL: BIG is not a 64-bit immediate"
+    fail=1
+fi
+if ! body shadow | grep -qE '%rbp|%r(di|si|dx|cx|8|9|10|11)'; then
+    echo "[final] FAIL: shadow() folded its local LIMIT"
+    fail=1
+fi
+# Every Final symbol sits after the .rodata directive, none in .data.
+data=$(sed -n '/^\s*\.section \.data$/,/^\s*\.section/p' "$TMP/out.s")
+for sym in LIMIT BIG BANNER PRIMES; do
+    if grep -qE "^$sym:" <<<"$data"; then
+        echo "[final] FAIL: $sym was emitted to .data"
+        fail=1
+    fi
+done
+if ! grep -qE '^counter:' <<<"$data"; then
+    echo "[final] FAIL: the mutable global counter left .data"
+    fail=1
+fi
+[ "$fail" -eq 0 ] || exit 1
+echo "[final] OK: scalar reads folded, Finals in .rodata"
+
+echo "[final] (3/4) Rejected writes"
+CASES=(
+"assign|K: Final[int64] = 1
+def f():
+    K = 2
+"
+"augmented|K: Final[int64] = 1
+def f():
+    K += 2
+"
+"element|T: Final[Array[4, uint8]] = [1, 2, 3, 4]
+def f():
+    T[1] = 9
+"
+"method|K: Final[int64] = 1
+class C:
+    a: int64
+    def bump(self):
+        K = self.a
+"
+"no_initializer|K: Final[int64]
+"
+"local|def f() -> int64:
+    k: Final[int64] = 1
+    return k
+"
+)
+for entry in "${CASES[@]}"; do
+    name="${entry%%|*}"
+    printf '%s' "${entry#*|}" > "$TMP/case_$name.ad"
+    if python3 -m compiler.adder asm --target=x86_64-adder-user \
+            "$TMP/case_$name.ad" -o "$TMP/case_$name.s" \
+            >"$TMP/case_$name.log" 2>&1; then
+        echo "[final] FAIL: $name compiled cleanly"
+        exit 1
+    fi
+    if ! grep -q "x86: .*Final" "$TMP/case_$name.log"; then
+        echo "[final] FAIL: $name was not rejected with a Final CodeGenError"
+        cat "$TMP/case_$name.log"
+        exit 1
+    fi
+done
+# A store through a Final pointer writes the pointee, not the Final.
+printf 'P: Final[Ptr[uint8]] = 0\ndef f():\n    P[0] = 1\n' > "$TMP/ptr.ad"
+if ! python3 -m compiler.adder asm --target=x86_64-adder-user \
+        "$TMP/ptr.ad" -o "$TMP/ptr.s" >"$TMP/ptr.log" 2>&1; then
+    echo "[final] FAIL: a store through a Final pointer was rejected"
+    cat "$TMP/ptr.log"
+    exit 1
+fi
+echo "[final] OK: assignment / element / method / local / uninitialised rejected"
+
+echo "[final] (4/4) Link with host C driver and run"
+cat > "$TMP/driver.c" <<'CEOF'
+#include <stdio.h>
+#include <stdint.h>
+#include <string.h>
+
+extern const int64_t LIMIT, counter;
+extern const uint8_t WRAPPED;
+extern const int32_t SHIFT;
+extern const int32_t NEG_ONE;
+extern const uint64_t BIG;
+extern const uint8_t BANNER[16];
+extern const uint16_t PRIMES[6];
+int64_t limit(void), scaled(int64_t), below(int64_t), sum_to_limit(void);
+int64_t consts(void), banner_byte(int64_t), prime(int64_t);
+int64_t shadow(int64_t), kind(int64_t);
+uint64_t big(void);
+
+static int fails;
+#define CHECK(got, want) do {                                             \
+    int64_t g = (int64_t)(got), w = (int64_t)(want);                      \
+    if (g != w && fails++ < 20)                                           \
+        printf("[final]   %s = %lld, want %lld\n", #got,                 \
+               (long long)g, (long long)w);                               \
+} while (0)
+
+int main(void) {
+    CHECK(LIMIT, 10);
+    CHECK(SHIFT, 3);
+    CHECK(NEG_ONE, -1);
+    CHECK(WRAPPED, 255);
+    CHECK(BIG, 0xfedcba9876543210ULL);
+    CHECK(counter, 10);
+    CHECK(limit(), 10);
+    for (int64_t x = -20; x <= 20; x++) {
+        CHECK(scaled(x), x * 6 + (x >> 3));
+        CHECK(below(x), x < 10);
+        CHECK(shadow(x), x + 1);
+        CHECK(kind(x), x == 10 ? 1 : x == 6 ? 2 : (x == 0 || x == 1) ? 3 : 0);
+    }
+    CHECK(sum_to_limit(), 45);
+    CHECK(consts(), -1 + 255 + 10 + 1);
+    CHECK(big(), 0xfedcba9876543210ULL);
+    CHECK(memcmp(BANNER, "adder final\n\0\0\0\0", 16), 0);
+    for (int i = 0; i < 12; i++)
+        CHECK(banner_byte(i), "adder final\n"[i]);
+    static const int primes[6] = {2, 3, 5, 7, 11, 13};
+    for (int i = 0; i < 6; i++) {
+        CHECK(prime(i), primes[i]);
+        CHECK(PRIMES[i], primes[i]);
+    }
+    printf("[final] %s\n", fails == 0 ? "ALL PASS" : "SOME FAILED");
+    return fails == 0 ? 0 : 1;
+}
+CEOF
+if ! gcc -O1 "$TMP/driver.c" "$TMP/out.s" -o "$TMP/run" 2>"$TMP/link.log"; then
+    echo "[final] FAIL: asm did not link against the C driver"
+    cat "$TMP/link.log"
+    exit 1
+fi
+# The Finals must land in a read-only segment of the linked binary.
+objdump -t "$TMP/run" > "$TMP/syms"
+if ! grep -qE '\.rodata.*\sPRIMES$' "$TMP/syms"; then
+    echo "[final] FAIL: PRIMES is not in .rodata of the linked binary"
+    exit 1
+fi
+if ! "$TMP/run"; then
+    echo "[final] FAIL: wrong values"
+    exit 1
+fi
+
+echo "[final] PASS"
+exit 0
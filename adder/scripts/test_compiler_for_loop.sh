@@ -39,16 +39,24 @@ if ! python3 -m compiler.adder asm --target=x86_64-adder-user \
     cat "$TMP/asm.log"
     exit 1
 fi
+# The small constant-trip loops are fully unrolled by default; the
+# shape check below looks at the rolled scaffolding.
+if ! python3 -m compiler.adder asm --target=x86_64-adder-user \
+        --no-unroll "$FIX" -o "$TMP/rolled.s" >"$TMP/asm.log" 2>&1; then
+    echo "[for_loop] FAIL: fixture did not compile to asm with --no-unroll"
+    cat "$TMP/asm.log"
+    exit 1
+fi
 
 echo "[for_loop] (2/4) Asm-shape sanity check on the loop scaffolding"
 # range() counter loops emit `.for_<fn>_N` / `.endfor_<fn>_N` labels;
 # array iteration emits `.forarr_<fn>_N` / `.endforarr_<fn>_N`. If the
 # lowering ever degrades back to "not supported" these vanish.
-if ! grep -qE '^\.for_[A-Za-z0-9_]+_[0-9]+:' "$ASM"; then
+if ! grep -qE '^\.for_[A-Za-z0-9_]+_[0-9]+:' "$TMP/rolled.s"; then
     echo "[for_loop] FAIL: no range-loop label (.for_...) in emitted asm"
     exit 1
 fi
-if ! grep -qE '^\.forarr_[A-Za-z0-9_]+_[0-9]+:' "$ASM"; then
+if ! grep -qE '^\.forarr_[A-Za-z0-9_]+_[0-9]+:' "$TMP/rolled.s"; then
     echo "[for_loop] FAIL: no array-loop label (.forarr_...) in emitted asm"
     exit 1
 fi
@@ -0,0 +1,193 @@
+#!/usr/bin/env bash
+# scripts/test_compiler_inline.sh — AST-level inlining
+#
+# Background: every call, down to a one-line accessor or an
+# `obj.method()` lowered to `Class__method`, used to pay the full SysV
+# argument shuffle, a `call`, a `pushq %rbp` frame and parameter spills.
+# compiler/inliner.py now picks small leaves, methods that are never
+# address-taken and single-call statics, and X86CodeGen expands them in
+# place. `@inline` forces a callee, `@noinline` keeps it out of line,
+# `--inline-report` prints every decision.
+#
+# This is a HOST-SIDE test: compile the fixture with and without
+# --no-inline, check the inlined listing no longer calls the expanded
+# callees, check the decorator errors, then link both builds against
+# one C driver that compares every entry point with a C reference.
+#
+# PASS criterion: asm shape + report + rejection checks hold, the
+# driver prints ALL PASS for both builds, exit 0.
+
+set -uo pipefail
+cd "$(dirname "$0")/.."
+ROOT="$(pwd)"
+TMP="$(mktemp -d)"
+trap "rm -rf $TMP" EXIT
+
+FIX=tests/test_compiler_inline.ad
+
+echo "[inline] (1/5) Compile fixture to x86_64 asm (inlined and --no-inline)"
+if ! python3 -m compiler.adder asm --target=x86_64-adder-user \
+        --inline-report "$FIX" -o "$TMP/inl.s" >"$TMP/report.log" 2>&1; then
+    echo "[inline] FAIL: fixture did not compile to asm"
+    cat "$TMP/report.log"
+    exit 1
+fi
+if ! python3 -m compiler.adder asm --target=x86_64-adder-user \
+        --no-inline "$FIX" -o "$TMP/call.s" >"$TMP/asm.log" 2>&1; then
+    echo "[inline] FAIL: fixture did not compile to asm with --no-inline"
+    cat "$TMP/asm.log"
+    exit 1
+fi
+
+echo "[inline] (2/5) Asm-shape sanity check"
+# body FILE FN — the listing of one function.
+body() { sed -n "/^$2:/,/\.size $2,/p" "$1"; }
+fail=0
+for pair in sum_squares:sq clamp_pair:clamp_byte multiples:first_multiple \
+            counter_run:Counter__bump mixed:_mix; do
+    fn="${pair%%:*}"; callee="${pair#*:}"
+    if body "$TMP/inl.s" "$fn" | grep -qE "call\s+$callee\$"; then
+        echo "[inline] FAIL: $fn still calls $callee"
+        fail=1
+    fi
+    if ! body "$TMP/call.s" "$fn" | grep -qE "call\s+$callee\$"; then
+        echo "[inline] FAIL: --no-inline build of $fn does not call $callee"
+        fail=1
+    fi
+done
+# Never expanded: @noinline, direct recursion, and a callee whose free
+# global `scale` is shadowed by a caller local.
+for pair in mixed:opaque mixed:fact fact:fact shadowed:scaled; do
+    fn="${pair%%:*}"; callee="${pair#*:}"
+    if ! body "$TMP/inl.s" "$fn" | grep -qE "call\s+$callee\$"; then
+        echo "[inline] FAIL: $fn no longer calls $callee"
+        fail=1
+    fi
+done
+[ "$fail" -eq 0 ] || exit 1
+echo "[inline] OK: expanded callees gone, @noinline/recursive/shadowed calls kept"
+
+echo "[inline] (3/5) Decision report"
+for want in "sq: inlined (leaf" "Counter__bump: inlined (method" \
+            "_mix: inlined (static" "opaque: not inlined: @noinline" \
+            "fact: not inlined: recursive"; do
+    if ! grep -qF "inline: $want" "$TMP/report.log"; then
+        echo "[inline] FAIL: report lacks '$want'"
+        cat "$TMP/report.log"
+        exit 1
+    fi
+done
+echo "[inline] OK: report lists leaf / method / static / refused decisions"
+
+echo "[inline] (4/5) Decorator errors"
+CASES=(
+"forced_recursive|@inline
+def f(n: int64) -> int64:
+    if n == 0:
+        return 0
+    return f(n - 1)
+"
+"inline_and_noinline|@inline
+@noinline
+def g(n: int64) -> int64:
+    return n
+"
+"unknown_decorator|@memoize
+def h(n: int64) -> int64:
+    return n
+"
+)
+for entry in "${CASES[@]}"; do
+    name="${entry%%|*}"
+    printf '%s' "${entry#*|}" > "$TMP/case_$name.ad"
+    if python3 -m compiler.adder asm --target=x86_64-adder-user \
+            "$TMP/case_$name.ad" -o "$TMP/case_$name.s" \
+            >"$TMP/case_$name.log" 2>&1; then
+        echo "[inline] FAIL: $name compiled cleanly"
+        exit 1
+    fi
+    if ! grep -q "x86: " "$TMP/case_$name.log"; then
+        echo "[inline] FAIL: $name was not rejected with a CodeGenError"
+        cat "$TMP/case_$name.log"
+        exit 1
+    fi
+done
+echo "[inline] OK: forced-but-impossible / contradictory / unknown decorators rejected"
+
+echo "[inline] (5/5) Link both builds with host C driver and run"
+cat > "$TMP/driver.c" <<'CEOF'
+#include <stdio.h>
+#include <stdint.h>
+
+int64_t sum_squares(int64_t), clamp_pair(int64_t, int64_t);
+int64_t multiples(int64_t), shadowed(int64_t);
+int64_t counter_run(int64_t), mixed(int64_t, int64_t);
+
+static int64_t r_sum_squares(int64_t n) {
+    int64_t t = 0;
+    for (int64_t i = 0; i < n; i++) {
+        t += i * i;
+        if (t > 1000) break;
+    }
+    return t;
+}
+static int64_t r_clamp(int64_t x) { return x < 0 ? 0 : x > 255 ? 255 : x; }
+static int64_t r_multiples(int64_t n) {
+    int64_t total = 0;
+    for (int64_t i = 0; i < n; i++) {
+        int64_t j = i;
+        while (j % 7 != 0) j++;
+        total += j;
+    }
+    return total;
+}
+static int64_t r_counter_run(int64_t n) {
+    int64_t hits = 0, last = 0;
+    for (int64_t i = 0; i < n; i++) {
+        hits += i;
+        if (hits > 50) hits = 50;
+        last = hits;
+    }
+    return last;
+}
+static int64_t r_mixed(int64_t a, int64_t b) {
+    int64_t t = (a + 1) * 31;
+    return (t > b ? t - b : b - t) + 120 + 1;
+}
+
+static int fails;
+#define CHECK(call, want) do {                                            \
+    int64_t g = (call), w = (want);                                       \
+    if (g != w && fails++ < 20)                                           \
+        printf("[inline]   %s = %lld, want %lld\n", #call,               \
+               (long long)g, (long long)w);                               \
+} while (0)
+
+int main(void) {
+    for (int64_t v = -300; v <= 300; v += 7) {
+        CHECK(sum_squares(v < 0 ? -v : v), r_sum_squares(v < 0 ? -v : v));
+        CHECK(clamp_pair(v, 300 - v), r_clamp(v) + r_clamp(300 - v) * 1000);
+        CHECK(shadowed(v), v * 3 + 100);
+        CHECK(counter_run(v & 31), r_counter_run(v & 31));
+        CHECK(mixed(v, 500 - v), r_mixed(v, 500 - v));
+    }
+    CHECK(multiples(40), r_multiples(40));
+    printf("[inline] %s\n", fails == 0 ? "ALL PASS" : "SOME FAILED");
+    return fails == 0 ? 0 : 1;
+}
+CEOF
+for build in inl call; do
+    if ! gcc -O1 "$TMP/driver.c" "$TMP/$build.s" -o "$TMP/$build" \
+            2>"$TMP/link.log"; then
+        echo "[inline] FAIL: $build build did not link against the C driver"
+        cat "$TMP/link.log"
+        exit 1
+    fi
+    if ! "$TMP/$build"; then
+        echo "[inline] FAIL: $build build computed wrong results"
+        exit 1
+    fi
+done
+
+echo "[inline] PASS"
+exit 0
@@ -0,0 +1,176 @@
+#!/usr/bin/env bash
+# scripts/test_compiler_instrument.sh — `--instrument=counts` entry
+# counters and the `adder prof` report
+#
+# Background: there was no way to see which functions a workload
+# actually runs. With --instrument=counts every emitted function starts
+# with a `lock incq` of its own 64-bit counter in .data.adder_prof,
+# where each counter sits in a self-describing record (count, address,
+# name) between __adder_prof_start and __adder_prof_end. `adder prof`
+# reads a raw or hex dump of that table and prints the hot functions.
+#
+# This is a HOST-SIDE test: compile the fixture with and without the
+# flag, check the listing, link against a C driver that checks the
+# counts in place and dumps the table, then check the report on the
+# raw dump and on two hex-dump forms of it.
+#
+# PASS criterion: asm shape holds, the driver prints ALL PASS, the
+# reports list the expected counts in order, exit 0.
+
+set -uo pipefail
+cd "$(dirname "$0")/.."
+ROOT="$(pwd)"
+TMP="$(mktemp -d)"
+trap "rm -rf $TMP" EXIT
+
+FIX=tests/test_compiler_instrument.ad
+
+echo "[instrument] (1/4) Compile fixture to x86_64 asm"
+for variant in plain counts; do
+    flags=()
+    [ "$variant" = counts ] && flags=(--instrument=counts)
+    if ! python3 -m compiler.adder asm --target=x86_64-adder-user \
+            "${flags[@]}" "$FIX" -o "$TMP/$variant.s" \
+            >"$TMP/asm.log" 2>&1; then
+        echo "[instrument] FAIL: fixture did not compile ($variant)"
+        cat "$TMP/asm.log"
+        exit 1
+    fi
+done
+
+echo "[instrument] (2/4) Asm-shape sanity check"
+# body FN — the listing of one function.
+body() { sed -n "/^$1:/,/\.size $1,/p" "$TMP/counts.s"; }
+fail=0
+for fn in square twice hot fib never Acc__add; do
+    # The counter bump is the first instruction after endbr64.
+    if ! body "$fn" | sed -n 3p \
+            | grep -qE "^\s+lock incq \.Lprof_$fn\(%rip\)$"; then
+        echo "[instrument] FAIL: $fn does not bump .Lprof_$fn on entry"
+        fail=1
+    fi
+done
+if [ "$(grep -c 'lock incq' "$TMP/counts.s")" -ne 6 ]; then
+    echo "[instrument] FAIL: expected exactly one counter bump per function"
+    fail=1
+fi
+if ! grep -qE '^\s+\.section \.data\.adder_prof, "aw"$' "$TMP/counts.s"; then
+    echo "[instrument] FAIL: no .data.adder_prof section"
+    fail=1
+fi
+if grep -qE 'lock incq|adder_prof' "$TMP/plain.s"; then
+    echo "[instrument] FAIL: uninstrumented build carries counters"
+    fail=1
+fi
+[ "$fail" -eq 0 ] || exit 1
+echo "[instrument] OK: one entry counter per function, none by default"
+
+echo "[instrument] (3/4) Link with host C driver and run"
+cat > "$TMP/driver.c" <<'CEOF'
+#include <stdio.h>
+#include <stdint.h>
+#include <string.h>
+
+extern char __adder_prof_start[], __adder_prof_end[];
+int64_t square(int64_t), twice(int64_t), hot(int64_t), fib(int64_t);
+int64_t never(void);
+
+struct rec { uint64_t count, addr; uint32_t size, name_len; char name[]; };
+
+static int fails;
+#define CHECK(got, want) do {                                             \
+    int64_t g = (int64_t)(got), w = (int64_t)(want);                      \
+    if (g != w && fails++ < 20)                                           \
+        printf("[instrument]   line %d: %s = %lld, want %lld\n",          \
+               __LINE__, #got, (long long)g, (long long)w);               \
+} while (0)
+
+static struct rec *find(const char *name) {
+    for (char *p = __adder_prof_start; p < __adder_prof_end;) {
+        struct rec *r = (struct rec *)p;
+        if (r->name_len == strlen(name) && !memcmp(r->name, name, r->name_len))
+            return r;
+        p += r->size;
+    }
+    printf("[instrument]   no record for %s\n", name);
+    fails++;
+    static struct rec none;
+    return &none;
+}
+
+int main(int argc, char **argv) {
+    CHECK(hot(10), 285 + 90);
+    CHECK(hot(10), 285 + 90);
+    CHECK(fib(10), 55);
+    for (int i = 0; i < 3; i++) CHECK(twice(i), 2 * i);
+
+    CHECK(find("hot")->count, 2);
+    CHECK(find("square")->count, 20);
+    CHECK(find("fib")->count, 177);
+    CHECK(find("twice")->count, 3);
+    CHECK(find("never")->count, 0);
+    CHECK(find("Acc__add")->count, 0);
+    CHECK(find("square")->addr, (uintptr_t)square);
+    CHECK(find("fib")->addr, (uintptr_t)fib);
+
+    FILE *f = fopen(argv[1], "wb");
+    fwrite(__adder_prof_start, 1, __adder_prof_end - __adder_prof_start, f);
+    fclose(f);
+
+    printf("[instrument] %s\n", fails == 0 ? "ALL PASS" : "SOME FAILED");
+    return fails == 0 ? 0 : 1;
+}
+CEOF
+if ! gcc -O1 "$TMP/driver.c" "$TMP/counts.s" -o "$TMP/run" \
+        2>"$TMP/link.log"; then
+    echo "[instrument] FAIL: asm did not link against the C driver"
+    cat "$TMP/link.log"
+    exit 1
+fi
+if ! "$TMP/run" "$TMP/prof.bin"; then
+    echo "[instrument] FAIL: wrong values"
+    exit 1
+fi
+
+echo "[instrument] (4/4) adder prof on raw and hex dumps"
+xxd -p "$TMP/prof.bin" > "$TMP/prof.hex"
+od -An -v -tx1 "$TMP/prof.bin" > "$TMP/prof.od"
+for dump in prof.bin prof.hex prof.od; do
+    if ! python3 -m compiler.adder prof "$TMP/$dump" \
+            >"$TMP/$dump.report" 2>&1; then
+        echo "[instrument] FAIL: adder prof rejected $dump"
+        cat "$TMP/$dump.report"
+        exit 1
+    fi
+    got="$(awk 'NR > 1 && NF == 4 { print $4 "=" $1 }' "$TMP/$dump.report" \
+           | paste -sd' ')"
+    if [ "$got" != "fib=177 square=20 twice=3 hot=2" ]; then
+        echo "[instrument] FAIL: $dump report order/counts: $got"
+        cat "$TMP/$dump.report"
+        exit 1
+    fi
+    if ! tail -1 "$TMP/$dump.report" \
+            | grep -qx "202 entries into 4 of 6 instrumented functions"; then
+        echo "[instrument] FAIL: $dump report summary"
+        cat "$TMP/$dump.report"
+        exit 1
+    fi
+done
+# Two runs' worth: the same dump twice sums the counts.
+python3 -m compiler.adder prof --top 1 "$TMP/prof.bin" "$TMP/prof.hex" \
+    >"$TMP/merged.report"
+if ! sed -n 2p "$TMP/merged.report" | grep -qE '^\s+354\s+87\.62\s+87\.62\s+fib$' \
+        || [ "$(wc -l < "$TMP/merged.report")" -ne 3 ]; then
+    echo "[instrument] FAIL: merged --top 1 report"
+    cat "$TMP/merged.report"
+    exit 1
+fi
+printf 'not a dump\n' > "$TMP/junk.txt"
+if python3 -m compiler.adder prof "$TMP/junk.txt" >/dev/null 2>&1; then
+    echo "[instrument] FAIL: junk accepted as a dump"
+    exit 1
+fi
+echo "[instrument] OK: raw, xxd and od dumps report the same hot list"
+
+echo "[instrument] PASS"
+exit 0
@@ -0,0 +1,250 @@
+#!/usr/bin/env bash
+# scripts/test_compiler_instrument_cycles.sh — `--instrument=cycles`
+# per-CPU call-path cycles, --instrument-filter, `adder prof --cpu`
+#
+# Background: entry counts (--instrument=counts) say how often a
+# function runs, not where the time goes. With --instrument=cycles
+# every instrumented function takes rdtsc after its prologue and again
+# in its shared epilogue (the one canary-checked functions already
+# have); __adder_prof_enter / _exit keep a per-CPU table of call paths,
+# in the per-CPU template behind %gs, with calls and inclusive cycles
+# per path. `adder prof --cpu` merges the tables into a flat profile
+# and folded stacks for a flame graph.
+#
+# This is a HOST-SIDE test: compile the fixture, check the listing,
+# link against a C driver that runs the call tree unarmed (no %gs
+# yet), then on two "CPUs" (two areas installed with arch_prctl),
+# checks nodes in place and dumps the tables; then check the merged
+# report and the folded stacks.
+#
+# PASS criterion: asm shape holds, the driver prints ALL PASS, the
+# report's call counts and the folded paths match the call tree,
+# exit 0.
+
+set -uo pipefail
+cd "$(dirname "$0")/.."
+ROOT="$(pwd)"
+TMP="$(mktemp -d)"
+trap "rm -rf $TMP" EXIT
+
+FIX=tests/test_compiler_instrument_cycles.ad
+
+echo "[instrument_cycles] (1/4) Compile fixture to x86_64 asm"
+if ! python3 -m compiler.adder asm --target=x86_64-adder-user \
+        --instrument=cycles --instrument-filter='-skip_*' \
+        "$FIX" -o "$TMP/out.s" >"$TMP/asm.log" 2>&1; then
+    echo "[instrument_cycles] FAIL: fixture did not compile to asm"
+    cat "$TMP/asm.log"
+    exit 1
+fi
+
+echo "[instrument_cycles] (2/4) Asm-shape sanity check"
+# body FN — the listing of one function.
+body() { sed -n "/^$1:/,/\.size $1,/p" "$TMP/out.s"; }
+fail=0
+expect() {  # expect FN REGEX WHAT
+    if ! body "$1" | grep -qE "$2"; then
+        echo "[instrument_cycles] FAIL: $1: $3"
+        fail=1
+    fi
+}
+reject() {  # reject FN REGEX WHAT
+    if body "$1" | grep -qE "$2"; then
+        echo "[instrument_cycles] FAIL: $1: $3"
+        fail=1
+    fi
+}
+for fn in spin leaf pick forward guarded fib run Acc__add; do
+    expect "$fn" '^\s+call __adder_prof_enter$' "no entry hook"
+    expect "$fn" '^\s+call __adder_prof_exit$' "no exit hook"
+done
+reject skip_me '__adder_prof' "filtered-out function is instrumented"
+expect spin '^\s+pushq %rbp$' "instrumented leaf went frameless"
+expect forward '^\s+call pick$' "return pick(x) is not a call"
+reject forward '^\s+jmp pick$' "return pick(x) became a sibling call"
+if [ "$(body pick | grep -cE '^\s+call __adder_prof_exit$')" -ne 1 ]; then
+    echo "[instrument_cycles] FAIL: pick's returns do not share one exit hook"
+    fail=1
+fi
+if ! body guarded | grep -A2 'call __adder_prof_exit' \
+        | grep -q 'movq -8(%rbp), %rcx'; then
+    echo "[instrument_cycles] FAIL: guarded: canary check does not follow the exit hook"
+    fail=1
+fi
+if ! grep -qE '^__adder_prof_pcpu_start:$' "$TMP/out.s" \
+        || ! grep -B12 '^__adder_prof_pcpu_start:$' "$TMP/out.s" \
+            | grep -q 'section .data..percpu'; then
+    echo "[instrument_cycles] FAIL: call-path table is not in the per-CPU template"
+    fail=1
+fi
+if python3 -m compiler.adder asm --target=x86_64-adder-user \
+        --instrument=cycles --instrument-filter=, "$FIX" \
+        -o "$TMP/bad.s" >/dev/null 2>&1; then
+    echo "[instrument_cycles] FAIL: an empty filter was accepted"
+    fail=1
+fi
+[ "$fail" -eq 0 ] || exit 1
+echo "[instrument_cycles] OK: hooks bracket every instrumented function, filter honoured"
+
+echo "[instrument_cycles] (3/4) Link with host C driver and run"
+cat > "$TMP/driver.c" <<'CEOF'
+#include <stdio.h>
+#include <stdint.h>
+#include <stdlib.h>
+#include <string.h>
+#include <asm/prctl.h>
+#include <sys/syscall.h>
+#include <unistd.h>
+
+extern char __per_cpu_template_start[], __per_cpu_template_end[];
+extern char __adder_prof_pcpu_start[], __adder_prof_pcpu_end[];
+extern char __adder_prof_start[], __adder_prof_end[];
+extern uint64_t __adder_prof_armed;
+int64_t run(void), fib(int64_t), forward(int64_t);
+uint64_t __stack_chk_guard = 0x2545f4914f6cdd1dULL;
+void __stack_chk_fail(void) { puts("[instrument_cycles]   canary!"); abort(); }
+
+struct node { uint64_t key, calls, cycles, addr; };
+
+static int fails;
+#define CHECK(got, want) do {                                             \
+    int64_t g = (int64_t)(got), w = (int64_t)(want);                      \
+    if (g != w && fails++ < 20)                                           \
+        printf("[instrument_cycles]   line %d: %s = %lld, want %lld\n",   \
+               __LINE__, #got, (long long)g, (long long)w);               \
+} while (0)
+
+static int64_t spin_ref(int64_t n) {
+    int64_t s = 0;
+    for (int64_t i = 0; i < n; i++) s = s + (i ^ s);
+    return s;
+}
+
+/* run(): forward(0..2), guarded(2), skip_me(10), fib(6). */
+#define LEAF(n) (spin_ref(n) & 1)
+#define RUN (0 + (LEAF(100) + 1) + (LEAF(200) + 1) + (62 + LEAF(50)) \
+             + LEAF(10) + 8)
+
+static char *new_cpu(void) {
+    size_t size = __per_cpu_template_end - __per_cpu_template_start;
+    char *area = aligned_alloc(64, (size + 63) & ~(size_t)63);
+    memcpy(area, __per_cpu_template_start, size);
+    *(uint64_t *)area = (uint64_t)area;
+    if (syscall(SYS_arch_prctl, ARCH_SET_GS, area)) {
+        perror("arch_prctl");
+        exit(1);
+    }
+    return area + (__adder_prof_pcpu_start - __per_cpu_template_start);
+}
+
+static struct node *find(char *table, uint64_t parent_plus_2, void *fn) {
+    uint64_t n = ((uint64_t *)table)[1];
+    struct node *nodes = (struct node *)(table + 64);
+    uint64_t key = parent_plus_2 << 32 | (uint32_t)(uintptr_t)fn;
+    for (uint64_t i = 0; i < n; i++)
+        if (nodes[i].key == key) return &nodes[i];
+    return NULL;
+}
+
+static void dump(const char *path, const void *p, size_t n) {
+    FILE *f = fopen(path, "wb");
+    fwrite(p, 1, n, f);
+    fclose(f);
+}
+
+int main(int argc, char **argv) {
+    size_t tsize = __adder_prof_pcpu_end - __adder_prof_pcpu_start;
+    (void)argc;
+    /* Unarmed and with no %gs base: the hooks must not touch %gs. */
+    CHECK(run(), RUN);
+    CHECK(fib(10), 55);
+
+    char *cpu0 = new_cpu();
+    __adder_prof_armed = 1;
+    CHECK(run(), RUN);
+    CHECK(*(uint64_t *)cpu0, 0);            /* back at the root */
+    struct node *r = find(cpu0, 1, (void *)run);
+    CHECK(r != NULL, 1);
+    if (r) {
+        CHECK(r->calls, 1);
+        CHECK(r->addr, (uintptr_t)run);
+        CHECK(r->cycles > 0, 1);
+        struct node *f = find(cpu0, r - (struct node *)(cpu0 + 64) + 2,
+                              (void *)forward);
+        CHECK(f != NULL, 1);
+        if (f) {
+            CHECK(f->calls, 3);
+            CHECK(f->cycles > 0 && f->cycles < r->cycles, 1);
+        }
+    }
+
+    char *cpu1 = new_cpu();
+    CHECK(run(), RUN);
+    CHECK(forward(2), 2);
+    CHECK(*(uint64_t *)cpu1, 0);
+
+    dump(argv[1], __adder_prof_start, __adder_prof_end - __adder_prof_start);
+    dump(argv[2], cpu0, tsize);
+    dump(argv[3], cpu1, tsize);
+    printf("[instrument_cycles] %s\n", fails == 0 ? "ALL PASS" : "SOME FAILED");
+    return fails == 0 ? 0 : 1;
+}
+CEOF
+if ! gcc -O1 "$TMP/driver.c" "$TMP/out.s" -o "$TMP/run" \
+        2>"$TMP/link.log"; then
+    echo "[instrument_cycles] FAIL: asm did not link against the C driver"
+    cat "$TMP/link.log"
+    exit 1
+fi
+if ! "$TMP/run" "$TMP/records.bin" "$TMP/cpu0.bin" "$TMP/cpu1.bin"; then
+    echo "[instrument_cycles] FAIL: wrong values"
+    exit 1
+fi
+
+echo "[instrument_cycles] (4/4) adder prof --cpu: flat profile and folded stacks"
+if ! python3 -m compiler.adder prof "$TMP/records.bin" \
+        --cpu "$TMP/cpu0.bin" --cpu "$TMP/cpu1.bin" \
+        --folded "$TMP/out.folded" >"$TMP/report.txt" 2>&1; then
+    echo "[instrument_cycles] FAIL: adder prof rejected the dumps"
+    cat "$TMP/report.txt"
+    exit 1
+fi
+# The rows, without the heading and the total line.
+sed '1d;$d' "$TMP/report.txt" >"$TMP/rows.txt"
+got="$(awk '{ print $5 "=" $1 }' "$TMP/rows.txt" \
+       | sort | paste -sd' ')"
+# Acc.add is inlined into run: its out-of-line copy never runs.
+want="fib=50 forward=7 guarded=2 leaf=9 pick=7 run=2 spin=9"
+if [ "$got" != "$want" ]; then
+    echo "[instrument_cycles] FAIL: calls per function: $got"
+    cat "$TMP/report.txt"
+    exit 1
+fi
+if ! awk '$2 < $3 { bad = 1 } END { exit bad }' "$TMP/rows.txt"; then
+    echo "[instrument_cycles] FAIL: a function's self time exceeds its inclusive time"
+    cat "$TMP/report.txt"
+    exit 1
+fi
+paths="$(cut -d' ' -f1 "$TMP/out.folded" | paste -sd' ')"
+want_paths="forward forward;pick forward;pick;leaf forward;pick;leaf;spin"
+want_paths="$want_paths run run;fib run;fib;fib run;fib;fib;fib"
+want_paths="$want_paths run;fib;fib;fib;fib run;fib;fib;fib;fib;fib"
+want_paths="$want_paths run;fib;fib;fib;fib;fib;fib run;forward"
+want_paths="$want_paths run;forward;pick run;forward;pick;leaf"
+want_paths="$want_paths run;forward;pick;leaf;spin run;guarded"
+want_paths="$want_paths run;guarded;leaf run;guarded;leaf;spin run;leaf"
+want_paths="$want_paths run;leaf;spin"
+if [ "$paths" != "$want_paths" ]; then
+    echo "[instrument_cycles] FAIL: folded paths: $paths"
+    exit 1
+fi
+folded_total="$(awk '{ s += $2 } END { print s }' "$TMP/out.folded")"
+if ! tail -1 "$TMP/report.txt" | grep -qx "$folded_total cycles in 7 functions"; then
+    echo "[instrument_cycles] FAIL: folded total $folded_total vs report"
+    tail -1 "$TMP/report.txt"
+    exit 1
+fi
+echo "[instrument_cycles] OK: per-CPU tables merge into the call tree"
+
+echo "[instrument_cycles] PASS"
+exit 0
@@ -0,0 +1,231 @@
+#!/usr/bin/env bash
+# scripts/test_compiler_layout.sh — @packed / @align(N) classes and
+# globals, --layout-report
+#
+# Background: layout_struct always used natural alignment with an
+# 8-byte-rounded total and gen_data always emitted `.align 8`, so
+# contended counters shared cache lines and descriptor rings / wire
+# headers could not be declared at all. `@packed` and `@align(N)` on a
+# class now drive layout_struct / get_type_size, `@align(N)` on a
+# global drives its `.align`, and --layout-report prints each class's
+# padding holes and cache-line straddles.
+#
+# This is a HOST-SIDE test: compile the fixture, check the listing,
+# the report and the rejected forms, then link against a C driver that
+# declares the same layouts with __attribute__((packed / aligned)).
+#
+# PASS criterion: asm shape + report + rejection checks hold, the
+# driver prints ALL PASS, exit 0.
+
+set -uo pipefail
+cd "$(dirname "$0")/.."
+ROOT="$(pwd)"
+TMP="$(mktemp -d)"
+trap "rm -rf $TMP" EXIT
+
+FIX=tests/test_compiler_layout.ad
+
+echo "[layout] (1/4) Compile fixture to x86_64 asm"
+if ! python3 -m compiler.adder asm --target=x86_64-adder-user \
+        "$FIX" -o "$TMP/out.s" >"$TMP/asm.log" 2>&1; then
+    echo "[layout] FAIL: fixture did not compile to asm"
+    cat "$TMP/asm.log"
+    exit 1
+fi
+
+echo "[layout] (2/4) Asm-shape sanity check"
+# body FN — the listing of one function.
+body() { sed -n "/^$1:/,/\.size $1,/p" "$TMP/out.s"; }
+fail=0
+expect() {  # expect FN REGEX WHAT
+    if ! body "$1" | grep -qE "$2"; then
+        echo "[layout] FAIL: $1: $3"
+        fail=1
+    fi
+}
+# aligned SYM N — the directive right before SYM's label is `.align N`.
+aligned() {
+    if ! grep -B1 "^$1:$" "$TMP/out.s" | grep -qE "^\s+\.align $2$"; then
+        echo "[layout] FAIL: $1 is not .align $2"
+        fail=1
+    fi
+}
+expect desc_len '^\s+imulq \$11, ' "packed Desc stride is not 11"
+expect desc_len '^\s+addq \$8, %rax$' "packed Desc.len is not at offset 8"
+expect set_wire '^\s+shlq \$3, ' "Wire stride is not 8"
+expect bump '^\s+addq \$128, %rax$' "Shared.b is not at offset 128"
+aligned hot_a 64
+aligned hot_b 64
+aligned shared 64
+aligned ring 8
+[ "$fail" -eq 0 ] || exit 1
+echo "[layout] OK: strides, offsets and .align follow the decorators"
+
+echo "[layout] (3/4) --layout-report and rejected forms"
+python3 -m compiler.adder asm --target=x86_64-adder-user --layout-report \
+    "$FIX" -o "$TMP/rep.s" 2>"$TMP/report.txt" >/dev/null
+for want in \
+        "layout: Desc: size 11, align 1" \
+        "layout: Wire: size 8, align 4" \
+        "layout:   tail padding of 1 byte" \
+        "layout: Shared: size 192, align 64" \
+        "layout:   hole of 60 bytes at offset 4 after 'lock'" \
+        "layout: Packet: size 7, align 1" \
+        "layout:   'x' (8 bytes at offset 60) straddles a cache line"; do
+    if ! grep -qxF "$want" "$TMP/report.txt"; then
+        echo "[layout] FAIL: report lacks: $want"
+        cat "$TMP/report.txt"
+        exit 1
+    fi
+done
+if python3 -m compiler.adder asm --target=x86_64-adder-user \
+        "$FIX" -o "$TMP/quiet.s" 2>&1 | grep -q "^layout:"; then
+    echo "[layout] FAIL: report printed without --layout-report"
+    exit 1
+fi
+CASES=(
+"align_not_pow2|@align(48)
+class C:
+    x: uint64
+"
+"align_global|@align(3)
+g: uint64
+"
+"align_too_big|@align(8192)
+g: uint64
+"
+"unknown_class_decorator|@frozen
+class C:
+    x: uint64
+"
+"align_on_def|@align(16)
+def f() -> int64:
+    return 0
+"
+"packed_global|@packed
+g: uint64
+"
+)
+for entry in "${CASES[@]}"; do
+    name="${entry%%|*}"
+    printf '%s' "${entry#*|}" > "$TMP/case_$name.ad"
+    if python3 -m compiler.adder asm --target=x86_64-adder-user \
+            "$TMP/case_$name.ad" -o "$TMP/case_$name.s" \
+            >"$TMP/case_$name.log" 2>&1; then
+        echo "[layout] FAIL: $name compiled cleanly"
+        exit 1
+    fi
+    if ! grep -qE "(x86: .*(@align|decorator)|@align\(N\))" \
+            "$TMP/case_$name.log"; then
+        echo "[layout] FAIL: $name was not rejected with a clear error"
+        cat "$TMP/case_$name.log"
+        exit 1
+    fi
+done
+echo "[layout] OK: report lists sizes, holes, straddles; bad decorators rejected"
+
+echo "[layout] (4/4) Link with host C driver and run"
+cat > "$TMP/driver.c" <<'CEOF'
+#include <stdio.h>
+#include <stdint.h>
+#include <stddef.h>
+#include <string.h>
+
+typedef struct __attribute__((packed)) {
+    uint64_t addr; uint16_t len; uint8_t flags;
+} Desc;
+typedef struct __attribute__((packed, aligned(4))) {
+    uint8_t kind; uint32_t len; uint16_t tag;
+} Wire;
+typedef struct __attribute__((aligned(64))) { uint64_t hits; } Counter;
+typedef struct { uint32_t lock; Counter a, b; } Shared;
+typedef struct __attribute__((packed)) {
+    uint8_t tag; uint32_t len; uint16_t crc;
+} Packet;
+
+int64_t desc_size(void), wire_size(void), counter_size(void);
+int64_t shared_size(void), packet_size(void);
+void set_desc(Desc *, uint64_t, uint64_t, uint16_t, uint8_t);
+uint16_t desc_len(const Desc *, uint64_t);
+void ring_set(uint64_t, uint16_t);
+void set_wire(Wire *, uint64_t, uint8_t, uint32_t, uint16_t);
+void bump(Shared *, uint64_t), bump_global(void);
+void set_packet(Packet *, uint8_t, uint32_t, uint16_t);
+
+extern Desc ring[8];
+extern uint64_t hot_a, hot_b;
+extern Shared shared;
+
+static int fails;
+#define CHECK(got, want) do {                                             \
+    int64_t g = (int64_t)(got), w = (int64_t)(want);                      \
+    if (g != w && fails++ < 20)                                           \
+        printf("[layout]   line %d: %s = %lld, want %lld\n", __LINE__,    \
+               #got, (long long)g, (long long)w);                         \
+} while (0)
+
+int main(void) {
+    CHECK(desc_size(), sizeof(Desc));
+    CHECK(wire_size(), sizeof(Wire));
+    CHECK(counter_size(), sizeof(Counter));
+    CHECK(shared_size(), sizeof(Shared));
+    CHECK(packet_size(), sizeof(Packet));
+
+    /* Packed ring: every field lands where the C layout has it. */
+    Desc d[4];
+    memset(d, 0xee, sizeof d);
+    for (int i = 0; i < 4; i++)
+        set_desc(d, i, 0x1000 * (i + 1), 100 + i, i | 0x80);
+    for (int i = 0; i < 4; i++) {
+        CHECK(d[i].addr, 0x1000 * (i + 1));
+        CHECK(d[i].len, 100 + i);
+        CHECK(d[i].flags, i | 0x80);
+        CHECK(desc_len(d, i), 100 + i);
+    }
+    for (int i = 0; i < 8; i++) ring_set(i, 7 * i);
+    for (int i = 0; i < 8; i++) CHECK(ring[i].len, 7 * i);
+
+    Wire w[3];
+    memset(w, 0, sizeof w);
+    for (int i = 0; i < 3; i++) set_wire(w, i, i + 1, 0xa0000000u + i, 0x5150 + i);
+    for (int i = 0; i < 3; i++) {
+        CHECK(w[i].kind, i + 1);
+        CHECK(w[i].len, 0xa0000000u + i);
+        CHECK(w[i].tag, 0x5150 + i);
+    }
+
+    Packet p;
+    memset(&p, 0, sizeof p);
+    set_packet(&p, 9, 0x01020304, 0xbeef);
+    CHECK(p.tag, 9); CHECK(p.len, 0x01020304); CHECK(p.crc, 0xbeef);
+
+    /* Cache-line separated counters. */
+    static Shared s;
+    bump(&s, 0); bump(&s, 1); bump(&s, 1);
+    CHECK(s.a.hits, 1); CHECK(s.b.hits, 2);
+    CHECK(offsetof(Shared, b) - offsetof(Shared, a), 64);
+    CHECK((uintptr_t)&hot_a % 64, 0);
+    CHECK((uintptr_t)&hot_b % 64, 0);
+    CHECK((uintptr_t)&shared % 64, 0);
+    CHECK((uintptr_t)&hot_b / 64 != (uintptr_t)&hot_a / 64, 1);
+    bump_global(); bump_global();
+    CHECK(shared.b.hits, 2);
+    CHECK(hot_a, 1); CHECK(hot_b, 2);
+
+    printf("[layout] %s\n", fails == 0 ? "ALL PASS" : "SOME FAILED");
+    return fails == 0 ? 0 : 1;
+}
+CEOF
+if ! gcc -O1 "$TMP/driver.c" "$TMP/out.s" -o "$TMP/run" \
+        2>"$TMP/link.log"; then
+    echo "[layout] FAIL: asm did not link against the C driver"
+    cat "$TMP/link.log"
+    exit 1
+fi
+if ! "$TMP/run"; then
+    echo "[layout] FAIL: wrong values"
+    exit 1
+fi
+
+echo "[layout] PASS"
+exit 0
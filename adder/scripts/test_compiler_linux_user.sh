@@ -0,0 +1,100 @@
+#!/usr/bin/env bash
+# scripts/test_compiler_linux_user.sh — the x86_64-linux-user target:
+# a static ELF64 that runs on the build host
+#
+# Background: the only way to run Adder-generated code was to boot
+# Hamnix in QEMU, so nothing could be timed with `perf stat` or
+# checked in CI without virtualization. x86_64-linux-user links the
+# same code against compiler/runtime_linux.S (_start plus the
+# user/runtime.S wrappers that have a Linux equivalent) into a static
+# ELF64 the host runs directly.
+#
+# This is a HOST-SIDE test: build the fixture, check the image shape,
+# run it and check its output against Python's zlib.crc32 and its exit
+# status, check a Hamnix-only wrapper is a link error, and check a -g
+# build maps main back to the fixture.
+#
+# PASS criterion: static ELF64 executable, correct CRCs and status,
+# the link error names the wrapper, exit 0.
+
+set -uo pipefail
+cd "$(dirname "$0")/.."
+ROOT="$(pwd)"
+TMP="$(mktemp -d)"
+trap "rm -rf $TMP" EXIT
+
+FIX=tests/test_compiler_linux_user.ad
+adder() { python3 -m compiler.adder "$@"; }
+
+echo "[linux_user] (1/4) Build a static ELF64"
+for g in "" -g; do
+    if ! adder compile --target=x86_64-linux-user $g "$FIX" \
+            -o "$TMP/prog$g" >"$TMP/build.log" 2>&1; then
+        echo "[linux_user] FAIL: fixture did not build ($g)"
+        cat "$TMP/build.log"
+        exit 1
+    fi
+done
+BIN="$TMP/prog"
+readelf -hl "$BIN" >"$TMP/hdr.txt"
+entry="$(awk '/Entry point/ { print $NF }' "$TMP/hdr.txt")"
+start="$(nm "$BIN" | awk '$3 == "_start" { print $1 }')"
+if ! grep -q 'Class: *ELF64' "$TMP/hdr.txt" \
+        || ! grep -q 'Type: *EXEC' "$TMP/hdr.txt" \
+        || grep -q 'INTERP' "$TMP/hdr.txt" \
+        || [ "$((entry))" != "$((0x$start))" ]; then
+    echo "[linux_user] FAIL: want a static ELF64 executable entered at _start"
+    cat "$TMP/hdr.txt"
+    exit 1
+fi
+echo "[linux_user] OK: static ELF64, entry _start"
+
+echo "[linux_user] (2/4) Run on the host"
+"$BIN" adder >"$TMP/out.txt"
+status=$?
+want="$(python3 -c '
+import zlib
+x, big = 1, bytearray()
+for _ in range(1 << 20):
+    x = (x * 6364136223846793005 + 1442695040888963407) % 2**64
+    big.append(x >> 56)
+print("%08x" % zlib.crc32(b"adder"))
+print("%08x" % zlib.crc32(bytes(big)))
+print("raw syscall")')"
+if [ "$status" != 42 ] || [ "$(cat "$TMP/out.txt")" != "$want" ]; then
+    echo "[linux_user] FAIL: exit $status, printed"
+    cat "$TMP/out.txt"
+    echo "want exit 42 and"
+    echo "$want"
+    exit 1
+fi
+"$BIN" >/dev/null
+status=$?
+if [ "$status" != 2 ]; then
+    echo "[linux_user] FAIL: argc not passed (exit $status, want 2)"
+    exit 1
+fi
+echo "[linux_user] OK: CRCs match zlib, argv and exit status round-trip"
+
+echo "[linux_user] (3/4) Hamnix-only wrappers are a link error"
+if adder compile --target=x86_64-linux-user \
+        tests/test_compiler_linux_user_rfork.ad -o "$TMP/rfork" \
+        >"$TMP/rfork.log" 2>&1 \
+        || ! grep -q "undefined reference to \`sys_rfork'" "$TMP/rfork.log"; then
+    echo "[linux_user] FAIL: sys_rfork linked, or the error did not name it"
+    cat "$TMP/rfork.log"
+    exit 1
+fi
+echo "[linux_user] OK: sys_rfork is undefined on the host"
+
+echo "[linux_user] (4/4) -g resolves on the host image"
+pc="$(nm "$TMP/prog-g" | awk '$3 == "main" { print $1 }')"
+got="$(addr2line -e "$TMP/prog-g" "0x$pc")"
+if [ "${got##*/}" != "test_compiler_linux_user.ad:47" ]; then
+    echo "[linux_user] FAIL: main resolved to '$got'"
+    exit 1
+fi
+echo "[linux_user] OK: main at $FIX:47"
+
+echo "[linux_user] PASS"
+exit 0
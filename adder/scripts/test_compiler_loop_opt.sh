@@ -0,0 +1,196 @@
+#!/usr/bin/env bash
+# scripts/test_compiler_loop_opt.sh — `for` loop lowering
+#
+# Background: gen_for_range re-evaluated the whole `stop` expression
+# (calls included) through a setcc/test/jz compare at the top of every
+# iteration, and stepped the counter with a full load/add/store round
+# trip through its stack slot; gen_for_array did the same with its
+# hidden index. Both now evaluate the range operands once, keep the
+# counter and any non-constant bound / step in callee-saved registers,
+# and end each iteration with one cmp + jcc back to the body. Loops with
+# a small constant trip count are fully unrolled (`--no-unroll` keeps
+# them rolled).
+#
+# This is a HOST-SIDE test: compile the fixture with and without
+# --no-unroll, check the listing shapes, then link both builds against
+# one C driver that compares every entry point with a C reference while
+# holding its own values in callee-saved registers across the calls.
+#
+# PASS criterion: asm shape checks hold, the driver prints ALL PASS for
+# both builds, exit 0.
+
+set -uo pipefail
+cd "$(dirname "$0")/.."
+ROOT="$(pwd)"
+TMP="$(mktemp -d)"
+trap "rm -rf $TMP" EXIT
+
+FIX=tests/test_compiler_loop_opt.ad
+
+echo "[loop_opt] (1/3) Compile fixture to x86_64 asm (default and --no-unroll)"
+if ! python3 -m compiler.adder asm --target=x86_64-adder-user \
+        "$FIX" -o "$TMP/opt.s" >"$TMP/asm.log" 2>&1; then
+    echo "[loop_opt] FAIL: fixture did not compile to asm"
+    cat "$TMP/asm.log"
+    exit 1
+fi
+if ! python3 -m compiler.adder asm --target=x86_64-adder-user \
+        --no-unroll "$FIX" -o "$TMP/rolled.s" >"$TMP/asm.log" 2>&1; then
+    echo "[loop_opt] FAIL: fixture did not compile to asm with --no-unroll"
+    cat "$TMP/asm.log"
+    exit 1
+fi
+
+echo "[loop_opt] (2/3) Asm-shape sanity check"
+# body FILE FN — the listing of one function.
+body() { sed -n "/^$2:/,/\.size $2,/p" "$1"; }
+fail=0
+n=$(body "$TMP/opt.s" call_bound | grep -cE 'call\s+limit$')
+if [ "$n" -ne 1 ]; then
+    echo "[loop_opt] FAIL: call_bound calls limit $n times in its listing, want 1"
+    fail=1
+fi
+# Register counter and bound, saved/restored, bottom-tested.
+if ! body "$TMP/opt.s" with_calls | grep -qE 'movq\s+%rbx, -[0-9]+\(%rbp\)'; then
+    echo "[loop_opt] FAIL: with_calls does not save %rbx in its prologue"
+    fail=1
+fi
+if ! body "$TMP/opt.s" with_calls \
+        | grep -A1 -E 'cmpq\s+%r12, %rbx' | grep -qE '^\s+jl\s+\.for_'; then
+    echo "[loop_opt] FAIL: with_calls loop is not a bottom cmpq %r12, %rbx; jl"
+    fail=1
+fi
+for fn in with_calls stepped table_sum; do
+    if body "$TMP/rolled.s" "$fn" | grep -qE '^\s+set[a-z]+\s'; then
+        echo "[loop_opt] FAIL: $fn loop test still materialises a setcc"
+        fail=1
+    fi
+done
+if ! body "$TMP/opt.s" addr_counter | grep -qE 'leaq\s+-[0-9]+\(%rbp\), %rax'; then
+    echo "[loop_opt] FAIL: address-taken counter in addr_counter left its stack slot"
+    fail=1
+fi
+for fn in digits table_sum; do
+    if body "$TMP/opt.s" "$fn" | grep -qE '^\.for'; then
+        echo "[loop_opt] FAIL: constant-trip loops in $fn were not unrolled"
+        fail=1
+    fi
+    if ! body "$TMP/rolled.s" "$fn" | grep -qE '^\.for'; then
+        echo "[loop_opt] FAIL: --no-unroll build of $fn has no loop"
+        fail=1
+    fi
+done
+[ "$fail" -eq 0 ] || exit 1
+echo "[loop_opt] OK: bound hoisted, register counters saved, bottom test, unrolled"
+
+echo "[loop_opt] (3/3) Link both builds with host C driver and run"
+cat > "$TMP/driver.c" <<'CEOF'
+#include <stdio.h>
+#include <stdint.h>
+
+int64_t call_bound(int64_t), with_calls(int64_t);
+int64_t nested3(int64_t, int64_t, int64_t), stepped(int64_t, int64_t);
+int64_t down32(int32_t), find_first(int64_t, int64_t);
+int64_t until(int64_t, int64_t), addr_counter(int64_t);
+int64_t digits(void), table_sum(int64_t);
+
+/* addr_counter takes `&i`, so it carries a stack canary. */
+uint64_t __stack_chk_guard = 0x5eed5eed5eed5eedULL;
+
+static int64_t mix(int64_t a, int64_t b) { return a * 7 + b; }
+
+static int64_t r_call_bound(int64_t n) {
+    int64_t s = 0;
+    for (int64_t i = 0; i < n; i++) s += i;
+    return s * 1000 + 1;
+}
+static int64_t r_with_calls(int64_t n) {
+    int64_t s = 0;
+    for (int64_t i = 1; i < n * 2; i += 3) s = mix(s, i);
+    return s;
+}
+static int64_t r_nested3(int64_t a, int64_t b, int64_t c) {
+    int64_t s = 0;
+    for (int64_t i = 0; i < a; i++)
+        for (int64_t j = i; j < b; j++)
+            for (int64_t k = 0; k < c; k++)
+                s = s + mix(i, j) - k;
+    return s;
+}
+static int64_t r_stepped(int64_t n, int64_t step) {
+    int64_t s = 0, i = 0, last = 0;
+    for (i = 0; i < n; i += step) { s += i; last = i + step; }
+    return s * 100 + last;
+}
+static int64_t r_down32(int32_t n) {
+    int64_t s = 0;
+    for (int32_t i = n; i > -5; i -= 2) s = s * 3 + mix(i, 1);
+    return s;
+}
+static int64_t r_find_first(int64_t n, int64_t want) {
+    for (int64_t i = 0; i < n; i++)
+        if (mix(i, 0) == want) return i;
+    return -1;
+}
+static int64_t r_until(int64_t n, int64_t cap) {
+    int64_t s = 0;
+    for (int64_t i = 0; i < n; i++) {
+        if (s > cap) break;
+        s = mix(s, i) % 1000;
+    }
+    return s;
+}
+static int64_t r_table_sum(int64_t seed) {
+    int64_t s = 0;
+    for (int64_t i = 0; i < 6; i++) s = mix(s, seed + i);
+    return s;
+}
+
+static int fails;
+#define CHECK(call, want) do {                                            \
+    int64_t g = (call), w = (want);                                       \
+    if (g != w && fails++ < 20)                                           \
+        printf("[loop_opt]   %s = %lld, want %lld\n", #call,             \
+               (long long)g, (long long)w);                               \
+} while (0)
+
+int main(void) {
+    /* Live across every call below: the callee-saved registers these
+     * end up in must survive the Adder functions' loop registers. */
+    volatile int64_t guard_in = 0x1234567;
+    int64_t g1 = guard_in, g2 = guard_in * 3, g3 = guard_in ^ 0x55;
+    for (int64_t v = 1; v <= 40; v += 3) {
+        CHECK(call_bound(v), r_call_bound(v));
+        CHECK(with_calls(v), r_with_calls(v));
+        CHECK(nested3(v % 5, v % 7, v % 4), r_nested3(v % 5, v % 7, v % 4));
+        CHECK(stepped(v * 3, v % 4 + 1), r_stepped(v * 3, v % 4 + 1));
+        CHECK(down32((int32_t)v - 6), r_down32((int32_t)v - 6));
+        CHECK(find_first(v, 7 * (v / 2)), r_find_first(v, 7 * (v / 2)));
+        CHECK(until(v, 300), r_until(v, 300));
+        CHECK(addr_counter(v), v * (v - 1) / 2);
+        CHECK(table_sum(v), r_table_sum(v));
+        g1 += v; g2 ^= g1; g3 -= g2;
+    }
+    CHECK(digits(), 1234);
+    int64_t r1 = guard_in, r2 = guard_in * 3, r3 = guard_in ^ 0x55;
+    for (int64_t v = 1; v <= 40; v += 3) { r1 += v; r2 ^= r1; r3 -= r2; }
+    CHECK(g1 + g2 + g3, r1 + r2 + r3);
+    printf("[loop_opt] %s\n", fails == 0 ? "ALL PASS" : "SOME FAILED");
+    return fails == 0 ? 0 : 1;
+}
+CEOF
+for build in opt rolled; do
+    if ! gcc -O2 "$TMP/driver.c" "$TMP/$build.s" -o "$TMP/$build" \
+            2>"$TMP/link.log"; then
+        echo "[loop_opt] FAIL: $build build did not link against the C driver"
+        cat "$TMP/link.log"
+        exit 1
+    fi
+    if ! "$TMP/$build"; then
+        echo "[loop_opt] FAIL: $build build computed wrong results"
+        exit 1
+    fi
+done
+
+echo "[loop_opt] PASS"
+exit 0
@@ -0,0 +1,274 @@
+#!/usr/bin/env bash
+# scripts/test_compiler_match.sh — `match` + if/elif dispatch
+#
+# Background: the parser built MatchStmt nodes but the x86_64 codegen
+# rejected them, so syscall, ioctl and 9P message dispatch were written
+# as if/elif ladders that compare the value against every constant in
+# turn. `match` on an integer scrutinee now lowers to a jump table of
+# .rodata offsets over dense values and a binary search over sparse
+# ones, and an if/elif chain testing one variable against constants is
+# recognised as the same shape. `--no-jump-tables` keeps every dispatch
+# to compares (for retpoline / IBT builds).
+#
+# This is a HOST-SIDE test: compile the fixture with and without
+# --no-jump-tables, check the listing shapes and the rejected patterns,
+# then link both builds against one C driver that compares every entry
+# point with a C reference over a sweep of values.
+#
+# PASS criterion: asm shape + rejection checks hold, the driver prints
+# ALL PASS for both builds, exit 0.
+
+set -uo pipefail
+cd "$(dirname "$0")/.."
+ROOT="$(pwd)"
+TMP="$(mktemp -d)"
+trap "rm -rf $TMP" EXIT
+
+FIX=tests/test_compiler_match.ad
+
+echo "[match] (1/4) Compile fixture to x86_64 asm (default and --no-jump-tables)"
+if ! python3 -m compiler.adder asm --target=x86_64-adder-user \
+        "$FIX" -o "$TMP/jt.s" >"$TMP/asm.log" 2>&1; then
+    echo "[match] FAIL: fixture did not compile to asm"
+    cat "$TMP/asm.log"
+    exit 1
+fi
+if ! python3 -m compiler.adder asm --target=x86_64-adder-user \
+        --no-jump-tables "$FIX" -o "$TMP/cmp.s" >"$TMP/asm.log" 2>&1; then
+    echo "[match] FAIL: fixture did not compile with --no-jump-tables"
+    cat "$TMP/asm.log"
+    exit 1
+fi
+
+echo "[match] (2/4) Asm-shape sanity check"
+# body FILE FN — the listing of one function.
+body() { sed -n "/^$2:/,/\.size $2,/p" "$1"; }
+fail=0
+for fn in dense chain classify; do
+    if ! body "$TMP/jt.s" "$fn" | grep -qE '^\s+jmp\s+\*%rcx$'; then
+        echo "[match] FAIL: $fn does not dispatch through a jump table"
+        fail=1
+    fi
+done
+if ! grep -qE '^\s+\.long\s+\.case_dense_[0-9]+ - \.jumptable_dense_[0-9]+$' "$TMP/jt.s"; then
+    echo "[match] FAIL: dense's table does not hold table-relative offsets"
+    fail=1
+fi
+for fn in sparse chain_sparse unsigned_top; do
+    if body "$TMP/jt.s" "$fn" | grep -qE 'jmp\s+\*'; then
+        echo "[match] FAIL: sparse $fn got a jump table"
+        fail=1
+    fi
+    if ! body "$TMP/jt.s" "$fn" | grep -qE '^\s+j[lb]\s+\.switch_lt_'; then
+        echo "[match] FAIL: $fn is not a binary search"
+        fail=1
+    fi
+done
+if ! body "$TMP/jt.s" unsigned_top | grep -qE '^\s+jb\s'; then
+    echo "[match] FAIL: unsigned_top does not search with unsigned compares"
+    fail=1
+fi
+if ! body "$TMP/jt.s" not_chain | grep -qE 'movq\s+OP_MAGIC\(%rip\)'; then
+    echo "[match] FAIL: not_chain folded the assigned global OP_MAGIC"
+    fail=1
+fi
+if grep -qE 'jmp\s+\*' "$TMP/cmp.s"; then
+    echo "[match] FAIL: --no-jump-tables build still jumps indirectly"
+    fail=1
+fi
+[ "$fail" -eq 0 ] || exit 1
+echo "[match] OK: dense -> jump table, sparse -> binary search, chains recognised"
+
+echo "[match] (3/4) Rejected patterns"
+CASES=(
+"after_wildcard|def f(x: int64) -> int64:
+    match x:
+        case _:
+            return 0
+        case 1:
+            return 1
+"
+"variant_binding|def f(x: int64) -> int64:
+    match x:
+        case Some(v):
+            return v
+        case _:
+            return 0
+"
+"non_constant|limit: int64 = 4
+def f(x: int64) -> int64:
+    match x:
+        case limit:
+            return 1
+        case _:
+            return 0
+"
+"struct_scrutinee|class P:
+    a: int64
+def f(p: P) -> int64:
+    match p:
+        case 1:
+            return 1
+        case _:
+            return 0
+"
+)
+for entry in "${CASES[@]}"; do
+    name="${entry%%|*}"
+    printf '%s' "${entry#*|}" > "$TMP/case_$name.ad"
+    if python3 -m compiler.adder asm --target=x86_64-adder-user \
+            "$TMP/case_$name.ad" -o "$TMP/case_$name.s" \
+            >"$TMP/case_$name.log" 2>&1; then
+        echo "[match] FAIL: $name compiled cleanly"
+        exit 1
+    fi
+    if ! grep -q "x86: match" "$TMP/case_$name.log"; then
+        echo "[match] FAIL: $name was not rejected with a match CodeGenError"
+        cat "$TMP/case_$name.log"
+        exit 1
+    fi
+done
+echo "[match] OK: unreachable arm / variant / non-constant / struct rejected"
+
+echo "[match] (4/4) Link both builds with host C driver and run"
+cat > "$TMP/driver.c" <<'CEOF'
+#include <stdio.h>
+#include <stdint.h>
+
+int64_t dense(int64_t), sparse(int64_t), unsigned_top(uint64_t);
+int64_t classify(int8_t), loop_dispatch(int64_t);
+int64_t chain(int64_t), chain_sparse(int64_t), not_chain(int64_t);
+void retune(int64_t);
+
+static int64_t r_dense(int64_t op) {
+    switch (op) {
+    case 0: return 100;
+    case 1: case 2: return 200 + op;
+    case 3: return 300;
+    case 4: case 5: return 400;
+    case 6: case 8: case 9: return 500;
+    case -1: return -100;
+    default: return -1;
+    }
+}
+static int64_t r_sparse(int64_t x) {
+    switch (x) {
+    case 3: return 1;
+    case 1000: return 2;
+    case -70000: return 3;
+    case 0x7fffffff: return 4;
+    case 0x100000000LL: return 5;
+    case -0x123456789LL: return 6;
+    case 42: case 43: return 7;
+    default: return 0;
+    }
+}
+static int64_t r_unsigned_top(uint64_t x) {
+    if (x == 0xfffffffffffffff0ULL) return 1;
+    if (x == 0xfffffffffffffff1ULL || x == 0xfffffffffffffff2ULL) return 2;
+    if (x == 1) return 3;
+    if (x == 2 || x == 5) return 4;
+    return 0;
+}
+static int64_t r_classify(int8_t c) {
+    switch (c) {
+    case 'a': case 'e': case 'i': case 'o': case 'u': return 1;
+    case ' ': case '\t': case '\n': return 2;
+    case -1: case -2: case -3: case -4: return 3;
+    default: return 0;
+    }
+}
+static int64_t r_loop_dispatch(int64_t n) {
+    int64_t total = 0, i = 0;
+    while (i < n) {
+        i++;
+        switch (i % 6) {
+        case 0: continue;
+        case 1: case 2: total += i; break;
+        case 3: total *= 2; break;
+        case 4:
+            if (total > 5000) return total;
+            total -= 1;
+            break;
+        }
+    }
+    return total;
+}
+static int64_t r_chain(int64_t op) {
+    switch (op) {
+    case 1: return 11;
+    case 2: case 3: return 12;
+    case 4: return 13;
+    case 6: return 14;
+    default: return 15;
+    }
+}
+static int64_t r_chain_sparse(int64_t op) {
+    switch (op) {
+    case 17: return 1;
+    case 9000: return 2;
+    case -5: return 3;
+    case 123456: return 4;
+    case 77: return 5;
+    default: return 0;
+    }
+}
+
+static int fails;
+#define CHECK(call, want) do {                                            \
+    int64_t g = (call), w = (want);                                       \
+    if (g != w && fails++ < 20)                                           \
+        printf("[match]   %s = %lld, want %lld\n", #call,                \
+               (long long)g, (long long)w);                               \
+} while (0)
+
+int main(void) {
+    static const int64_t probes[] = {
+        3, 1000, -70000, 0x7fffffff, 0x100000000LL, -0x123456789LL, 42,
+        43, 17, 9000, 123456, 77, 0x80000000LL, -0x80000000LL,
+        INT64_MIN, INT64_MAX,
+    };
+    for (int64_t v = -20; v <= 140; v++) {
+        CHECK(dense(v), r_dense(v));
+        CHECK(sparse(v), r_sparse(v));
+        CHECK(classify((int8_t)v), r_classify((int8_t)v));
+        CHECK(classify((int8_t)(v + 100)), r_classify((int8_t)(v + 100)));
+        CHECK(chain(v), r_chain(v));
+        CHECK(chain_sparse(v), r_chain_sparse(v));
+        CHECK(unsigned_top((uint64_t)v), r_unsigned_top((uint64_t)v));
+        CHECK(unsigned_top(0xfffffffffffffff0ULL + (uint64_t)(v & 15)),
+              r_unsigned_top(0xfffffffffffffff0ULL + (uint64_t)(v & 15)));
+        CHECK(loop_dispatch(v * 3), r_loop_dispatch(v * 3));
+    }
+    for (unsigned k = 0; k < sizeof probes / sizeof probes[0]; k++) {
+        int64_t v = probes[k];
+        CHECK(dense(v), r_dense(v));
+        CHECK(sparse(v), r_sparse(v));
+        CHECK(sparse(v + 1), r_sparse(v + 1));
+        CHECK(sparse(v - 1), r_sparse(v - 1));
+        CHECK(chain_sparse(v), r_chain_sparse(v));
+        CHECK(unsigned_top((uint64_t)v), r_unsigned_top((uint64_t)v));
+    }
+    retune(9);
+    CHECK(not_chain(9), 4);
+    CHECK(not_chain(7), 0);
+    CHECK(not_chain(3), 3);
+    printf("[match] %s\n", fails == 0 ? "ALL PASS" : "SOME FAILED");
+    return fails == 0 ? 0 : 1;
+}
+CEOF
+for build in jt cmp; do
+    if ! gcc -O1 "$TMP/driver.c" "$TMP/$build.s" -o "$TMP/$build" \
+            2>"$TMP/link.log"; then
+        echo "[match] FAIL: $build build did not link against the C driver"
+        cat "$TMP/link.log"
+        exit 1
+    fi
+    if ! "$TMP/$build"; then
+        echo "[match] FAIL: $build build computed wrong results"
+        exit 1
+    fi
+done
+
+echo "[match] PASS"
+exit 0
@@ -21,8 +21,11 @@ cd "$PROJ_ROOT"
 TMP="$(mktemp -d)"
 trap "rm -rf $TMP" EXIT
 
-# 1) Compile the .ad fixture to asm.
-if ! python3 -m compiler.adder asm --target=x86_64-adder-user \
+# 1) Compile the .ad fixture to asm. --no-inline: the shape checks
+# below look for the real `call Class__method` lowering, which the
+# inliner would otherwise expand away (scripts/test_compiler_inline.sh
+# covers the expanded form).
+if ! python3 -m compiler.adder asm --target=x86_64-adder-user --no-inline \
         tests/test_compiler_methods.ad -o "$TMP/methods.s" \
         >"$TMP/methods.log" 2>&1; then
     echo "[methods] FAIL: compile error"
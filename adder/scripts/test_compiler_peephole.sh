@@ -0,0 +1,137 @@
+#!/usr/bin/env bash
+# scripts/test_compiler_peephole.sh — x86 peephole pass
+#
+# Background: the stack-machine codegen emits `pushq %rax; popq %rcx`
+# around every operand, `leaq g(%rip), %rax; movq (%rax), %rax` for
+# every scalar global read, `movq $0` for every zero and a `jmp` to the
+# very next label at the end of every if-branch. compiler/optimizer.py
+# rewrites those windows after codegen (on by default, `--no-peephole`
+# opts out).
+#
+# This is a HOST-SIDE test: compile the fixture twice (with and without
+# the pass), check the optimized asm no longer contains the naive
+# windows, then link each against a tiny C driver and assert both
+# builds compute the same results.
+#
+# PASS criterion: shape checks hold, both builds print ALL PASS, exit 0.
+
+set -uo pipefail
+cd "$(dirname "$0")/.."
+ROOT="$(pwd)"
+TMP="$(mktemp -d)"
+trap "rm -rf $TMP" EXIT
+
+FIX=tests/test_compiler_peephole.ad
+
+echo "[peephole] (1/4) Compile fixture to x86_64 asm (with and without the pass)"
+# The fixture's naive windows sit around calls and stack slots: keep
+# the inliner, frame elision and tail calls out of the way.
+NOOPT="--no-inline --keep-frame-pointer --no-tail-calls"
+if ! python3 -m compiler.adder asm --target=x86_64-adder-user \
+        $NOOPT --peephole-stats "$FIX" -o "$TMP/opt.s" >"$TMP/asm.log" 2>&1; then
+    echo "[peephole] FAIL: fixture did not compile to asm"
+    cat "$TMP/asm.log"
+    exit 1
+fi
+if ! python3 -m compiler.adder asm --target=x86_64-adder-user \
+        $NOOPT --no-peephole "$FIX" -o "$TMP/raw.s" >>"$TMP/asm.log" 2>&1; then
+    echo "[peephole] FAIL: fixture did not compile to asm with --no-peephole"
+    cat "$TMP/asm.log"
+    exit 1
+fi
+
+echo "[peephole] (2/4) Asm-shape sanity check"
+# The unoptimized listing must still contain every naive window,
+# otherwise the shape checks below prove nothing.
+if ! grep -A1 -E "^\s+pushq %rax$" "$TMP/raw.s" | grep -qE "^\s+popq %rdi$" || \
+   ! grep -qE "^\s+movq \\\$0, %rax$" "$TMP/raw.s"; then
+    echo "[peephole] FAIL: --no-peephole output lacks the naive windows"
+    exit 1
+fi
+if grep -A1 -E "^\s+pushq %rax$" "$TMP/opt.s" | grep -qE "^\s+popq %rdi$"; then
+    echo "[peephole] FAIL: pushq %rax; popq %rdi survived"
+    exit 1
+fi
+if ! grep -qE "^\s+movq counter\(%rip\), %rax$" "$TMP/opt.s"; then
+    echo "[peephole] FAIL: global read not folded to movq counter(%rip), %rax"
+    exit 1
+fi
+if ! grep -qE "^\s+xorl %eax, %eax$" "$TMP/opt.s"; then
+    echo "[peephole] FAIL: movq \$0, %rax not rewritten to xorl"
+    exit 1
+fi
+# A jmp whose target label is the very next line must be gone.
+if awk '/^[ \t]+jmp /{t=$2; next} { if (t != "" && $0 == t ":") bad=1; t="" } END {exit !bad}' "$TMP/opt.s"; then
+    echo "[peephole] FAIL: jump to the next label survived"
+    exit 1
+fi
+if ! grep -qE "^peephole: [0-9]+ passes, store_reload=[1-9]" "$TMP/asm.log"; then
+    echo "[peephole] FAIL: --peephole-stats did not report store_reload hits"
+    cat "$TMP/asm.log"
+    exit 1
+fi
+echo "[peephole] OK: $(grep '^peephole:' "$TMP/asm.log")"
+
+echo "[peephole] (3/4) Assemble + link both builds with host C driver"
+cat > "$TMP/driver.c" <<'CEOF'
+#include <stdio.h>
+#include <stdint.h>
+extern int64_t call_one(void);
+extern int64_t read_global(void);
+extern int64_t zero_ret(void);
+extern int64_t zero_then_cmp(int64_t, int64_t);
+extern int64_t sign_of(int64_t);
+extern int64_t store_then_return(int64_t, int64_t);
+
+struct tc { const char *name; long long got; long long want; };
+
+int main(void) {
+    struct tc cases[] = {
+        { "call_one",          call_one(),                  42 },
+        { "read_global",       read_global(),               41 },
+        { "zero_ret",          zero_ret(),                   0 },
+        { "zero_then_cmp_lt",  zero_then_cmp(1, 2),          1 },
+        { "zero_then_cmp_ge",  zero_then_cmp(2, 1),          0 },
+        { "sign_neg",          sign_of(-5),                 -1 },
+        { "sign_pos",          sign_of(5),                   1 },
+        { "sign_zero",         sign_of(0),                   0 },
+        { "store_then_return", store_then_return(6, 7),     49 },
+    };
+    int n = (int)(sizeof(cases) / sizeof(cases[0]));
+    int ok = 1;
+    for (int i = 0; i < n; i++) {
+        int pass = (cases[i].got == cases[i].want);
+        printf("[peephole]   %-18s got=%-4lld want=%-4lld %s\n",
+               cases[i].name, cases[i].got, cases[i].want,
+               pass ? "OK" : "FAIL");
+        if (!pass) ok = 0;
+    }
+    printf("[peephole] %s\n", ok ? "ALL PASS" : "SOME FAILED");
+    return ok ? 0 : 1;
+}
+CEOF
+
+for variant in raw opt; do
+    if ! gcc -c "$TMP/$variant.s" -o "$TMP/$variant.o" 2>"$TMP/as.log"; then
+        echo "[peephole] FAIL: $variant asm did not assemble"
+        cat "$TMP/as.log"
+        exit 1
+    fi
+    if ! gcc "$TMP/driver.c" "$TMP/$variant.o" -o "$TMP/$variant" 2>"$TMP/link.log"; then
+        echo "[peephole] FAIL: link of $variant build against C driver failed"
+        cat "$TMP/link.log"
+        exit 1
+    fi
+done
+
+echo "[peephole] (4/4) Run both builds and assert computed results"
+for variant in raw opt; do
+    echo "[peephole] -- $variant"
+    if ! "$TMP/$variant"; then
+        echo "[peephole] FAIL: $variant build computed a wrong result"
+        exit 1
+    fi
+done
+
+echo "[peephole] PASS"
+exit 0
@@ -0,0 +1,271 @@
+#!/usr/bin/env bash
+# scripts/test_compiler_percpu_access.sh — nested per-CPU aggregate
+# access, `&percpu...` through the %gs:0 self pointer, --percpu-align
+#
+# Background: member / index access on a Percpu aggregate only worked
+# one level deep off the global (`stats.hits`, `arr[i]`), and taking an
+# address of anything per-CPU was rejected, so run-queue state and
+# per-CPU magazines lived in shared arrays indexed by CPU id. Chains
+# now fold to one `%gs:disp` / `%gs:disp(%rcx)` access; addresses,
+# struct copies and chains with two variable indices use the area's
+# own address, stored at offset 0 of every per-CPU area. The template
+# is aligned and padded to --percpu-align (64 by default) so each
+# CPU's copy starts on a cache line.
+#
+# This is a HOST-SIDE test: compile the fixture, check the listing and
+# the --percpu-align handling, then link against a C driver that gives
+# two "CPUs" their own copy of the template, switches the GS base
+# between them with arch_prctl(ARCH_SET_GS) and checks every entry
+# point against the areas' bytes.
+#
+# PASS criterion: asm shape + option checks hold, the driver prints
+# ALL PASS, exit 0.
+
+set -uo pipefail
+cd "$(dirname "$0")/.."
+ROOT="$(pwd)"
+TMP="$(mktemp -d)"
+trap "rm -rf $TMP" EXIT
+
+FIX=tests/test_compiler_percpu_access.ad
+
+echo "[percpu_access] (1/4) Compile fixture to x86_64 asm"
+if ! python3 -m compiler.adder asm --target=x86_64-adder-user \
+        "$FIX" -o "$TMP/out.s" >"$TMP/asm.log" 2>&1; then
+    echo "[percpu_access] FAIL: fixture did not compile to asm"
+    cat "$TMP/asm.log"
+    exit 1
+fi
+
+echo "[percpu_access] (2/4) Asm-shape sanity check"
+# body FN — the listing of one function.
+body() { sed -n "/^$1:/,/\.size $1,/p" "$TMP/out.s"; }
+fail=0
+expect() {  # expect FN REGEX WHAT
+    if ! body "$1" | grep -qE "$2"; then
+        echo "[percpu_access] FAIL: $1: $3"
+        fail=1
+    fi
+}
+reject() {  # reject FN REGEX WHAT
+    if body "$1" | grep -qE "$2"; then
+        echo "[percpu_access] FAIL: $1: $3"
+        fail=1
+    fi
+}
+expect rq_nr '^\s+movl %gs:[0-9]+, %eax$' "rq.nr is not one %gs:disp load"
+expect hist '^\s+movzwq %gs:[0-9]+\(%rcx\), %rax$' "rq.st.hist[k] is not %gs:disp(%rcx)"
+expect bump_hist '^\s+movw %ax, %gs:[0-9]+\(%rcx\)$' "hist[k] += 1 does not store via %gs"
+expect grid_row2 '^\s+movzwq %gs:[0-9]+\(%rcx\), %rax$' "grid[2][j] did not fold the row"
+expect get_sv '^\s+movslq %gs:[0-9]+, %rax$' "signed scalar not sign-extended"
+for fn in rq_nr hist bump_hist grid_row2 get_sv rq_enqueue; do
+    reject "$fn" '%gs:0,' "one-index access went through the self pointer"
+done
+for fn in stats_ptr rq_ptr slot_ptr mag_push grid_get snapshot restore; do
+    expect "$fn" '^\s+movq %gs:0, %rax$' "no self-pointer load"
+done
+if grep -qE 'leaq (seed|rq|mags|grid|sv)\(%rip\)' "$TMP/out.s"; then
+    echo "[percpu_access] FAIL: a per-CPU symbol is addressed as a flat global"
+    fail=1
+fi
+if ! sed -n '/^__per_cpu_template_start:/,+1p' "$TMP/out.s" \
+        | grep -qE '^\s+\.zero 8$' \
+        || ! grep -B3 '^__per_cpu_template_start:' "$TMP/out.s" \
+        | grep -qE '^\s+\.align 64$'; then
+    echo "[percpu_access] FAIL: template is not 64-aligned with a self slot"
+    fail=1
+fi
+[ "$fail" -eq 0 ] || exit 1
+echo "[percpu_access] OK: folded %gs accesses, self pointer for addresses"
+
+echo "[percpu_access] (3/4) --percpu-align"
+if ! python3 -m compiler.adder asm --target=x86_64-adder-user \
+        --percpu-align=128 "$FIX" -o "$TMP/a128.s" >"$TMP/a128.log" 2>&1 \
+        || ! grep -B3 '^__per_cpu_template_start:' "$TMP/a128.s" \
+        | grep -qE '^\s+\.align 128$'; then
+    echo "[percpu_access] FAIL: --percpu-align=128 not honoured"
+    cat "$TMP/a128.log"
+    exit 1
+fi
+for bad in 48 4 zero; do
+    if python3 -m compiler.adder asm --target=x86_64-adder-user \
+            --percpu-align=$bad "$FIX" -o "$TMP/bad.s" \
+            >"$TMP/bad.log" 2>&1; then
+        echo "[percpu_access] FAIL: --percpu-align=$bad accepted"
+        exit 1
+    fi
+    if ! grep -q "percpu-align" "$TMP/bad.log"; then
+        echo "[percpu_access] FAIL: --percpu-align=$bad rejected oddly"
+        cat "$TMP/bad.log"
+        exit 1
+    fi
+done
+echo "[percpu_access] OK: 128 honoured; 48 / 4 / zero rejected"
+
+echo "[percpu_access] (4/4) Link with host C driver and run"
+cat > "$TMP/driver.c" <<'CEOF'
+#include <stdio.h>
+#include <stdint.h>
+#include <stdlib.h>
+#include <string.h>
+#include <unistd.h>
+#include <sys/syscall.h>
+#include <asm/prctl.h>
+
+typedef struct { uint64_t hits; int32_t delta; uint16_t hist[4]; } Stat;
+typedef struct { uint32_t nr; int32_t load; uint8_t *curr; Stat st; } Rq;
+typedef struct { uint32_t count; uint64_t objs[6]; } Magazine;
+
+extern char __per_cpu_template_start[], __per_cpu_template_end[];
+extern char rq[], mags[], grid[];
+
+void rq_enqueue(int32_t);
+uint32_t rq_nr(void);
+int64_t rq_load(void);
+void bump_hist(uint64_t);
+uint16_t hist(uint64_t);
+void mag_push(uint64_t, uint64_t);
+uint64_t mag_pop(uint64_t);
+uint32_t mag_count(uint64_t);
+void grid_set(uint64_t, uint64_t, int16_t);
+int64_t grid_get(uint64_t, uint64_t), grid_row2(uint64_t);
+Stat *stats_ptr(void);
+Rq *rq_ptr(void);
+uint64_t *slot_ptr(uint64_t);
+void snapshot(Stat *), restore(const Stat *);
+void set_sv(int32_t);
+int64_t get_sv(void);
+uint16_t get_seed(void);
+
+/* The `&percpu...` entry points carry a stack canary (any `&`). */
+uint64_t __stack_chk_guard = 0x5eed5eed5eed5eedULL;
+
+static int fails;
+#define CHECK(got, want) do {                                             \
+    int64_t g = (int64_t)(got), w = (int64_t)(want);                      \
+    if (g != w && fails++ < 20)                                           \
+        printf("[percpu_access]   line %d: %s = %lld, want %lld\n",      \
+               __LINE__, #got, (long long)g, (long long)w);               \
+} while (0)
+
+static char *cpu[2];
+
+static void use(int k) {
+    if (syscall(SYS_arch_prctl, ARCH_SET_GS, cpu[k]) != 0) {
+        perror("arch_prctl");
+        exit(2);
+    }
+}
+
+#define AT(k, sym) (cpu[k] + ((sym) - __per_cpu_template_start))
+
+int main(void) {
+    size_t size = __per_cpu_template_end - __per_cpu_template_start;
+    CHECK((uintptr_t)__per_cpu_template_start % 64, 0);
+    CHECK(size % 64, 0);
+    CHECK(rq - __per_cpu_template_start >= 8, 1);
+    for (int k = 0; k < 2; k++) {
+        cpu[k] = aligned_alloc(64, size);
+        memcpy(cpu[k], __per_cpu_template_start, size);
+        *(char **)cpu[k] = cpu[k];
+    }
+    Rq *r0 = (Rq *)AT(0, rq), *r1 = (Rq *)AT(1, rq);
+    Magazine *m0 = (Magazine *)AT(0, mags), *m1 = (Magazine *)AT(1, mags);
+
+    for (int k = 0; k < 2; k++) {
+        use(k);
+        CHECK(get_seed(), 0x1234);
+        CHECK(get_sv(), -5);
+        CHECK(rq_nr(), 0);
+    }
+
+    /* Struct fields, compound assignment, per-CPU isolation. */
+    use(0);
+    rq_enqueue(5); rq_enqueue(5); rq_enqueue(5); rq_enqueue(-20);
+    CHECK(rq_nr(), 4);
+    CHECK((int32_t)rq_load(), -5);
+    use(1);
+    CHECK(rq_nr(), 0);
+    rq_enqueue(7);
+    CHECK(rq_nr(), 1);
+    CHECK(r0->nr, 4); CHECK(r0->load, -5); CHECK(r0->st.hits, 4);
+    CHECK(r1->nr, 1); CHECK(r1->load, 7); CHECK(r1->st.hits, 1);
+
+    /* Addresses come from the self pointer. */
+    CHECK(rq_ptr() == r1, 1);
+    CHECK(stats_ptr() == &r1->st, 1);
+    CHECK(slot_ptr(2) == &m1[2].objs[2], 1);
+    use(0);
+    CHECK(rq_ptr() == r0, 1);
+    CHECK(slot_ptr(0) == &m0[0].objs[2], 1);
+
+    /* A variable index inside a struct field. */
+    for (int k = 0; k < 4; k++)
+        for (int n = 0; n <= k; n++) bump_hist(k);
+    for (int k = 0; k < 4; k++) {
+        CHECK(hist(k), k + 1);
+        CHECK(r0->st.hist[k], k + 1);
+        CHECK(r1->st.hist[k], 0);
+    }
+
+    /* Two variable indices per access. */
+    for (int i = 0; i < 5; i++) mag_push(1, 100 + i);
+    CHECK(mag_count(1), 5);
+    CHECK(m0[1].count, 5);
+    for (int i = 0; i < 5; i++) CHECK(m0[1].objs[i], 100 + i);
+    CHECK(mag_pop(1), 104);
+    CHECK(mag_count(1), 4);
+    use(1);
+    CHECK(mag_count(1), 0);
+    mag_push(2, 9);
+    CHECK(m1[2].count, 1); CHECK(m1[2].objs[0], 9);
+    CHECK(m0[2].count, 0);
+
+    /* Arrays of arrays. */
+    use(0);
+    for (int i = 0; i < 4; i++)
+        for (int j = 0; j < 4; j++) grid_set(i, j, i * 4 + j - 8);
+    for (int i = 0; i < 4; i++)
+        for (int j = 0; j < 4; j++) {
+            CHECK((int16_t)grid_get(i, j), i * 4 + j - 8);
+            CHECK(((int16_t *)AT(0, grid))[i * 4 + j], i * 4 + j - 8);
+            CHECK(((int16_t *)AT(1, grid))[i * 4 + j], 0);
+        }
+    for (int j = 0; j < 4; j++) CHECK((int16_t)grid_row2(j), j);
+
+    /* Struct copies in and out of per-CPU storage. */
+    Stat s;
+    memset(&s, 0, sizeof s);
+    snapshot(&s);
+    CHECK(memcmp(&s, &r0->st, sizeof s), 0);
+    s.hits = 0x1122334455667788ULL; s.delta = -9; s.hist[3] = 0xbeef;
+    use(1);
+    restore(&s);
+    CHECK(memcmp(&r1->st, &s, sizeof s), 0);
+    CHECK(r0->st.hits, 4);
+
+    /* Signed scalar, and the self pointers survived. */
+    set_sv(-77);
+    CHECK(get_sv(), -77);
+    use(0);
+    CHECK(get_sv(), -5);
+    CHECK(*(char **)cpu[0] == cpu[0], 1);
+    CHECK(*(char **)cpu[1] == cpu[1], 1);
+
+    printf("[percpu_access] %s\n", fails == 0 ? "ALL PASS" : "SOME FAILED");
+    return fails == 0 ? 0 : 1;
+}
+CEOF
+if ! gcc -O1 "$TMP/driver.c" "$TMP/out.s" -o "$TMP/run" \
+        2>"$TMP/link.log"; then
+    echo "[percpu_access] FAIL: asm did not link against the C driver"
+    cat "$TMP/link.log"
+    exit 1
+fi
+if ! "$TMP/run"; then
+    echo "[percpu_access] FAIL: wrong values"
+    exit 1
+fi
+
+echo "[percpu_access] PASS"
+exit 0
@@ -10,8 +10,9 @@
 # (f676865) flagged it as `TODO(adder)`. The fix wires gen_index_load,
 # the IndexExpr store path, gen_member_load, and the MemberExpr store
 # path to detect Percpu-aggregate identifiers and emit %gs:-prefixed
-# accesses; `&percpu_aggregate[i]` is rejected explicitly (no
-# %gs-relative leaq exists).
+# accesses. `&percpu_aggregate[i]` was rejected at first (no
+# %gs-relative leaq exists); it now loads the area's self pointer from
+# %gs:0 (see test_compiler_percpu_access.sh for nested access).
 #
 # Host-side test only: assemble the fixture with `compiler.adder asm`
 # and grep the emitted .s for the expected `%gs:` prefix on each
@@ -21,7 +22,7 @@
 #
 # PASS criterion: every accessor in the fixture emits a `%gs:`-prefixed
 # load or store; NO accessor emits a `leaq <symbol>(%rip)` for its
-# aggregate base; the `&percpu_aggregate[i]` rejection still fires.
+# aggregate base; `&percpu_aggregate[i]` goes through %gs:0.
 
 set -uo pipefail
 cd "$(dirname "$0")/.."
@@ -119,27 +120,28 @@ else
     echo "  [whole-file] OK: no leaq <percpu_aggregate>(%rip) anywhere"
 fi
 
-# Negative case: `&percpu_arr[i]` must be REJECTED at codegen, since
-# %gs-relative leaq isn't expressible.
-echo "[percpu_aggregate] verifying &percpu_aggregate[i] is rejected"
-cat > "$TMP/reject_addrof.ad" <<'EOF'
+# `&percpu_arr[i]` must not decay to the master template either: it is
+# this CPU's base (the self pointer at %gs:0) plus the element offset.
+echo "[percpu_aggregate] verifying &percpu_aggregate[i] uses the self pointer"
+cat > "$TMP/addrof.ad" <<'EOF'
 arr_x: Percpu[Array[4, uint64]]
 
 def get_ptr() -> uint64:
     p: Ptr[uint64] = &arr_x[0]
     return cast[uint64](p)
 EOF
-if python3 -m compiler.adder asm --target=x86_64-adder-user \
-        "$TMP/reject_addrof.ad" -o "$TMP/reject.s" \
-        >"$TMP/reject.log" 2>&1; then
-    echo "[percpu_aggregate] FAIL: &percpu_arr[i] silently compiled"
-    cat "$TMP/reject.s" | tail -20
+if ! python3 -m compiler.adder asm --target=x86_64-adder-user \
+        "$TMP/addrof.ad" -o "$TMP/addrof.s" \
+        >"$TMP/addrof.log" 2>&1; then
+    echo "[percpu_aggregate] FAIL: &percpu_arr[i] did not compile"
+    cat "$TMP/addrof.log"
     fail=1
-elif grep -q "Percpu" "$TMP/reject.log"; then
-    echo "  [reject_addrof] OK: &percpu_arr[i] rejected"
+elif grep -q 'movq %gs:0, %rax' "$TMP/addrof.s" \
+        && ! grep -q 'leaq arr_x(%rip)' "$TMP/addrof.s"; then
+    echo "  [addrof] OK: &percpu_arr[i] loads the %gs:0 self pointer"
 else
-    echo "[percpu_aggregate] FAIL: rejection had wrong shape:"
-    cat "$TMP/reject.log"
+    echo "[percpu_aggregate] FAIL: &percpu_arr[i] has the wrong shape:"
+    grep -A12 '^get_ptr:' "$TMP/addrof.s"
     fail=1
 fi
 
@@ -0,0 +1,197 @@
+#!/usr/bin/env bash
+# scripts/test_compiler_profile_use.sh — `--profile-use`: section
+# placement, inlining and unrolling from an entry-count profile
+#
+# Background: `adder prof` could show the hot functions but nothing
+# fed them back into the build. `adder prof --json` now writes the
+# merged counts as a profile, and `--profile-use` reads it back: hot
+# functions go to .text.hot hottest first, never-entered ones to
+# .text.unlikely, hot callees and loops get larger inline and unroll
+# budgets and cold ones none. Entries for functions the program no
+# longer has are reported, not fatal.
+#
+# This is a HOST-SIDE test: build the fixture with --instrument=counts
+# --no-inline, run a training workload through a C driver and dump
+# the counts, turn them into a profile (plus one stale entry), rebuild
+# with --profile-use, check the listing and the link order, and check
+# the optimised build computes what the default build does.
+#
+# PASS criterion: asm shape holds, the stale entry is reported, both
+# builds print the same results, exit 0.
+
+set -uo pipefail
+cd "$(dirname "$0")/.."
+ROOT="$(pwd)"
+TMP="$(mktemp -d)"
+trap "rm -rf $TMP" EXIT
+
+FIX=tests/test_compiler_profile_use.ad
+adder() { python3 -m compiler.adder "$@"; }
+
+cat > "$TMP/driver.c" <<'CEOF'
+#include <stdio.h>
+#include <stdint.h>
+#include <string.h>
+
+extern char __adder_prof_start[] __attribute__((weak));
+extern char __adder_prof_end[] __attribute__((weak));
+int64_t run(int64_t, int64_t *), checksum(int64_t *), warm(int64_t);
+
+int main(int argc, char **argv) {
+    int64_t data[12];
+    for (int i = 0; i < 12; i++)
+        data[i] = i * i - 5;
+    if (argc > 1) {
+        /* Training: the common path only, then dump the counts. */
+        run(1000, data);
+        for (int i = 0; i < 100; i++)
+            checksum(data);
+        for (int i = 0; i < 3; i++)
+            warm(i);
+        FILE *f = fopen(argv[1], "wb");
+        fwrite(__adder_prof_start, 1,
+               __adder_prof_end - __adder_prof_start, f);
+        fclose(f);
+        return 0;
+    }
+    printf("%lld %lld %lld %lld\n", (long long)run(1000, data),
+           (long long)run(-3, data), (long long)checksum(data),
+           (long long)warm(41));
+    return 0;
+}
+CEOF
+
+echo "[profile_use] (1/4) Training build and run"
+if ! adder asm --target=x86_64-adder-user --instrument=counts --no-inline \
+        "$FIX" -o "$TMP/train.s" >"$TMP/asm.log" 2>&1 \
+        || ! gcc -O1 "$TMP/driver.c" "$TMP/train.s" -o "$TMP/train" \
+            2>"$TMP/link.log" \
+        || ! "$TMP/train" "$TMP/dump.bin"; then
+    echo "[profile_use] FAIL: training build did not build or run"
+    cat "$TMP/asm.log" "$TMP/link.log"
+    exit 1
+fi
+if ! adder prof "$TMP/dump.bin" --json "$TMP/prof.json" >/dev/null; then
+    echo "[profile_use] FAIL: adder prof --json"
+    exit 1
+fi
+# A function renamed or deleted since the profile was taken.
+if ! python3 - "$TMP/prof.json" <<'PYEOF'
+import json, sys
+doc = json.load(open(sys.argv[1]))
+assert doc["counts"]["mix"] == 1000 and doc["counts"]["on_error"] == 0, doc
+doc["counts"]["gone_fn"] = 7
+json.dump(doc, open(sys.argv[1], "w"))
+PYEOF
+then
+    echo "[profile_use] FAIL: unexpected training counts"
+    exit 1
+fi
+
+echo "[profile_use] (2/4) Optimised build"
+if ! adder asm --target=x86_64-adder-user --profile-use="$TMP/prof.json" \
+        --inline-report "$FIX" -o "$TMP/pgo.s" 2>"$TMP/pgo.log"; then
+    echo "[profile_use] FAIL: --profile-use build failed"
+    cat "$TMP/pgo.log"
+    exit 1
+fi
+adder asm --target=x86_64-adder-user "$FIX" -o "$TMP/plain.s"
+fail=0
+if ! grep -qx 'warning: profile: 1 stale entry not in this program ignored: gone_fn' \
+        "$TMP/pgo.log"; then
+    echo "[profile_use] FAIL: stale entry not reported"
+    fail=1
+fi
+for bad in '{"version": 1, "counts": {"f": -1}}' '{"counts": {}}' 'nope'; do
+    echo "$bad" >"$TMP/bad.json"
+    if adder asm --target=x86_64-adder-user --profile-use="$TMP/bad.json" \
+            "$FIX" -o "$TMP/bad.s" >/dev/null 2>&1; then
+        echo "[profile_use] FAIL: accepted profile $bad"
+        fail=1
+    fi
+done
+[ "$fail" -eq 0 ] || exit 1
+
+echo "[profile_use] (3/4) Asm-shape sanity check"
+# section FN — the section directive(s) just before FN's label.
+section() {
+    grep -B6 "^$1:\$" "$TMP/pgo.s" | grep -E '^\s+\.(section|subsection|text)' \
+        | tr -s ' ' | paste -sd'|'
+}
+body() { sed -n "/^$2:/,/\.size $2,/p" "$TMP/$1.s"; }
+expect_section() {  # expect_section FN WANT
+    got="$(section "$1")"
+    if [ "$got" != "$2" ]; then
+        echo "[profile_use] FAIL: $1 placed in '$got', want '$2'"
+        fail=1
+    fi
+}
+expect_section mix ' .section .text.hot, "ax", @progbits| .subsection 0'
+expect_section checksum ' .section .text.hot, "ax", @progbits| .subsection 1'
+expect_section scale_err ' .section .text.unlikely, "ax", @progbits'
+expect_section on_error ' .section .text.unlikely, "ax", @progbits'
+for fn in hot_loop warm run; do
+    expect_section "$fn" ' .text'
+done
+if grep -qE '^\s+\.(section \.text\.|subsection)' "$TMP/plain.s"; then
+    echo "[profile_use] FAIL: default build has profile placement"
+    fail=1
+fi
+# Inlining: hot mix fits the scaled budget, cold scale_err stays a call.
+if ! body plain hot_loop | grep -q 'call mix' \
+        || body pgo hot_loop | grep -q 'call mix'; then
+    echo "[profile_use] FAIL: hot mix not inlined into hot_loop"
+    fail=1
+fi
+if body plain on_error | grep -q 'call scale_err' \
+        || ! body pgo on_error | grep -q 'call scale_err'; then
+    echo "[profile_use] FAIL: cold scale_err was inlined"
+    fail=1
+fi
+grep -q '^inline: mix: inlined (leaf, hot, size' "$TMP/pgo.log" \
+    || { echo "[profile_use] FAIL: inline report"; fail=1; }
+# Unrolling: 12 trips unrolled in hot checksum, 4 kept rolled in cold
+# on_error.
+if ! body plain checksum | grep -qE '^\s+j[a-z]+ \.for_' \
+        || body pgo checksum | grep -qE '^\s+j[a-z]+ \.for_'; then
+    echo "[profile_use] FAIL: hot checksum loop not unrolled"
+    fail=1
+fi
+if body plain on_error | grep -qE '^\s+j[a-z]+ \.for_' \
+        || ! body pgo on_error | grep -qE '^\s+j[a-z]+ \.for_'; then
+    echo "[profile_use] FAIL: cold on_error loop unrolled"
+    fail=1
+fi
+[ "$fail" -eq 0 ] || exit 1
+echo "[profile_use] OK: placement, inlining and unrolling follow the profile"
+
+echo "[profile_use] (4/4) Link both builds and compare"
+for b in plain pgo; do
+    if ! gcc -O1 "$TMP/driver.c" "$TMP/$b.s" -o "$TMP/$b" \
+            2>"$TMP/link.log"; then
+        echo "[profile_use] FAIL: $b build did not link"
+        cat "$TMP/link.log"
+        exit 1
+    fi
+done
+want="$("$TMP/plain")"
+got="$("$TMP/pgo")"
+if [ "$got" != "$want" ]; then
+    echo "[profile_use] FAIL: optimised build printed '$got', want '$want'"
+    exit 1
+fi
+addr() { nm "$TMP/pgo" | awk -v s="$1" '$3 == s { print $1 }'; }
+if [[ ! "$(addr mix)" < "$(addr checksum)" ]]; then
+    echo "[profile_use] FAIL: .text.hot is not hottest first"
+    exit 1
+fi
+for fn in hot_loop warm run; do
+    if [[ ! "$(addr checksum)" < "$(addr "$fn")" ]]; then
+        echo "[profile_use] FAIL: $fn is linked among the hot functions"
+        exit 1
+    fi
+done
+echo "[profile_use] OK: same results ($got), hot functions linked first"
+
+echo "[profile_use] PASS"
+exit 0
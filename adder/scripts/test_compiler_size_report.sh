@@ -0,0 +1,127 @@
+#!/usr/bin/env bash
+# scripts/test_compiler_size_report.sh — `adder compile --size-report`
+# and `adder size`: bytes per module and per symbol
+#
+# Background: the kernel image and the initramfs only had a total
+# size, so nothing said which module or helper a megabyte of .bss or
+# a copied function came from. --size-report assembles the output into
+# an object and charges every byte of .text / .rodata / .data / .bss
+# to a symbol and its module; --size-json saves that, and `adder size
+# OLD NEW` diffs two builds.
+#
+# This is a HOST-SIDE test on the two-module fixture
+# tests/test_compiler_size_report.ad (+ _lib.ad): the rows add up to
+# the object's sections, known symbols land in the right module and
+# section, the duplicated private `_mix` is listed, and a diff against
+# an --instrument build shows the record table and the grown functions.
+#
+# PASS criterion: every check holds, exit 0.
+
+set -uo pipefail
+cd "$(dirname "$0")/.."
+ROOT="$(pwd)"
+TMP="$(mktemp -d)"
+trap "rm -rf $TMP; rm -f $ROOT/tests/test_compiler_size_report.s" EXIT
+
+FIX=tests/test_compiler_size_report.ad
+adder() { python3 -m compiler.adder "$@"; }
+
+echo "[size_report] (1/4) Every byte is charged to a symbol"
+if ! adder compile --target=x86_64-linux-user --emit-asm --size-report \
+        --size-json "$TMP/a.json" "$FIX" -o "$TMP/a" \
+        >"$TMP/a.log" 2>"$TMP/a.report"; then
+    echo "[size_report] FAIL: fixture did not build"
+    cat "$TMP/a.log" "$TMP/a.report"
+    exit 1
+fi
+as --64 -o "$TMP/a.o" tests/test_compiler_size_report.s
+if ! size -A "$TMP/a.o" | python3 -c '
+import json, sys
+want = {"text": 0, "rodata": 0, "data": 0, "bss": 0}
+for line in sys.stdin:
+    parts = line.split()
+    if len(parts) == 3 and parts[0].startswith("."):
+        for kind in want:
+            if parts[0].startswith("." + kind):
+                want[kind] += int(parts[1])
+got = {kind: 0 for kind in want}
+for sym in json.load(open(sys.argv[1]))["symbols"]:
+    for kind in got:
+        got[kind] += sym[kind]
+print("sections", want, "symbols", got)
+sys.exit(got != want)' "$TMP/a.json"; then
+    echo "[size_report] FAIL: symbol rows do not add up to the sections"
+    exit 1
+fi
+echo "[size_report] OK: rows add up to the object's sections"
+
+echo "[size_report] (2/4) Symbols land in their module and section"
+if ! python3 - "$TMP/a.json" <<'PYEOF'
+import json, sys
+rows = {s["symbol"]: s for s in json.load(open(sys.argv[1]))["symbols"]}
+main = "tests.test_compiler_size_report"
+lib = main + "_lib"
+checks = [
+    ("sr_big", main, lambda s: s["bss"] == 4096 and s["text"] == 0),
+    ("sr_lib_table", lib, lambda s: s["bss"] == 8192),
+    ("sr_counter", main, lambda s: s["data"] == 8),
+    ("SrPoint__norm", main, lambda s: s["text"] > 0),
+    # The string literal is charged to the function that uses it.
+    ("sr_banner", main, lambda s: s["text"] > 0 and s["rodata"] >= 32),
+    ("tests_test_compiler_size_report_lib__mix", lib,
+     lambda s: s["text"] > 0 and s["name"] == "_mix"),
+]
+bad = 0
+for sym, module, ok in checks:
+    row = rows.get(sym)
+    if row is None or row["module"] != module or not ok(row):
+        print(f"[size_report] FAIL: {sym}: {row}")
+        bad += 1
+for row in rows.values():
+    if row["module"] not in (main, lib):
+        print(f"[size_report] FAIL: unattributed {row}")
+        bad += 1
+sys.exit(1 if bad else 0)
+PYEOF
+then
+    exit 1
+fi
+echo "[size_report] OK: .bss, .data, .rodata, .text and methods attributed"
+
+echo "[size_report] (3/4) The report lists the duplicated helper"
+adder size "$TMP/a.json" --top 20 >"$TMP/a.saved"
+if ! grep -q '^  _mix: 2 copies, 88 bytes (tests.test_compiler_size_report, tests.test_compiler_size_report_lib)$' \
+        "$TMP/a.report" \
+        || ! grep -q '^tests.test_compiler_size_report_lib  *165  *0  *0  *8192  *8357$' \
+            "$TMP/a.report" \
+        || ! diff <(sed -n '/^module /,$p' "$TMP/a.report") "$TMP/a.saved" \
+            >"$TMP/a.diff"; then
+    echo "[size_report] FAIL: report (or its --size-json replay) is off"
+    cat "$TMP/a.report" "$TMP/a.diff"
+    exit 1
+fi
+echo "[size_report] OK: _mix carried twice; adder size replays the report"
+
+echo "[size_report] (4/4) adder size diffs two builds"
+if ! adder compile --target=x86_64-linux-user --instrument=counts \
+        --size-json "$TMP/b.json" "$FIX" -o "$TMP/b" >"$TMP/b.log" 2>&1; then
+    echo "[size_report] FAIL: --instrument build"
+    cat "$TMP/b.log"
+    exit 1
+fi
+adder size "$TMP/a.json" "$TMP/b.json" >"$TMP/diff.txt"
+if ! grep -q '^(compiler)  *0  *[0-9]*  *+[0-9]*  *new  *data +' \
+            "$TMP/diff.txt" \
+        || ! grep -q '^__adder_prof_start (new)  *0 ' "$TMP/diff.txt" \
+        || ! grep -q '^main  *322  *[0-9]*  *+[0-9]*  *+[0-9.]*%  *text +' \
+            "$TMP/diff.txt" \
+        || ! grep -q '^total 13005 -> [0-9]* bytes (+' "$TMP/diff.txt" \
+        || adder size "$TMP/a.json" "$TMP/a.json" | grep -q '^sr_'; then
+    echo "[size_report] FAIL: diff does not show the profile records"
+    cat "$TMP/diff.txt"
+    exit 1
+fi
+echo "[size_report] OK: $(tail -1 "$TMP/diff.txt")"
+
+echo "[size_report] PASS"
+exit 0
@@ -0,0 +1,189 @@
+#!/usr/bin/env bash
+# scripts/test_compiler_static_init.sh — list-literal / file-embed globals
+#
+# Background: a global initializer could only be a string literal, an
+# integer or a function name, so lookup tables and generated fixtures
+# (tests/test_xz_fixtures.ad) were declared zeroed and filled by an
+# `_init_*()` function that stored one element per statement at boot.
+# `name: Array[N, T] = [...]` and `bytes_from_file("path")` now emit
+# the bytes straight into .data.
+#
+# This is a HOST-SIDE test: compile the fixture, check the listing has
+# data directives and no fill code, check the rejected forms, then link
+# the asm against a C driver that reads every table back.
+#
+# PASS criterion: asm shape + rejection checks hold, the driver prints
+# ALL PASS, exit 0.
+
+set -uo pipefail
+cd "$(dirname "$0")/.."
+ROOT="$(pwd)"
+TMP="$(mktemp -d)"
+trap "rm -rf $TMP" EXIT
+
+FIX=tests/test_compiler_static_init.ad
+
+echo "[static_init] (1/4) Compile fixture to x86_64 asm"
+if ! python3 -m compiler.adder asm --target=x86_64-adder-user \
+        "$FIX" -o "$TMP/out.s" >"$TMP/asm.log" 2>&1; then
+    echo "[static_init] FAIL: fixture did not compile to asm"
+    cat "$TMP/asm.log"
+    exit 1
+fi
+
+echo "[static_init] (2/4) Asm-shape sanity check"
+fail=0
+check() {
+    if ! grep -qE "$1" "$TMP/out.s"; then
+        echo "[static_init] FAIL: $2"
+        fail=1
+    fi
+}
+check '^\s+\.long 0, 498536548, 997073096,' "crc_nibble is not emitted as .long data"
+check '^\s+\.short 65535, 32768, 32767, 65, 1, 90$' "mixed int16 table is wrong"
+check '^\s+\.quad double, square, double$' "Fn table is not emitted as .quad relocations"
+check '^\s+\.incbin ".*/tests/test_compiler_static_init\.bin"$' \
+    "blob is not an .incbin of the fixture's sibling file"
+if sed -n '/^\s*\.text/,/^\s*\.section \.data/p' "$TMP/out.s" \
+        | grep -qE '^(crc_nibble|short_tbl|mixed|ops|blob)\b|_init_'; then
+    echo "[static_init] FAIL: a table is filled by code"
+    fail=1
+fi
+[ "$fail" -eq 0 ] || exit 1
+echo "[static_init] OK: tables are .data directives, blob is .incbin"
+
+echo "[static_init] (3/4) Rejected initializers"
+printf 'x' > "$TMP/one.bin"
+printf 'xxxxxxxxx' > "$TMP/nine.bin"
+CASES=(
+"too_many|t: Array[2, uint8] = [1, 2, 3]
+"
+"out_of_range|t: Array[2, uint8] = [1, 256]
+"
+"non_constant|n: int64 = 3
+t: Array[2, int64] = [1, n]
+"
+"not_array|t: int64 = [1]
+"
+"struct_elem|class P:
+    a: int64
+t: Array[2, P] = [1, 2]
+"
+"not_function|t: Array[1, Fn[int64]] = [7]
+"
+"blob_too_big|t: Array[8, uint8] = bytes_from_file(\"nine.bin\")
+"
+"blob_missing|t: Array[8, uint8] = bytes_from_file(\"absent.bin\")
+"
+"blob_wide|t: Array[8, uint32] = bytes_from_file(\"one.bin\")
+"
+"blob_in_body|def f() -> int64:
+    x: Array[4, uint8]
+    x = bytes_from_file(\"one.bin\")
+    return 0
+"
+)
+for entry in "${CASES[@]}"; do
+    name="${entry%%|*}"
+    printf '%s' "${entry#*|}" > "$TMP/case_$name.ad"
+    if python3 -m compiler.adder asm --target=x86_64-adder-user \
+            "$TMP/case_$name.ad" -o "$TMP/case_$name.s" \
+            >"$TMP/case_$name.log" 2>&1; then
+        echo "[static_init] FAIL: $name compiled cleanly"
+        exit 1
+    fi
+    if ! grep -qE "x86: (global 't'|bytes_from_file)" "$TMP/case_$name.log"; then
+        echo "[static_init] FAIL: $name was not rejected with a CodeGenError"
+        cat "$TMP/case_$name.log"
+        exit 1
+    fi
+done
+echo "[static_init] OK: overflow / range / non-constant / type / file errors rejected"
+
+echo "[static_init] (4/4) Link with host C driver and run"
+cat > "$TMP/driver.c" <<'CEOF'
+#include <stdio.h>
+#include <stdint.h>
+#include <string.h>
+
+extern uint32_t crc_nibble[16];
+extern uint8_t short_tbl[10];
+extern int16_t mixed[6];
+extern int64_t wide[3];
+extern int8_t bytes_neg[4];
+extern int64_t after_odd;
+extern uint8_t blob[48];
+uint32_t crc32(const uint8_t *, int64_t);
+int64_t apply(int64_t, int64_t), blob_sum(void);
+
+static int fails;
+#define CHECK(got, want) do {                                             \
+    int64_t g = (int64_t)(got), w = (int64_t)(want);                      \
+    if (g != w && fails++ < 20)                                           \
+        printf("[static_init]   %s = %lld, want %lld\n", #got,           \
+               (long long)g, (long long)w);                               \
+} while (0)
+
+static uint32_t ref_crc32(const uint8_t *p, size_t n) {
+    uint32_t c = 0xffffffffu;
+    for (size_t i = 0; i < n; i++) {
+        c ^= p[i];
+        for (int k = 0; k < 8; k++)
+            c = (c >> 1) ^ (c & 1 ? 0xedb88320u : 0);
+    }
+    return c ^ 0xffffffffu;
+}
+
+int main(void) {
+    static const uint8_t want_blob[39] = {
+        0, 1, 2, 0x7f, 0x80, 0xfe, 0xff,
+        's', 't', 'a', 't', 'i', 'c', ' ', 'b', 'l', 'o', 'b', '\n',
+        200, 201, 202, 203, 204, 205, 206, 207, 208, 209,
+        210, 211, 212, 213, 214, 215, 216, 217, 218, 219,
+    };
+    const char *msg = "123456789";
+    CHECK(crc32((const uint8_t *)msg, 9), 0xcbf43926u);
+    CHECK(crc32(want_blob, 39), ref_crc32(want_blob, 39));
+    CHECK(crc_nibble[15], 0xbdbdf21cu);
+    for (int i = 0; i < 10; i++)
+        CHECK(short_tbl[i], i < 3 ? i + 1 : 0);
+    CHECK(mixed[0], -1);
+    CHECK(mixed[1], -32768);
+    CHECK(mixed[2], 32767);
+    CHECK(mixed[3], 'A');
+    CHECK(mixed[4], 1);
+    CHECK(mixed[5], 0x5a);
+    CHECK(wide[0], -0x123456789LL);
+    CHECK(wide[1], INT64_MAX);
+    CHECK(wide[2], 0);
+    CHECK(bytes_neg[0], -128);
+    CHECK(bytes_neg[1], -1);
+    CHECK(bytes_neg[3], 127);
+    CHECK((uintptr_t)&after_odd % 8, 0);
+    CHECK(after_odd, 0x1122334455667788LL);
+    CHECK(apply(0, 21), 42);
+    CHECK(apply(1, 12), 144);
+    CHECK(apply(2, -4), -8);
+    CHECK(memcmp(blob, want_blob, 39), 0);
+    for (int i = 39; i < 48; i++)
+        CHECK(blob[i], 0);
+    int64_t s = 0;
+    for (int i = 0; i < 39; i++)
+        s += want_blob[i];
+    CHECK(blob_sum(), s);
+    printf("[static_init] %s\n", fails == 0 ? "ALL PASS" : "SOME FAILED");
+    return fails == 0 ? 0 : 1;
+}
+CEOF
+if ! gcc -O1 "$TMP/driver.c" "$TMP/out.s" -o "$TMP/run" 2>"$TMP/link.log"; then
+    echo "[static_init] FAIL: asm did not link against the C driver"
+    cat "$TMP/link.log"
+    exit 1
+fi
+if ! "$TMP/run"; then
+    echo "[static_init] FAIL: tables read back wrong"
+    exit 1
+fi
+
+echo "[static_init] PASS"
+exit 0
@@ -0,0 +1,179 @@
+#!/usr/bin/env bash
+# scripts/test_compiler_strength_reduce.sh — `*` / `//` / `%` by constants
+#
+# Background: gen_binary used to emit imulq / divq / idivq (with the
+# %rdx zero or cqo) for every multiply, divide and modulo, even by a
+# constant power of two (`x // 4096`, `idx % 64`). Constant operands are
+# now strength-reduced: shifts / masks for powers of two (bias-adjusted
+# for signed dividends), a multiply by the magic reciprocal for other
+# divisors, lea for small multipliers. Signedness follows
+# _binop_signed_op, exactly like the divq / idivq path.
+#
+# This is a HOST-SIDE test: compile to x86_64 SysV asm, assemble, link
+# against a tiny C driver that sweeps each function over edge-case and
+# pseudo-random inputs, comparing against the C operator.
+#
+# PASS criterion: no div/idiv in the fixture's asm, every result matches
+# the C reference, the driver prints ALL PASS, exit 0.
+
+set -uo pipefail
+cd "$(dirname "$0")/.."
+ROOT="$(pwd)"
+TMP="$(mktemp -d)"
+trap "rm -rf $TMP" EXIT
+
+FIX=tests/test_compiler_strength_reduce.ad
+ASM="$TMP/strength_reduce.s"
+OBJ="$TMP/strength_reduce.o"
+BIN="$TMP/strength_reduce_test"
+
+echo "[strength_reduce] (1/4) Compile fixture to x86_64 asm"
+if ! python3 -m compiler.adder asm --target=x86_64-adder-user \
+        "$FIX" -o "$ASM" >"$TMP/asm.log" 2>&1; then
+    echo "[strength_reduce] FAIL: fixture did not compile to asm"
+    cat "$TMP/asm.log"
+    exit 1
+fi
+
+echo "[strength_reduce] (2/4) Asm-shape sanity check"
+# Every divisor in the fixture is a constant — no hardware divide may
+# survive, nor a register-register imulq for the small multipliers.
+if grep -qE "^\s+i?div[bwlq]?\s" "$ASM"; then
+    echo "[strength_reduce] FAIL: div/idiv still emitted for a constant divisor"
+    grep -nE "^\s+i?div" "$ASM"
+    exit 1
+fi
+if ! grep -qE "shrq\s+\\\$12, %rax" "$ASM"; then
+    echo "[strength_reduce] FAIL: x // 4096 over uint64 is not a logical shift"
+    exit 1
+fi
+if ! grep -qE "leaq\s+\(%rax,%rax,2\), %rax" "$ASM"; then
+    echo "[strength_reduce] FAIL: x * 3 is not an lea"
+    exit 1
+fi
+echo "[strength_reduce] OK: no div/idiv, shift + lea lowerings present"
+
+echo "[strength_reduce] (3/4) Assemble + link with host C driver"
+if ! gcc -c "$ASM" -o "$OBJ" 2>"$TMP/as.log"; then
+    echo "[strength_reduce] FAIL: emitted asm did not assemble"
+    cat "$TMP/as.log"
+    exit 1
+fi
+
+cat > "$TMP/driver.c" <<'CEOF'
+#include <stdio.h>
+#include <stdint.h>
+
+#define U(name) extern uint64_t name(uint64_t);
+#define S(name) extern int64_t name(int64_t);
+U(u_div_4096) U(u_mod_64) U(u_mod_2p32) U(u_mod_2p40)
+U(u_div_3) U(u_div_7) U(u_div_10) U(u_mod_10) U(u_mod_7)
+U(u_div_1e9p7) U(u_mod_big)
+S(s_div_2) S(s_div_16) S(s_mod_16) S(s_div_neg8) S(s_mod_neg8)
+S(s_mod_2p40) S(s_div_3) S(s_div_7) S(s_mod_10) S(s_div_neg7)
+S(s_mod_neg7) S(s_div_neg1)
+extern int32_t s32_div_4(int32_t);
+U(mul_3) U(mul_40)
+S(mul_72) S(mul_1000) S(mul_neg9)
+
+static uint64_t rng = 0x9E3779B97F4A7C15ull;
+static uint64_t next(void) {
+    rng ^= rng << 13; rng ^= rng >> 7; rng ^= rng << 17;
+    return rng;
+}
+
+static int fails;
+
+#define CHECK_U(fn, expr) do {                                            \
+    uint64_t x = v, got = fn(x), want = (expr);                         \
+    if (got != want) {                                                  \
+        if (fails++ < 20)                                               \
+            printf("[strength_reduce]   %-12s x=%llu got=%llu want=%llu\n", \
+                   #fn, (unsigned long long)x, (unsigned long long)got, \
+                   (unsigned long long)want);                           \
+    }                                                                   \
+} while (0)
+
+#define CHECK_S(fn, expr) do {                                            \
+    int64_t x = (int64_t)v, got = fn(x), want = (expr);                 \
+    if (got != want) {                                                  \
+        if (fails++ < 20)                                               \
+            printf("[strength_reduce]   %-12s x=%lld got=%lld want=%lld\n", \
+                   #fn, (long long)x, (long long)got, (long long)want); \
+    }                                                                   \
+} while (0)
+
+int main(void) {
+    static const uint64_t edge[] = {
+        0, 1, 2, 3, 6, 7, 8, 9, 10, 15, 16, 17, 63, 64, 65, 4095, 4096,
+        4097, 1000000006, 1000000007, 1000000008, 5999999999ull,
+        6000000000ull, 0xFFFFFFFFull, 0x100000000ull, 0x7FFFFFFFFFFFFFFFull,
+        0x8000000000000000ull, 0x8000000000000001ull, 0xFFFFFFFFFFFFFFFEull,
+        0xFFFFFFFFFFFFFFFFull, (uint64_t)-7, (uint64_t)-8, (uint64_t)-9,
+        (uint64_t)-16, (uint64_t)-17,
+    };
+    int n_edge = (int)(sizeof(edge) / sizeof(edge[0]));
+    int total = 0;
+    for (int i = 0; i < n_edge + 20000; i++) {
+        uint64_t v = i < n_edge ? edge[i] : next();
+        if (i >= n_edge && (i & 3) == 0)
+            v >>= (v & 63);              /* small magnitudes too */
+        CHECK_U(u_div_4096, x / 4096);
+        CHECK_U(u_mod_64, x % 64);
+        CHECK_U(u_mod_2p32, x % 4294967296ull);
+        CHECK_U(u_mod_2p40, x % 1099511627776ull);
+        CHECK_U(u_div_3, x / 3);
+        CHECK_U(u_div_7, x / 7);
+        CHECK_U(u_div_10, x / 10);
+        CHECK_U(u_mod_10, x % 10);
+        CHECK_U(u_mod_7, x % 7);
+        CHECK_U(u_div_1e9p7, x / 1000000007);
+        CHECK_U(u_mod_big, x % 6000000000ull);
+        CHECK_S(s_div_2, x / 2);
+        CHECK_S(s_div_16, x / 16);
+        CHECK_S(s_mod_16, x % 16);
+        CHECK_S(s_div_neg8, x / -8);
+        CHECK_S(s_mod_neg8, x % -8);
+        CHECK_S(s_mod_2p40, x % 1099511627776ll);
+        CHECK_S(s_div_3, x / 3);
+        CHECK_S(s_div_7, x / 7);
+        CHECK_S(s_mod_10, x % 10);
+        CHECK_S(s_div_neg7, x / -7);
+        CHECK_S(s_mod_neg7, x % -7);
+        if ((int64_t)v != INT64_MIN)
+            CHECK_S(s_div_neg1, -x);
+        {
+            int32_t x32 = (int32_t)v;
+            int32_t got = s32_div_4(x32), want = x32 / 4;
+            if (got != want && fails++ < 20)
+                printf("[strength_reduce]   s32_div_4    x=%d got=%d want=%d\n",
+                       x32, got, want);
+        }
+        CHECK_U(mul_3, x * 3);
+        CHECK_U(mul_40, x * 40);
+        CHECK_S(mul_72, (int64_t)((uint64_t)x * 72));
+        CHECK_S(mul_1000, (int64_t)((uint64_t)x * 1000));
+        CHECK_S(mul_neg9, (int64_t)((uint64_t)x * (uint64_t)-9));
+        total++;
+    }
+    printf("[strength_reduce]   %d inputs x 29 functions, %d mismatches\n",
+           total, fails);
+    printf("[strength_reduce] %s\n", fails == 0 ? "ALL PASS" : "SOME FAILED");
+    return fails == 0 ? 0 : 1;
+}
+CEOF
+
+if ! gcc -O1 "$TMP/driver.c" "$OBJ" -o "$BIN" 2>"$TMP/link.log"; then
+    echo "[strength_reduce] FAIL: link against C driver failed"
+    cat "$TMP/link.log"
+    exit 1
+fi
+
+echo "[strength_reduce] (4/4) Run and assert computed results"
+if ! "$BIN"; then
+    echo "[strength_reduce] FAIL: one or more strength-reduced results were wrong"
+    exit 1
+fi
+
+echo "[strength_reduce] PASS"
+exit 0
@@ -6,7 +6,8 @@
 # when the name is NOT shadowed by a user-defined function or local variable.
 #
 #   strlen(s: Ptr[uint8]) -> uint64
-#     Emits `repne scasb` — scans for the NUL byte and computes the count.
+#     Scans aligned qwords for the NUL byte (the word-at-a-time has-zero
+#     test, then bsf) and computes the count.
 #
 #   clamp(x, lo, hi) — value type
 #     Emits two cmpq + cmovl/cmovg pairs: first clamps x up to lo if needed,
@@ -39,17 +40,21 @@ if ! python3 -m compiler.adder asm --target=x86_64-adder-user \
 fi
 
 echo "[strlen_clamp] (2/4) Asm-shape sanity check"
-# strlen must be pure inline (repne scasb) — no call to strlen/strlen_u8.
+# strlen must be pure inline (a qword scan) — no call to strlen/strlen_u8.
 if grep -qE "call\s+strlen" "$ASM"; then
     echo "[strlen_clamp] FAIL: call to strlen found in asm — codegen is not inlining"
     exit 1
 fi
-# Verify repne scasb is present (the strlen inline expansion uses it)
-if ! grep -q "repne scasb" "$ASM"; then
-    echo "[strlen_clamp] FAIL: no repne scasb found — strlen inline missing"
+# Verify the word-at-a-time scan is present and the byte scan is gone
+if ! grep -q "movabsq \$0x8080808080808080" "$ASM"; then
+    echo "[strlen_clamp] FAIL: no has-zero mask found — strlen inline missing"
     exit 1
 fi
-echo "[strlen_clamp] OK: repne scasb present, no runtime strlen call"
+if grep -q "repne scasb" "$ASM"; then
+    echo "[strlen_clamp] FAIL: strlen still scans a byte at a time (repne scasb)"
+    exit 1
+fi
+echo "[strlen_clamp] OK: word-at-a-time scan present, no runtime strlen call"
 
 # clamp must be pure inline (cmpq + cmovl + cmovg) — no call to clamp.
 if grep -qE "call\s+clamp" "$ASM"; then
@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+"""
+benchmarks/codegen/run.py — build the codegen benchmarks at every
+optimization level, run them on the host, and compare against the
+committed baseline.
+
+Each benchmark is one .ad program in this directory (bench.ad is the
+shared measurement runtime, not a benchmark). It is compiled for the
+x86_64-linux-user target at each level, run --runs times, and reduced
+to the fastest run:
+
+    text          .text bytes of the linked image (deterministic)
+    instructions  user-mode instructions retired in the measured region
+    cycles        user-mode cycles in the measured region
+    ns            CLOCK_MONOTONIC nanoseconds in the measured region
+
+instructions and cycles come from perf_event_open inside the program;
+hosts without a PMU (most VMs) report them as `-` and only text and ns
+are compared. The checksum each run prints must be the same at every
+level, on every run, and equal to the baseline's: a benchmark that
+computes something different is a failure whatever its speed.
+
+The compiler has no -O switch; the levels are flag sets over the passes
+it does have:
+
+    O0  every pass off: no peephole, inlining, unrolling, jump tables,
+        tail calls or frame elision
+    O1  the local passes: peephole, frame elision, tail calls, jump
+        tables; no inlining or unrolling
+    O2  the defaults
+
+Against baseline.json, a metric more than its tolerance worse than the
+baseline is a regression, and any regression fails the run (exit 1).
+cycles are only held to the baseline when it was recorded on the same
+CPU model. ns is always shown, but only judged with --judge-time (and
+on the same CPU model): on a shared or virtual host the best of several
+runs still moves by half, so wall time gates only on a quiet machine
+that asks for it. Improvements are reported, never fatal: record them
+with --update, in the same commit as the codegen change that made them.
+
+    python3 benchmarks/codegen/run.py                   # check
+    python3 benchmarks/codegen/run.py --update          # re-baseline
+    python3 benchmarks/codegen/run.py --bench xz --level O2 --keep build/bench
+    perf stat build/bench/xz-O2                         # then profile one
+"""
+
+import argparse
+import json
+import os
+import platform
+import re
+import struct
+import subprocess
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Optional
+
+HERE = Path(__file__).resolve().parent
+ROOT = HERE.parents[1]
+BASELINE = HERE / "baseline.json"
+
+LEVELS = {
+    "O0": ["--no-peephole", "--no-inline", "--no-unroll", "--no-jump-tables",
+           "--no-tail-calls", "--keep-frame-pointer"],
+    "O1": ["--no-inline", "--no-unroll"],
+    "O2": [],
+}
+
+METRICS = ("text", "instructions", "cycles", "ns")
+# How much worse than the baseline a metric may get before it counts
+# as a regression. text is exact to the byte; the counters are nearly
+# so; wall time on a shared host is not.
+TOLERANCE = {"text": 0.01, "instructions": 0.02, "cycles": 0.10, "ns": 0.25}
+# Only meaningful against a baseline taken on the same CPU model.
+HOST_METRICS = ("cycles", "ns")
+
+_REPORT = re.compile(r"^bench (\S+) ns=(\d+) instructions=(\d+|-) "
+                     r"cycles=(\d+|-) checksum=([0-9a-f]{16})$", re.M)
+
+
+class BenchError(Exception):
+    """A benchmark that did not build, crashed, or disagreed with itself."""
+
+
+@dataclass
+class Result:
+    """One benchmark at one level: the best of its runs."""
+    text: int
+    ns: int
+    checksum: str
+    instructions: Optional[int] = None
+    cycles: Optional[int] = None
+
+    def to_json(self) -> dict:
+        return {k: v for k, v in self.__dict__.items() if v is not None}
+
+
+@dataclass
+class Comparison:
+    """A metric against its baseline value."""
+    name: str
+    value: Optional[int]
+    base: Optional[int]
+    judged: bool
+    delta: Optional[float] = field(init=False)
+
+    def __post_init__(self):
+        self.delta = (None if self.value is None or not self.base
+                      else self.value / self.base - 1.0)
+
+    @property
+    def regressed(self) -> bool:
+        return (self.judged and self.delta is not None
+                and self.delta > TOLERANCE[self.name])
+
+
+def host_cpu() -> str:
+    """The CPU model name, to tell whether timings are comparable."""
+    try:
+        for line in Path("/proc/cpuinfo").read_text().splitlines():
+            if line.startswith("model name"):
+                return line.split(":", 1)[1].strip()
+    except OSError:
+        pass
+    return platform.processor() or platform.machine()
+
+
+def benchmarks() -> list[str]:
+    return sorted(p.stem for p in HERE.glob("*.ad") if p.stem != "bench")
+
+
+def text_size(image: Path) -> int:
+    """Size of the .text section of an ELF64 image."""
+    data = image.read_bytes()
+    shoff, = struct.unpack_from("<Q", data, 0x28)
+    shentsize, shnum, shstrndx = struct.unpack_from("<HHH", data, 0x3A)
+    strtab_off, = struct.unpack_from("<Q", data,
+                                     shoff + shstrndx * shentsize + 24)
+    for i in range(shnum):
+        name, = struct.unpack_from("<I", data, shoff + i * shentsize)
+        end = data.index(b"\0", strtab_off + name)
+        if data[strtab_off + name:end] == b".text":
+            size, = struct.unpack_from("<Q", data,
+                                       shoff + i * shentsize + 32)
+            return size
+    raise BenchError(f"{image}: no .text section")
+
+
+def build(bench: str, level: str, out: Path) -> Path:
+    image = out / f"{bench}-{level}"
+    result = subprocess.run(
+        [sys.executable, "-m", "compiler.adder", "compile",
+         "--target=x86_64-linux-user", *LEVELS[level],
+         str((HERE / f"{bench}.ad").relative_to(ROOT)), "-o", str(image)],
+        cwd=ROOT, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise BenchError(f"{bench} {level}: build failed\n"
+                         f"{result.stderr.strip()}")
+    return image
+
+
+def _run(bench: str, level: str, image: Path) -> Result:
+    proc = subprocess.run([str(image)], capture_output=True, text=True,
+                          timeout=300)
+    m = _REPORT.search(proc.stdout)
+    if proc.returncode != 0 or not m or m.group(1) != bench:
+        raise BenchError(f"{bench} {level}: exit {proc.returncode}, "
+                         f"printed {proc.stdout.strip()!r}")
+    return Result(text_size(image), int(m.group(2)), m.group(5),
+                  None if m.group(3) == "-" else int(m.group(3)),
+                  None if m.group(4) == "-" else int(m.group(4)))
+
+
+def measure(images: dict[tuple[str, str], Path],
+            runs: int) -> dict[tuple[str, str], Result]:
+    """Run every image `runs` times and keep the best of each metric.
+
+    The runs go round-robin, after one discarded warm-up round, so a
+    slow spell on the host is spread over every benchmark rather than
+    landing on whichever one happened to be running."""
+    for job, image in images.items():
+        _run(*job, image)
+    best: dict[tuple[str, str], Result] = {}
+    for _ in range(runs):
+        for job, image in images.items():
+            r = _run(*job, image)
+            b = best.setdefault(job, r)
+            if r.checksum != b.checksum:
+                raise BenchError(f"{job[0]} {job[1]}: checksum {r.checksum} "
+                                 f"on one run, {b.checksum} on another")
+            b.ns = min(b.ns, r.ns)
+            if r.instructions is not None and b.instructions is not None:
+                b.instructions = min(b.instructions, r.instructions)
+            if r.cycles is not None and b.cycles is not None:
+                b.cycles = min(b.cycles, r.cycles)
+    return best
+
+
+def compare(result: Result, base: Optional[dict],
+            judged: set[str]) -> list[Comparison]:
+    base = base or {}
+    return [Comparison(name, getattr(result, name), base.get(name),
+                       name in judged)
+            for name in METRICS]
+
+
+def _cell(c: Comparison) -> str:
+    if c.value is None:
+        return f"{'-':>12} {'':>8}"
+    value = (f"{c.value / 1e6:.2f}ms" if c.name == "ns" else str(c.value))
+    if c.delta is None:
+        delta = "new" if c.base is None else ""
+    else:
+        delta = f"{c.delta * 100:+.1f}%" + ("!" if c.regressed else
+                                             "" if c.judged else "?")
+    return f"{value:>12} {delta:>8}"
+
+
+def format_table(rows: list[tuple[str, str, list[Comparison]]]) -> str:
+    """One row per benchmark and level; `!` marks a regression, `?` a
+    delta not judged."""
+    head = f"{'benchmark':<12} {'level':<5}" + "".join(
+        f" {name:>12} {'Δ':>8}" for name in METRICS)
+    lines = [head]
+    for bench, level, comparisons in rows:
+        lines.append(f"{bench:<12} {level:<5}"
+                     + "".join(" " + _cell(c) for c in comparisons))
+    return "\n".join(lines)
+
+
+def main(argv: list[str]) -> int:
+    parser = argparse.ArgumentParser(
+        description="Run the codegen benchmarks against the baseline")
+    parser.add_argument("--bench", action="append", choices=benchmarks(),
+                        help="only this benchmark (repeatable)")
+    parser.add_argument("--level", action="append", choices=list(LEVELS),
+                        help="only this level (repeatable)")
+    parser.add_argument("--runs", type=int, default=7,
+                        help="runs per build, best kept (default: 7)")
+    parser.add_argument("--baseline", default=str(BASELINE),
+                        help="baseline file (default: %(default)s)")
+    parser.add_argument("--update", action="store_true",
+                        help="write the results into the baseline instead "
+                             "of judging them")
+    parser.add_argument("--judge-time", action="store_true",
+                        help="also fail on wall-time regressions (quiet, "
+                             "dedicated hosts only)")
+    parser.add_argument("--keep", metavar="DIR",
+                        help="build into DIR and leave the images there")
+    args = parser.parse_args(argv)
+
+    names = args.bench or benchmarks()
+    levels = args.level or list(LEVELS)
+    baseline_path = Path(args.baseline)
+    try:
+        baseline = json.loads(baseline_path.read_text())
+    except FileNotFoundError:
+        baseline = {"host": None, "results": {}}
+    except (OSError, ValueError) as e:
+        print(f"run.py: {baseline_path}: {e}", file=sys.stderr)
+        return 1
+    host = host_cpu()
+    same_host = baseline.get("host") == host
+    judged = {"text", "instructions"}
+    if same_host:
+        judged.add("cycles")
+        if args.judge_time:
+            judged.add("ns")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        out = Path(args.keep) if args.keep else Path(tmp)
+        out.mkdir(parents=True, exist_ok=True)
+        jobs = [(b, lv) for b in names for lv in levels]
+        try:
+            with ThreadPoolExecutor(os.cpu_count() or 1) as pool:
+                images = dict(zip(jobs, pool.map(lambda j: build(*j, out),
+                                                 jobs)))
+            # Runs stay serial: concurrent runs would time each other.
+            results = measure(images, args.runs)
+        except (BenchError, subprocess.TimeoutExpired) as e:
+            print(f"run.py: {e}", file=sys.stderr)
+            return 1
+
+    failures = []
+    for bench in names:
+        sums = {results[(bench, lv)].checksum for lv in levels}
+        if len(sums) > 1:
+            failures.append(f"{bench}: levels disagree on the checksum "
+                            f"({', '.join(sorted(sums))})")
+
+    if args.update:
+        if failures:
+            print("\n".join(failures), file=sys.stderr)
+            return 1
+        if not same_host:
+            # Timings from another CPU would be judged against this one.
+            for per_level in baseline["results"].values():
+                for entry in per_level.values():
+                    for name in HOST_METRICS:
+                        entry.pop(name, None)
+        baseline["host"] = host
+        for (bench, level), result in results.items():
+            baseline["results"].setdefault(bench, {})[level] = \
+                result.to_json()
+        baseline_path.write_text(json.dumps(baseline, indent=2,
+                                            sort_keys=True) + "\n")
+        print(f"Wrote {len(results)} results to {baseline_path}")
+        return 0
+
+    rows = []
+    for (bench, level), result in results.items():
+        base = baseline["results"].get(bench, {}).get(level)
+        if base and base.get("checksum") != result.checksum:
+            failures.append(f"{bench} {level}: checksum {result.checksum}, "
+                            f"baseline {base['checksum']}")
+        comparisons = compare(result, base, judged)
+        failures += [f"{bench} {level}: {c.name} {c.delta * 100:+.1f}% "
+                     f"(tolerance {TOLERANCE[c.name] * 100:.0f}%)"
+                     for c in comparisons if c.regressed]
+        rows.append((bench, level, comparisons))
+    print(format_table(rows))
+    if not same_host:
+        print(f"baseline host {baseline.get('host')!r} is not this one "
+              f"({host!r}): cycles and ns not judged")
+    if failures:
+        print(f"{len(failures)} regressions:")
+        print("\n".join(f"  {f}" for f in failures))
+        return 1
+    print(f"{len(rows)} results within tolerance")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
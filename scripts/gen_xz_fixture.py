@@ -11,8 +11,8 @@
 # Each fixture is:
 #   - a known payload (deterministic bytes),
 #   - that payload compressed by `xz` with documented options,
-#   - emitted into the .ad as two top-level Arrays (the .xz bytes and
-#     the expected plaintext) plus their lengths.
+#   - emitted into the .ad as two list-initialized top-level Arrays
+#     (the .xz bytes and the expected plaintext) plus their lengths.
 #
 # Driven by scripts/test_xz.sh.
 
@@ -32,17 +32,19 @@ def xz_compress(data: bytes, args: list[str]) -> bytes:
 
 
 def emit_array(out, name: str, data: bytes):
-    """Emit `name: Array[N, uint8]` + a fill function _init_<name>()."""
+    """Emit `name: Array[N, uint8] = [...]` + its length. The bytes are
+    a list-literal initializer, so they land in .data at build time and
+    nothing fills them at startup."""
     n = len(data)
-    out.append(f"{name}: Array[{max(n, 1)}, uint8]")
-    out.append(f"{name}_len: uint64 = {n}")
-    out.append("")
-    out.append(f"def _init_{name}():")
     if n == 0:
-        out.append("    return")
+        out.append(f"{name}: Array[1, uint8]")
     else:
-        for i, b in enumerate(data):
-            out.append(f"    {name}[{i}] = {b}")
+        out.append(f"{name}: Array[{n}, uint8] = [")
+        for i in range(0, n, 16):
+            out.append("    " + ", ".join(str(b) for b in data[i:i + 16])
+                       + ",")
+        out.append("]")
+    out.append(f"{name}_len: uint64 = {n}")
     out.append("")
     out.append("")
 
@@ -115,12 +117,6 @@ def main():
         emit_array(out, f"{name}_xz", comp)
         emit_array(out, f"{name}_plain", plain)
 
-    out.append("def init_xz_fixtures():")
-    for name, _, _ in fx:
-        out.append(f"    _init_{name}_xz()")
-        out.append(f"    _init_{name}_plain()")
-    out.append("")
-
     with open(out_path, "w") as f:
         f.write("\n".join(out))
 
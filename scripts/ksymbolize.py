@@ -0,0 +1,772 @@
+#!/usr/bin/env python3
+"""
+scripts/ksymbolize.py — symbolize sampled kernel RIPs and stack traces,
+and turn them into top-N tables and flame-graph input.
+
+Reads the linked kernel image (build/hamnix-kernel.elf by default) with
+its own ELF parser: the symbol table always, and the DWARF line table
+when the kernel was compiled with `-g`. No binutils are run, so it works
+on any host that has Python.
+
+Samples come on stdin or from the files named on the command line, one
+sample per line, in whichever of these shapes the capture produced:
+
+    rip=0xffffffff81012345         serial log: [trap-diag] dumps, or any
+    RIP=ffffffff81012345           line with a register dump (QEMU
+                                   `-d int,cpu`); one frame
+    Trace 0: 0x7f.. [00000000/ffffffff81012345/...]
+                                   QEMU `-d exec`; one frame, the guest pc
+    #0  0xffffffff81012345 in ...  gdb `bt` through the gdbstub; frames
+    #1  0xffffffff81004321 in ...  #0, #1, ... make one sample
+    ffffffff81012345 ffffffff81004321 ...
+                                   a bare stack, leaf first; addresses may
+                                   be separated by spaces, `,`, `;` or `<-`
+
+Every other line is ignored, so a whole serial log can be fed as is.
+Caller frames hold return addresses and are looked up one byte back, so
+they land on the call instruction (what addr2line and gdb do).
+
+Symbols are shown with their module:
+
+    kernel_sched_core__pick_next    ->  kernel.sched.core._pick_next
+    kernel_sched_core___helper      ->  kernel.sched.core.__helper
+    RunQueue__push                  ->  kernel.sched.core.RunQueue.push
+    schedule                        ->  kernel.sched.core.schedule
+    schedule.cold                   ->  kernel.sched.core.schedule.cold
+
+Adder mangles a module-private `_name` to `<module_slug>_` + `_name`,
+where the slug is the module path with `.` turned into `_`. The slug
+alone is ambiguous (`kernel_sched_core` could be kernel/sched_core.ad),
+so the module comes from the line table when the function has one, and
+otherwise from the .ad files under --root. Without either, the symbol
+is shown as it is.
+
+Output, with --top N rows (default 20, 0 for all):
+
+    self     self%     total    total%  function
+    ...
+
+`self` counts the samples taken inside the function itself; `total` counts
+those with the function anywhere on the stack. `--by line` keys the
+table on function and source line instead. `--folded FILE` also writes one
+`root;...;leaf count` line per distinct stack, the input of
+flamegraph.pl and its ports. `--resolve` prints each sample's frames
+instead of the table.
+
+Identical stacks are counted before anything is symbolized, and each
+distinct address is looked up once in a flat interval index. That keeps
+millions of samples to a few seconds, most of it reading the input.
+"""
+
+import argparse
+import bisect
+import heapq
+import re
+import struct
+import sys
+from collections import Counter
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Generic, Iterable, Iterator, Optional, TypeVar
+
+HERE = Path(__file__).resolve().parent.parent
+DEFAULT_ELF = HERE / "build" / "hamnix-kernel.elf"
+
+UNKNOWN = "[unknown]"
+
+T = TypeVar("T")
+
+
+class SymbolizeError(Exception):
+    """An image or a line table this tool cannot read."""
+
+
+# -- ELF ----------------------------------------------------------------------
+
+_ET_REL = 1
+_SHT_SYMTAB = 2
+_SHT_NOBITS = 8
+_SHF_EXECINSTR = 4
+_STT_NOTYPE = 0
+_STT_FUNC = 2
+_SHN_LORESERVE = 0xFF00
+
+
+@dataclass
+class Section:
+    name: str
+    kind: int
+    flags: int
+    addr: int
+    offset: int
+    size: int
+    link: int
+    entsize: int
+
+
+@dataclass
+class Symbol:
+    name: str
+    start: int
+    end: int
+    # STT_FUNC, rather than a bare label.
+    is_function: bool
+
+
+class Elf:
+    """Sections and function symbols of a linked little-endian ELF image.
+
+    Both classes are read: the kernel is ELF64, the user binaries are
+    x86-64 code in an ELF32 wrapper."""
+
+    def __init__(self, data: bytes):
+        if data[:4] != b"\x7fELF":
+            raise SymbolizeError("not an ELF file")
+        if data[5] != 1:
+            raise SymbolizeError("big-endian ELF is not supported")
+        if data[4] == 2:
+            shoff = struct.unpack_from("<Q", data, 40)[0]
+            shentsize, shnum, shstrndx = struct.unpack_from("<HHH", data, 58)
+            section = struct.Struct("<IIQQQQIIQQ")
+        elif data[4] == 1:
+            shoff = struct.unpack_from("<I", data, 32)[0]
+            shentsize, shnum, shstrndx = struct.unpack_from("<HHH", data, 46)
+            section = struct.Struct("<IIIIIIIIII")
+        else:
+            raise SymbolizeError(f"unknown ELF class {data[4]}")
+        if struct.unpack_from("<H", data, 16)[0] == _ET_REL:
+            raise SymbolizeError(
+                "relocatable object: addresses are assigned at link "
+                "time, symbolize against the linked image")
+        self.data = data
+        self.elf64 = data[4] == 2
+        headers = [section.unpack_from(data, shoff + i * shentsize)
+                   for i in range(shnum)]
+        self.sections: list[Section] = []
+        for (name, kind, flags, addr, offset, size,
+             link, _, _, entsize) in headers:
+            self.sections.append(
+                Section("", kind, flags, addr, offset, size, link, entsize))
+        if shstrndx < len(self.sections):
+            names = self.contents(self.sections[shstrndx])
+            for sec, header in zip(self.sections, headers):
+                sec.name = _cstr(names, header[0])
+
+    def section(self, name: str) -> Optional[Section]:
+        for sec in self.sections:
+            if sec.name == name:
+                return sec
+        return None
+
+    def contents(self, sec: Section) -> bytes:
+        if sec.kind == _SHT_NOBITS:
+            return b""
+        return self.data[sec.offset:sec.offset + sec.size]
+
+    def symbols(self) -> list[Symbol]:
+        """Functions, and bare labels in executable sections (assembly
+        entry points without `.type`). A symbol without a size runs to
+        the next symbol in its section, or the section's end; a label
+        never hides the function around it (see Symbolizer)."""
+        found: list[tuple[int, int, str, int, bool]] = []
+        if self.elf64:
+            layout, fields = struct.Struct("<IBBHQQ"), (0, 4, 1, 3, 5)
+        else:
+            layout, fields = struct.Struct("<IIIBBH"), (0, 1, 3, 5, 2)
+        for sec in self.sections:
+            if sec.kind != _SHT_SYMTAB or not sec.entsize:
+                continue
+            names = self.contents(self.sections[sec.link])
+            table = self.contents(sec)
+            for i in range(len(table) // sec.entsize):
+                entry = layout.unpack_from(table, i * sec.entsize)
+                name, value, info, shndx, size = (entry[f] for f in fields)
+                if not name or shndx == 0 or shndx >= _SHN_LORESERVE:
+                    continue
+                kind = info & 0xF
+                label = _cstr(names, name)
+                if kind == _STT_NOTYPE:
+                    # `.`-labels are the codegen's branch targets.
+                    if label.startswith(".") or \
+                            not self.sections[shndx].flags & _SHF_EXECINSTR:
+                        continue
+                elif kind != _STT_FUNC:
+                    continue
+                found.append((value, size, label, shndx, kind == _STT_FUNC))
+        found.sort()
+        symbols = []
+        for i, (value, size, name, shndx, is_function) in enumerate(found):
+            end = value + size
+            if not size:
+                sec = self.sections[shndx]
+                end = sec.addr + sec.size
+                for k in range(i + 1, len(found)):
+                    if found[k][3] == shndx and found[k][0] > value:
+                        end = found[k][0]
+                        break
+            if end > value:
+                symbols.append(Symbol(name, value, end, is_function))
+        return symbols
+
+
+def _cstr(blob: bytes, start: int) -> str:
+    end = blob.index(b"\0", start)
+    return blob[start:end].decode(errors="replace")
+
+
+# -- Interval index -----------------------------------------------------------
+
+class IntervalIndex(Generic[T]):
+    """Point lookups over [start, end) intervals that may nest or
+    overlap: a lookup returns the innermost (shortest) interval that
+    covers the address.
+
+    The intervals are flattened once into sorted, disjoint segments,
+    each holding the innermost interval over it, so a lookup is one
+    binary search."""
+
+    def __init__(self, intervals: Iterable[tuple[int, int, T]]):
+        ranked = [(start, end, value) for start, end, value in intervals
+                  if end > start]
+        order = sorted(range(len(ranked)), key=lambda r: ranked[r][0])
+        bounds = sorted({b for start, end, _ in ranked for b in (start, end)})
+        self.starts: list[int] = []
+        self.ends: list[int] = []
+        self.values: list[T] = []
+        # (length, rank, end) of every interval open at the sweep.
+        active: list[tuple[int, int, int]] = []
+        j = 0
+        for k, bound in enumerate(bounds[:-1]):
+            while j < len(order) and ranked[order[j]][0] == bound:
+                start, end, _ = ranked[order[j]]
+                heapq.heappush(active, (end - start, order[j], end))
+                j += 1
+            while active and active[0][2] <= bound:
+                heapq.heappop(active)
+            if not active:
+                continue
+            value = ranked[active[0][1]][2]
+            if self.ends and self.ends[-1] == bound \
+                    and self.values[-1] == value:
+                self.ends[-1] = bounds[k + 1]
+            else:
+                self.starts.append(bound)
+                self.ends.append(bounds[k + 1])
+                self.values.append(value)
+
+    def lookup(self, address: int) -> Optional[T]:
+        i = bisect.bisect_right(self.starts, address) - 1
+        if i >= 0 and address < self.ends[i]:
+            return self.values[i]
+        return None
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+
+# -- DWARF line table ---------------------------------------------------------
+
+_DW_LNS_COPY = 1
+_DW_LNS_ADVANCE_PC = 2
+_DW_LNS_ADVANCE_LINE = 3
+_DW_LNS_SET_FILE = 4
+_DW_LNS_CONST_ADD_PC = 8
+_DW_LNS_FIXED_ADVANCE_PC = 9
+_DW_LNE_END_SEQUENCE = 1
+_DW_LNE_SET_ADDRESS = 2
+_DW_LNE_DEFINE_FILE = 3
+_DW_LNCT_PATH = 1
+_DW_LNCT_DIRECTORY_INDEX = 2
+# DWARF 5 entry forms: fixed sizes, and the string forms.
+_FORM_SIZES = {0x0B: 1, 0x05: 2, 0x06: 4, 0x07: 8, 0x1E: 16}
+_DW_FORM_STRING = 0x08
+_DW_FORM_STRP = 0x0E
+_DW_FORM_LINE_STRP = 0x1F
+_DW_FORM_UDATA = 0x0F
+_DW_FORM_BLOCK = 0x09
+
+
+class _Reader:
+    def __init__(self, data: bytes, pos: int = 0):
+        self.data = data
+        self.pos = pos
+
+    def fixed(self, fmt: str) -> int:
+        value = struct.unpack_from(fmt, self.data, self.pos)[0]
+        self.pos += struct.calcsize(fmt)
+        return value
+
+    def uint(self, size: int) -> int:
+        value = int.from_bytes(self.data[self.pos:self.pos + size], "little")
+        self.pos += size
+        return value
+
+    def uleb(self) -> int:
+        value = shift = 0
+        while True:
+            byte = self.data[self.pos]
+            self.pos += 1
+            value |= (byte & 0x7F) << shift
+            shift += 7
+            if byte < 0x80:
+                return value
+
+    def sleb(self) -> int:
+        value = shift = 0
+        while True:
+            byte = self.data[self.pos]
+            self.pos += 1
+            value |= (byte & 0x7F) << shift
+            shift += 7
+            if byte < 0x80:
+                if byte & 0x40:
+                    value -= 1 << shift
+                return value
+
+    def cstr(self) -> str:
+        end = self.data.index(b"\0", self.pos)
+        text = self.data[self.pos:end].decode(errors="replace")
+        self.pos = end + 1
+        return text
+
+
+def _join(directory: str, name: str) -> str:
+    if not directory or name.startswith("/"):
+        return name
+    return f"{directory.rstrip('/')}/{name}"
+
+
+def _v5_entries(r: _Reader, offset_size: int, strings: dict[int, bytes]
+                ) -> list[dict[int, object]]:
+    """A DWARF 5 directory or file-name table: a list of
+    {content type: value}."""
+    formats = [(r.uleb(), r.uleb()) for _ in range(r.uint(1))]
+    entries = []
+    for _ in range(r.uleb()):
+        entry: dict[int, object] = {}
+        for content, form in formats:
+            if form == _DW_FORM_STRING:
+                value: object = r.cstr()
+            elif form in (_DW_FORM_STRP, _DW_FORM_LINE_STRP):
+                blob = strings.get(form, b"")
+                value = _cstr(blob, r.uint(offset_size)) if blob else "?"
+            elif form == _DW_FORM_UDATA:
+                value = r.uleb()
+            elif form == _DW_FORM_BLOCK:
+                r.pos += r.uleb()
+                value = None
+            elif form in _FORM_SIZES:
+                value = r.uint(_FORM_SIZES[form])
+            else:
+                raise SymbolizeError(
+                    f".debug_line: unsupported form 0x{form:x}")
+            entry[content] = value
+        entries.append(entry)
+    return entries
+
+
+def parse_line_table(data: bytes, strings: Optional[dict[int, bytes]] = None
+                     ) -> list[tuple[int, int, str, int]]:
+    """Every address range of .debug_line `data`, as (start, end, file,
+    line). `strings` maps DW_FORM_strp / DW_FORM_line_strp to the
+    contents of .debug_str / .debug_line_str (DWARF 5 only)."""
+    strings = strings or {}
+    ranges: list[tuple[int, int, str, int]] = []
+    unit = 0
+    while unit < len(data):
+        r = _Reader(data, unit)
+        length, offset_size = r.fixed("<I"), 4
+        if length == 0xFFFFFFFF:
+            length, offset_size = r.fixed("<Q"), 8
+        end = r.pos + length
+        version = r.fixed("<H")
+        if not 2 <= version <= 5:
+            raise SymbolizeError(f".debug_line: DWARF version {version}")
+        if version >= 5:
+            r.pos += 2                      # address and selector sizes
+        header_length = r.uint(offset_size)
+        program = r.pos + header_length
+        min_insn = r.uint(1)
+        if version >= 4:
+            r.pos += 1                      # maximum operations per insn
+        r.pos += 1                          # default_is_stmt
+        line_base = r.fixed("<b")
+        line_range = r.uint(1)
+        opcode_base = r.uint(1)
+        arg_counts = [0] + list(data[r.pos:r.pos + opcode_base - 1])
+        r.pos += opcode_base - 1
+        if version >= 5:
+            dirs = [str(d.get(_DW_LNCT_PATH, ""))
+                    for d in _v5_entries(r, offset_size, strings)]
+            files = [_join(dirs[int(f.get(_DW_LNCT_DIRECTORY_INDEX, 0))]
+                           if dirs else "", str(f.get(_DW_LNCT_PATH, "?")))
+                     for f in _v5_entries(r, offset_size, strings)]
+        else:
+            dirs = [""]
+            while data[r.pos]:
+                dirs.append(r.cstr())
+            r.pos += 1
+            files = ["?"]
+            while data[r.pos]:
+                name = r.cstr()
+                directory = r.uleb()
+                r.uleb()
+                r.uleb()
+                files.append(_join(dirs[directory], name))
+            r.pos += 1
+        r.pos = program
+        rows: list[tuple[int, int, int]] = []
+        address, file, line = 0, 1, 1
+        while r.pos < end:
+            op = r.uint(1)
+            if op >= opcode_base:
+                adjusted = op - opcode_base
+                address += adjusted // line_range * min_insn
+                line += line_base + adjusted % line_range
+                rows.append((address, file, line))
+            elif op == 0:
+                size = r.uleb()
+                sub_end = r.pos + size
+                sub = r.uint(1)
+                if sub == _DW_LNE_END_SEQUENCE:
+                    rows.append((address, -1, 0))
+                    for (start, f, n), (stop, _, _) in zip(rows, rows[1:]):
+                        if f >= 0 and stop > start:
+                            name = files[f] if f < len(files) else "?"
+                            ranges.append((start, stop, name, n))
+                    rows = []
+                    address, file, line = 0, 1, 1
+                elif sub == _DW_LNE_SET_ADDRESS:
+                    address = r.uint(size - 1)
+                elif sub == _DW_LNE_DEFINE_FILE:
+                    name = r.cstr()
+                    files.append(_join(dirs[r.uleb()], name))
+                r.pos = sub_end
+            elif op == _DW_LNS_COPY:
+                rows.append((address, file, line))
+            elif op == _DW_LNS_ADVANCE_PC:
+                address += r.uleb() * min_insn
+            elif op == _DW_LNS_ADVANCE_LINE:
+                line += r.sleb()
+            elif op == _DW_LNS_SET_FILE:
+                file = r.uleb()
+            elif op == _DW_LNS_CONST_ADD_PC:
+                address += (255 - opcode_base) // line_range * min_insn
+            elif op == _DW_LNS_FIXED_ADVANCE_PC:
+                address += r.fixed("<H")
+            else:
+                for _ in range(arg_counts[op]):
+                    r.uleb()
+        unit = end
+    return ranges
+
+
+# -- Names --------------------------------------------------------------------
+
+def module_of(path: str, root: Path) -> Optional[str]:
+    """`kernel/sched/core.ad` (relative to `root`, or absolute under
+    it) -> `kernel.sched.core`; None for a file that is not Adder."""
+    file = Path(path)
+    if file.suffix != ".ad":
+        return None
+    if file.is_absolute():
+        try:
+            file = file.relative_to(root)
+        except ValueError:
+            file = Path(file.name)
+    return ".".join(file.with_suffix("").parts)
+
+
+def source_modules(root: Path) -> dict[str, str]:
+    """Mangling slug -> dotted module, for every .ad file under
+    `root` (see adder.py's _mangle_private)."""
+    modules = {}
+    for path in sorted(root.rglob("*.ad")):
+        module = module_of(str(path), root)
+        if module:
+            modules.setdefault(module.replace(".", "_"), module)
+    return modules
+
+
+def demangle(symbol: str, module: Optional[str],
+             modules: dict[str, str]) -> str:
+    """The source-level, module-qualified name of `symbol`. `module` is
+    the function's module if the line table knows it; `modules` maps
+    mangling slugs to modules for the rest."""
+    base, dot, suffix = symbol.partition(".")
+    suffix = dot + suffix
+    if module is not None:
+        slug = module.replace(".", "_") + "_"
+        if base.startswith(slug + "_"):
+            return f"{module}.{base[len(slug):]}{suffix}"
+    else:
+        at = base.find("__")
+        while at > 0:
+            if base[:at] in modules:
+                return f"{modules[base[:at]]}.{base[at + 1:]}{suffix}"
+            at = base.find("__", at + 1)
+    if base[:1].isupper() and "__" in base[1:]:
+        cls, _, method = base.partition("__")
+        base = f"{cls}.{method}"
+    return f"{module}.{base}{suffix}" if module else base + suffix
+
+
+# -- Symbolizer ---------------------------------------------------------------
+
+@dataclass(frozen=True)
+class Frame:
+    function: str       # demangled, or UNKNOWN
+    start: int          # the function's address
+    file: Optional[str]
+    line: int
+
+    def key(self, by_line: bool) -> str:
+        if by_line and self.file is not None:
+            return f"{self.function} {self.file}:{self.line}"
+        return self.function
+
+
+class Symbolizer:
+    """Address -> Frame for one linked image."""
+
+    def __init__(self, elf: Elf, root: Path):
+        self.root = root
+        symbols = sorted(elf.symbols(), key=lambda s: (s.start, s.name))
+        self.functions = IntervalIndex((s.start, s.end, s) for s in symbols
+                                       if s.is_function)
+        self.labels = IntervalIndex((s.start, s.end, s) for s in symbols
+                                    if not s.is_function)
+        self.lines: IntervalIndex[tuple[str, int]] = IntervalIndex([])
+        line_section = elf.section(".debug_line")
+        if line_section is not None:
+            strings = {}
+            for form, name in ((_DW_FORM_STRP, ".debug_str"),
+                               (_DW_FORM_LINE_STRP, ".debug_line_str")):
+                sec = elf.section(name)
+                if sec is not None:
+                    strings[form] = elf.contents(sec)
+            ranges = parse_line_table(elf.contents(line_section), strings)
+            self.lines = IntervalIndex(
+                (start, end, (self._relative(file), line))
+                for start, end, file, line in ranges)
+        self._modules: Optional[dict[str, str]] = None
+        self._names: dict[str, str] = {}
+        self._frames: dict[int, Frame] = {}
+
+    @property
+    def has_lines(self) -> bool:
+        return len(self.lines) > 0
+
+    def _relative(self, path: str) -> str:
+        if path.startswith("/"):
+            try:
+                return str(Path(path).relative_to(self.root))
+            except ValueError:
+                pass
+        return path
+
+    def _name(self, symbol: Symbol) -> str:
+        name = self._names.get(symbol.name)
+        if name is None:
+            at = self.lines.lookup(symbol.start)
+            module = module_of(at[0], self.root) if at else None
+            if module is None and self._modules is None \
+                    and "__" in symbol.name:
+                self._modules = source_modules(self.root)
+            name = demangle(symbol.name, module, self._modules or {})
+            self._names[symbol.name] = name
+        return name
+
+    def frame(self, address: int) -> Frame:
+        frame = self._frames.get(address)
+        if frame is None:
+            symbol = self.functions.lookup(address) \
+                or self.labels.lookup(address)
+            at = self.lines.lookup(address)
+            file, line = at if at else (None, 0)
+            if symbol is None:
+                frame = Frame(UNKNOWN, address, file, line)
+            else:
+                frame = Frame(self._name(symbol), symbol.start, file, line)
+            self._frames[address] = frame
+        return frame
+
+    def stack(self, addresses: tuple[int, ...]) -> list[Frame]:
+        """Frames of a leaf-first stack. Callers are looked up at their
+        return address minus one, inside the call."""
+        return [self.frame(a if i == 0 else a - 1)
+                for i, a in enumerate(addresses)]
+
+
+# -- Samples ------------------------------------------------------------------
+
+_ADDRESS = r"(?:0x)?[0-9a-fA-F]{8,16}"
+_STACK = re.compile(rf"\s*{_ADDRESS}(?:(?:\s*(?:<-|[,;])\s*|\s+){_ADDRESS})*"
+                    r"\s*")
+_STACK_ADDRESS = re.compile(r"(?:0x)?([0-9a-fA-F]{8,16})")
+_GDB_FRAME = re.compile(r"#(\d+)\s+(0x[0-9a-fA-F]+)\s+in\s")
+_RIP = re.compile(r"(?<![@\w])(?:RIP|rip)=(?:0x)?([0-9a-fA-F]+)\b")
+_QEMU_EXEC = re.compile(
+    r"Trace\s+\d+:\s+0x[0-9a-fA-F]+\s+\[[0-9a-fA-F]+/([0-9a-fA-F]+)/")
+
+
+def parse_samples(lines: Iterable[str]) -> Iterator[tuple[int, ...]]:
+    """Leaf-first stacks from a capture (see the module docstring)."""
+    gdb: list[int] = []
+    for text in lines:
+        if text.startswith("#"):
+            m = _GDB_FRAME.match(text)
+            if m:
+                if m.group(1) == "0" and gdb:
+                    yield tuple(gdb)
+                    gdb = []
+                gdb.append(int(m.group(2), 16))
+                continue
+        if gdb:
+            yield tuple(gdb)
+            gdb = []
+        # Bare stacks first: they are the bulk of a sampler's output.
+        if _STACK.fullmatch(text):
+            yield tuple(int(a, 16) for a in _STACK_ADDRESS.findall(text))
+            continue
+        m = _RIP.search(text) or _QEMU_EXEC.match(text)
+        if m:
+            yield (int(m.group(1), 16),)
+    if gdb:
+        yield tuple(gdb)
+
+
+def read_samples(paths: list[str]) -> Counter:
+    """Distinct stacks and how often each was sampled."""
+    counts: Counter = Counter()
+    for path in paths or ["-"]:
+        if path == "-":
+            counts.update(parse_samples(sys.stdin))
+            continue
+        with open(path, errors="replace") as f:
+            counts.update(parse_samples(f))
+    return counts
+
+
+# -- Reports ------------------------------------------------------------------
+
+def profile(sym: Symbolizer, stacks: Counter, by_line: bool = False
+            ) -> tuple[Counter, Counter, Counter]:
+    """Self and total samples per function (or function and line), and
+    the folded stacks."""
+    self_counts: Counter = Counter()
+    total: Counter = Counter()
+    folded: Counter = Counter()
+    # Frame keys of leaf and of caller addresses (see Symbolizer.stack).
+    leaf: dict[int, str] = {}
+    caller: dict[int, str] = {}
+    for addresses, n in stacks.items():
+        key = leaf.get(addresses[0])
+        if key is None:
+            key = leaf[addresses[0]] = sym.frame(addresses[0]).key(by_line)
+        keys = [key]
+        for address in addresses[1:]:
+            key = caller.get(address)
+            if key is None:
+                key = caller[address] = sym.frame(address - 1).key(by_line)
+            keys.append(key)
+        self_counts[keys[0]] += n
+        for key in set(keys) if len(keys) > 1 else keys:
+            total[key] += n
+        folded[";".join(reversed(keys))] += n
+    return self_counts, total, folded
+
+
+def format_top(self_counts: Counter, total: Counter, samples: int,
+               top: int = 20) -> str:
+    """Functions by self samples, descending."""
+    rows = sorted(total, key=lambda k: (-self_counts[k], -total[k], k))
+    lines = [f"{'self':>10}  {'self%':>6}  {'total':>10}  {'total%':>6}  "
+             f"function"]
+    for key in rows[:top or None]:
+        lines.append(f"{self_counts[key]:>10}  "
+                     f"{100 * self_counts[key] / samples:>6.2f}  "
+                     f"{total[key]:>10}  {100 * total[key] / samples:>6.2f}  "
+                     f"{key}")
+    lines.append(f"{samples} samples, {len(self_counts)} functions sampled")
+    return "\n".join(lines)
+
+
+def format_folded(folded: Counter) -> str:
+    """One `frame;frame;frame samples` line per distinct stack, root
+    first: the input of flamegraph.pl and its ports."""
+    return "".join(f"{path} {n}\n" for path, n in sorted(folded.items()))
+
+
+def format_frame(address: int, frame: Frame) -> str:
+    where = frame.function
+    if frame.function != UNKNOWN and address != frame.start:
+        where += f"+0x{address - frame.start:x}"
+    if frame.file is not None:
+        where += f" {frame.file}:{frame.line}"
+    return f"0x{address:016x} {where}"
+
+
+def main(argv: list[str]) -> int:
+    parser = argparse.ArgumentParser(
+        description="Symbolize kernel RIP samples and stack traces")
+    parser.add_argument("samples", nargs="*",
+                        help="capture files (default: stdin)")
+    parser.add_argument("-e", "--elf", default=str(DEFAULT_ELF),
+                        help="linked image (default: %(default)s)")
+    parser.add_argument("--root", default=str(HERE),
+                        help="source tree, for module names "
+                             "(default: %(default)s)")
+    parser.add_argument("--top", type=int, default=20,
+                        help="rows in the table, 0 for all (default: 20)")
+    parser.add_argument("--by", choices=("function", "line"),
+                        default="function",
+                        help="key the table and folded stacks on the "
+                             "function, or the function and source line")
+    parser.add_argument("--folded", metavar="FILE",
+                        help="also write folded stacks for flamegraph.pl")
+    parser.add_argument("--resolve", action="store_true",
+                        help="print each sample's frames instead of the "
+                             "table")
+    args = parser.parse_args(argv)
+
+    try:
+        elf = Elf(Path(args.elf).read_bytes())
+        sym = Symbolizer(elf, Path(args.root).resolve())
+    except (OSError, SymbolizeError) as e:
+        print(f"ksymbolize: {args.elf}: {e}", file=sys.stderr)
+        return 1
+    if args.by == "line" and not sym.has_lines:
+        print(f"ksymbolize: {args.elf} has no line table (build with -g)",
+              file=sys.stderr)
+        return 1
+    try:
+        if args.resolve:
+            paths = args.samples or ["-"]
+            for path in paths:
+                f = sys.stdin if path == "-" else open(path,
+                                                       errors="replace")
+                with f:
+                    for addresses in parse_samples(f):
+                        for address, frame in zip(addresses,
+                                                  sym.stack(addresses)):
+                            print(format_frame(address, frame))
+                        print()
+            return 0
+        stacks = read_samples(args.samples)
+    except OSError as e:
+        print(f"ksymbolize: {e}", file=sys.stderr)
+        return 1
+    samples = sum(stacks.values())
+    if not samples:
+        print("ksymbolize: no samples in the input", file=sys.stderr)
+        return 1
+    self_counts, total, folded = profile(sym, stacks, args.by == "line")
+    print(format_top(self_counts, total, samples, args.top))
+    if args.folded:
+        Path(args.folded).write_text(format_folded(folded))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
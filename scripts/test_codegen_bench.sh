@@ -0,0 +1,101 @@
+#!/usr/bin/env bash
+# scripts/test_codegen_bench.sh — the codegen benchmark harness
+# (benchmarks/codegen/run.py) judges what it should.
+#
+# No QEMU: the benchmarks are x86_64-linux-user programs run on the
+# host. Wall time is too noisy to test against, so every check here is
+# on something deterministic — code size, checksums, coverage:
+#
+#   1. The committed baseline covers every benchmark at every level,
+#      and its checksums agree across levels.
+#   2. Two benchmarks re-baselined into a scratch file pass against it
+#      (timings from a "different host", so not judged).
+#   3. A baseline 10% smaller than the build fails as a text
+#      regression; a wrong checksum fails as a miscompile.
+#
+# PASS criterion: every check holds, exit 0.
+
+set -uo pipefail
+PROJ_ROOT="$(cd "$(dirname "${BASH_SOURCE[0]}")/.." && pwd)"
+cd "$PROJ_ROOT"
+TMP="$(mktemp -d)"
+trap "rm -rf $TMP" EXIT
+
+bench() { python3 benchmarks/codegen/run.py "$@"; }
+SEL=(--bench crc32 --bench recursion --level O0 --level O2 --runs 1)
+
+echo "[test_codegen_bench] (1/3) Baseline coverage"
+if ! python3 - <<'PYEOF'
+import json, sys
+from pathlib import Path
+sys.path.insert(0, "benchmarks/codegen")
+import run
+base = json.loads(Path("benchmarks/codegen/baseline.json").read_text())
+bad = 0
+for bench in run.benchmarks():
+    levels = base["results"].get(bench, {})
+    if sorted(levels) != sorted(run.LEVELS):
+        print(f"[test_codegen_bench] FAIL: {bench}: levels {sorted(levels)}")
+        bad += 1
+    elif len({r["checksum"] for r in levels.values()}) != 1:
+        print(f"[test_codegen_bench] FAIL: {bench}: checksums disagree")
+        bad += 1
+sys.exit(1 if bad else 0)
+PYEOF
+then
+    exit 1
+fi
+echo "[test_codegen_bench] OK: every benchmark at every level"
+
+echo "[test_codegen_bench] (2/3) A fresh baseline passes"
+if ! bench "${SEL[@]}" --baseline "$TMP/base.json" --update \
+        >"$TMP/update.log" 2>&1; then
+    echo "[test_codegen_bench] FAIL: --update"
+    cat "$TMP/update.log"
+    exit 1
+fi
+# rebase FILE EXPR — rewrite the scratch baseline with a Python
+# expression over each result `r`.
+rebase() {
+    python3 - "$TMP/base.json" "$1" "$2" <<'PYEOF'
+import json, sys
+src, dst, expr = sys.argv[1:]
+base = json.load(open(src))
+base["host"] = "another host"
+for levels in base["results"].values():
+    for r in levels.values():
+        exec(expr)
+json.dump(base, open(dst, "w"))
+PYEOF
+}
+rebase "$TMP/same.json" "pass"
+if ! bench "${SEL[@]}" --baseline "$TMP/same.json" >"$TMP/same.log" 2>&1 \
+        || ! grep -q '^4 results within tolerance$' "$TMP/same.log" \
+        || ! grep -q 'not judged$' "$TMP/same.log"; then
+    echo "[test_codegen_bench] FAIL: build did not pass its own baseline"
+    cat "$TMP/same.log"
+    exit 1
+fi
+echo "[test_codegen_bench] OK: 4 results within tolerance"
+
+echo "[test_codegen_bench] (3/3) Regressions and miscompiles fail"
+rebase "$TMP/small.json" 'r["text"] = int(r["text"] / 1.1)'
+rebase "$TMP/wrong.json" 'r["checksum"] = "0" * 16'
+if bench "${SEL[@]}" --baseline "$TMP/small.json" >"$TMP/small.log" 2>&1 \
+        || [ "$(grep -c ': text +10\.0% (tolerance 1%)$' \
+                "$TMP/small.log")" != 4 ]; then
+    echo "[test_codegen_bench] FAIL: 10% text growth not reported"
+    cat "$TMP/small.log"
+    exit 1
+fi
+if bench "${SEL[@]}" --baseline "$TMP/wrong.json" >"$TMP/wrong.log" 2>&1 \
+        || ! grep -q 'crc32 O2: checksum 000000009a8d2b07, baseline 0\{16\}' \
+            "$TMP/wrong.log"; then
+    echo "[test_codegen_bench] FAIL: wrong checksum not reported"
+    cat "$TMP/wrong.log"
+    exit 1
+fi
+echo "[test_codegen_bench] OK: text growth and a wrong checksum both fail"
+
+echo "[test_codegen_bench] PASS"
+exit 0
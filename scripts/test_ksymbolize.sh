@@ -0,0 +1,239 @@
+#!/usr/bin/env bash
+# scripts/test_ksymbolize.sh — host-side regression for the sample
+# symbolizer (scripts/ksymbolize.py).
+#
+# No QEMU: the fixture images are only read, never run (except the
+# host-linked one in step 4). Each step feeds ksymbolize.py a capture
+# built from the image's own addresses (read with nm — the tool itself
+# uses no binutils) and checks what comes back:
+#
+#   1. Build tests/test_ksymbolize.ad (+ tests/ksym_sched.ad) as a user
+#      image with and without -g.
+#   2. A capture mixing every input shape (serial rip=, QEMU RIP= and
+#      `-d exec`, gdb `bt`, bare stacks) and log noise resolves to the
+#      module-qualified name, offset and source line of every frame.
+#   3. The top-N table and the folded stacks count every sample;
+#      without -g the names still come back qualified (from the source
+#      tree), --by line is refused, and non-images are rejected.
+#   4. ELF64 + DWARF 5: on a gcc -g build of the Adder -g fixture the
+#      line table agrees with addr2line, a real backtrace resolves
+#      leaf;middle.cold;outer;main, and a million samples go through.
+#
+# PASS criterion: every check holds, exit 0.
+
+set -uo pipefail
+PROJ_ROOT="$(cd "$(dirname "${BASH_SOURCE[0]}")/.." && pwd)"
+cd "$PROJ_ROOT"
+TMP="$(mktemp -d)"
+trap "rm -rf $TMP" EXIT
+
+ksym() { python3 scripts/ksymbolize.py "$@"; }
+fail=0
+
+echo "[test_ksymbolize] (1/4) Build the fixture with and without -g"
+for g in -g ""; do
+    if ! python3 -m compiler.adder compile --target=x86_64-adder-user $g \
+            tests/test_ksymbolize.ad -o "$TMP/ks$g.elf" \
+            >"$TMP/build.log" 2>&1; then
+        echo "[test_ksymbolize] FAIL: fixture did not build ($g)"
+        cat "$TMP/build.log"
+        exit 1
+    fi
+done
+# addr IMAGE SYMBOL [OFFSET] — the symbol's address plus OFFSET, as
+# 0x%016x.
+addr() {
+    printf '0x%016x' $((0x$(nm "$1" | awk -v s="$2" '$3 == s { print $1 }') \
+        + ${3:-0}))
+}
+G="$TMP/ks-g.elf"
+echo "[test_ksymbolize] OK: fixture built"
+
+echo "[test_ksymbolize] (2/4) Every capture shape resolves"
+push="$(addr "$G" RunQueue__push 4)"
+pick="$(addr "$G" tests_ksym_sched__pick)"
+cold="$(addr "$G" schedule.cold 2)"
+# The return address of main's call to schedule.
+ret="$(objdump -d -m i386:x86-64 "$G" | grep -A1 'call.*<schedule>' \
+    | tail -1 | awk '{ print $1 }' | tr -d :)"
+main_ret="$(printf '0x%016x' $((0x$ret)))"
+main_off="$(printf '0x%x' $((0x$ret - $(addr "$G" main))))"
+cat > "$TMP/capture.txt" <<EOF
+[    0.100] boot noise 1234
+[trap-diag] rip=$push cs=0x0000000000000008
+[trap-diag] code@rip=0x4883ec10c3c3c3c3 0x0000000000000000
+RIP=${pick#0x} RFL=00000046 [---Z-P-] CPL=0 II=0 A20=1 SMM=0 HLT=0
+Trace 0: 0x7f3c12345678 [00000000/${push#0x}/00000000/ff000000] RunQueue__push
+#0  $cold in ?? ()
+#1  $main_ret in ?? ()
+$cold <- $main_ret
+EOF
+ksym -e "$G" --resolve "$TMP/capture.txt" >"$TMP/resolve.txt"
+want="$push tests.ksym_sched.RunQueue.push+0x4 tests/ksym_sched.ad:14
+
+$pick tests.ksym_sched._pick tests/ksym_sched.ad:19
+
+$push tests.ksym_sched.RunQueue.push+0x4 tests/ksym_sched.ad:14
+
+$cold tests.ksym_sched.schedule.cold+0x2 tests/ksym_sched.ad:28
+$main_ret tests.test_ksymbolize.main+$main_off tests/test_ksymbolize.ad:15
+
+$cold tests.ksym_sched.schedule.cold+0x2 tests/ksym_sched.ad:28
+$main_ret tests.test_ksymbolize.main+$main_off tests/test_ksymbolize.ad:15
+"
+if [ "$(cat "$TMP/resolve.txt")" != "$(printf '%s' "$want")" ]; then
+    echo "[test_ksymbolize] FAIL: --resolve printed"
+    cat "$TMP/resolve.txt"
+    echo "want"
+    printf '%s\n' "$want"
+    exit 1
+fi
+echo "[test_ksymbolize] OK: 5 samples, names, offsets and lines"
+
+echo "[test_ksymbolize] (3/4) Tables, folded stacks, errors"
+ksym -e "$G" "$TMP/capture.txt" --folded "$TMP/folded.txt" >"$TMP/top.txt"
+want_top="      self   self%       total  total%  function
+         2   40.00           2   40.00  tests.ksym_sched.RunQueue.push
+         2   40.00           2   40.00  tests.ksym_sched.schedule.cold
+         1   20.00           1   20.00  tests.ksym_sched._pick
+         0    0.00           2   40.00  tests.test_ksymbolize.main
+5 samples, 3 functions sampled"
+want_folded="tests.ksym_sched.RunQueue.push 2
+tests.ksym_sched._pick 1
+tests.test_ksymbolize.main;tests.ksym_sched.schedule.cold 2"
+if [ "$(cat "$TMP/top.txt")" != "$want_top" ] \
+        || [ "$(cat "$TMP/folded.txt")" != "$want_folded" ]; then
+    echo "[test_ksymbolize] FAIL: table / folded stacks"
+    cat "$TMP/top.txt" "$TMP/folded.txt"
+    fail=1
+fi
+ksym -e "$G" --by line --top 1 "$TMP/capture.txt" >"$TMP/lines.txt"
+if ! grep -q ' tests.ksym_sched.RunQueue.push tests/ksym_sched.ad:14$' \
+        "$TMP/lines.txt"; then
+    echo "[test_ksymbolize] FAIL: --by line"
+    cat "$TMP/lines.txt"
+    fail=1
+fi
+# Without -g the module comes from the .ad files under --root.
+N="$TMP/ks.elf"
+printf 'rip=%s\n' "$(addr "$N" tests_ksym_sched__pick 3)" "$(addr "$N" main)" \
+    | ksym -e "$N" --resolve >"$TMP/plain.txt"
+if ! grep -q ' tests\.ksym_sched\._pick+0x3$' "$TMP/plain.txt" \
+        || ! grep -q ' main$' "$TMP/plain.txt"; then
+    echo "[test_ksymbolize] FAIL: names without a line table"
+    cat "$TMP/plain.txt"
+    fail=1
+fi
+expect_error() {  # expect_error WANT ARGS...
+    local want="$1"
+    shift
+    if ksym "$@" </dev/null >/dev/null 2>"$TMP/err.txt" \
+            || ! grep -q "$want" "$TMP/err.txt"; then
+        echo "[test_ksymbolize] FAIL: $* did not fail with '$want'"
+        cat "$TMP/err.txt"
+        fail=1
+    fi
+}
+expect_error 'no line table' -e "$N" --by line
+as --64 -o "$TMP/obj.o" /dev/null
+expect_error 'relocatable object' -e "$TMP/obj.o"
+expect_error 'not an ELF file' -e scripts/ksymbolize.py
+expect_error 'no samples' -e "$G"
+[ "$fail" -eq 0 ] || exit 1
+echo "[test_ksymbolize] OK: counts, folded stacks, errors"
+
+echo "[test_ksymbolize] (4/4) ELF64, DWARF 5, a real backtrace, scale"
+cat > "$TMP/driver.c" <<'CEOF'
+#include <stdio.h>
+#include <stdint.h>
+#include <execinfo.h>
+
+int64_t outer(int64_t), mix(int64_t, int64_t);
+static void *frames[32];
+static int nframes;
+
+int64_t probe(int64_t depth) {
+    nframes = backtrace(frames, 32);
+    return depth;
+}
+
+int main(void) {
+    outer(4);
+    mix(5, 2);
+    for (int i = 0; i < nframes; i++)
+        printf("%016lx%s", (unsigned long)frames[i],
+               i + 1 < nframes ? " " : "\n");
+    return 0;
+}
+CEOF
+if ! python3 -m compiler.adder asm --target=x86_64-adder-user -g \
+        adder/tests/test_compiler_debug_info.ad -o "$TMP/debug.s" \
+        >"$TMP/asm.log" 2>&1 \
+        || ! gcc -g -O1 -no-pie "$TMP/driver.c" "$TMP/debug.s" \
+            -o "$TMP/debug" 2>"$TMP/link.log"; then
+    echo "[test_ksymbolize] FAIL: host fixture did not build"
+    cat "$TMP/asm.log" "$TMP/link.log"
+    exit 1
+fi
+# The driver's line table is DWARF 5 (gcc), the Adder one DWARF 3 (gas).
+python3 - "$TMP/debug" <<'PYEOF' || fail=1
+import subprocess, sys
+from pathlib import Path
+sys.path.insert(0, "scripts")
+import ksymbolize
+
+image = sys.argv[1]
+elf = ksymbolize.Elf(Path(image).read_bytes())
+sym = ksymbolize.Symbolizer(elf, Path.cwd())
+pcs = [s.start + off for s in elf.symbols() for off in (0, 4, 9)
+       if s.start + off < s.end]
+want = subprocess.run(["addr2line", "-e", image] + [hex(a) for a in pcs],
+                      capture_output=True, text=True).stdout.splitlines()
+bad = 0
+for pc, line in zip(pcs, want):
+    frame = sym.frame(pc)
+    got = (f"{Path(frame.file).name}:{frame.line}"
+           if frame.file else "?")
+    if Path(line.split()[0]).name != got and not (
+            frame.file is None and line.endswith(":?")):
+        print(f"[test_ksymbolize] FAIL: 0x{pc:x}: {got}, addr2line {line}")
+        bad += 1
+print(f"[test_ksymbolize] OK: {len(pcs)} pcs agree with addr2line"
+      if not bad else "")
+sys.exit(1 if bad else 0)
+PYEOF
+"$TMP/debug" >"$TMP/bt.txt"
+ksym -e "$TMP/debug" --folded "$TMP/bt.folded" "$TMP/bt.txt" >/dev/null
+# probe <- leaf <- middle.cold <- outer <- main <- libc start (unknown).
+m=adder.tests.test_compiler_debug_info
+if ! grep -qF ";main;$m.outer;$m.middle.cold;$m.leaf;probe 1" \
+        "$TMP/bt.folded"; then
+    echo "[test_ksymbolize] FAIL: backtrace folded to"
+    cat "$TMP/bt.folded"
+    fail=1
+fi
+python3 - "$TMP/debug" "$TMP/big.txt" <<'PYEOF'
+import random, subprocess, sys
+nm = subprocess.run(["nm", sys.argv[1]], capture_output=True,
+                    text=True).stdout.split("\n")
+pcs = [int(f[0], 16) for f in (l.split() for l in nm)
+       if len(f) == 3 and f[1] in "Tt"]
+random.seed(7)
+with open(sys.argv[2], "w") as out:
+    for _ in range(1_000_000):
+        out.write(" ".join(f"{random.choice(pcs) + random.randrange(4):016x}"
+                           for _ in range(random.randint(1, 6))) + "\n")
+PYEOF
+start=$(date +%s)
+ksym -e "$TMP/debug" --top 3 "$TMP/big.txt" >"$TMP/big.top"
+secs=$(( $(date +%s) - start ))
+if ! grep -q '^1000000 samples' "$TMP/big.top" || [ "$secs" -gt 120 ]; then
+    echo "[test_ksymbolize] FAIL: 1M samples took ${secs}s"
+    cat "$TMP/big.top"
+    fail=1
+fi
+[ "$fail" -eq 0 ] || exit 1
+echo "[test_ksymbolize] OK: backtrace resolved, 1M samples in ${secs}s"
+
+echo "[test_ksymbolize] PASS"
+exit 0
@@ -0,0 +1,72 @@
+#!/usr/bin/env bash
+# scripts/test_linux_user.sh — lib/ algorithms on the build host via
+# the x86_64-linux-user target.
+#
+# No QEMU: the regressions that scripts/test_xz.sh and
+# scripts/test_inflate.sh run inside a booted Hamnix are linked
+# against the host-Linux runtime (adder/compiler/runtime_linux.S)
+# instead and run directly, and the gzip / gunzip userland round-trips
+# a corpus with the host's gzip. The same binaries can be timed with
+# `perf stat`.
+#
+#   1. Build tests/test_xz.ad, tests/test_inflate.ad, user/gzip.ad and
+#      user/gunzip.ad as static host ELF64s.
+#   2. The xz and inflate regressions print their PASS banners.
+#   3. gunzip inflates what host gzip -9 made, and host gzip accepts
+#      what gzip made, byte-exact both ways.
+#
+# PASS criterion: every check holds, exit 0.
+
+set -uo pipefail
+PROJ_ROOT="$(cd "$(dirname "${BASH_SOURCE[0]}")/.." && pwd)"
+cd "$PROJ_ROOT"
+TMP="$(mktemp -d)"
+trap "rm -rf $TMP" EXIT
+fail=0
+
+echo "[test_linux_user] (1/3) Build for x86_64-linux-user"
+for src in tests/test_xz.ad tests/test_inflate.ad user/gzip.ad \
+        user/gunzip.ad; do
+    if ! python3 -m compiler.adder compile --target=x86_64-linux-user \
+            "$src" -o "$TMP/$(basename "$src" .ad)" \
+            >"$TMP/build.log" 2>&1; then
+        echo "[test_linux_user] FAIL: $src did not build"
+        cat "$TMP/build.log"
+        exit 1
+    fi
+done
+echo "[test_linux_user] OK: 4 host binaries"
+
+echo "[test_linux_user] (2/3) lib/xz and lib/zlib regressions"
+for t in xz inflate; do
+    timeout 60 "$TMP/test_$t" >"$TMP/$t.log" 2>&1
+    status=$?
+    if [ "$status" != 0 ] || ! grep -q "^\[$t\] PASS" "$TMP/$t.log"; then
+        echo "[test_linux_user] FAIL: test_$t exited $status"
+        tail -20 "$TMP/$t.log"
+        fail=1
+    fi
+done
+[ "$fail" -eq 0 ] || exit 1
+echo "[test_linux_user] OK: [xz] PASS, [inflate] PASS"
+
+echo "[test_linux_user] (3/3) gzip / gunzip against host gzip"
+cat adder/compiler/*.py >"$TMP/corpus"
+cp "$TMP/corpus" "$TMP/a"
+gzip -9 -k "$TMP/a"
+rm "$TMP/a"
+if ! (cd "$TMP" && ./gunzip a.gz) || ! cmp -s "$TMP/a" "$TMP/corpus"; then
+    echo "[test_linux_user] FAIL: gunzip of host gzip -9 output"
+    fail=1
+fi
+cp "$TMP/corpus" "$TMP/b"
+if ! (cd "$TMP" && ./gzip b) \
+        || ! gzip -dc "$TMP/b.gz" | cmp -s - "$TMP/corpus"; then
+    echo "[test_linux_user] FAIL: host gunzip of gzip output"
+    fail=1
+fi
+[ "$fail" -eq 0 ] || exit 1
+echo "[test_linux_user] OK: $(wc -c <"$TMP/corpus") bytes round-trip both ways"
+
+echo "[test_linux_user] PASS"
+exit 0